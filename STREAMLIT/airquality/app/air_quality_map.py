@@ -6,6 +6,7 @@ import seaborn as sns
 from datetime import datetime, timedelta
 import numpy as np
 from db_async_wrapper import AirQualityDB, StationManager
+from qev_raster import add_qev_heatmap_layer
 import webbrowser
 import os
 import logging
@@ -51,8 +52,14 @@ class AirQualityMapper:
         else:
             return "Mauvais", "red"
     
-    def create_location_map(self, address):
-        """Créer une carte pour une adresse spécifique"""
+    def create_location_map(self, address, local_tiles: bool = False):
+        """
+        Créer une carte pour une adresse spécifique
+
+        Args:
+            address: Adresse à cartographier
+            local_tiles: Tuiles QeV en file:// (carte HTML ouverte hors Streamlit)
+        """
         # Récupérer les données pour cette adresse
         location_data = self.db.get_location_data(address)
 
@@ -134,6 +141,9 @@ class AirQualityMapper:
             fillOpacity=0.2
         ).add_to(m)
 
+        # Carte QeV précalculée (tuiles statiques, voir precompute_qev_raster.py)
+        has_layers = add_qev_heatmap_layer(m, local=local_tiles)
+
         # Ajouter les stations de mesure proches (dans un rayon de 10km)
         try:
             station_mgr = StationManager()
@@ -228,13 +238,15 @@ class AirQualityMapper:
 
                 # Ajouter le groupe à la carte
                 station_group.add_to(m)
-
-                # Ajouter contrôle des couches
-                folium.LayerControl().add_to(m)
+                has_layers = True
 
         except Exception as e:
             logger.warning(f"⚠️ Impossible d'ajouter les stations à la carte: {e}")
 
+        # Ajouter contrôle des couches
+        if has_layers:
+            folium.LayerControl().add_to(m)
+
         return m, summary
     
     def create_data_visualization(self, address):
@@ -406,7 +418,7 @@ def main():
     print(f"\n🗺️ Génération de la carte interactive...")
     
     # Créer la carte
-    map_obj, map_summary = mapper.create_location_map(user_address)
+    map_obj, map_summary = mapper.create_location_map(user_address, local_tiles=True)
     if map_obj:
         map_file = f"map_{user_address.replace(' ', '_').replace(',', '')}_air_quality.html"
         map_obj.save(map_file)
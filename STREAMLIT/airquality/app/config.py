@@ -254,7 +254,7 @@ def download_air_quality_data(latitude, longitude, address, start_date, end_date
             st.success(f"✅ Données air quality sauvegardées")
             
             # Sauvegarder les pollens dans la table dédiée
-            if db.insert_pollen_data(df, lat=latitude, lon=longitude):
+            if db.insert_pollen_data(df, lat=latitude, lon=longitude, force_update=force_update):
                 st.success(f"✅ Données pollens sauvegardées")
             
             # Reset force_refresh flag après utilisation
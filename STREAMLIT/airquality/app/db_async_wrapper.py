@@ -9,6 +9,11 @@ dans du code synchrone comme Streamlit
 """
 
 import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import time
 import pandas as pd
 from typing import Optional, Dict, List
 import threading
@@ -26,46 +31,165 @@ from db_environment import (
     StreetViewDownloadManager,
     ImageAnalysisManager
 )
+import db_pool
 
+logger = logging.getLogger(__name__)
 
-# Event loop global pour éviter de créer/fermer à chaque appel
-_loop = None
-_loop_lock = threading.Lock()
 
+# ============================================================
+# EVENT LOOP DÉDIÉ (THREAD DAEMON)
+# ============================================================
+# Un seul loop, dans son propre thread, possède les clients Prisma/asyncpg.
+# Chaque thread de script Streamlit y soumet ses coroutines via
+# run_coroutine_threadsafe et attend le résultat: les appels de plusieurs
+# sessions s'exécutent en concurrence sur les mêmes connexions.
+
+# Timeout par défaut d'un appel DB synchrone (secondes)
+DEFAULT_CALL_TIMEOUT = float(os.getenv('DB_CALL_TIMEOUT', '120'))
+# Ingestion massive (COPY): délai plus long
+BULK_CALL_TIMEOUT = float(os.getenv('DB_BULK_TIMEOUT', '1800'))
+# Connexion du pool Prisma dès le démarrage du loop (0 pour désactiver)
+DB_POOL_WARMUP = os.getenv('DB_POOL_WARMUP', '1') != '0'
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
 
-def get_event_loop():
-    """Récupère ou crée l'event loop réutilisable"""
-    global _loop
+# Métriques des appels soumis au loop
+_metrics_lock = threading.Lock()
+_metrics = {
+    'submitted': 0,
+    'completed': 0,
+    'failed': 0,
+    'timeouts': 0,
+    'in_flight': 0,
+    'max_in_flight': 0,
+    'total_wait_s': 0.0,
+}
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Récupère le loop dédié, en démarrant son thread daemon au premier appel"""
+    global _loop, _loop_thread
     with _loop_lock:
-        if _loop is None or _loop.is_closed():
+        if _loop is None or _loop.is_closed() or not _loop_thread.is_alive():
             _loop = asyncio.new_event_loop()
-            # Ne pas set_event_loop pour éviter conflits avec Streamlit
+            started = threading.Event()
+
+            def _run_loop(loop: asyncio.AbstractEventLoop):
+                # Ne pas set_event_loop dans les threads Streamlit: uniquement ici
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            _loop_thread = threading.Thread(target=_run_loop, args=(_loop,), name='db-event-loop', daemon=True)
+            _loop_thread.start()
+            started.wait()
+            logger.info("✅ Event loop DB démarré (thread daemon)")
+
+            # Warm-up du pool Prisma en arrière-plan: la première requête
+            # d'un rerun Streamlit trouve des connexions déjà ouvertes
+            if DB_POOL_WARMUP:
+                warm_up = asyncio.run_coroutine_threadsafe(db_pool.warm_up(), _loop)
+                warm_up.add_done_callback(_log_warm_up)
         return _loop
 
 
-def run_async(coro):
+def _log_warm_up(future: concurrent.futures.Future):
+    if future.exception() is not None:
+        logger.warning(f"⚠️ Warm-up du pool Prisma échoué (connexion à la première requête): {future.exception()}")
+
+
+def get_loop_metrics() -> Dict:
+    """Instantané des métriques du loop DB (appels en cours, timeouts, attente moyenne)"""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    finished = metrics['completed'] + metrics['failed'] + metrics['timeouts']
+    metrics['avg_wait_s'] = round(metrics['total_wait_s'] / finished, 4) if finished else 0.0
+    return metrics
+
+
+def get_pool_status() -> Dict:
+    """État du pool Prisma du loop DB (taille, clients occupés, évictions, remplacements)"""
+    async def _status():
+        return db_pool.pool_status()
+    return run_async(_status())
+
+
+def _record(outcome: str, elapsed: float):
+    with _metrics_lock:
+        _metrics[outcome] += 1
+        _metrics['in_flight'] -= 1
+        _metrics['total_wait_s'] += elapsed
+
+
+def run_async(coro, timeout: Optional[float] = None):
     """
-    Execute une coroutine dans l'event loop réutilisable
-    N'utilise PAS asyncio.run() car ça ferme le loop
+    Exécute une coroutine sur le loop DB dédié et attend son résultat.
+
+    Utilisable depuis n'importe quel thread, y compris un thread qui a
+    déjà son propre loop en cours (le résultat est toujours retourné,
+    jamais une task non attendue).
+
+    Args:
+        coro: Coroutine à exécuter
+        timeout: Délai max en secondes (DEFAULT_CALL_TIMEOUT si None)
+
+    Raises:
+        TimeoutError: si l'appel dépasse le délai (la coroutine est annulée)
     """
     loop = get_event_loop()
 
-    # Si on est déjà dans un event loop (cas Streamlit parfois)
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_async appelé depuis le loop DB lui-même: utiliser 'await' directement")
+
+    timeout = DEFAULT_CALL_TIMEOUT if timeout is None else timeout
+    with _metrics_lock:
+        _metrics['submitted'] += 1
+        _metrics['in_flight'] += 1
+        _metrics['max_in_flight'] = max(_metrics['max_in_flight'], _metrics['in_flight'])
+
+    started = time.perf_counter()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        result = future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        _record('timeouts', time.perf_counter() - started)
+        logger.error(f"⏱️ Appel DB annulé après {timeout:g}s")
+        raise TimeoutError(f"Appel DB > {timeout}s")
+    except BaseException:
+        _record('failed', time.perf_counter() - started)
+        raise
+
+    _record('completed', time.perf_counter() - started)
+    return result
+
+
+def shutdown_event_loop(timeout: float = 5.0):
+    """Ferme les clients puis arrête le loop dédié (appelé à la sortie du process)"""
+    with _loop_lock:
+        loop = _loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            return
+
+    async def _close_clients():
+        from db_utils_postgres import AsyncpgClient
+        for close in (db_pool.close_pool, AsyncpgClient.close):
+            try:
+                await close()
+            except Exception as e:
+                logger.warning(f"⚠️ Fermeture client DB: {e}")
+
     try:
-        if asyncio.get_running_loop():
-            # Créer une nouvelle task dans le loop courant
-            return asyncio.create_task(coro)
-    except RuntimeError:
-        # Pas de loop en cours, utiliser notre loop
+        asyncio.run_coroutine_threadsafe(_close_clients(), loop).result(timeout=timeout)
+    except Exception:
         pass
+    loop.call_soon_threadsafe(loop.stop)
 
-    # Exécuter dans notre loop sans le fermer
-    if not loop.is_running():
-        return loop.run_until_complete(coro)
-    else:
-        # Si le loop tourne déjà (thread différent), créer future
-        future = asyncio.run_coroutine_threadsafe(coro, loop)
-        return future.result()
+
+atexit.register(shutdown_event_loop)
 
 
 class AirQualityDB:
@@ -92,26 +216,43 @@ class AirQualityDB:
         """Version synchrone de insert_data"""
         return run_async(self.async_db.insert_data(dataframe, lat, lon, force_update))
 
-    def get_location_data(self, address: str = None) -> pd.DataFrame:
-        """Version synchrone de get_location_data"""
-        return run_async(self.async_db.get_location_data(address))
+    def bulk_ingest(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                    force_update: bool = False) -> Dict:
+        """Version synchrone de bulk_ingest (COPY asyncpg, retourne les timings par lot)"""
+        return run_async(self.async_db.bulk_ingest(dataframe, lat, lon, force_update), timeout=BULK_CALL_TIMEOUT)
+
+    def bulk_ingest_pollen(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                           force_update: bool = False) -> Dict:
+        """Version synchrone de bulk_ingest_pollen"""
+        return run_async(self.async_db.bulk_ingest_pollen(dataframe, lat, lon, force_update), timeout=BULK_CALL_TIMEOUT)
+
+    def get_location_data(self, address: str = None, start=None, end=None,
+                          columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """Version synchrone de get_location_data (métadonnées d'adresse dans df.attrs)"""
+        return run_async(self.async_db.get_location_data(address, start, end, columns, limit))
+
+    def get_location_data_many(self, addresses: List[str], start=None, end=None,
+                               columns: Optional[List[str]] = None, as_dict: bool = False):
+        """Version synchrone de get_location_data_many (une requête pour toutes les adresses)"""
+        return run_async(self.async_db.get_location_data_many(addresses, start, end, columns, as_dict))
 
     def get_date_range(self, address: str = None) -> Optional[Dict]:
         """Version synchrone de get_date_range"""
         return run_async(self.async_db.get_date_range(address))
 
-    def get_pollen_data(self, address: str = None) -> pd.DataFrame:
+    def get_pollen_data(self, address: str = None, start=None, end=None,
+                        columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
         """Version synchrone de get_pollen_data - récupère pollens depuis table séparée"""
-        return run_async(self.async_db.get_pollen_data(address))
+        return run_async(self.async_db.get_pollen_data(address, start, end, columns, limit))
 
-    def insert_pollen_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517) -> bool:
+    def insert_pollen_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517, force_update: bool = False) -> bool:
         """Version synchrone de insert_pollen_data - stocke pollens dans table dédiée"""
-        return run_async(self.async_db.insert_pollen_data(dataframe, lat, lon))
+        return run_async(self.async_db.insert_pollen_data(dataframe, lat, lon, force_update))
 
     def get_location_summary(self, address: str = None) -> Optional[Dict]:
         """
         Résumé air quality pour une adresse (compatible avec ancien système)
-        Retourne statistiques agrégées depuis PostgreSQL
+        Retourne statistiques agrégées depuis les rollups journaliers PostgreSQL
         """
         import logging
         logger = logging.getLogger(__name__)
@@ -119,44 +260,16 @@ class AirQualityDB:
         # Utiliser l'adresse courante si non spécifiée
         search_address = address or self.current_address
 
-        # Normaliser l'adresse recherchée pour garantir la cohérence
-        normalized_search = DatabaseManager.sanitize_address(search_address)
-
-        # Récupérer toutes les données pour cette adresse
-        df = self.get_location_data(search_address)
+        summary = run_async(self.async_db.get_location_summary(search_address))
 
-        if df.empty:
-            logger.warning(f"📊 get_location_summary: DataFrame vide pour '{search_address}'")
+        if not summary:
+            logger.warning(f"📊 get_location_summary: aucune donnée pour '{search_address}'")
             return None
 
-        # Calculer statistiques (similaire à l'ancien get_location_summary)
-        lat = df['latitude'].iloc[0] if 'latitude' in df.columns and len(df) > 0 else None
-        lon = df['longitude'].iloc[0] if 'longitude' in df.columns and len(df) > 0 else None
-
         logger.info(f"📊 get_location_summary pour '{search_address}':")
-        logger.info(f"   Adresse recherchée: '{search_address}'")
-        logger.info(f"   Adresse normalisée: '{normalized_search}'")
-        logger.info(f"   Coordonnées du DataFrame: lat={lat}, lon={lon}")
-        logger.info(f"   Nombre de lignes dans DataFrame: {len(df)}")
-
-        summary = {
-            'address': search_address,
-            'normalized_address': normalized_search,  # Utiliser l'adresse normalisée correcte
-            'total_records': len(df),
-            'avg_pm10': df['pm10'].mean() if 'pm10' in df.columns else None,
-            'avg_pm2_5': df['pm2_5'].mean() if 'pm2_5' in df.columns else None,
-            'avg_no2': df['nitrogen_dioxide'].mean() if 'nitrogen_dioxide' in df.columns else None,
-            'avg_o3': df['ozone'].mean() if 'ozone' in df.columns else None,
-            'avg_so2': df['sulphur_dioxide'].mean() if 'sulphur_dioxide' in df.columns else None,
-            'avg_co': df['carbon_monoxide'].mean() if 'carbon_monoxide' in df.columns else None,
-            'max_pm10': df['pm10'].max() if 'pm10' in df.columns else None,
-            'max_pm2_5': df['pm2_5'].max() if 'pm2_5' in df.columns else None,
-            'start_date': df['date'].min() if 'date' in df.columns else None,
-            'end_date': df['date'].max() if 'date' in df.columns else None,
-            'pollution_alert_pct': (df['pm2_5'] > 20).mean() * 100 if 'pm2_5' in df.columns else 0,
-            'latitude': lat,
-            'longitude': lon
-        }
+        logger.info(f"   Adresse normalisée: '{summary['normalized_address']}'")
+        logger.info(f"   Coordonnées: lat={summary['latitude']}, lon={summary['longitude']}")
+        logger.info(f"   Nombre d'enregistrements: {summary['total_records']}")
 
         return summary
 
@@ -164,6 +277,12 @@ class AirQualityDB:
         """
         Calcule et retourne le score QeV pour une adresse.
 
+        Le sous-indice air vient des agrégats courants de l'adresse (O(1),
+        tenus à jour par insert_data). Le résultat est caché sous l'empreinte
+        de ses entrées (agrégats air, version OSM, résultats YOLO/segmentation,
+        pondérations): tant qu'elle ne change pas, aucun recalcul ni nouvelle
+        ligne qev_scores.
+
         Args:
             address: Adresse à analyser (optionnel, utilise current_address si None)
 
@@ -173,34 +292,54 @@ class AirQualityDB:
         import logging
         logger = logging.getLogger(__name__)
 
-        from qev_service import QeVService
+        from qev_service import QeVService, qev_input_fingerprint, SERIES_GRANULARITIES
 
         # Utiliser l'adresse courante si non spécifiée
         search_address = address or self.current_address
 
         logger.info(f"🎯 Calcul QeV demandé pour adresse: '{search_address}'")
 
-        # Récupérer les données air quality
-        df = self.get_location_data(search_address)
-
-        if df.empty:
-            logger.warning(f"⚠️ Pas de données air quality pour '{search_address}' - QeV impossible")
-            return None
-
-        logger.info(f"✅ Données air quality récupérées: {len(df)} enregistrements")
-        logger.info(f"   Colonnes disponibles: {list(df.columns)}")
-        logger.info(f"   PM2.5 moyen: {df['pm2_5'].mean():.2f} μg/m³" if 'pm2_5' in df.columns else "   PM2.5: non disponible")
-        logger.info(f"   NO2 moyen: {df['nitrogen_dioxide'].mean():.2f} μg/m³" if 'nitrogen_dioxide' in df.columns else "   NO2: non disponible")
-
         # Récupérer coordonnées
         summary = self.get_location_summary(search_address)
         if not summary or summary['latitude'] is None:
-            logger.warning(f"⚠️ Coordonnées manquantes pour '{search_address}' - QeV impossible")
+            logger.warning(f"⚠️ Pas de données air quality ou coordonnées pour '{search_address}' - QeV impossible")
             return None
 
         latitude = summary['latitude']
         longitude = summary['longitude']
 
+        # Agrégats courants: moyennes par polluant sans relire l'historique
+        try:
+            aggregates = run_async(self.async_db.get_air_aggregates(search_address))
+        except Exception as agg_err:
+            logger.warning(f"⚠️ Agrégats courants indisponibles: {agg_err}")
+            aggregates = None
+
+        # Empreinte des entrées: aucun appel Overpass, aucune lecture d'image
+        fingerprint = None
+        if aggregates is not None:
+            try:
+                air_version = (aggregates['last_ts'], aggregates['records'], aggregates['updated_at'])
+                fingerprint = qev_input_fingerprint(search_address, latitude, longitude, air_version)
+                cached = run_async(self.async_db.get_cached_qev_result(fingerprint, search_address))
+                if cached is not None:
+                    logger.info(f"⚡ QeV en cache (empreinte {fingerprint[:12]}): {cached.get('QeV', 'N/A')}")
+                    return cached
+            except Exception as cache_err:
+                logger.warning(f"⚠️ Cache QeV indisponible: {cache_err}")
+
+        # Sans agrégats (table pas encore migrée): lecture complète de la série
+        df = None
+        if aggregates is None:
+            df = self.get_location_data(search_address)
+            if df.empty:
+                logger.warning(f"⚠️ Pas de données air quality pour '{search_address}' - QeV impossible")
+                return None
+            logger.info(f"✅ Données air quality récupérées: {len(df)} enregistrements")
+        else:
+            logger.info(f"✅ Agrégats air quality: {aggregates['records']} enregistrements")
+        logger.info(f"   PM2.5 moyen: {summary['avg_pm2_5']:.2f} μg/m³")
+        logger.info(f"   NO2 moyen: {summary['avg_no2']:.2f} μg/m³")
         logger.info(f"📍 Coordonnées pour QeV: lat={latitude:.6f}, lon={longitude:.6f}")
 
         # Utiliser le service QeV pour calculer
@@ -211,45 +350,48 @@ class AirQualityDB:
                 address=search_address,
                 latitude=latitude,
                 longitude=longitude,
-                air_quality_df=df
+                air_quality_df=df,
+                air_aggregates=aggregates
                 # traffic_data=None => estimation automatique via OSM Overpass
             )
 
             logger.info(f"✅ QeV calculé avec succès: {qev_result.get('QeV', 'N/A')}")
 
-            # Persister le score QeV en base de données
+            if (fingerprint is None or not qev_result.get('osm_traffic_available', True)
+                    or qev_result.get('degraded_stages')):
+                # Trafic par défaut ou étape en repli (échec/hors délai): ni cache ni historique
+                logger.warning("⚠️ Résultat QeV non caché/persisté (entrées incomplètes)")
+                return qev_result
+
+            # Persister le score QeV seulement si l'empreinte a changé
             try:
-                from db_utils_postgres import DatabaseClient, AddressManager
-
-                normalized_scores = qev_result.get('normalized_scores', {})
-                sub_indices = qev_result.get('sub_indices', {})
-                weights = qev_result.get('weights', {})
-
-                async def _persist_qev():
-                    db = await DatabaseClient.get_client()
-                    addr_mgr = AddressManager()
-                    addr_record = await addr_mgr.get_or_create_address(
-                        search_address, latitude, longitude
-                    )
-                    await db.qevscore.create(data={
-                        'addressId': addr_record.id,
-                        'qevScore': qev_result['QeV'],
-                        'qevCategory': qev_result['QeV_category'],
-                        'rawAirIndex': sub_indices.get('I_Air'),
-                        'rawTrafficNuisance': sub_indices.get('I_Trafic'),
-                        'rawGreenIndex': sub_indices.get('I_Vert'),
-                        'normalizedAirScore': normalized_scores.get('S_Air'),
-                        'normalizedTrafficScore': normalized_scores.get('S_Trafic'),
-                        'normalizedGreenScore': normalized_scores.get('S_Vert'),
-                        'weightAir': weights.get('air', 0.50),
-                        'weightTraffic': weights.get('traffic', 0.25),
-                        'weightGreen': weights.get('green', 0.25),
-                    })
-                    logger.info("✅ Score QeV persisté en PostgreSQL")
-
-                run_async(_persist_qev())
+                changed = run_async(self.async_db.save_qev_result(qev_result, fingerprint, search_address))
             except Exception as db_err:
                 logger.warning(f"⚠️ Impossible de persister le QeV en DB: {db_err}")
+                changed = False
+
+            # Séries horaires/journalières: même trafic et verdure que le calcul
+            # ponctuel (aucun nouvel appel OSM / 3-30-300). Seules les périodes
+            # depuis la dernière enregistrée sont recalculées; la fenêtre des
+            # percentiles glissants est relue en amont.
+            if changed:
+                try:
+                    for granularity, (_, window) in SERIES_GRANULARITIES.items():
+                        last_period = run_async(self.async_db.get_qev_series_end(granularity, search_address))
+                        start = last_period - pd.Timedelta(window) if last_period is not None else None
+                        series = qev_service.calculate_qev_series(
+                            self.get_location_data(search_address, start=start),
+                            qev_result['raw_indicators']['traffic'],
+                            qev_result['raw_indicators']['green'],
+                            granularity=granularity
+                        )
+                        if last_period is not None and not series.empty:
+                            series = series[series.index >= last_period]
+                        run_async(self.async_db.save_qev_series(
+                            series, granularity, qev_result['weights'], search_address
+                        ))
+                except Exception as series_err:
+                    logger.warning(f"⚠️ Impossible de calculer/persister la série QeV: {series_err}")
 
             return qev_result
 
@@ -260,6 +402,24 @@ class AirQualityDB:
             return None
 
 
+    def get_qev_sub_indices(self, addresses: Optional[List[str]] = None) -> pd.DataFrame:
+        """Version synchrone de get_qev_sub_indices (entrée du what-if QeV)"""
+        return run_async(self.async_db.get_qev_sub_indices(addresses))
+
+    def top_k(self, category: Optional[str] = None, bbox=None, k: int = 10, worst: bool = False) -> pd.DataFrame:
+        """Version synchrone de top_k (classement par dernier score QeV)"""
+        return run_async(self.async_db.top_k(category, bbox, k, worst))
+
+    def get_latest_qev_scores(self, addresses: Optional[List[str]] = None) -> pd.DataFrame:
+        """Version synchrone de get_latest_qev_scores"""
+        return run_async(self.async_db.get_latest_qev_scores(addresses))
+
+    def get_qev_series(self, address: str = None, granularity: str = 'day',
+                       start=None, end=None) -> pd.DataFrame:
+        """Version synchrone de get_qev_series (série QeV précalculée par get_qev_score)"""
+        return run_async(self.async_db.get_qev_series(address, granularity, start, end))
+
+
 class WeatherDB:
     """Wrapper synchrone pour WeatherDB async"""
 
@@ -284,6 +444,16 @@ class WeatherDB:
         """Version synchrone de insert_data"""
         return run_async(self.async_db.insert_data(dataframe, lat, lon, force_update))
 
+    def bulk_ingest(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                    force_update: bool = False) -> Dict:
+        """Version synchrone de bulk_ingest (COPY asyncpg, retourne les timings par lot)"""
+        return run_async(self.async_db.bulk_ingest(dataframe, lat, lon, force_update), timeout=BULK_CALL_TIMEOUT)
+
+    def get_many(self, addresses: List[str], start=None, end=None,
+                 columns: Optional[List[str]] = None, as_dict: bool = False):
+        """Version synchrone de get_many (météo de plusieurs adresses en une requête)"""
+        return run_async(self.async_db.get_many(addresses, start, end, columns, as_dict))
+
     def get_hourly_forecast(self, address: str = None, hours: int = 24) -> pd.DataFrame:
         """Version synchrone de get_hourly_forecast"""
         return run_async(self.async_db.get_hourly_forecast(address, hours))
@@ -561,6 +731,9 @@ class StationManager:
 
 # Export
 __all__ = [
+    'run_async',
+    'get_loop_metrics',
+    'get_pool_status',
     'AirQualityDB',
     'WeatherDB',
     'DatabaseManager',
@@ -21,6 +21,8 @@ from prisma.models import (
     StreetViewDownload, StreetViewImage, ImageAnalysis
 )
 
+import db_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,48 +31,17 @@ logger = logging.getLogger(__name__)
 # ============================================================
 
 class EnvironmentDatabaseClient:
-    """Client Prisma singleton pour données environnement"""
-
-    _instance: Optional[Prisma] = None
-    _is_connected: bool = False
-    _loop: Optional[object] = None
+    """Accès au pool Prisma partagé avec db_utils_postgres (voir db_pool.py)"""
 
     @classmethod
     async def get_client(cls) -> Prisma:
-        """Récupère ou crée le client Prisma"""
-        import asyncio
-        current_loop = asyncio.get_running_loop()
-
-        # Si le loop a changé (reload Streamlit), on doit recréer le client
-        if cls._is_connected and cls._loop is not None and cls._loop is not current_loop:
-            logger.warning("⚠️ Env Event loop changed. Resetting Prisma client.")
-            if cls._instance:
-                try:
-                    await cls._instance.disconnect()
-                except Exception:
-                    pass
-            cls._instance = None
-            cls._is_connected = False
-
-        if cls._instance is None:
-            cls._instance = Prisma()
-
-        if not cls._is_connected:
-            await cls._instance.connect()
-            cls._is_connected = True
-            cls._loop = current_loop
-            logger.info("✅ Environment Prisma client connected")
-
-        return cls._instance
+        """Client Prisma du pool, lié au loop courant"""
+        return await db_pool.get_client()
 
     @classmethod
     async def disconnect(cls):
-        """Ferme la connexion"""
-        if cls._instance and cls._is_connected:
-            await cls._instance.disconnect()
-            cls._is_connected = False
-            cls._loop = None
-            logger.info("🔌 Environment Prisma client disconnected")
+        """Ferme le pool du loop courant"""
+        await db_pool.close_pool()
 
 
 # ============================================================
@@ -85,7 +56,7 @@ class SatelliteDownloadManager:
 
     async def _ensure_connected(self):
         """Assure connexion active"""
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await EnvironmentDatabaseClient.get_client()
 
     async def create_download(
@@ -213,7 +184,7 @@ class StreetViewDownloadManager:
         self.db: Optional[Prisma] = None
 
     async def _ensure_connected(self):
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await EnvironmentDatabaseClient.get_client()
 
     async def create_download(
@@ -340,7 +311,7 @@ class ImageAnalysisManager:
         self.db: Optional[Prisma] = None
 
     async def _ensure_connected(self):
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await EnvironmentDatabaseClient.get_client()
 
     async def save_analysis(
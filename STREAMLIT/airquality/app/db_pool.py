@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+============================================================
+POOL DE CLIENTS PRISMA PARTAGÉ
+============================================================
+Couche de connexion commune à db_utils_postgres et db_environment:
+- Clients "cœur" (min_size) connectés au démarrage, jamais évincés
+- Clients de débordement (jusqu'à max_size) créés à la demande
+  par acquire() et fermés après idle_timeout sans usage
+- Health check périodique (SELECT 1), client remplacé s'il échoue
+- Un pool par event loop: un nouveau loop ne déconnecte plus
+  les clients du loop DB dédié (plus de reconnexions en rafale)
+
+Configuration (variables d'environnement):
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE,
+    DB_POOL_IDLE_TIMEOUT, DB_POOL_HEALTH_INTERVAL
+============================================================
+"""
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List
+
+from prisma import Prisma
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '4'))
+# Un client de débordement inutilisé depuis ce délai est fermé (secondes)
+POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+# Intervalle entre deux health checks d'un même client (secondes)
+POOL_HEALTH_INTERVAL = float(os.getenv('DB_POOL_HEALTH_INTERVAL', '30'))
+
+
+# ============================================================
+# POOL
+# ============================================================
+
+class PooledClient:
+    """Client Prisma connecté + état d'utilisation"""
+
+    def __init__(self, client: Prisma, core: bool):
+        self.client = client
+        self.core = core
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+
+
+class PrismaPool:
+    """Pool de clients Prisma lié à un event loop"""
+
+    def __init__(self, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 health_check_interval: float = POOL_HEALTH_INTERVAL):
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._slots: List[PooledClient] = []
+        self._next = 0
+        self._lock = asyncio.Lock()
+        self._available = asyncio.Condition(self._lock)
+        self._reaper: Optional[asyncio.Task] = None
+        self._closed = False
+        self.stats = {'connects': 0, 'evicted': 0, 'replaced': 0, 'waits': 0}
+
+    async def _connect(self, core: bool) -> PooledClient:
+        client = Prisma()
+        await client.connect()
+        self.stats['connects'] += 1
+        return PooledClient(client, core)
+
+    async def start(self):
+        """Warm-up: connecte les clients cœur en parallèle et lance la maintenance"""
+        async with self._lock:
+            missing = self.min_size - sum(1 for slot in self._slots if slot.core)
+            if missing > 0:
+                slots = await asyncio.gather(*(self._connect(core=True) for _ in range(missing)))
+                self._slots.extend(slots)
+                logger.info(f"✅ Pool Prisma prêt ({len(self._slots)} client(s), max {self.max_size})")
+
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def get_client(self) -> Prisma:
+        """
+        Client cœur partagé (round-robin).
+
+        Prisma multiplexe les requêtes concurrentes d'un même client: le
+        client retourné peut être conservé par l'appelant (self.db). Les
+        clients cœur ne sont jamais évincés, seulement remplacés après un
+        health check en échec (is_connected() devient alors False).
+        """
+        core = [slot for slot in self._slots if slot.core]
+        if not core:
+            await self.start()
+            core = [slot for slot in self._slots if slot.core]
+        slot = core[self._next % len(core)]
+        self._next += 1
+        slot.last_used = time.monotonic()
+        return slot.client
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Réserve un client pour la durée du bloc.
+
+        Préfère un client libre, sinon ouvre un client de débordement
+        (≤ max_size), sinon attend qu'un client soit rendu.
+        """
+        if not self._slots:
+            await self.start()
+
+        async with self._available:
+            while True:
+                free = [slot for slot in self._slots if slot.in_use == 0]
+                if free:
+                    slot = min(free, key=lambda s: s.last_used)
+                    break
+                if len(self._slots) < self.max_size:
+                    slot = await self._connect(core=False)
+                    self._slots.append(slot)
+                    logger.info(f"➕ Client Prisma de débordement ({len(self._slots)}/{self.max_size})")
+                    break
+                self.stats['waits'] += 1
+                await self._available.wait()
+            slot.in_use += 1
+
+        try:
+            yield slot.client
+        finally:
+            async with self._available:
+                slot.in_use -= 1
+                slot.last_used = time.monotonic()
+                self._available.notify()
+
+    async def _check(self, slot: PooledClient) -> bool:
+        """Health check d'un client libre"""
+        try:
+            await asyncio.wait_for(slot.client.query_raw('SELECT 1'), timeout=10)
+            slot.last_checked = time.monotonic()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Health check Prisma en échec: {e}")
+            return False
+
+    async def _disconnect(self, slot: PooledClient):
+        try:
+            await slot.client.disconnect()
+        except Exception:
+            pass  # Client déjà mort
+
+    async def _maintain(self):
+        """Tâche de fond: éviction des clients inactifs + health checks"""
+        interval = max(1.0, min(self.idle_timeout, self.health_check_interval) / 2)
+        while not self._closed:
+            await asyncio.sleep(interval)
+            try:
+                await self.maintain_once()
+            except Exception as e:
+                logger.warning(f"⚠️ Maintenance pool Prisma: {e}")
+
+    async def maintain_once(self):
+        """Un passage de maintenance (exposé pour les scripts/diagnostics)"""
+        now = time.monotonic()
+
+        async with self._lock:
+            idle = [slot for slot in self._slots
+                    if not slot.core and slot.in_use == 0 and now - slot.last_used > self.idle_timeout]
+            for slot in idle:
+                self._slots.remove(slot)
+            to_check = [slot for slot in self._slots
+                        if slot.in_use == 0 and now - slot.last_checked > self.health_check_interval]
+
+        for slot in idle:
+            await self._disconnect(slot)
+            self.stats['evicted'] += 1
+        if idle:
+            logger.info(f"🧹 {len(idle)} client(s) Prisma inactif(s) fermé(s)")
+
+        for slot in to_check:
+            if await self._check(slot):
+                continue
+            async with self._lock:
+                if slot not in self._slots:
+                    continue
+                self._slots.remove(slot)
+            await self._disconnect(slot)
+            if slot.core:
+                replacement = await self._connect(core=True)
+                async with self._lock:
+                    self._slots.append(replacement)
+            self.stats['replaced'] += 1
+            logger.info("🔄 Client Prisma remplacé après health check")
+
+    async def close(self):
+        """Ferme tous les clients et arrête la maintenance"""
+        self._closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._lock:
+            slots, self._slots = self._slots, []
+        for slot in slots:
+            await self._disconnect(slot)
+        if slots:
+            logger.info(f"🔌 Pool Prisma fermé ({len(slots)} client(s))")
+
+    def status(self) -> Dict:
+        """Taille, clients occupés et compteurs du pool"""
+        return {
+            'size': len(self._slots),
+            'core': sum(1 for slot in self._slots if slot.core),
+            'in_use': sum(1 for slot in self._slots if slot.in_use),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            **self.stats,
+        }
+
+
+# ============================================================
+# UN POOL PAR EVENT LOOP
+# ============================================================
+# Les clients Prisma sont liés au loop qui les a connectés. Le loop DB
+# dédié (db_async_wrapper) garde son pool pour toute la vie du process;
+# un script qui lance asyncio.run() obtient le sien sans toucher au premier.
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PrismaPool]" = weakref.WeakKeyDictionary()
+
+
+def get_pool() -> PrismaPool:
+    """Pool du loop courant (créé au premier appel, sans connexion)"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None or pool._closed:
+        pool = PrismaPool()
+        _pools[loop] = pool
+    return pool
+
+
+async def get_client() -> Prisma:
+    """Client Prisma partagé du loop courant"""
+    return await get_pool().get_client()
+
+
+def acquire():
+    """Client Prisma réservé pour un bloc 'async with'"""
+    return get_pool().acquire()
+
+
+async def warm_up():
+    """Connecte les clients cœur du loop courant (à appeler au démarrage)"""
+    await get_pool().start()
+
+
+async def close_pool():
+    """Ferme le pool du loop courant"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.pop(loop, None)
+    if pool is not None:
+        await pool.close()
+
+
+def pool_status() -> Dict:
+    """État du pool du loop courant ({} s'il n'existe pas)"""
+    pool = _pools.get(asyncio.get_running_loop())
+    return pool.status() if pool is not None else {}
+
+
+__all__ = [
+    'PrismaPool',
+    'get_pool',
+    'get_client',
+    'acquire',
+    'warm_up',
+    'close_pool',
+    'pool_status',
+    'POOL_MIN_SIZE',
+    'POOL_MAX_SIZE',
+]
@@ -15,65 +15,1512 @@ Architecture: PostgreSQL + Prisma + PostGIS
 # ============================================================
 # IMPORTS
 # ============================================================
+import copy
+import json
 import logging
+import math
+import os
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import pandas as pd
 
 from prisma import Prisma
 from prisma.models import Address, AirQualityRecord, WeatherRecord
 
+import db_pool
+
 logger = logging.getLogger(__name__)
 
 
 # ============================================================
-# CLIENT PRISMA SINGLETON
+# CLIENT PRISMA (POOL PARTAGÉ)
 # ============================================================
 
 class DatabaseClient:
-    """Client Prisma singleton partagé"""
+    """Accès au pool Prisma partagé (voir db_pool.py)"""
+
+    @classmethod
+    async def get_client(cls) -> Prisma:
+        """Client Prisma du pool, lié au loop courant (jamais reconnecté au changement de loop)"""
+        return await db_pool.get_client()
+
+    @classmethod
+    def acquire(cls):
+        """Client Prisma réservé pour un bloc 'async with' (débordement jusqu'à DB_POOL_MAX_SIZE)"""
+        return db_pool.acquire()
+
+    @classmethod
+    async def disconnect(cls):
+        """Ferme le pool du loop courant"""
+        await db_pool.close_pool()
+
+
+# ============================================================
+# POOL ASYNCPG (INGESTION MASSIVE VIA COPY)
+# ============================================================
+
+# Paramètres d'URL propres à Prisma, refusés par asyncpg
+PRISMA_ONLY_URL_PARAMS = {'schema', 'connection_limit', 'pool_timeout', 'pgbouncer', 'socket_timeout'}
+
+
+def asyncpg_dsn(database_url: Optional[str] = None) -> str:
+    """Convertit DATABASE_URL (format Prisma) en DSN accepté par asyncpg"""
+    import os
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+    url = database_url or os.getenv('DATABASE_URL')
+    if not url:
+        raise RuntimeError("DATABASE_URL non défini")
+
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in PRISMA_ONLY_URL_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
 
-    _instance: Optional[Prisma] = None
-    _is_connected: bool = False
+
+class AsyncpgClient:
+    """Pool asyncpg partagé pour COPY (Prisma n'expose pas le protocole COPY)"""
+
+    _pool = None
     _loop: Optional[object] = None
 
     @classmethod
-    async def get_client(cls) -> Prisma:
-        """Récupère ou crée le client Prisma"""
+    async def get_pool(cls):
+        """Récupère ou crée le pool asyncpg lié au loop courant"""
         import asyncio
+        import asyncpg
+
         current_loop = asyncio.get_running_loop()
 
-        # Si le loop a changé (reload Streamlit), on doit recréer le client
-        if cls._is_connected and cls._loop is not None and cls._loop is not current_loop:
-            logger.warning("⚠️ Event loop changed (Streamlit reload?). Resetting Prisma client.")
-            if cls._instance:
-                try:
-                    await cls._instance.disconnect()
-                except Exception:
-                    pass # Ignore errors on disconnect from dead loop
-            cls._instance = None
-            cls._is_connected = False
-
-        if cls._instance is None:
-            cls._instance = Prisma()
-
-        if not cls._is_connected:
-            await cls._instance.connect()
-            cls._is_connected = True
+        # Un pool asyncpg est lié à son event loop
+        if cls._pool is not None and cls._loop is not current_loop:
+            logger.warning("⚠️ Event loop changed. Resetting asyncpg pool.")
+            cls._pool.terminate()
+            cls._pool = None
+
+        if cls._pool is None:
+            cls._pool = await asyncpg.create_pool(
+                dsn=asyncpg_dsn(),
+                min_size=db_pool.POOL_MIN_SIZE,
+                max_size=db_pool.POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=db_pool.POOL_IDLE_TIMEOUT
+            )
             cls._loop = current_loop
-            logger.info("✅ Prisma DB client connected")
+            logger.info("✅ asyncpg pool connected")
 
-        return cls._instance
+        return cls._pool
 
     @classmethod
-    async def disconnect(cls):
-        """Ferme la connexion"""
-        if cls._instance and cls._is_connected:
-            await cls._instance.disconnect()
-            cls._is_connected = False
+    async def close(cls):
+        """Ferme le pool"""
+        if cls._pool is not None:
+            await cls._pool.close()
+            cls._pool = None
             cls._loop = None
-            logger.info("🔌 Prisma DB client disconnected")
+            logger.info("🔌 asyncpg pool closed")
+
+
+# ============================================================
+# PARTITIONS MENSUELLES (voir prisma/partitioning_migration.sql)
+# ============================================================
+
+# Mois dont la partition est garantie, par table (évite un aller-retour par lot)
+_ENSURED_PARTITIONS: Dict[str, set] = {}
+
+
+async def ensure_partitions(conn, table: str, timestamps: pd.Series) -> set:
+    """
+    Crée à la volée les partitions mensuelles couvrant un lot avant écriture.
+
+    À appeler sur la connexion du lot, dans sa transaction: la création
+    (create_monthly_partition verrouille la table parente) et l'écriture
+    forment un tout, aucun insert concurrent ne peut tomber dans la
+    partition par défaut entre les deux. Chaque mois passe dans un
+    savepoint: un échec laisse le lot s'écrire (partition par défaut).
+
+    Sans effet si la table n'est pas partitionnée (la fonction SQL retourne NULL)
+    ou si le helper SQL n'est pas installé (base non migrée).
+
+    Returns:
+        Mois garantis, à passer à mark_partitions_ensured() après COMMIT
+        (un rollback annule aussi la création des partitions)
+    """
+    import asyncpg
+
+    if timestamps.empty:
+        return set()
+
+    months = set(pd.to_datetime(timestamps).dt.to_period('M').dt.to_timestamp().dt.date.unique())
+    missing = sorted(months - _ENSURED_PARTITIONS.get(table, set()))
+    created = set()
+    for month in missing:
+        try:
+            async with conn.transaction():
+                await conn.fetchval('SELECT create_monthly_partition($1, $2)', table, month)
+            created.add(month)
+        except asyncpg.exceptions.UndefinedFunctionError:
+            # Helpers absents (base non migrée): la table heap reçoit tout, inutile de réessayer
+            logger.debug(f"ensure_partitions({table}) ignoré: create_monthly_partition non installée")
+            return set(missing)
+        except Exception as e:
+            logger.warning(f"⚠️ ensure_partitions({table}) a échoué pour {month:%Y-%m}, "
+                           f"nouvel essai au prochain lot: {e}")
+    return created
+
+
+def mark_partitions_ensured(table: str, months: set) -> None:
+    """Met en cache les mois de ensure_partitions() une fois la transaction validée"""
+    _ENSURED_PARTITIONS.setdefault(table, set()).update(months)
+
+
+# ============================================================
+# UPSERT ENSEMBLISTE (VECTORISÉ)
+# ============================================================
+
+# Mapping colonnes DataFrame (Open-Meteo) → (colonne SQL, type SQL cible)
+AIR_QUALITY_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'pm10': ('pm10', 'double precision'),
+    'pm2_5': ('pm2_5', 'double precision'),
+    'carbon_monoxide': ('carbon_monoxide', 'double precision'),
+    'nitrogen_dioxide': ('nitrogen_dioxide', 'double precision'),
+    'ozone': ('ozone', 'double precision'),
+    'sulphur_dioxide': ('sulfur_dioxide', 'double precision'),
+}
+
+WEATHER_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'temperature': ('temperature', 'double precision'),
+    'feels_like': ('feels_like', 'double precision'),
+    'humidity': ('humidity', 'integer'),
+    'pressure': ('pressure', 'double precision'),
+    'wind_speed': ('wind_speed', 'double precision'),
+    'wind_direction': ('wind_direction', 'integer'),
+    'wind_gusts': ('wind_gusts', 'double precision'),
+    'cloud_cover': ('cloud_cover', 'integer'),
+    'rain': ('precipitation_1h', 'double precision'),
+    'weather_code': ('weather_code', 'integer'),
+    'visibility': ('visibility', 'double precision'),
+}
+
+# Open-Meteo → noms botaniques du schéma pollen_records
+POLLEN_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'alder_pollen': ('alnus', 'double precision'),        # Alder = Aulne
+    'birch_pollen': ('betula', 'double precision'),       # Birch = Bouleau
+    'grass_pollen': ('graminaceae', 'double precision'),  # Grass = Graminées
+    'mugwort_pollen': ('artemisia', 'double precision'),  # Mugwort = Armoise
+    'ragweed_pollen': ('ambrosia', 'double precision'),   # Ragweed = Ambroisie
+}
+
+
+def frame_to_records(dataframe: pd.DataFrame, column_map: Dict[str, Tuple[str, str]]) -> pd.DataFrame:
+    """
+    Convertit un DataFrame Open-Meteo en colonnes SQL, sans itération ligne par ligne.
+
+    Les timestamps sont convertis en une passe (UTC naïf, comme Prisma),
+    les valeurs en numérique (NaN → NULL) et les doublons de timestamp
+    sont éliminés (dernier gagnant) pour qu'un seul statement suffise.
+
+    Args:
+        dataframe: DataFrame avec une colonne 'date' (et optionnellement 'address_id'
+                   pour un lot multi-adresses)
+        column_map: Mapping colonne DataFrame → (colonne SQL, type SQL)
+
+    Returns:
+        DataFrame avec ['address_id'], 'timestamp' + colonnes SQL présentes dans la source
+    """
+    timestamps = pd.to_datetime(dataframe['date'], utc=True).dt.tz_localize(None)
+    records = pd.DataFrame({'timestamp': timestamps.to_numpy()})
+    key_cols = ['timestamp']
+
+    if 'address_id' in dataframe.columns:
+        records.insert(0, 'address_id', dataframe['address_id'].to_numpy(dtype='int64'))
+        key_cols = ['address_id', 'timestamp']
+
+    for source_col, (sql_col, _) in column_map.items():
+        if source_col in dataframe.columns:
+            records[sql_col] = pd.to_numeric(dataframe[source_col], errors='coerce').to_numpy(dtype='float64')
+
+    records = records.dropna(subset=['timestamp'])
+    return records.drop_duplicates(subset=key_cols, keep='last').reset_index(drop=True)
+
+
+def build_merge_sql(
+    table: str,
+    source_sql: str,
+    value_cols: List[str],
+    column_map: Dict[str, Tuple[str, str]],
+    data_source_param: str,
+    force_update: bool = False,
+    station_scoped: bool = True,
+    has_updated_at: bool = True,
+    time_bounds: Optional[Tuple[str, str]] = None
+) -> str:
+    """
+    Construit le statement de fusion d'un lot vers une table de séries temporelles.
+
+    source_sql doit produire les colonnes (address_id, "timestamp", value_cols...),
+    les valeurs en float8 (cast vers le type cible ici, ex: humidity INTEGER).
+
+    Pour les tables dont la clé unique contient station_id (air/météo), les
+    lignes Open-Meteo ont station_id NULL et PostgreSQL ne détecte pas de
+    conflit sur NULL: la mise à jour passe donc par un CTE UPDATE ... FROM,
+    suivi d'un INSERT des timestamps absents. Pour pollen_records
+    (clé (address_id, timestamp)) on utilise directement INSERT ... ON CONFLICT.
+
+    time_bounds: placeholders (min, max) du lot. Sur les tables partitionnées
+    par mois, ce filtre explicite sur "timestamp" permet au planificateur
+    d'écarter les partitions hors plage (la jointure seule ne le permet pas).
+
+    Le statement retourne une ligne (inserted, updated).
+    """
+    sql_types = {sql_col: sql_type for sql_col, sql_type in column_map.values()}
+    casted = {col: f'i.{col}::{sql_types[col]}' if sql_types[col] != 'double precision' else f'i.{col}'
+              for col in value_cols}
+
+    insert_cols = ['address_id', '"timestamp"'] + value_cols + ['data_source', 'created_at']
+    insert_vals = ['i.address_id', 'i."timestamp"'] + [casted[col] for col in value_cols] + [data_source_param, 'NOW()']
+    set_parts = [f'{col} = {casted[col]}' for col in value_cols] + [f'data_source = {data_source_param}']
+    if has_updated_at:
+        insert_cols.append('updated_at')
+        insert_vals.append('NOW()')
+        set_parts.append('updated_at = NOW()')
+
+    if station_scoped:
+        match = 'r.address_id = i.address_id AND r."timestamp" = i."timestamp" AND r.station_id IS NULL'
+        if time_bounds:
+            match += f' AND r."timestamp" BETWEEN {time_bounds[0]}::timestamp AND {time_bounds[1]}::timestamp'
+        updated_cte = ''
+        if force_update:
+            updated_cte = f'''
+            updated AS (
+                UPDATE {table} r
+                SET {', '.join(set_parts)}
+                FROM incoming i
+                WHERE {match}
+                RETURNING 1
+            ),'''
+        return f'''
+            WITH incoming AS (
+                {source_sql}
+            ),{updated_cte}
+            inserted AS (
+                INSERT INTO {table} ({', '.join(insert_cols)})
+                SELECT {', '.join(insert_vals)}
+                FROM incoming i
+                WHERE NOT EXISTS (SELECT 1 FROM {table} r WHERE {match})
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            )
+            SELECT
+                (SELECT COUNT(*) FROM inserted) AS inserted,
+                {'(SELECT COUNT(*) FROM updated)' if force_update else '0'} AS updated
+        '''
+
+    if force_update:
+        excluded = [f'{col} = EXCLUDED.{col}' for col in value_cols] + ['data_source = EXCLUDED.data_source']
+        if has_updated_at:
+            excluded.append('updated_at = NOW()')
+        conflict_action = f'DO UPDATE SET {", ".join(excluded)}'
+    else:
+        conflict_action = 'DO NOTHING'
+    bounds_filter = ''
+    if time_bounds:
+        bounds_filter = f'WHERE i."timestamp" BETWEEN {time_bounds[0]}::timestamp AND {time_bounds[1]}::timestamp'
+    # xmax = 0 ⇔ ligne réellement insérée (et non mise à jour par ON CONFLICT)
+    return f'''
+        WITH incoming AS (
+            {source_sql}
+        ),
+        written AS (
+            INSERT INTO {table} ({', '.join(insert_cols)})
+            SELECT {', '.join(insert_vals)}
+            FROM incoming i
+            {bounds_filter}
+            ON CONFLICT (address_id, "timestamp") {conflict_action}
+            RETURNING (xmax = 0) AS is_insert
+        )
+        SELECT
+            COUNT(*) FILTER (WHERE is_insert) AS inserted,
+            COUNT(*) FILTER (WHERE NOT is_insert) AS updated
+        FROM written
+    '''
+
+
+async def bulk_upsert(
+    table: str,
+    address_id: int,
+    records: pd.DataFrame,
+    column_map: Dict[str, Tuple[str, str]],
+    data_source: str,
+    force_update: bool = False,
+    station_scoped: bool = True,
+    has_updated_at: bool = True
+) -> Dict[str, int]:
+    """
+    Upsert ensembliste: tout le lot part en 1 seul statement SQL.
+
+    Le lot est transmis en un paramètre JSONB puis déplié côté serveur
+    (jsonb_to_recordset), et fusionné via build_merge_sql(), dans la même
+    transaction asyncpg que le rafraîchissement des agrégats.
+
+    Args:
+        table: Table cible (air_quality_records, weather_records, pollen_records)
+        address_id: ID de l'adresse
+        records: Résultat de frame_to_records()
+        column_map: Mapping utilisé pour construire records
+        data_source: Valeur de data_source pour les lignes écrites
+        force_update: Si True, met à jour les timestamps existants
+        station_scoped: True si la clé unique inclut station_id
+        has_updated_at: True si la table a une colonne updated_at (sans défaut SQL)
+
+    Returns:
+        dict {'inserted', 'updated', 'skipped'}
+    """
+    if records.empty:
+        return {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+    value_cols = [col for col in records.columns if col not in ('address_id', 'timestamp')]
+    records = records[['timestamp'] + value_cols]
+    recordset_def = ', '.join(['"timestamp" timestamp'] + [f'{col} double precision' for col in value_cols])
+    source_sql = f'SELECT $1::integer AS address_id, t.* FROM jsonb_to_recordset($2::jsonb) AS t({recordset_def})'
+
+    query = build_merge_sql(
+        table, source_sql, value_cols, column_map, '$3',
+        force_update=force_update, station_scoped=station_scoped, has_updated_at=has_updated_at,
+        time_bounds=('$4', '$5')
+    )
+
+    payload = records.to_json(orient='records', date_format='iso')
+    bounds = (records['timestamp'].min().to_pydatetime(), records['timestamp'].max().to_pydatetime())
+
+    # Partitions, lot, rollups journaliers et agrégats courants dans la même
+    # transaction: un lecteur ne voit jamais des mesures sans leurs agrégats
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            months = await ensure_partitions(conn, table, records['timestamp'])
+            row = await conn.fetchrow(query, address_id, payload, data_source, *bounds)
+            inserted = int(row['inserted']) if row else 0
+            updated = int(row['updated']) if row else 0
+            if inserted or updated:
+                await refresh_daily_rollups(table, [address_id], *bounds, conn=conn)
+        mark_partitions_ensured(table, months)
+
+    if inserted or updated:
+        invalidate_read_cache(table, [address_id])
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'skipped': len(records) - inserted - updated
+    }
+
+
+# Taille de lot par défaut pour COPY (≈ 1 an horaire pour 6 adresses)
+COPY_BATCH_SIZE = 50_000
+
+
+async def copy_ingest(
+    table: str,
+    records: pd.DataFrame,
+    column_map: Dict[str, Tuple[str, str]],
+    data_source: str,
+    force_update: bool = False,
+    station_scoped: bool = True,
+    has_updated_at: bool = True,
+    batch_size: int = COPY_BATCH_SIZE
+) -> Dict:
+    """
+    Ingestion massive: COPY binaire vers une table de staging, puis fusion SQL.
+
+    Chaque lot est traité dans sa propre transaction:
+    1. partitions mensuelles manquantes (ensure_partitions), CREATE TEMP TABLE ... ON COMMIT DROP
+    2. copy_records_to_table (protocole COPY, pas de paramètres SQL)
+    3. fusion staging → table cible via build_merge_sql()
+    4. rafraîchissement des rollups journaliers des jours touchés
+
+    Args:
+        table: Table cible (air_quality_records, weather_records, pollen_records)
+        records: DataFrame avec address_id, timestamp et colonnes SQL
+                 (plusieurs adresses possibles)
+        column_map: Mapping utilisé pour construire records
+        data_source: Valeur de data_source pour les lignes écrites
+        force_update: Si True, met à jour les timestamps existants
+        station_scoped: True si la clé unique inclut station_id
+        has_updated_at: True si la table a une colonne updated_at
+        batch_size: Nombre de lignes par lot COPY
+
+    Returns:
+        dict {'inserted', 'updated', 'skipped', 'rows', 'elapsed_s', 'rows_per_s', 'batches'}
+        où batches contient les timings par lot (copy_s, merge_s)
+    """
+    import time
+
+    summary = {'inserted': 0, 'updated': 0, 'skipped': 0, 'rows': len(records),
+               'elapsed_s': 0.0, 'rows_per_s': 0.0, 'batches': []}
+    if records.empty:
+        return summary
+
+    value_cols = [col for col in records.columns if col not in ('address_id', 'timestamp')]
+    columns = ['address_id', 'timestamp'] + value_cols
+    staging = f'staging_{table}'
+    staging_def = ', '.join(['address_id integer', '"timestamp" timestamp'] +
+                            [f'{col} double precision' for col in value_cols])
+    merge_sql = build_merge_sql(
+        table, f'SELECT * FROM {staging}', value_cols, column_map, '$1',
+        force_update=force_update, station_scoped=station_scoped, has_updated_at=has_updated_at,
+        time_bounds=('$2', '$3')
+    )
+
+    # Conversion vectorisée vers des objets Python (NaN → None) attendus par asyncpg
+    frame = records[columns].astype(object)
+    frame = frame.where(records[columns].notna(), None)
+
+    pool = await AsyncpgClient.get_pool()
+    started = time.perf_counter()
+
+    async with pool.acquire() as conn:
+        for offset in range(0, len(frame), batch_size):
+            batch = list(frame.iloc[offset:offset + batch_size].itertuples(index=False, name=None))
+            batch_ts = records['timestamp'].iloc[offset:offset + batch_size]
+            bounds = (batch_ts.min().to_pydatetime(), batch_ts.max().to_pydatetime())
+
+            async with conn.transaction():
+                t0 = time.perf_counter()
+                months = await ensure_partitions(conn, table, batch_ts)
+                await conn.execute(f'CREATE TEMP TABLE {staging} ({staging_def}) ON COMMIT DROP')
+                await conn.copy_records_to_table(staging, records=batch, columns=columns)
+                t1 = time.perf_counter()
+                row = await conn.fetchrow(merge_sql, data_source, *bounds)
+                if row['inserted'] or row['updated']:
+                    batch_ids = records['address_id'].iloc[offset:offset + batch_size].unique().tolist()
+                    await refresh_daily_rollups(table, batch_ids, *bounds, conn=conn)
+                t2 = time.perf_counter()
+            mark_partitions_ensured(table, months)
+
+            batch_stats = {
+                'rows': len(batch),
+                'inserted': int(row['inserted']),
+                'updated': int(row['updated']),
+                'copy_s': round(t1 - t0, 4),
+                'merge_s': round(t2 - t1, 4),
+                'rows_per_s': round(len(batch) / max(t2 - t0, 1e-9))
+            }
+            summary['batches'].append(batch_stats)
+            summary['inserted'] += batch_stats['inserted']
+            summary['updated'] += batch_stats['updated']
+
+            logger.info(f"📦 COPY {table} lot {len(summary['batches'])}: {batch_stats['rows']} lignes "
+                        f"(copy {batch_stats['copy_s']:.3f}s, merge {batch_stats['merge_s']:.3f}s, "
+                        f"{batch_stats['rows_per_s']} lignes/s)")
+
+    elapsed = time.perf_counter() - started
+    if summary['inserted'] or summary['updated']:
+        invalidate_read_cache(table, records['address_id'].unique().tolist())
+    summary['skipped'] = summary['rows'] - summary['inserted'] - summary['updated']
+    summary['elapsed_s'] = round(elapsed, 4)
+    summary['rows_per_s'] = round(summary['rows'] / max(elapsed, 1e-9))
+    return summary
+
+
+# ============================================================
+# ROLLUPS JOURNALIERS (voir prisma/rollups_migration.sql)
+# ============================================================
+
+# Table brute → (table rollup, {colonne SQL: seuil de dépassement µg/m³ ou None})
+ROLLUP_COLUMNS: Dict[str, Tuple[str, Dict[str, Optional[float]]]] = {
+    'air_quality_records': ('air_quality_daily_rollups', {
+        'pm10': 50.0,               # UE, valeur limite journalière
+        'pm2_5': 20.0,              # Seuil d'alerte utilisé par l'application
+        'nitrogen_dioxide': 200.0,  # UE, valeur limite horaire
+        'ozone': 120.0,             # UE, valeur cible
+        'sulfur_dioxide': 350.0,    # UE, valeur limite horaire
+        'carbon_monoxide': 10000.0, # UE, valeur limite (10 mg/m³)
+    }),
+    'weather_records': ('weather_daily_rollups', {
+        'temperature': None,
+    }),
+}
+
+
+def build_rollup_sql(table: str) -> str:
+    """
+    Statement de rafraîchissement des rollups journaliers d'une table brute.
+
+    Paramètres: $1 integer[] (adresses), $2/$3 timestamps min/max du lot.
+    Les jours touchés sont recalculés entièrement depuis les données brutes
+    (idempotent, correct aussi pour les mises à jour force_update).
+    """
+    rollup_table, columns = ROLLUP_COLUMNS[table]
+
+    names = ['address_id', 'day', 'records', 'first_ts', 'last_ts']
+    aggregates = ['address_id', '"timestamp"::date', 'COUNT(*)', 'MIN("timestamp")', 'MAX("timestamp")']
+    for col, threshold in columns.items():
+        names += [f'{col}_count', f'{col}_sum', f'{col}_sumsq', f'{col}_min', f'{col}_max']
+        aggregates += [f'COUNT({col})', f'SUM({col})', f'SUM({col} * {col})', f'MIN({col})', f'MAX({col})']
+        if threshold is not None:
+            names.append(f'{col}_exceed')
+            aggregates.append(f'COUNT(*) FILTER (WHERE {col} > {threshold})')
+    updates = [f'{name} = EXCLUDED.{name}' for name in names[2:]] + ['updated_at = NOW()']
+
+    return f'''
+        INSERT INTO {rollup_table} ({', '.join(names)}, updated_at)
+        SELECT {', '.join(aggregates)}, NOW()
+        FROM {table}
+        WHERE address_id = ANY($1::integer[])
+          AND "timestamp" >= date_trunc('day', $2::timestamp)
+          AND "timestamp" < date_trunc('day', $3::timestamp) + INTERVAL '1 day'
+        GROUP BY address_id, "timestamp"::date
+        ON CONFLICT (address_id, day) DO UPDATE SET {', '.join(updates)}
+    '''
+
+
+# Table brute → table d'agrégats courants (une ligne par adresse, voir
+# prisma/running_stats_migration.sql), mise à jour par différence des
+# rollups des jours touchés
+RUNNING_STATS_TABLES: Dict[str, str] = {
+    'air_quality_records': 'air_quality_running_stats',
+}
+
+
+def build_running_stats_sql(table: str) -> str:
+    """
+    Statement de rafraîchissement des rollups journaliers et des agrégats
+    courants d'une table brute (remplace build_rollup_sql pour
+    RUNNING_STATS_TABLES).
+
+    Paramètres: ceux de build_rollup_sql. Un seul statement:
+    1. old: rollups des jours touchés avant le lot (snapshot du statement:
+       les lignes réécrites par fresh y gardent leur version précédente)
+    2. fresh: upsert des rollups de ces jours (build_rollup_sql, RETURNING)
+    3. delta: fresh - old par adresse, ajouté aux agrégats courants
+
+    Un delta calculé sur les seules lignes du lot serait faux pour
+    force_update (valeurs remplacées, pas ajoutées): la différence des
+    rollups des jours touchés est exacte, et son coût dépend du nombre de
+    jours du lot, jamais de l'historique de l'adresse. min/max et
+    first_ts/last_ts sont élargis (LEAST/GREATEST): une valeur extrême
+    remplacée par force_update reste dans l'enveloppe jusqu'à un recalcul
+    complet (prisma/running_stats_migration.sql).
+    """
+    rollup_table, columns = ROLLUP_COLUMNS[table]
+
+    additive = ['records']
+    extrema = {'first_ts': 'LEAST', 'last_ts': 'GREATEST'}
+    for col, threshold in columns.items():
+        additive += [f'{col}_count', f'{col}_sum', f'{col}_sumsq']
+        extrema.update({f'{col}_min': 'LEAST', f'{col}_max': 'GREATEST'})
+        if threshold is not None:
+            additive.append(f'{col}_exceed')
+    names = ['address_id'] + additive + list(extrema)
+
+    # old entre avec un signe négatif; ses extrêmes sont ignorés (NULL)
+    old_select = ['address_id'] + [f'-{name}' for name in additive] + ['NULL'] * len(extrema)
+    delta_select = (['address_id'] + [f'SUM({name}) AS {name}' for name in additive]
+                    + [f'{"MIN" if agg == "LEAST" else "MAX"}({name}) AS {name}' for name, agg in extrema.items()])
+    updates = ([f'{name} = COALESCE(t.{name}, 0) + COALESCE(EXCLUDED.{name}, 0)' for name in additive]
+               + [f'{name} = {agg}(t.{name}, EXCLUDED.{name})' for name, agg in extrema.items()]
+               + ['updated_at = NOW()'])
+
+    return f'''
+        WITH old AS (
+            SELECT {', '.join(names)}
+            FROM {rollup_table}
+            WHERE address_id = ANY($1::integer[])
+              AND day >= $2::date AND day <= $3::date
+        ),
+        fresh AS (
+            {build_rollup_sql(table).strip()}
+            RETURNING {', '.join(names)}
+        ),
+        delta AS (
+            SELECT {', '.join(delta_select)}
+            FROM (
+                SELECT {', '.join(names)} FROM fresh
+                UNION ALL
+                SELECT {', '.join(old_select)} FROM old
+            ) d
+            GROUP BY address_id
+        )
+        INSERT INTO {RUNNING_STATS_TABLES[table]} AS t ({', '.join(names)}, updated_at)
+        SELECT {', '.join(names)}, NOW()
+        FROM delta
+        ON CONFLICT (address_id) DO UPDATE SET {', '.join(updates)}
+    '''
+
+
+async def refresh_daily_rollups(table: str, address_ids: List[int], start: datetime, end: datetime,
+                                conn=None) -> None:
+    """
+    Recalcule les rollups des jours [start, end] pour les adresses données,
+    puis leurs agrégats courants (RUNNING_STATS_TABLES).
+
+    Appelé par le chemin d'ingestion (bulk_upsert, copy_ingest) dans la
+    transaction du lot: le coût dépend du nombre de jours touchés, pas
+    de l'historique.
+
+    Args:
+        table: Table brute (air_quality_records, weather_records)
+        address_ids: Adresses concernées
+        start: Timestamp min du lot (UTC naïf)
+        end: Timestamp max du lot (UTC naïf)
+        conn: Connexion asyncpg existante (ex: transaction COPY), sinon pool
+    """
+    if table not in ROLLUP_COLUMNS or not address_ids:
+        return
+
+    query = build_running_stats_sql(table) if table in RUNNING_STATS_TABLES else build_rollup_sql(table)
+    ids = [int(a) for a in address_ids]
+    params = (ids, pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime())
+
+    async def _refresh(connection):
+        await connection.execute(query, *params)
+
+    if conn is not None:
+        await _refresh(conn)
+        return
+
+    try:
+        pool = await AsyncpgClient.get_pool()
+        async with pool.acquire() as pooled:
+            async with pooled.transaction():
+                await _refresh(pooled)
+    except Exception as e:
+        # Le lot brut est déjà écrit: un rollup en retard se rattrape au prochain lot du même jour
+        logger.warning(f"⚠️ Rafraîchissement rollups {table} échoué: {e}")
+
+
+# Colonne DataFrame → préfixe des colonnes de rollups / agrégats courants
+AIR_AGGREGATE_COLUMNS: Dict[str, str] = {
+    'pm10': 'pm10',
+    'pm2_5': 'pm2_5',
+    'nitrogen_dioxide': 'nitrogen_dioxide',
+    'ozone': 'ozone',
+    'sulphur_dioxide': 'sulfur_dioxide',
+    'carbon_monoxide': 'carbon_monoxide',
+}
+
+_AGGREGATE_STATS = ('count', 'sum', 'sumsq', 'min', 'max', 'exceed')
+
+
+async def read_air_aggregates(address_id: int, since: Optional[datetime] = None) -> Optional[Dict]:
+    """
+    Statistiques air quality d'une adresse sans lire les mesures
+
+    Args:
+        address_id: ID de l'adresse
+        since: Début de fenêtre (jour UTC inclus). None = tout l'historique,
+               une ligne de air_quality_running_stats; sinon somme des
+               rollups journaliers de la fenêtre.
+
+    Returns:
+        {'records', 'first_ts', 'last_ts', 'updated_at', 'pollutants': {colonne:
+        {'count', 'mean', 'std', 'min', 'max', 'exceed'}}} ou None sans mesure
+    """
+    fields = ['records', 'first_ts', 'last_ts', 'updated_at']
+    fields += [f'{col}_{stat}' for col in AIR_AGGREGATE_COLUMNS.values() for stat in _AGGREGATE_STATS]
+
+    if since is None:
+        query = f'SELECT {", ".join(fields)} FROM air_quality_running_stats WHERE address_id = $1'
+        params = (address_id,)
+    else:
+        combine = {'first_ts': 'MIN', 'last_ts': 'MAX', 'updated_at': 'MAX', 'min': 'MIN', 'max': 'MAX'}
+        select = [f'{combine.get(field, combine.get(field.rsplit("_", 1)[-1], "SUM"))}({field}) AS {field}'
+                  for field in fields]
+        query = (f'SELECT {", ".join(select)} FROM air_quality_daily_rollups '
+                 f'WHERE address_id = $1 AND day >= $2::date')
+        params = (address_id, pd.Timestamp(since).date())
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(query, *params)
+    if row is None or not row['records']:
+        return None
+
+    pollutants = {}
+    for name, col in AIR_AGGREGATE_COLUMNS.items():
+        count = int(row[f'{col}_count'] or 0)
+        if not count:
+            pollutants[name] = {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None, 'exceed': 0}
+            continue
+        mean = float(row[f'{col}_sum']) / count
+        sumsq = row[f'{col}_sumsq']
+        # Écart-type de population: E[x²] - E[x]², borné à 0 contre l'arrondi
+        std = math.sqrt(max(float(sumsq) / count - mean * mean, 0.0)) if sumsq is not None else None
+        pollutants[name] = {
+            'count': count,
+            'mean': mean,
+            'std': std,
+            'min': row[f'{col}_min'],
+            'max': row[f'{col}_max'],
+            'exceed': int(row[f'{col}_exceed'] or 0),
+        }
+
+    return {
+        'records': int(row['records']),
+        'first_ts': row['first_ts'],
+        'last_ts': row['last_ts'],
+        'updated_at': row['updated_at'],
+        'pollutants': pollutants,
+    }
+
+
+# ============================================================
+# LECTURE COLONNAIRE (PLAGE TEMPORELLE)
+# ============================================================
+
+# Colonnes DataFrame (lecture) → expression SQL
+AIR_QUALITY_READ_COLUMNS: Dict[str, str] = {
+    'pm10': 'pm10',
+    'pm2_5': 'pm2_5',
+    'nitrogen_dioxide': 'nitrogen_dioxide',
+    'ozone': 'ozone',
+    'sulphur_dioxide': 'sulfur_dioxide',
+    'carbon_monoxide': 'carbon_monoxide',
+    'aqi_value': 'aqi_value',
+    'aqi_category': 'aqi_category',
+}
+
+POLLEN_READ_COLUMNS: Dict[str, str] = {
+    'grass_pollen': 'COALESCE(graminaceae, poaceae)',
+    'birch_pollen': 'betula',
+    'alder_pollen': 'alnus',
+    'hazel_pollen': 'corylus',
+    'cypress_pollen': 'cupressaceae',
+    'poplar_pollen': 'populus',
+    'oak_pollen': 'quercus',
+    'ash_pollen': 'fraxinus',
+    'plane_pollen': 'platanus',
+    'nettle_pollen': 'urticaceae',
+    'mugwort_pollen': 'artemisia',
+    'ragweed_pollen': 'ambrosia',
+    'plantain_pollen': 'plantago',
+    'chenopod_pollen': 'chenopod',
+    'total_pollen': 'total_pollen',
+}
+
+WEATHER_READ_COLUMNS: Dict[str, str] = {
+    name: sql_column for name, (sql_column, _) in WEATHER_COLUMNS.items()
+}
+
+# Colonnes non numériques (pas de conversion float32)
+TEXT_READ_COLUMNS = {'aqi_category', 'qev_category'}
+
+
+def _utc_naive(value) -> datetime:
+    """Convertit une borne (str, datetime, Timestamp) en datetime UTC naïf (timestamp(3) Prisma)"""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts.to_pydatetime()
+
+
+def _cache_bound(value) -> Optional[datetime]:
+    """Borne de lecture normalisée pour la clé de cache (None conservé)"""
+    return _utc_naive(value) if value is not None else None
+
+
+async def read_columns(
+    table: str,
+    address_id: int,
+    read_map: Dict[str, str],
+    columns: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Lit une série temporelle en colonnes via asyncpg.
+
+    Seules les colonnes demandées sont sélectionnées, le filtre de plage
+    exploite l'index (address_id, timestamp DESC) et le DataFrame est
+    construit directement depuis les tableaux de colonnes (float32).
+
+    Args:
+        table: Table source (air_quality_records, pollen_records)
+        address_id: ID de l'adresse
+        read_map: Mapping colonnes DataFrame → expression SQL
+        columns: Colonnes à lire (None = toutes celles de read_map)
+        start: Borne inférieure incluse (UTC naïf)
+        end: Borne supérieure incluse (UTC naïf)
+        limit: Nombre max de lignes (les plus récentes)
+
+    Returns:
+        DataFrame 'date' + colonnes demandées, trié par date décroissante
+    """
+    if columns is None:
+        columns = list(read_map)
+    unknown = [col for col in columns if col not in read_map]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues pour {table}: {unknown}")
+
+    select = ', '.join(['"timestamp"'] + [f'{read_map[col]} AS {col}' for col in columns])
+    params: list = [address_id]
+    where = ['address_id = $1']
+    if start is not None:
+        params.append(_utc_naive(start))
+        where.append(f'"timestamp" >= ${len(params)}')
+    if end is not None:
+        params.append(_utc_naive(end))
+        where.append(f'"timestamp" <= ${len(params)}')
+
+    sql = f'SELECT {select} FROM {table} WHERE {" AND ".join(where)} ORDER BY "timestamp" DESC'
+    if limit is not None:
+        params.append(int(limit))
+        sql += f' LIMIT ${len(params)}'
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+
+    return _rows_to_frame(rows, ['date'] + columns)
+
+
+def _rows_to_frame(rows: list, names: List[str]) -> pd.DataFrame:
+    """Transpose des lignes asyncpg en colonnes (un seul passage, pas de dict par ligne)"""
+    import numpy as np
+
+    if not rows:
+        return pd.DataFrame(columns=names)
+
+    data = {}
+    for col, values in zip(names, zip(*rows)):
+        if col == 'date':
+            data[col] = pd.to_datetime(values)
+        elif col == 'address_id':
+            data[col] = np.array(values, dtype=np.int32)
+        elif col in TEXT_READ_COLUMNS:
+            data[col] = np.array(values, dtype=object)
+        else:
+            data[col] = np.array(values, dtype=np.float64).astype(np.float32)
+    return pd.DataFrame(data)
+
+
+async def read_columns_many(
+    table: str,
+    address_ids: List[int],
+    read_map: Dict[str, str],
+    columns: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Lit la série temporelle de plusieurs adresses en un seul scan.
+
+    Même lecture colonnaire que read_columns, avec un filtre
+    address_id = ANY($1): une requête quel que soit le nombre d'adresses.
+
+    Returns:
+        DataFrame long 'address_id', 'date' + colonnes, trié par adresse
+        puis date décroissante
+    """
+    if columns is None:
+        columns = list(read_map)
+    unknown = [col for col in columns if col not in read_map]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues pour {table}: {unknown}")
+
+    select = ', '.join(['address_id', '"timestamp"'] + [f'{read_map[col]} AS {col}' for col in columns])
+    params: list = [list(address_ids)]
+    where = ['address_id = ANY($1::integer[])']
+    if start is not None:
+        params.append(_utc_naive(start))
+        where.append(f'"timestamp" >= ${len(params)}')
+    if end is not None:
+        params.append(_utc_naive(end))
+        where.append(f'"timestamp" <= ${len(params)}')
+
+    sql = (f'SELECT {select} FROM {table} WHERE {" AND ".join(where)} '
+           f'ORDER BY address_id, "timestamp" DESC')
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+
+    return _rows_to_frame(rows, ['address_id', 'date'] + columns)
+
+
+def _address_metadata(addr: Address) -> Dict:
+    """Métadonnées d'adresse (df.attrs)"""
+    return {
+        'address_id': addr.id,
+        'address': addr.fullAddress,
+        'normalized_address': addr.normalizedAddress,
+        'latitude': addr.latitude,
+        'longitude': addr.longitude,
+    }
+
+
+def shape_many(df: pd.DataFrame, found: Dict[str, Address], as_dict: bool = False):
+    """
+    Met en forme le résultat de read_columns_many.
+
+    Args:
+        df: DataFrame long (address_id, date, colonnes)
+        found: Adresse saisie → Address (AddressManager.find_addresses)
+        as_dict: True pour un DataFrame par adresse saisie
+
+    Returns:
+        DataFrame long avec colonne 'address' (adresse saisie, catégorielle) et
+        df.attrs['addresses'] = {adresse: métadonnées}, ou dict adresse → DataFrame
+        (métadonnées dans df.attrs, comme get_location_data)
+    """
+    if as_dict:
+        groups = {address_id: group for address_id, group in df.groupby('address_id', sort=False)}
+        frames = {}
+        for address, addr in found.items():
+            group = groups.get(addr.id)
+            if group is None:
+                frames[address] = pd.DataFrame()
+                continue
+            frame = group.drop(columns='address_id').reset_index(drop=True)
+            frame.attrs.update(_address_metadata(addr))
+            frames[address] = frame
+        return frames
+
+    # Une adresse en base peut correspondre à plusieurs saisies: la première l'emporte
+    labels: Dict[int, str] = {}
+    for address, addr in found.items():
+        labels.setdefault(addr.id, address)
+    df.insert(0, 'address', pd.Categorical(df['address_id'].map(labels), categories=list(dict.fromkeys(labels.values()))))
+    df.attrs['addresses'] = {address: _address_metadata(addr) for address, addr in found.items()}
+    return df
+
+
+# ============================================================
+# CACHE DE LECTURE (LRU, BUDGET MÉMOIRE)
+# ============================================================
+# Un rendu Streamlit lit plusieurs fois la même série (résumé, QeV,
+# visualisation). Les lectures sont mises en cache sous la clé
+# (table, address_id, max(timestamp), nombre de lignes, paramètres):
+# un insert change la version et rend l'entrée inatteignable, et les
+# chemins d'écriture invalident explicitement l'adresse (force_update
+# modifie des valeurs sans changer la version).
+
+READ_CACHE_MAX_BYTES = int(float(os.getenv('DB_READ_CACHE_MB', '64')) * 1024 * 1024)
+
+
+class ReadCache:
+    """Cache LRU de DataFrames/dicts borné en mémoire (octets)"""
+
+    def __init__(self, max_bytes: int = READ_CACHE_MAX_BYTES):
+        import threading
+        from collections import OrderedDict
+
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, Tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        import sys
+
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in getattr(value, 'values', lambda: [])())
+
+    @staticmethod
+    def _copy(value):
+        # Copie: l'appelant peut modifier le DataFrame sans corrompre le cache
+        if isinstance(value, pd.DataFrame):
+            return value.copy()
+        if isinstance(value, dict):
+            return dict(value)
+        return value
+
+    def get(self, key: tuple):
+        """Valeur en cache (copie) ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._copy(entry[0])
+
+    def put(self, key: tuple, value) -> None:
+        """Ajoute une valeur, évince les moins récemment utilisées au-delà du budget"""
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, table: Optional[str] = None, address_ids: Optional[List[int]] = None) -> int:
+        """Supprime les entrées d'une table et/ou d'adresses (tout si aucun filtre)"""
+        ids = set(address_ids) if address_ids is not None else None
+        with self._lock:
+            stale = [key for key in self._entries
+                     if (table is None or key[0] == table) and (ids is None or key[1] in ids)]
+            for key in stale:
+                self._bytes -= self._entries.pop(key)[1]
+        return len(stale)
+
+    def stats(self) -> Dict:
+        """Taille, occupation mémoire et taux de succès"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+READ_CACHE = ReadCache()
+
+
+async def series_version(table: str, address_id: int) -> Tuple[Optional[datetime], int]:
+    """
+    (max(timestamp), nombre de lignes) d'une série
+
+    Une ligne d'agrégats courants si la table en a (RUNNING_STATS_TABLES),
+    sinon index-only scan sur (address_id, timestamp).
+    """
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        if table in RUNNING_STATS_TABLES:
+            row = await conn.fetchrow(
+                f'SELECT last_ts, records AS row_count FROM {RUNNING_STATS_TABLES[table]} WHERE address_id = $1',
+                address_id
+            )
+            if row is not None:
+                return row['last_ts'], int(row['row_count'])
+        row = await conn.fetchrow(
+            f'SELECT MAX("timestamp") AS last_ts, COUNT(*) AS row_count FROM {table} WHERE address_id = $1',
+            address_id
+        )
+    return row['last_ts'], int(row['row_count'])
+
+
+async def cached_read(table: str, address_id: int, params: tuple, loader):
+    """
+    Lecture via READ_CACHE
+
+    Args:
+        table: Table dont la version (max timestamp, nombre de lignes) fait partie de la clé
+        address_id: ID de l'adresse
+        params: Paramètres de lecture (hashables) complétant la clé
+        loader: Coroutine sans argument qui lit la valeur en cas d'absence
+    """
+    key = (table, address_id, *(await series_version(table, address_id)), params)
+    value = READ_CACHE.get(key)
+    if value is not None:
+        return value
+
+    value = await loader()
+    if value is not None:
+        READ_CACHE.put(key, value)
+    return ReadCache._copy(value)
+
+
+def invalidate_read_cache(table: str, address_ids: List[int]) -> None:
+    """À appeler après toute écriture sur une série"""
+    dropped = READ_CACHE.invalidate(table, address_ids)
+    if dropped:
+        logger.debug(f"🧹 Cache de lecture: {dropped} entrée(s) invalidée(s) pour {table} {address_ids}")
+
+
+# ============================================================
+# SÉRIES QeV (voir prisma/qev_series_migration.sql)
+# ============================================================
+# Les scores QeV horaires/journaliers sont stockés dans qev_scores avec
+# granularity ('hour'/'day') et period_start; les scores ponctuels
+# (calcul à la demande) gardent granularity NULL.
+
+QEV_SERIES_COLUMNS: Dict[str, Tuple[str, str]] = {
+    'raw_air_index': ('raw_air_index', 'double precision'),
+    'sub_index_no2': ('raw_air_index_no2', 'double precision'),
+    'sub_index_pm25': ('raw_air_index_pm25', 'double precision'),
+    'sub_index_pm10': ('raw_air_index_pm10', 'double precision'),
+    'sub_index_o3': ('raw_air_index_o3', 'double precision'),
+    'sub_index_so2': ('raw_air_index_so2', 'double precision'),
+    'raw_traffic_nuisance': ('raw_traffic_nuisance', 'double precision'),
+    'raw_green_index': ('raw_green_index', 'double precision'),
+    'normalized_air_score': ('normalized_air_score', 'double precision'),
+    'normalized_traffic_score': ('normalized_traffic_score', 'double precision'),
+    'normalized_green_score': ('normalized_green_score', 'double precision'),
+    'qev_score': ('qev_score', 'double precision'),
+    'qev_category': ('qev_category', 'text'),
+    'qev_p10': ('qev_p10', 'double precision'),
+    'qev_p50': ('qev_p50', 'double precision'),
+    'qev_p90': ('qev_p90', 'double precision'),
+    'data_completeness': ('data_completeness', 'double precision'),
+    'confidence_level': ('confidence_level', 'double precision'),
+}
+
+
+async def upsert_qev_series(address_id: int, granularity: str, series: pd.DataFrame,
+                            weights: Dict[str, float]) -> int:
+    """
+    Enregistre une série QeV en un seul statement (jsonb_to_recordset + ON CONFLICT).
+
+    Args:
+        address_id: ID de l'adresse
+        granularity: 'hour' ou 'day'
+        series: DataFrame indexé par period_start (QeVService.calculate_qev_series)
+        weights: Pondérations utilisées pour le calcul
+
+    Returns:
+        Nombre de périodes écrites
+    """
+    if series.empty:
+        return 0
+
+    frame_cols = [col for col in QEV_SERIES_COLUMNS if col in series.columns]
+    payload_frame = series[frame_cols].rename(columns={col: QEV_SERIES_COLUMNS[col][0] for col in frame_cols})
+    # Début de période en UTC naïf, comme les timestamps des séries brutes
+    payload_frame.insert(0, 'period_start', [_utc_naive(ts) for ts in series.index])
+    payload = payload_frame.to_json(orient='records', date_format='iso', double_precision=15)
+
+    sql_cols = [QEV_SERIES_COLUMNS[col][0] for col in frame_cols]
+    recordset_def = ', '.join(['period_start timestamp'] + [f'{QEV_SERIES_COLUMNS[col][0]} {QEV_SERIES_COLUMNS[col][1]}'
+                                                            for col in frame_cols])
+    insert_cols = ', '.join(['address_id', 'granularity', 'period_start'] + sql_cols +
+                            ['weight_air', 'weight_traffic', 'weight_green', 'calculated_at', 'updated_at'])
+    select_cols = ', '.join(['$1', '$2', 't.period_start'] + [f't.{col}' for col in sql_cols] +
+                            ['$4', '$5', '$6', 'NOW()', 'NOW()'])
+    set_parts = ', '.join([f'{col} = EXCLUDED.{col}' for col in sql_cols] +
+                          ['weight_air = EXCLUDED.weight_air', 'weight_traffic = EXCLUDED.weight_traffic',
+                           'weight_green = EXCLUDED.weight_green', 'calculated_at = NOW()', 'updated_at = NOW()'])
+
+    query = f'''
+        INSERT INTO qev_scores ({insert_cols})
+        SELECT {select_cols}
+        FROM jsonb_to_recordset($3::jsonb) AS t({recordset_def})
+        ON CONFLICT (address_id, granularity, period_start) WHERE granularity IS NOT NULL
+        DO UPDATE SET {set_parts}
+    '''
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        status = await conn.execute(
+            query, address_id, granularity, payload,
+            float(weights.get('air', 0.50)), float(weights.get('traffic', 0.25)), float(weights.get('green', 0.25))
+        )
+    return int(status.split()[-1])
+
+
+async def read_qev_series(address_id: int, granularity: str,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Lit une série QeV précalculée (lecture colonnaire)
+
+    Returns:
+        DataFrame 'date' (début de période) + colonnes QEV_SERIES_COLUMNS, trié par date croissante
+    """
+    columns = list(QEV_SERIES_COLUMNS)
+    select = ', '.join(['period_start'] + [f'{QEV_SERIES_COLUMNS[col][0]} AS {col}' for col in columns])
+    params: list = [address_id, granularity]
+    where = ['address_id = $1', 'granularity = $2']
+    if start is not None:
+        params.append(_utc_naive(start))
+        where.append(f'period_start >= ${len(params)}')
+    if end is not None:
+        params.append(_utc_naive(end))
+        where.append(f'period_start <= ${len(params)}')
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            f'SELECT {select} FROM qev_scores WHERE {" AND ".join(where)} ORDER BY period_start',
+            *params
+        )
+
+    return _rows_to_frame(rows, ['date'] + columns)
+
+
+# ============================================================
+# CACHE DES RÉSULTATS QeV (voir prisma/qev_result_cache_migration.sql)
+# ============================================================
+# Un résultat QeV complet est mis en cache sous l'empreinte de ses entrées
+# (qev_service.qev_input_fingerprint): LRU en mémoire devant une ligne
+# qev_result_cache par adresse. Un rendu dont l'empreinte n'a pas changé
+# ne relance ni Overpass ni l'analyse YOLO/segmentation, et n'ajoute
+# aucune ligne dans qev_scores.
+
+QEV_RESULT_CACHE = ReadCache(int(float(os.getenv('DB_QEV_CACHE_MB', '8')) * 1024 * 1024))
+
+
+# Ajoute à qev_scores les résultats en cache des adresses $1 (appelé dans la
+# transaction qui vient d'écrire qev_result_cache): chemin unique UI et lot
+INSERT_QEV_SCORES_FROM_CACHE = '''
+    INSERT INTO qev_scores (
+        address_id, qev_score, qev_category,
+        raw_air_index, raw_air_index_no2, raw_air_index_pm25, raw_air_index_pm10,
+        raw_air_index_o3, raw_air_index_so2, raw_traffic_nuisance, raw_green_index,
+        normalized_air_score, normalized_traffic_score, normalized_green_score,
+        weight_air, weight_traffic, weight_green,
+        data_completeness, confidence_level,
+        calculated_at, created_at, updated_at
+    )
+    SELECT c.address_id,
+           (c.result->>'QeV')::float8, c.result->>'QeV_category',
+           (c.result->'sub_indices'->>'I_Air')::float8,
+           (c.result->'sub_indices'->'I_Air_details'->>'no2')::float8,
+           (c.result->'sub_indices'->'I_Air_details'->>'pm25')::float8,
+           (c.result->'sub_indices'->'I_Air_details'->>'pm10')::float8,
+           (c.result->'sub_indices'->'I_Air_details'->>'o3')::float8,
+           (c.result->'sub_indices'->'I_Air_details'->>'so2')::float8,
+           (c.result->'sub_indices'->>'I_Trafic')::float8,
+           (c.result->'sub_indices'->>'I_Vert')::float8,
+           (c.result->'normalized_scores'->>'S_Air')::float8,
+           (c.result->'normalized_scores'->>'S_Trafic')::float8,
+           (c.result->'normalized_scores'->>'S_Vert')::float8,
+           COALESCE((c.result->'weights'->>'air')::float8, 0.50),
+           COALESCE((c.result->'weights'->>'traffic')::float8, 0.25),
+           COALESCE((c.result->'weights'->>'green')::float8, 0.25),
+           (c.result->>'data_completeness')::float8,
+           (c.result->>'confidence_level')::float8,
+           NOW(), NOW(), NOW()
+    FROM qev_result_cache c
+    WHERE c.address_id = ANY($1::integer[])
+'''
+
+
+def _json_ready(value):
+    """Rend un résultat QeV encodable en JSONB (NaN/inf → null, scalaires NumPy → Python)"""
+    if isinstance(value, dict):
+        return {str(k): _json_ready(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(v) for v in value]
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        return None
+    return value
+
+
+async def load_qev_result(address_id: int, fingerprint: str) -> Optional[Dict]:
+    """
+    Résultat QeV calculé avec cette empreinte (LRU puis PostgreSQL) ou None
+
+    Copie profonde sur les deux chemins: l'appelant (repondération, what-if)
+    peut modifier le résultat et ses sous-dicts sans toucher au cache.
+    """
+    key = ('qev_result', address_id, fingerprint)
+    result = QEV_RESULT_CACHE.get(key)
+    if result is not None:
+        return copy.deepcopy(result)
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        payload = await conn.fetchval(
+            'SELECT result FROM qev_result_cache WHERE address_id = $1 AND fingerprint = $2',
+            address_id, fingerprint
+        )
+    if payload is None:
+        return None
+
+    result = json.loads(payload)
+    QEV_RESULT_CACHE.put(key, result)
+    return copy.deepcopy(result)
+
+
+async def store_qev_result(address_id: int, fingerprint: str, result: Dict) -> bool:
+    """
+    Enregistre le résultat QeV courant de l'adresse et, si son empreinte est
+    nouvelle, l'ajoute à qev_scores dans la même transaction
+
+    Returns:
+        True si l'empreinte a changé (score persisté dans qev_scores),
+        False si une autre session a déjà enregistré la même empreinte
+    """
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            written = await conn.fetchval('''
+                INSERT INTO qev_result_cache (address_id, fingerprint, result, computed_at)
+                VALUES ($1, $2, $3::jsonb, NOW())
+                ON CONFLICT (address_id) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint, result = EXCLUDED.result, computed_at = NOW()
+                WHERE qev_result_cache.fingerprint <> EXCLUDED.fingerprint
+                RETURNING address_id
+            ''', address_id, fingerprint, json.dumps(_json_ready(result), default=str))
+
+            if written is not None:
+                await conn.execute(INSERT_QEV_SCORES_FROM_CACHE, [written])
+
+    QEV_RESULT_CACHE.invalidate('qev_result', [address_id])
+    QEV_RESULT_CACHE.put(('qev_result', address_id, fingerprint), result)
+    return written is not None
+
+
+async def store_qev_results(items: List[Tuple[int, str, Dict]]) -> List[int]:
+    """
+    Version par lot de store_qev_result (scoring par lot: batch_qev.py)
+
+    Une transaction, deux statements: mise en cache des résultats dont
+    l'empreinte a changé, puis ajout de ces seuls résultats à qev_scores
+    (le trigger de qev_latest_scores maintient les classements).
+
+    Args:
+        items: (address_id, empreinte, résultat QeV); en cas de doublon, le dernier gagne
+
+    Returns:
+        IDs des adresses dont le score a été persisté (empreinte changée)
+    """
+    latest = {int(address_id): (fingerprint, result) for address_id, fingerprint, result in items}
+    if not latest:
+        return []
+
+    payload = json.dumps([
+        {'address_id': address_id, 'fingerprint': fingerprint, 'result': _json_ready(result)}
+        for address_id, (fingerprint, result) in latest.items()
+    ], default=str)
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            rows = await conn.fetch('''
+                INSERT INTO qev_result_cache (address_id, fingerprint, result, computed_at)
+                SELECT t.address_id, t.fingerprint, t.result, NOW()
+                FROM jsonb_to_recordset($1::jsonb) AS t(address_id integer, fingerprint text, result jsonb)
+                ON CONFLICT (address_id) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint, result = EXCLUDED.result, computed_at = NOW()
+                WHERE qev_result_cache.fingerprint <> EXCLUDED.fingerprint
+                RETURNING address_id
+            ''', payload)
+            written = [row['address_id'] for row in rows]
+
+            if written:
+                await conn.execute(INSERT_QEV_SCORES_FROM_CACHE, written)
+
+    QEV_RESULT_CACHE.invalidate('qev_result', list(latest))
+    for address_id, (fingerprint, result) in latest.items():
+        QEV_RESULT_CACHE.put(('qev_result', address_id, fingerprint), result)
+    logger.info(f"✅ {len(written)}/{len(latest)} scores QeV persistés (lot)")
+    return written
+
+
+async def load_qev_sub_indices(address_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Sous-indices bruts du dernier résultat QeV de chaque adresse (qev_result_cache)
+
+    Une ligne par adresse: I_Air, ses composantes par polluant, I_Trafic,
+    I_Vert. Entrée de qev_calculator.QeVSubIndices pour re-pondérer sans
+    recalcul (what-if).
+
+    Args:
+        address_ids: Adresses à lire (None = toutes)
+    """
+    query = '''
+        SELECT c.address_id, a.full_address AS address, a.latitude, a.longitude,
+               (c.result->'sub_indices'->>'I_Air')::float8 AS raw_air_index,
+               (c.result->'sub_indices'->'I_Air_details'->>'no2')::float8 AS sub_index_no2,
+               (c.result->'sub_indices'->'I_Air_details'->>'pm25')::float8 AS sub_index_pm25,
+               (c.result->'sub_indices'->'I_Air_details'->>'pm10')::float8 AS sub_index_pm10,
+               (c.result->'sub_indices'->'I_Air_details'->>'o3')::float8 AS sub_index_o3,
+               (c.result->'sub_indices'->'I_Air_details'->>'so2')::float8 AS sub_index_so2,
+               (c.result->'sub_indices'->>'I_Trafic')::float8 AS raw_traffic_nuisance,
+               (c.result->'sub_indices'->>'I_Vert')::float8 AS raw_green_index,
+               c.computed_at
+        FROM qev_result_cache c
+        JOIN addresses a ON a.id = c.address_id
+        WHERE $1::integer[] IS NULL OR c.address_id = ANY($1::integer[])
+        ORDER BY c.address_id
+    '''
+    ids = [int(a) for a in address_ids] if address_ids is not None else None
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, ids)
+
+    columns = ['address_id', 'address', 'latitude', 'longitude', 'raw_air_index',
+               'sub_index_no2', 'sub_index_pm25', 'sub_index_pm10', 'sub_index_o3', 'sub_index_so2',
+               'raw_traffic_nuisance', 'raw_green_index', 'computed_at']
+    return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+
+# ============================================================
+# CLASSEMENTS QeV (voir prisma/qev_latest_migration.sql)
+# ============================================================
+# qev_scores est un historique append-only. qev_latest_scores garde le
+# dernier score ponctuel de chaque adresse (trigger AFTER INSERT) avec
+# ses coordonnées: un classement est un parcours d'index borné par k,
+# indépendant de la taille de l'historique.
+
+QEV_LATEST_COLUMNS = [
+    'address_id', 'address', 'qev_score', 'qev_category',
+    'normalized_air_score', 'normalized_traffic_score', 'normalized_green_score',
+    'latitude', 'longitude', 'calculated_at',
+]
+
+
+async def top_k_qev_scores(
+    category: Optional[str] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    k: int = 10,
+    ascending: bool = False
+) -> pd.DataFrame:
+    """
+    Meilleurs (ou pires) derniers scores QeV par adresse
+
+    Args:
+        category: Catégorie QeV à retenir ("Bon", "Excellent", ...), None = toutes
+        bbox: (sud, ouest, nord, est) en degrés, None = pas de filtre spatial
+        k: Nombre d'adresses
+        ascending: True pour les k pires scores
+
+    Returns:
+        DataFrame (QEV_LATEST_COLUMNS), trié par score
+    """
+    where, params = [], []
+    if category is not None:
+        params.append(category)
+        where.append(f'l.qev_category = ${len(params)}')
+    if bbox is not None:
+        south, west, north, east = bbox
+        params += [south, north, west, east]
+        n = len(params)
+        where.append(f'l.latitude BETWEEN ${n - 3} AND ${n - 2} AND l.longitude BETWEEN ${n - 1} AND ${n}')
+    params.append(int(k))
+
+    query = f'''
+        SELECT l.address_id, a.full_address AS address, l.qev_score, l.qev_category,
+               l.normalized_air_score, l.normalized_traffic_score, l.normalized_green_score,
+               l.latitude, l.longitude, l.calculated_at
+        FROM (
+            SELECT * FROM qev_latest_scores l
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY l.qev_score {'ASC' if ascending else 'DESC'}
+            LIMIT ${len(params)}
+        ) l
+        JOIN addresses a ON a.id = l.address_id
+        ORDER BY l.qev_score {'ASC' if ascending else 'DESC'}
+    '''
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(query, *params)
+    return pd.DataFrame([tuple(row) for row in rows], columns=QEV_LATEST_COLUMNS)
+
+
+async def latest_qev_scores(address_ids: Optional[List[int]] = None) -> pd.DataFrame:
+    """Dernier score QeV ponctuel des adresses données (None = toutes), lu dans qev_latest_scores"""
+    ids = [int(a) for a in address_ids] if address_ids is not None else None
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT l.address_id, a.full_address AS address, l.qev_score, l.qev_category,
+                   l.normalized_air_score, l.normalized_traffic_score, l.normalized_green_score,
+                   l.latitude, l.longitude, l.calculated_at
+            FROM qev_latest_scores l
+            JOIN addresses a ON a.id = l.address_id
+            WHERE $1::integer[] IS NULL OR l.address_id = ANY($1::integer[])
+            ORDER BY l.address_id
+        ''', ids)
+    return pd.DataFrame([tuple(row) for row in rows], columns=QEV_LATEST_COLUMNS)
 
 
 # ============================================================
@@ -87,7 +1534,7 @@ class AddressManager:
         self.db: Optional[Prisma] = None
 
     async def _ensure_connected(self):
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await DatabaseClient.get_client()
 
     @staticmethod
@@ -186,6 +1633,27 @@ class AddressManager:
             where={'normalizedAddress': normalized_address}
         )
 
+    async def find_addresses(self, addresses: List[str]) -> Dict[str, Address]:
+        """
+        Résout plusieurs adresses en une seule requête
+
+        Returns:
+            Dict adresse saisie → Address (les adresses inconnues sont absentes)
+        """
+        await self._ensure_connected()
+
+        normalized = {address: self.sanitize_address(address) for address in addresses}
+        records = await self.db.address.find_many(
+            where={'normalizedAddress': {'in': sorted(set(normalized.values()))}}
+        )
+        by_normalized = {record.normalizedAddress: record for record in records}
+
+        found = {address: by_normalized[norm] for address, norm in normalized.items() if norm in by_normalized}
+        missing = [address for address in addresses if address not in found]
+        if missing:
+            logger.warning(f"⚠️ Adresses non trouvées dans la base: {missing}")
+        return found
+
 
 # ============================================================
 # CLASSE : BASE DE DONNÉES AIR QUALITY (PostgreSQL)
@@ -211,7 +1679,7 @@ class AirQualityDB:
 
     async def _ensure_connected(self):
         """Assure connexion active"""
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await DatabaseClient.get_client()
 
     async def _ensure_address(self, lat: float = 50.8503, lon: float = 4.3517):
@@ -224,11 +1692,11 @@ class AirQualityDB:
 
     async def insert_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517, force_update: bool = False) -> bool:
         """
-        Insère nouvelles données dans PostgreSQL (optimisé batch).
+        Insère nouvelles données dans PostgreSQL (upsert ensembliste).
 
-        Stratégie: 1 SELECT pour récupérer tous les timestamps existants,
-        puis 1 create_many pour les nouveaux enregistrements.
-        Élimine le pattern N+1 (anciennement N SELECTs + N INSERTs).
+        Stratégie: conversion vectorisée colonnes DataFrame → enregistrements,
+        puis 1 seul statement SQL (CTE UPDATE + INSERT) quel que soit
+        le nombre de lignes, au lieu de N UPDATE individuels.
 
         Args:
             dataframe: DataFrame avec nouvelles données
@@ -247,337 +1715,459 @@ class AirQualityDB:
             await self._ensure_connected()
             await self._ensure_address(lat, lon)
 
-            # Préparer les timestamps du DataFrame
-            df_timestamps = [pd.to_datetime(row['date']) for _, row in dataframe.iterrows()]
-            min_ts = min(df_timestamps)
-            max_ts = max(df_timestamps)
+            records = frame_to_records(dataframe, AIR_QUALITY_COLUMNS)
+            logger.info(f"📊 Batch upsert: {len(records)} lignes (force_update={force_update})")
 
-            # 1 seul SELECT: récupérer tous les timestamps existants pour cette plage
-            existing_records = await self.db.airqualityrecord.find_many(
-                where={
-                    'addressId': self.address_id,
-                    'timestamp': {'gte': min_ts, 'lte': max_ts}
-                }
+            counts = await bulk_upsert(
+                'air_quality_records', self.address_id, records,
+                AIR_QUALITY_COLUMNS, data_source='openmeteo', force_update=force_update
             )
-            existing_ts_set = {r.timestamp for r in existing_records}
-            existing_by_ts = {r.timestamp: r for r in existing_records}
-
-            logger.info(f"📊 Batch insert: {len(dataframe)} lignes, {len(existing_ts_set)} existantes")
-
-            # Séparer les nouvelles données des existantes
-            new_records = []
-            updated = 0
-            skipped = 0
-
-            for _, row in dataframe.iterrows():
-                timestamp = pd.to_datetime(row['date'])
-
-                if timestamp in existing_ts_set:
-                    if force_update:
-                        # Mise à jour individuelle (inévitable pour UPDATE)
-                        existing = existing_by_ts[timestamp]
-                        await self.db.airqualityrecord.update(
-                            where={'id': existing.id},
-                            data={
-                                'pm10': row.get('pm10'),
-                                'pm25': row.get('pm2_5'),
-                                'carbonMonoxide': row.get('carbon_monoxide'),
-                                'nitrogenDioxide': row.get('nitrogen_dioxide'),
-                                'ozone': row.get('ozone'),
-                                'sulfurDioxide': row.get('sulphur_dioxide'),
-                                'dataSource': 'openmeteo'
-                            }
-                        )
-                        updated += 1
-                    else:
-                        skipped += 1
-                    continue
-
-                # Ajouter aux nouveaux enregistrements pour batch insert
-                new_records.append({
-                    'timestamp': timestamp,
-                    'addressId': self.address_id,
-                    'pm10': row.get('pm10'),
-                    'pm25': row.get('pm2_5'),
-                    'carbonMonoxide': row.get('carbon_monoxide'),
-                    'nitrogenDioxide': row.get('nitrogen_dioxide'),
-                    'ozone': row.get('ozone'),
-                    'sulfurDioxide': row.get('sulphur_dioxide'),
-                    'dataSource': 'openmeteo'
-                })
-
-            # Batch INSERT en une seule requête
-            inserted = 0
-            if new_records:
-                result = await self.db.airqualityrecord.create_many(
-                    data=new_records,
-                    skip_duplicates=True
-                )
-                inserted = result
 
-            logger.info(f"✅ Air quality: {inserted} nouveaux, {updated} mis à jour, {skipped} ignorés")
+            logger.info(f"✅ Air quality: {counts['inserted']} nouveaux, {counts['updated']} mis à jour, "
+                        f"{counts['skipped']} ignorés")
             return True
 
         except Exception as e:
             logger.error(f"❌ Erreur insertion globale: {e}")
             return False
 
-    async def get_location_data(self, address: str = None) -> pd.DataFrame:
+    async def _copy_records(self, dataframe: pd.DataFrame, column_map: Dict[str, Tuple[str, str]],
+                            lat: float, lon: float) -> pd.DataFrame:
+        """Prépare un lot COPY: address_id par ligne si fourni, sinon adresse courante"""
+        records = frame_to_records(dataframe, column_map)
+        if 'address_id' not in records.columns:
+            await self._ensure_connected()
+            await self._ensure_address(lat, lon)
+            records.insert(0, 'address_id', self.address_id)
+        return records
+
+    async def bulk_ingest(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                          force_update: bool = False, batch_size: int = COPY_BATCH_SIZE) -> Dict:
         """
-        Récupère données air quality pour une adresse
+        Ingestion massive (backfill, rafraîchissement multi-adresses) via COPY asyncpg.
+
+        Même sémantique que insert_data, mais les lignes sont streamées en COPY
+        binaire vers une table de staging puis fusionnées, lot par lot.
+        Si le DataFrame contient une colonne 'address_id', chaque ligne est
+        rattachée à son adresse (lat/lon ignorés).
 
         Returns:
-            DataFrame avec les données
+            dict de copy_ingest() avec timings par lot
         """
+        records = await self._copy_records(dataframe, AIR_QUALITY_COLUMNS, lat, lon)
+        stats = await copy_ingest(
+            'air_quality_records', records, AIR_QUALITY_COLUMNS, data_source='openmeteo',
+            force_update=force_update, batch_size=batch_size
+        )
+        logger.info(f"✅ Air quality COPY: {stats['inserted']} nouveaux, {stats['updated']} mis à jour, "
+                    f"{stats['skipped']} ignorés ({stats['rows_per_s']} lignes/s)")
+        return stats
+
+    async def bulk_ingest_pollen(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                                 force_update: bool = False, batch_size: int = COPY_BATCH_SIZE) -> Dict:
+        """Ingestion massive des pollens via COPY asyncpg (voir bulk_ingest)"""
+        records = await self._copy_records(dataframe, POLLEN_COLUMNS, lat, lon)
+        stats = await copy_ingest(
+            'pollen_records', records, POLLEN_COLUMNS, data_source='openmeteo',
+            force_update=force_update, station_scoped=False, has_updated_at=False, batch_size=batch_size
+        )
+        logger.info(f"✅ Pollens COPY: {stats['inserted']} nouveaux, {stats['updated']} mis à jour "
+                    f"({stats['rows_per_s']} lignes/s)")
+        return stats
+
+    async def _resolve_address(self, address: Optional[str]) -> Optional[Address]:
+        """Retrouve l'adresse (courante par défaut) via son nom normalisé"""
         await self._ensure_connected()
 
         if address is None:
             address = self.current_address
 
         normalized = AddressManager.sanitize_address(address)
+        addr = await self.address_manager.find_address_by_normalized(normalized)
 
-        logger.info(f"🔍 get_location_data - Recherche adresse:")
-        logger.info(f"   Input address: '{address}'")
-        logger.info(f"   Normalized: '{normalized}'")
-        logger.info(f"   self.current_address: '{self.current_address}'")
+        if not addr:
+            logger.warning(f"⚠️ Adresse non trouvée dans la base: '{normalized}' (input: '{address}')")
+        return addr
 
-        # Trouver l'adresse
-        addr = await self.address_manager.find_address_by_normalized(normalized)
+    @staticmethod
+    def _attach_metadata(df: pd.DataFrame, addr: Address) -> pd.DataFrame:
+        """Métadonnées d'adresse en scalaires (df.attrs) au lieu de colonnes répétées"""
+        df.attrs.update(_address_metadata(addr))
+        return df
 
+    async def get_location_data(
+        self,
+        address: str = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Récupère données air quality pour une adresse (lecture colonnaire)
+
+        Args:
+            address: Adresse (adresse courante si None)
+            start: Début de période incluse (None = depuis le début)
+            end: Fin de période incluse (None = jusqu'à la fin)
+            columns: Polluants à lire (voir AIR_QUALITY_READ_COLUMNS, None = tous)
+            limit: Nombre max de mesures (les plus récentes)
+
+        Returns:
+            DataFrame 'date' + polluants (float32), trié par date décroissante.
+            Adresse, coordonnées et nom normalisé sont dans df.attrs.
+        """
+        addr = await self._resolve_address(address)
         if not addr:
-            logger.warning(f"⚠️ Adresse non trouvée dans la base: '{normalized}'")
             return pd.DataFrame()
 
-        logger.info(f"✅ Adresse trouvée: ID={addr.id}, coords=({addr.latitude}, {addr.longitude})")
-
-        # Récupérer les données
-        records = await self.db.airqualityrecord.find_many(
-            where={'addressId': addr.id},
-            order={'timestamp': 'desc'}
+        async def _load():
+            df = await read_columns(
+                'air_quality_records', addr.id, AIR_QUALITY_READ_COLUMNS,
+                columns=columns, start=start, end=end, limit=limit
+            )
+            logger.info(f"✅ Air quality: {len(df)} enregistrements pour addressId={addr.id} "
+                        f"({df.memory_usage(deep=True).sum() / 1024:.0f} Ko)")
+            return df
+
+        df = await cached_read(
+            'air_quality_records', addr.id,
+            ('series', tuple(columns) if columns else None, _cache_bound(start), _cache_bound(end), limit),
+            _load
         )
 
-        if not records:
+        if df.empty:
             logger.warning(f"⚠️ Aucun enregistrement pour addressId={addr.id}")
             return pd.DataFrame()
 
-        # Convertir en DataFrame
-        data = []
-        for record in records:
-            # Utiliser getattr pour TOUS les champs optionnels (protection contre désync Prisma)
-            data.append({
-                'date': record.timestamp,
-                'address': addr.fullAddress,
-                'normalized_address': addr.normalizedAddress,
-                'latitude': addr.latitude,
-                'longitude': addr.longitude,
-
-                # Polluants principaux (colonnes réelles de air_quality_records)
-                'pm10': getattr(record, 'pm10', None),
-                'pm2_5': getattr(record, 'pm25', None),
-                'nitrogen_dioxide': getattr(record, 'nitrogenDioxide', None),
-                'ozone': getattr(record, 'ozone', None),
-                'sulphur_dioxide': getattr(record, 'sulfurDioxide', None),
-                'carbon_monoxide': getattr(record, 'carbonMonoxide', None),
-
-                # Indices AQI
-                'aqi_value': getattr(record, 'aqiValue', None),
-                'aqi_category': getattr(record, 'aqiCategory', None),
-            })
+        return self._attach_metadata(df, addr)
 
-        return pd.DataFrame(data)
-
-    async def get_pollen_data(self, address: str = None) -> pd.DataFrame:
+    async def get_location_data_many(
+        self,
+        addresses: List[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        as_dict: bool = False
+    ):
         """
-        Récupère données pollens depuis la table pollen_records
+        Données air quality de plusieurs adresses (comparaisons, tableaux de bord)
+
+        Une requête pour résoudre toutes les adresses, un scan pour toutes
+        les mesures: comparer 20 adresses coûte à peu près comme en lire une.
+
+        Args:
+            addresses: Adresses à lire
+            start: Début de période incluse
+            end: Fin de période incluse
+            columns: Polluants à lire (voir AIR_QUALITY_READ_COLUMNS, None = tous)
+            as_dict: True pour un DataFrame par adresse
 
         Returns:
-            DataFrame avec les données pollens (noms utilisateur-friendly)
+            DataFrame long (address, address_id, date, polluants) ou dict adresse → DataFrame
+            (voir shape_many)
         """
         await self._ensure_connected()
+        found = await self.address_manager.find_addresses(addresses)
+        if not found:
+            return {address: pd.DataFrame() for address in addresses} if as_dict else pd.DataFrame()
 
-        if address is None:
-            address = self.current_address
+        df = await read_columns_many(
+            'air_quality_records', sorted({addr.id for addr in found.values()}),
+            AIR_QUALITY_READ_COLUMNS, columns=columns, start=start, end=end
+        )
+        logger.info(f"✅ Air quality: {len(df)} enregistrements pour {len(found)} adresses (1 requête)")
 
-        normalized = AddressManager.sanitize_address(address)
-        addr = await self.address_manager.find_address_by_normalized(normalized)
+        result = shape_many(df, found, as_dict=as_dict)
+        if as_dict:
+            for address in addresses:
+                result.setdefault(address, pd.DataFrame())
+        return result
 
+    async def get_pollen_data(
+        self,
+        address: str = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Récupère données pollens depuis la table pollen_records (lecture colonnaire)
+
+        Args:
+            address: Adresse (adresse courante si None)
+            start: Début de période incluse
+            end: Fin de période incluse
+            columns: Pollens à lire (voir POLLEN_READ_COLUMNS, None = tous)
+            limit: Nombre max de mesures (les plus récentes)
+
+        Returns:
+            DataFrame avec les données pollens (noms utilisateur-friendly, float32),
+            métadonnées d'adresse dans df.attrs
+        """
+        addr = await self._resolve_address(address)
         if not addr:
-            logger.warning(f"⚠️ Adresse non trouvée pour pollens: '{normalized}'")
             return pd.DataFrame()
 
-        # Récupérer les données pollens
-        records = await self.db.pollenrecord.find_many(
-            where={'addressId': addr.id},
-            order={'timestamp': 'desc'}
+        async def _load():
+            df = await read_columns(
+                'pollen_records', addr.id, POLLEN_READ_COLUMNS,
+                columns=columns, start=start, end=end, limit=limit
+            )
+            logger.info(f"✅ Pollens récupérés: {len(df)} enregistrements")
+            return df
+
+        df = await cached_read(
+            'pollen_records', addr.id,
+            ('series', tuple(columns) if columns else None, _cache_bound(start), _cache_bound(end), limit),
+            _load
         )
 
-        if not records:
+        if df.empty:
             logger.info(f"ℹ️ Aucun enregistrement pollen pour addressId={addr.id}")
             return pd.DataFrame()
 
-        # Mapping noms botaniques → noms utilisateur-friendly
-        data = []
-        for record in records:
-            data.append({
-                'date': record.timestamp,
-                'address': addr.fullAddress,
-                # Pollens avec noms courants
-                'grass_pollen': getattr(record, 'graminaceae', None) or getattr(record, 'poaceae', None),
-                'birch_pollen': getattr(record, 'betula', None),
-                'alder_pollen': getattr(record, 'alnus', None),
-                'hazel_pollen': getattr(record, 'corylus', None),
-                'cypress_pollen': getattr(record, 'cupressaceae', None),
-                'poplar_pollen': getattr(record, 'populus', None),
-                'oak_pollen': getattr(record, 'quercus', None),
-                'ash_pollen': getattr(record, 'fraxinus', None),
-                'plane_pollen': getattr(record, 'platanus', None),
-                'nettle_pollen': getattr(record, 'urticaceae', None),
-                'mugwort_pollen': getattr(record, 'artemisia', None),
-                'ragweed_pollen': getattr(record, 'ambrosia', None),
-                'plantain_pollen': getattr(record, 'plantago', None),
-                'chenopod_pollen': getattr(record, 'chenopod', None),
-                'total_pollen': getattr(record, 'totalPollen', None),
-            })
-
-        logger.info(f"✅ Pollens récupérés: {len(data)} enregistrements")
-        return pd.DataFrame(data)
+        return self._attach_metadata(df, addr)
 
-    async def insert_pollen_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517) -> bool:
+    async def insert_pollen_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517, force_update: bool = False) -> bool:
         """
-        Insère données pollens dans la table pollen_records.
+        Insère données pollens dans la table pollen_records (upsert ensembliste).
         Le DataFrame doit contenir les colonnes Open-Meteo: alder_pollen, birch_pollen, grass_pollen, etc.
-        
+
         Args:
             dataframe: DataFrame avec colonnes pollen (noms Open-Meteo)
             lat: Latitude
             lon: Longitude
-            
+            force_update: Si True, met à jour les timestamps existants (ON CONFLICT DO UPDATE)
+
         Returns:
             True si succès
         """
-        # Colonnes pollen attendues depuis Open-Meteo
-        pollen_cols = ['alder_pollen', 'birch_pollen', 'grass_pollen', 'olive_pollen', 
-                      'ragweed_pollen', 'mugwort_pollen']
-        
         # Vérifier qu'au moins une colonne pollen existe
-        available_pollen_cols = [col for col in pollen_cols if col in dataframe.columns]
+        # Note: olive_pollen n'est pas dans le schéma actuel, il est ignoré
+        available_pollen_cols = [col for col in POLLEN_COLUMNS if col in dataframe.columns]
         if not available_pollen_cols:
             logger.info("ℹ️ Aucune colonne pollen dans le DataFrame, skip insertion pollen")
             return True
-        
+
         try:
             await self._ensure_connected()
             await self._ensure_address(lat, lon)
-            
-            # Préparer les timestamps
-            df_timestamps = [pd.to_datetime(row['date']) for _, row in dataframe.iterrows()]
-            min_ts = min(df_timestamps)
-            max_ts = max(df_timestamps)
-            
-            # Récupérer timestamps existants
-            existing_records = await self.db.pollenrecord.find_many(
-                where={
-                    'addressId': self.address_id,
-                    'timestamp': {'gte': min_ts, 'lte': max_ts}
-                }
+
+            records = frame_to_records(dataframe, POLLEN_COLUMNS)
+            counts = await bulk_upsert(
+                'pollen_records', self.address_id, records,
+                POLLEN_COLUMNS, data_source='openmeteo', force_update=force_update,
+                station_scoped=False, has_updated_at=False
             )
-            existing_ts_set = {r.timestamp for r in existing_records}
-            
-            # Préparer nouveaux enregistrements
-            new_records = []
-            for _, row in dataframe.iterrows():
-                timestamp = pd.to_datetime(row['date'])
-                
-                if timestamp in existing_ts_set:
-                    continue  # Skip duplicates
-                
-                # Mapping Open-Meteo → noms botaniques DB
-                # Note: On utilise les noms du schéma Prisma
-                record = {
-                    'timestamp': timestamp,
-                    'addressId': self.address_id,
-                    'alnus': self._safe_float(row.get('alder_pollen')),      # Alder = Aulne
-                    'betula': self._safe_float(row.get('birch_pollen')),     # Birch = Bouleau
-                    'graminaceae': self._safe_float(row.get('grass_pollen')), # Grass = Graminées
-                    'artemisia': self._safe_float(row.get('mugwort_pollen')), # Mugwort = Armoise
-                    'ambrosia': self._safe_float(row.get('ragweed_pollen')),  # Ragweed = Ambroisie
-                    'dataSource': 'openmeteo'
-                }
-                
-                # Olive pollen si disponible
-                if 'olive_pollen' in row:
-                    # Olive n'est pas dans le schéma actuel, on le stocke comme olive... à ajouter
-                    pass
-                
-                new_records.append(record)
-            
-            # Batch insert
-            inserted = 0
-            if new_records:
-                result = await self.db.pollenrecord.create_many(
-                    data=new_records,
-                    skip_duplicates=True
-                )
-                inserted = result
-            
-            logger.info(f"✅ Pollens: {inserted} nouveaux enregistrements (sur {len(dataframe)} lignes)")
+
+            logger.info(f"✅ Pollens: {counts['inserted']} nouveaux, {counts['updated']} mis à jour "
+                        f"(sur {len(dataframe)} lignes)")
             return True
-            
+
         except Exception as e:
             logger.error(f"❌ Erreur insertion pollens: {e}")
             return False
-    
-    def _safe_float(self, value) -> Optional[float]:
-        """Convertit une valeur en float, retourne None si NaN ou invalide"""
-        import math
-        if value is None:
-            return None
-        try:
-            f = float(value)
-            if math.isnan(f):
-                return None
-            return f
-        except (ValueError, TypeError):
-            return None
 
     async def get_date_range(self, address: str = None) -> Optional[Dict]:
         """
         Récupère l'intervalle de dates pour une adresse
-        OPTIMISÉ: 1 seule requête agrégée au lieu de 3 requêtes séparées
+        OPTIMISÉ: lu depuis air_quality_daily_rollups (1 ligne par jour)
 
         Returns:
             dict avec start_date et end_date ou None
         """
-        await self._ensure_connected()
+        addr = await self._resolve_address(address)
+        if not addr:
+            return None
 
-        if address is None:
-            address = self.current_address
+        result = await self.db.query_raw('''
+            SELECT
+                MIN(first_ts) as start_date,
+                MAX(last_ts) as end_date,
+                COALESCE(SUM(records), 0) as total_records
+            FROM air_quality_daily_rollups
+            WHERE address_id = $1
+        ''', addr.id)
 
-        normalized = AddressManager.sanitize_address(address)
-        addr = await self.address_manager.find_address_by_normalized(normalized)
+        if not result or not result[0]['total_records']:
+            return None
+
+        return {
+            'start_date': result[0]['start_date'],
+            'end_date': result[0]['end_date'],
+            'total_records': int(result[0]['total_records'])
+        }
 
+    async def get_location_summary(self, address: str = None) -> Optional[Dict]:
+        """
+        Résumé air quality (moyennes, maxima, % d'alertes PM2.5) depuis les
+        agrégats courants de l'adresse: une ligne, quel que soit l'historique.
+
+        Returns:
+            dict compatible avec l'ancien get_location_summary ou None
+        """
+        addr = await self._resolve_address(address)
         if not addr:
             return None
 
-        # OPTIMISATION: 1 seule requête agrégée au lieu de 3 requêtes
+        summary = await self._load_location_summary(addr)
+        if summary is not None:
+            summary['address'] = address or self.current_address
+        return summary
+
+    async def _load_location_summary(self, addr: Address) -> Optional[Dict]:
+        """Agrégats de get_location_summary (air_quality_running_stats)"""
         result = await self.db.query_raw('''
-            SELECT 
-                MIN(timestamp) as start_date,
-                MAX(timestamp) as end_date,
-                COUNT(*) as total_records
-            FROM air_quality_records 
+            SELECT
+                records AS total_records,
+                first_ts AS start_date,
+                last_ts AS end_date,
+                pm10_sum / NULLIF(pm10_count, 0) AS avg_pm10,
+                pm2_5_sum / NULLIF(pm2_5_count, 0) AS avg_pm2_5,
+                nitrogen_dioxide_sum / NULLIF(nitrogen_dioxide_count, 0) AS avg_no2,
+                ozone_sum / NULLIF(ozone_count, 0) AS avg_o3,
+                sulfur_dioxide_sum / NULLIF(sulfur_dioxide_count, 0) AS avg_so2,
+                carbon_monoxide_sum / NULLIF(carbon_monoxide_count, 0) AS avg_co,
+                pm10_max AS max_pm10,
+                pm2_5_max AS max_pm2_5,
+                100.0 * pm2_5_exceed / NULLIF(records, 0) AS pollution_alert_pct
+            FROM air_quality_running_stats
             WHERE address_id = $1
         ''', addr.id)
 
-        if not result or result[0]['total_records'] == 0:
+        if not result or not result[0]['total_records']:
+            logger.warning(f"📊 get_location_summary: aucun agrégat pour addressId={addr.id}")
             return None
 
+        row = result[0]
+        # NULL (polluant jamais mesuré) → NaN, comme les moyennes pandas d'origine
+        stat = lambda key: float(row[key]) if row[key] is not None else float('nan')
+
         return {
-            'start_date': result[0]['start_date'],
-            'end_date': result[0]['end_date'],
-            'total_records': result[0]['total_records']
+            'address': addr.fullAddress,
+            'normalized_address': addr.normalizedAddress,
+            'total_records': int(row['total_records']),
+            'avg_pm10': stat('avg_pm10'),
+            'avg_pm2_5': stat('avg_pm2_5'),
+            'avg_no2': stat('avg_no2'),
+            'avg_o3': stat('avg_o3'),
+            'avg_so2': stat('avg_so2'),
+            'avg_co': stat('avg_co'),
+            'max_pm10': stat('max_pm10'),
+            'max_pm2_5': stat('max_pm2_5'),
+            'start_date': row['start_date'],
+            'end_date': row['end_date'],
+            'pollution_alert_pct': stat('pollution_alert_pct'),
+            'latitude': addr.latitude,
+            'longitude': addr.longitude
         }
 
+    async def save_qev_series(self, series: pd.DataFrame, granularity: str,
+                              weights: Dict[str, float], address: str = None) -> int:
+        """Enregistre une série QeV horaire/journalière pour l'adresse (upsert par période)"""
+        addr = await self._resolve_address(address)
+        if not addr:
+            return 0
+
+        written = await upsert_qev_series(addr.id, granularity, series, weights)
+        logger.info(f"✅ Série QeV ({granularity}): {written} périodes enregistrées pour addressId={addr.id}")
+        return written
+
+    async def get_air_aggregates(self, address: str = None, since: Optional[datetime] = None) -> Optional[Dict]:
+        """Statistiques par polluant sans lecture des mesures (voir read_air_aggregates)"""
+        addr = await self._resolve_address(address)
+        if not addr:
+            return None
+        return await read_air_aggregates(addr.id, since=since)
+
+    async def get_qev_series_end(self, granularity: str, address: str = None) -> Optional[datetime]:
+        """Début de la dernière période enregistrée d'une série QeV (None si aucune)"""
+        addr = await self._resolve_address(address)
+        if not addr:
+            return None
+        result = await self.db.query_raw(
+            'SELECT MAX(period_start) AS last_period FROM qev_scores WHERE address_id = $1 AND granularity = $2',
+            addr.id, granularity
+        )
+        return result[0]['last_period'] if result else None
+
+    async def get_cached_qev_result(self, fingerprint: str, address: str = None) -> Optional[Dict]:
+        """Résultat QeV déjà calculé pour cette empreinte d'entrées, sinon None"""
+        addr = await self._resolve_address(address)
+        if not addr:
+            return None
+        return await load_qev_result(addr.id, fingerprint)
+
+    async def get_qev_sub_indices(self, addresses: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Sous-indices bruts QeV des adresses déjà scorées (voir load_qev_sub_indices)
+
+        Args:
+            addresses: Adresses à lire (None = toutes les adresses scorées)
+        """
+        await self._ensure_connected()
+        if addresses is None:
+            return await load_qev_sub_indices()
+
+        found = await self.address_manager.find_addresses(addresses)
+        if not found:
+            return await load_qev_sub_indices([])
+        return await load_qev_sub_indices(sorted({addr.id for addr in found.values()}))
+
+    async def top_k(self, category: Optional[str] = None,
+                    bbox: Optional[Tuple[float, float, float, float]] = None,
+                    k: int = 10, worst: bool = False) -> pd.DataFrame:
+        """Classement des adresses par dernier score QeV (voir top_k_qev_scores)"""
+        await self._ensure_connected()
+        return await top_k_qev_scores(category=category, bbox=bbox, k=k, ascending=worst)
+
+    async def get_latest_qev_scores(self, addresses: Optional[List[str]] = None) -> pd.DataFrame:
+        """Dernier score QeV ponctuel de chaque adresse (None = toutes les adresses scorées)"""
+        await self._ensure_connected()
+        if addresses is None:
+            return await latest_qev_scores()
+        found = await self.address_manager.find_addresses(addresses)
+        return await latest_qev_scores(sorted({addr.id for addr in found.values()}))
+
+    async def save_qev_result(self, qev_result: Dict, fingerprint: str, address: str = None) -> bool:
+        """
+        Met en cache un résultat QeV et l'ajoute à qev_scores si son empreinte est nouvelle
+
+        Returns:
+            True si un score a été persisté (empreinte changée)
+        """
+        addr = await self._resolve_address(address)
+        if not addr:
+            return False
+
+        if not await store_qev_result(addr.id, fingerprint, qev_result):
+            return False
+
+        logger.info(f"✅ Score QeV persisté en PostgreSQL (addressId={addr.id}, empreinte {fingerprint[:12]})")
+        return True
+
+    async def get_qev_series(
+        self,
+        address: str = None,
+        granularity: str = 'day',
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Série QeV précalculée (score, sous-indices, percentiles glissants)
+
+        Returns:
+            DataFrame 'date' + colonnes QEV_SERIES_COLUMNS (vide si aucune série)
+        """
+        addr = await self._resolve_address(address)
+        if not addr:
+            return pd.DataFrame()
+
+        df = await read_qev_series(addr.id, granularity, start=start, end=end)
+        return self._attach_metadata(df, addr) if not df.empty else pd.DataFrame()
+
 
 # ============================================================
 # CLASSE : BASE DE DONNÉES MÉTÉO (PostgreSQL)
@@ -602,7 +2192,7 @@ class WeatherDB:
         logger.info(f"✅ WeatherDB (Prisma) initialisée: {self.current_address}")
 
     async def _ensure_connected(self):
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await DatabaseClient.get_client()
 
     async def _ensure_address(self, lat: float = 50.8503, lon: float = 4.3517):
@@ -613,7 +2203,7 @@ class WeatherDB:
             self.address_id = address.id
 
     async def insert_data(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517, force_update: bool = False) -> bool:
-        """Insère données météo dans PostgreSQL (optimisé batch)."""
+        """Insère données météo dans PostgreSQL (upsert ensembliste, 1 statement)."""
         if dataframe is None or dataframe.empty:
             logger.error("❌ DataFrame météo vide")
             return False
@@ -622,88 +2212,44 @@ class WeatherDB:
             await self._ensure_connected()
             await self._ensure_address(lat, lon)
 
-            # Préparer les timestamps du DataFrame
-            df_timestamps = [pd.to_datetime(row['date']) for _, row in dataframe.iterrows()]
-            min_ts = min(df_timestamps)
-            max_ts = max(df_timestamps)
+            records = frame_to_records(dataframe, WEATHER_COLUMNS)
+            logger.info(f"📊 Météo batch upsert: {len(records)} lignes (force_update={force_update})")
 
-            # 1 seul SELECT: récupérer tous les timestamps existants pour cette plage
-            existing_records = await self.db.weatherrecord.find_many(
-                where={
-                    'addressId': self.address_id,
-                    'timestamp': {'gte': min_ts, 'lte': max_ts}
-                }
+            counts = await bulk_upsert(
+                'weather_records', self.address_id, records,
+                WEATHER_COLUMNS, data_source='meteosource', force_update=force_update
             )
-            existing_ts_set = {r.timestamp for r in existing_records}
-            existing_by_ts = {r.timestamp: r for r in existing_records}
-
-            logger.info(f"📊 Météo batch: {len(dataframe)} lignes, {len(existing_ts_set)} existantes")
-
-            new_records = []
-            updated = 0
-            skipped = 0
-
-            for _, row in dataframe.iterrows():
-                timestamp = pd.to_datetime(row['date'])
-
-                if timestamp in existing_ts_set:
-                    if force_update:
-                        existing = existing_by_ts[timestamp]
-                        await self.db.weatherrecord.update(
-                            where={'id': existing.id},
-                            data={
-                                'temperature': row.get('temperature'),
-                                'feelsLike': row.get('feels_like'),
-                                'humidity': row.get('humidity'),
-                                'pressure': row.get('pressure'),
-                                'windSpeed': row.get('wind_speed'),
-                                'windDirection': row.get('wind_direction'),
-                                'windGusts': row.get('wind_gusts'),
-                                'cloudCover': row.get('cloud_cover'),
-                                'precipitation1h': row.get('rain'),
-                                'weatherCode': row.get('weather_code'),
-                                'visibility': row.get('visibility'),
-                                'dataSource': 'meteosource'
-                            }
-                        )
-                        updated += 1
-                    else:
-                        skipped += 1
-                    continue
-
-                new_records.append({
-                    'timestamp': timestamp,
-                    'addressId': self.address_id,
-                    'temperature': row.get('temperature'),
-                    'feelsLike': row.get('feels_like'),
-                    'humidity': row.get('humidity'),
-                    'pressure': row.get('pressure'),
-                    'windSpeed': row.get('wind_speed'),
-                    'windDirection': row.get('wind_direction'),
-                    'windGusts': row.get('wind_gusts'),
-                    'cloudCover': row.get('cloud_cover'),
-                    'precipitation1h': row.get('rain'),
-                    'weatherCode': row.get('weather_code'),
-                    'visibility': row.get('visibility'),
-                    'dataSource': 'meteosource'
-                })
-
-            # Batch INSERT
-            inserted = 0
-            if new_records:
-                result = await self.db.weatherrecord.create_many(
-                    data=new_records,
-                    skip_duplicates=True
-                )
-                inserted = result
 
-            logger.info(f"✅ Météo: {inserted} nouveaux, {updated} mis à jour, {skipped} ignorés")
+            logger.info(f"✅ Météo: {counts['inserted']} nouveaux, {counts['updated']} mis à jour, "
+                        f"{counts['skipped']} ignorés")
             return True
 
         except Exception as e:
             logger.error(f"❌ Erreur insertion météo globale: {e}")
             return False
 
+    async def bulk_ingest(self, dataframe: pd.DataFrame, lat: float = 50.8503, lon: float = 4.3517,
+                          force_update: bool = False, batch_size: int = COPY_BATCH_SIZE) -> Dict:
+        """
+        Ingestion massive météo via COPY asyncpg (voir AirQualityDB.bulk_ingest).
+
+        Returns:
+            dict de copy_ingest() avec timings par lot
+        """
+        records = frame_to_records(dataframe, WEATHER_COLUMNS)
+        if 'address_id' not in records.columns:
+            await self._ensure_connected()
+            await self._ensure_address(lat, lon)
+            records.insert(0, 'address_id', self.address_id)
+
+        stats = await copy_ingest(
+            'weather_records', records, WEATHER_COLUMNS, data_source='meteosource',
+            force_update=force_update, batch_size=batch_size
+        )
+        logger.info(f"✅ Météo COPY: {stats['inserted']} nouveaux, {stats['updated']} mis à jour, "
+                    f"{stats['skipped']} ignorés ({stats['rows_per_s']} lignes/s)")
+        return stats
+
     async def save_hourly_weather(self, address: str, lat: float, lon: float, hourly_df: pd.DataFrame) -> bool:
         """
         Sauvegarde données météo horaires (historiques ou prévisions)
@@ -772,6 +2318,9 @@ class WeatherDB:
                 }
             )
 
+            invalidate_read_cache('weather_records', [self.address_id])
+            await refresh_daily_rollups('weather_records', [self.address_id], timestamp, timestamp)
+
             logger.info("✅ Météo actuelle sauvegardée")
             return True
 
@@ -831,7 +2380,7 @@ class WeatherDB:
     async def get_temperature_statistics(self, address: str = None) -> Dict:
         """
         Calcule statistiques de température
-        OPTIMISÉ: Calcul côté base de données (AVG, MIN, MAX)
+        OPTIMISÉ: Calcul depuis weather_daily_rollups (AVG, MIN, MAX)
         """
         await self._ensure_connected()
 
@@ -844,18 +2393,18 @@ class WeatherDB:
         if not addr:
             return {}
 
-        # OPTIMISATION: Calculs agrégés en SQL
+        # OPTIMISATION: Calculs agrégés depuis les rollups journaliers
         result = await self.db.query_raw('''
             SELECT 
-                AVG(temperature) as avg_temp,
-                MIN(temperature) as min_temp,
-                MAX(temperature) as max_temp,
-                COUNT(*) as total_records
-            FROM weather_records 
-            WHERE address_id = $1 AND temperature IS NOT NULL
+                SUM(temperature_sum) / NULLIF(SUM(temperature_count), 0) as avg_temp,
+                MIN(temperature_min) as min_temp,
+                MAX(temperature_max) as max_temp,
+                COALESCE(SUM(temperature_count), 0) as total_records
+            FROM weather_daily_rollups 
+            WHERE address_id = $1
         ''', addr.id)
 
-        if not result or result[0]['total_records'] == 0:
+        if not result or not result[0]['total_records']:
             return {}
             
         row = result[0]
@@ -867,6 +2416,44 @@ class WeatherDB:
             'total_records': row['total_records']
         }
 
+    async def get_many(
+        self,
+        addresses: List[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[List[str]] = None,
+        as_dict: bool = False
+    ):
+        """
+        Données météo de plusieurs adresses en une requête d'adresses + un scan
+
+        Args:
+            addresses: Adresses à lire
+            start: Début de période incluse
+            end: Fin de période incluse
+            columns: Variables à lire (voir WEATHER_READ_COLUMNS, None = toutes)
+            as_dict: True pour un DataFrame par adresse
+
+        Returns:
+            DataFrame long (address, address_id, date, variables) ou dict adresse → DataFrame
+        """
+        await self._ensure_connected()
+        found = await self.address_manager.find_addresses(addresses)
+        if not found:
+            return {address: pd.DataFrame() for address in addresses} if as_dict else pd.DataFrame()
+
+        df = await read_columns_many(
+            'weather_records', sorted({addr.id for addr in found.values()}),
+            WEATHER_READ_COLUMNS, columns=columns, start=start, end=end
+        )
+        logger.info(f"✅ Météo: {len(df)} enregistrements pour {len(found)} adresses (1 requête)")
+
+        result = shape_many(df, found, as_dict=as_dict)
+        if as_dict:
+            for address in addresses:
+                result.setdefault(address, pd.DataFrame())
+        return result
+
     async def get_hourly_forecast(self, address: str = None, hours: int = 24) -> pd.DataFrame:
         """Récupère prévisions horaires"""
         await self._ensure_connected()
@@ -928,7 +2515,7 @@ class DatabaseManager:
     async def list_all_databases(db_type: str = 'air_quality') -> List[Dict]:
         """
         Liste toutes les adresses disponibles dans PostgreSQL
-        OPTIMISÉ: Utilise 1 seule requête SQL avec JOIN au lieu de boucle N+1
+        OPTIMISÉ: 1 seule requête sur les rollups journaliers (pas de scan des mesures)
         """
         db = await DatabaseClient.get_client()
         databases = []
@@ -940,13 +2527,13 @@ class DatabaseManager:
                 query = '''
                     SELECT 
                         a.id, a.normalized_address, a.updated_at,
-                        COUNT(r.id) as count,
-                        MIN(r.timestamp) as min_date,
-                        MAX(r.timestamp) as max_date
+                        SUM(r.records) as count,
+                        MIN(r.first_ts) as min_date,
+                        MAX(r.last_ts) as max_date
                     FROM addresses a
-                    LEFT JOIN air_quality_records r ON a.id = r.address_id
+                    JOIN air_quality_daily_rollups r ON a.id = r.address_id
                     GROUP BY a.id
-                    HAVING COUNT(r.id) > 0
+                    HAVING SUM(r.records) > 0
                     ORDER BY a.created_at DESC
                 '''
                 results = await db.query_raw(query)
@@ -958,7 +2545,7 @@ class DatabaseManager:
                         'size': 0, # N/A PostgreSQL
                         'modified': row['updated_at'],
                         'address': row['normalized_address'],
-                        'records': row['count'],
+                        'records': int(row['count']),
                         'date_range': f"{row['min_date'] or 'N/A'} → {row['max_date'] or 'N/A'}"
                     })
                     
@@ -967,13 +2554,13 @@ class DatabaseManager:
                 query = '''
                     SELECT 
                         a.id, a.normalized_address, a.updated_at,
-                        COUNT(r.id) as count,
-                        MIN(r.timestamp) as min_date,
-                        MAX(r.timestamp) as max_date
+                        SUM(r.records) as count,
+                        MIN(r.first_ts) as min_date,
+                        MAX(r.last_ts) as max_date
                     FROM addresses a
-                    LEFT JOIN weather_records r ON a.id = r.address_id
+                    JOIN weather_daily_rollups r ON a.id = r.address_id
                     GROUP BY a.id
-                    HAVING COUNT(r.id) > 0
+                    HAVING SUM(r.records) > 0
                     ORDER BY a.created_at DESC
                 '''
                 results = await db.query_raw(query)
@@ -985,7 +2572,7 @@ class DatabaseManager:
                         'size': 0,
                         'modified': row['updated_at'],
                         'address': row['normalized_address'],
-                        'records': row['count'],
+                        'records': int(row['count']),
                         'date_range': f"{row['min_date'] or 'N/A'} → {row['max_date'] or 'N/A'}"
                     })
 
@@ -1002,6 +2589,27 @@ class DatabaseManager:
 # GESTIONNAIRE DE STATIONS
 # ============================================================
 
+# Stations + statistiques de mesures en 1 seule requête
+# (compteurs de station_running_stats, tenus à jour par trigger: aucun scan des mesures)
+STATION_STATS_QUERY = '''
+    SELECT
+        s.id, s.station_code, s.station_name, s.station_type,
+        s.latitude, s.longitude, s.elevation, s.metadata, s.is_active,
+        s.created_at, s.updated_at,
+        COALESCE(aq.records, 0) AS air_quality_records,
+        COALESCE(w.records, 0) AS weather_records,
+        CASE WHEN s.station_type = 'air_quality' THEN aq.last_ts ELSE w.last_ts END AS last_measurement
+        {extra_columns}
+    FROM stations s
+    LEFT JOIN station_running_stats aq
+        ON aq.station_id = s.id AND aq.source_table = 'air_quality_records'
+    LEFT JOIN station_running_stats w
+        ON w.station_id = s.id AND w.source_table = 'weather_records'
+    WHERE {where_clause}
+    ORDER BY {order_by}
+'''
+
+
 class StationManager:
     """Gestion des stations de mesure avec support PostGIS"""
 
@@ -1010,12 +2618,49 @@ class StationManager:
 
     async def _ensure_connected(self):
         """Assure la connexion à la base de données"""
-        if not self.db:
+        if not self.db or not self.db.is_connected():
             self.db = await DatabaseClient.get_client()
 
+    @staticmethod
+    def _station_to_dict(row: Dict) -> Dict:
+        """Convertit une ligne de STATION_STATS_QUERY en dictionnaire station"""
+        station = {
+            'id': row['id'],
+            'station_code': row['station_code'],
+            'station_name': row['station_name'],
+            'station_type': row['station_type'],
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'elevation': row['elevation'],
+            'metadata': row['metadata'],
+            'is_active': row['is_active'],
+            'air_quality_records': int(row['air_quality_records']),
+            'weather_records': int(row['weather_records']),
+            'last_measurement': row['last_measurement'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+        if 'distance_km' in row:
+            station['distance_km'] = round(row['distance_km'], 2)
+        return station
+
+    async def _query_stations(self, where_parts: List[str], params: list,
+                              order_by: str = 's.station_name ASC', extra_columns: str = '') -> List[Dict]:
+        """Exécute STATION_STATS_QUERY avec filtres paramétrés"""
+        await self._ensure_connected()
+
+        query = STATION_STATS_QUERY.format(
+            extra_columns=extra_columns,
+            where_clause=' AND '.join(where_parts) if where_parts else 'TRUE',
+            order_by=order_by
+        )
+        rows = await self.db.query_raw(query, *params)
+        return [self._station_to_dict(row) for row in rows]
+
     async def get_all_stations(self, station_type: Optional[str] = None, active_only: bool = True) -> List[Dict]:
         """
         Récupère toutes les stations de mesure
+        OPTIMISÉ: 1 seule requête (comptages + dernière mesure via station_running_stats)
 
         Args:
             station_type: Type de station ('air_quality', 'weather') ou None pour toutes
@@ -1024,64 +2669,14 @@ class StationManager:
         Returns:
             Liste de dictionnaires avec les informations des stations
         """
-        await self._ensure_connected()
-
-        where_clause = {}
+        where_parts, params = [], []
         if station_type:
-            where_clause['stationType'] = station_type
+            params.append(station_type)
+            where_parts.append(f's.station_type = ${len(params)}')
         if active_only:
-            where_clause['isActive'] = True
-
-        stations = await self.db.station.find_many(
-            where=where_clause if where_clause else None,
-            order={'stationName': 'asc'}
-        )
-
-        result = []
-        for station in stations:
-            # Récupérer le nombre de mesures pour cette station
-            air_quality_count = await self.db.airqualityrecord.count(
-                where={'stationId': station.id}
-            )
-            weather_count = await self.db.weatherrecord.count(
-                where={'stationId': station.id}
-            )
+            where_parts.append('s.is_active')
 
-            # Récupérer la dernière mesure
-            last_measurement = None
-            if station.stationType == 'air_quality':
-                last_record = await self.db.airqualityrecord.find_first(
-                    where={'stationId': station.id},
-                    order={'timestamp': 'desc'}
-                )
-                if last_record:
-                    last_measurement = last_record.timestamp
-            else:
-                last_record = await self.db.weatherrecord.find_first(
-                    where={'stationId': station.id},
-                    order={'timestamp': 'desc'}
-                )
-                if last_record:
-                    last_measurement = last_record.timestamp
-
-            result.append({
-                'id': station.id,
-                'station_code': station.stationCode,
-                'station_name': station.stationName,
-                'station_type': station.stationType,
-                'latitude': station.latitude,
-                'longitude': station.longitude,
-                'elevation': station.elevation,
-                'metadata': station.metadata,
-                'is_active': station.isActive,
-                'air_quality_records': air_quality_count,
-                'weather_records': weather_count,
-                'last_measurement': last_measurement,
-                'created_at': station.createdAt,
-                'updated_at': station.updatedAt
-            })
-
-        return result
+        return await self._query_stations(where_parts, params)
 
     async def get_stations_near_location(
         self,
@@ -1093,6 +2688,7 @@ class StationManager:
         """
         Récupère les stations dans un rayon donné autour d'une position
         Utilise PostGIS pour le calcul de distance
+        OPTIMISÉ: comptages inclus dans la requête spatiale (pas de N+1)
 
         Args:
             latitude: Latitude du point central
@@ -1103,63 +2699,21 @@ class StationManager:
         Returns:
             Liste de stations triées par distance
         """
-        await self._ensure_connected()
-
-        # Utiliser une requête SQL brute avec PostGIS pour calculer les distances
-        # ST_Distance retourne la distance en degrés, conversion approximative: 1° ≈ 111 km
+        # ST_DWithin en degrés, conversion approximative: 1° ≈ 111 km
         radius_degrees = radius_km / 111.0
+        point = 'ST_SetSRID(ST_MakePoint($1::double precision, $2::double precision), 4326)'
 
-        where_parts = [f"ST_DWithin(geom, ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326), {radius_degrees})"]
-
+        params: list = [float(longitude), float(latitude), float(radius_degrees)]
+        where_parts = [f'ST_DWithin(s.geom, {point}, $3::double precision)']
         if station_type:
-            where_parts.append(f"station_type = '{station_type}'")
-
-        where_clause = " AND ".join(where_parts)
-
-        query = f"""
-            SELECT
-                id, station_code, station_name, station_type,
-                latitude, longitude, elevation, metadata, is_active,
-                created_at, updated_at,
-                ST_Distance(
-                    geom::geography,
-                    ST_SetSRID(ST_MakePoint({longitude}, {latitude}), 4326)::geography
-                ) / 1000 as distance_km
-            FROM stations
-            WHERE {where_clause}
-            ORDER BY distance_km ASC
-        """
-
-        stations = await self.db.query_raw(query)
-
-        result = []
-        for station in stations:
-            # Récupérer le nombre de mesures
-            air_quality_count = await self.db.airqualityrecord.count(
-                where={'stationId': station['id']}
-            )
-            weather_count = await self.db.weatherrecord.count(
-                where={'stationId': station['id']}
-            )
+            params.append(station_type)
+            where_parts.append(f's.station_type = ${len(params)}')
 
-            result.append({
-                'id': station['id'],
-                'station_code': station['station_code'],
-                'station_name': station['station_name'],
-                'station_type': station['station_type'],
-                'latitude': station['latitude'],
-                'longitude': station['longitude'],
-                'elevation': station['elevation'],
-                'metadata': station['metadata'],
-                'is_active': station['is_active'],
-                'distance_km': round(station['distance_km'], 2),
-                'air_quality_records': air_quality_count,
-                'weather_records': weather_count,
-                'created_at': station['created_at'],
-                'updated_at': station['updated_at']
-            })
-
-        return result
+        return await self._query_stations(
+            where_parts, params,
+            order_by='distance_km ASC',
+            extra_columns=f', ST_Distance(s.geom::geography, {point}::geography) / 1000 AS distance_km'
+        )
 
     async def get_station_by_code(self, station_code: str) -> Optional[Dict]:
         """
@@ -1171,37 +2725,8 @@ class StationManager:
         Returns:
             Dictionnaire avec les informations de la station ou None
         """
-        await self._ensure_connected()
-
-        station = await self.db.station.find_unique(
-            where={'stationCode': station_code}
-        )
-
-        if not station:
-            return None
-
-        air_quality_count = await self.db.airqualityrecord.count(
-            where={'stationId': station.id}
-        )
-        weather_count = await self.db.weatherrecord.count(
-            where={'stationId': station.id}
-        )
-
-        return {
-            'id': station.id,
-            'station_code': station.stationCode,
-            'station_name': station.stationName,
-            'station_type': station.stationType,
-            'latitude': station.latitude,
-            'longitude': station.longitude,
-            'elevation': station.elevation,
-            'metadata': station.metadata,
-            'is_active': station.isActive,
-            'air_quality_records': air_quality_count,
-            'weather_records': weather_count,
-            'created_at': station.createdAt,
-            'updated_at': station.updatedAt
-        }
+        stations = await self._query_stations(['s.station_code = $1'], [station_code])
+        return stations[0] if stations else None
 
     async def create_station(
         self,
@@ -1273,6 +2798,29 @@ class StationManager:
 
 __all__ = [
     'DatabaseClient',
+    'AsyncpgClient',
+    'frame_to_records',
+    'bulk_upsert',
+    'copy_ingest',
+    'ensure_partitions',
+    'mark_partitions_ensured',
+    'refresh_daily_rollups',
+    'read_air_aggregates',
+    'AIR_AGGREGATE_COLUMNS',
+    'read_columns',
+    'read_columns_many',
+    'ReadCache',
+    'READ_CACHE',
+    'invalidate_read_cache',
+    'upsert_qev_series',
+    'read_qev_series',
+    'QEV_RESULT_CACHE',
+    'load_qev_result',
+    'store_qev_result',
+    'store_qev_results',
+    'load_qev_sub_indices',
+    'top_k_qev_scores',
+    'latest_qev_scores',
     'AddressManager',
     'AirQualityDB',
     'WeatherDB',
@@ -564,8 +564,7 @@ def display_environmental_analysis(address: str):
                         
                         # ✅ Sauvegarder aussi en PostgreSQL
                         try:
-                            import asyncio
-                            from db_async_wrapper import ImageAnalysisManager
+                            from db_async_wrapper import ImageAnalysisManager, run_async
 
                             async def save_to_db():
                                 analysis_manager = ImageAnalysisManager()
@@ -579,7 +578,7 @@ def display_environmental_analysis(address: str):
                                     results=results_data
                                 )
 
-                            asyncio.run(save_to_db())
+                            run_async(save_to_db())
                             logger.info("✅ Analyse YOLO enregistrée en PostgreSQL")
                         except Exception as e:
                             logger.warning(f"⚠️ Impossible d'enregistrer en DB: {e}")
@@ -669,8 +668,7 @@ def display_environmental_analysis(address: str):
                                 
                                 # ✅ Sauvegarder aussi en PostgreSQL
                                 try:
-                                    import asyncio
-                                    from db_async_wrapper import ImageAnalysisManager
+                                    from db_async_wrapper import ImageAnalysisManager, run_async
 
                                     async def save_to_db():
                                         analysis_manager = ImageAnalysisManager()
@@ -684,7 +682,7 @@ def display_environmental_analysis(address: str):
                                             results=results
                                         )
 
-                                    asyncio.run(save_to_db())
+                                    run_async(save_to_db())
                                     logger.info("✅ Analyse Map enregistrée en PostgreSQL")
                                 except Exception as e:
                                     logger.warning(f"⚠️ Impossible d'enregistrer en DB: {e}")
@@ -11,12 +11,19 @@ Implémente la règle 3-30-300 (Konijnendijk 2022)
 import logging
 import json
 import os
+import threading
 import time
+import numpy as np
 import requests
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import math
 import re
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import osm_local_index
+from overpass_cache import cache_key, get_overpass_store
 
 logger = logging.getLogger(__name__)
 
@@ -31,51 +38,228 @@ OVERPASS_MAX_RETRIES = 2          # 2 essais par serveur (4 serveurs = 8 essais
 OVERPASS_RETRY_DELAY_S = 3        # Délai initial entre retries
 OVERPASS_TOTAL_TIMEOUT_S = 45     # Timeout total pour tous les serveurs combinés
 
-# Circuit breaker: évite de réessayer Overpass si tous les serveurs ont échoué récemment
-_overpass_circuit_open = False
-_overpass_last_failure_time = 0
+# Circuit breaker: évite de réessayer Overpass si tous les serveurs ont échoué récemment.
+# État et réponses partagés entre process (overpass_cache.py: Redis, disque ou mémoire)
 OVERPASS_CIRCUIT_RESET_S = 120    # Réessayer après 2 minutes
 
 
-
-def _overpass_request(query: str, timeout: int = 15) -> dict:
+class RateLimiter:
     """
-    Envoie une requête Overpass avec retry et fallback sur serveurs alternatifs.
-    Timeout total de 45s pour éviter de bloquer le flux de recherche.
-    Utilise un backoff exponentiel pour les retries.
-    Implémente un circuit breaker pour éviter les attentes répétées.
+    Limiteur de débit partagé entre threads (intervalle minimal entre appels)
 
     Args:
-        query: Requête Overpass QL
-        timeout: Timeout HTTP par requête en secondes
+        rate_per_s: Appels par seconde autorisés (<= 0: pas de limite)
+    """
+
+    def __init__(self, rate_per_s: float = 0.0):
+        self.interval = 1.0 / rate_per_s if rate_per_s > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'au prochain créneau libre"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Débit maximal vers Overpass (requêtes/s, 0 = illimité), partagé par les threads
+# du process (étapes QeV parallèles, scoring par lot: voir batch_qev.py)
+_overpass_rate_limiter = RateLimiter(float(os.getenv('OVERPASS_MAX_RPS', '0')))
+
+
+def set_overpass_rate_limit(rate_per_s: float):
+    """Change le débit maximal vers Overpass (requêtes/s, 0 = illimité)"""
+    global _overpass_rate_limiter
+    _overpass_rate_limiter = RateLimiter(rate_per_s)
 
-    Returns:
-        dict JSON de la réponse Overpass
+
+
+# ============================================================
+# CLASSEMENT DES SERVEURS ET REQUÊTES EN COURSE (HEDGING)
+# ============================================================
+# Mode hedged: la requête part vers le serveur le mieux classé; si
+# aucune réponse n'arrive avant le percentile OVERPASS_HEDGE_PERCENTILE
+# de ses latences récentes, une requête de secours part vers le
+# suivant, etc. La première réponse valide gagne, les autres sont
+# abandonnées (non lancées: annulées; en vol: ignorées).
+
+OVERPASS_HEDGED = os.getenv('OVERPASS_HEDGED', '1') != '0'
+OVERPASS_HEDGE_PERCENTILE = float(os.getenv('OVERPASS_HEDGE_PERCENTILE', '0.9'))
+OVERPASS_HEDGE_DEFAULT_S = 4.0    # Délai avant secours tant qu'un serveur n'a pas d'historique
+OVERPASS_HEDGE_MIN_S = 1.0
+OVERPASS_HEDGE_MAX_S = 15.0
+OVERPASS_STATS_WINDOW = 50        # Dernières requêtes retenues par serveur
+OVERPASS_ERROR_PENALTY = 4.0      # Score = latence médiane × (1 + pénalité × taux d'erreur)
+
+# Erreurs HTTP transitoires (serveur surchargé): essayer un autre serveur
+OVERPASS_RETRYABLE_STATUS = (429, 502, 503, 504)
+
+
+class OverpassServerStats:
+    """Latences et erreurs glissantes par serveur (partagées par les threads du process)"""
+
+    def __init__(self, servers: List[str], window: int = OVERPASS_STATS_WINDOW):
+        self.servers = list(servers)
+        self._samples = {server: deque(maxlen=window) for server in servers}
+        self._lock = threading.Lock()
+
+    def record(self, server: str, latency_s: float, ok: bool):
+        with self._lock:
+            self._samples.setdefault(server, deque(maxlen=OVERPASS_STATS_WINDOW)).append((latency_s, ok))
+
+    def _latencies(self, server: str) -> List[float]:
+        return sorted(latency for latency, ok in self._samples.get(server, ()) if ok)
+
+    def score(self, server: str) -> float:
+        """Plus petit = meilleur (sans historique: latence par défaut)"""
+        with self._lock:
+            samples = list(self._samples.get(server, ()))
+            latencies = self._latencies(server)
+        if not samples:
+            return OVERPASS_HEDGE_DEFAULT_S
+        error_rate = sum(1 for _, ok in samples if not ok) / len(samples)
+        typical = latencies[len(latencies) // 2] if latencies else OVERPASS_TOTAL_TIMEOUT_S
+        return typical * (1 + OVERPASS_ERROR_PENALTY * error_rate)
+
+    def ranked(self) -> List[str]:
+        """Serveurs du meilleur au moins bon (ordre de OVERPASS_SERVERS à égalité)"""
+        return sorted(self.servers, key=self.score)
+
+    def hedge_delay(self, server: str) -> float:
+        """Attente avant secours: percentile des latences réussies du serveur"""
+        with self._lock:
+            latencies = self._latencies(server)
+        if not latencies:
+            return OVERPASS_HEDGE_DEFAULT_S
+        index = max(0, math.ceil(OVERPASS_HEDGE_PERCENTILE * len(latencies)) - 1)
+        return min(max(latencies[index], OVERPASS_HEDGE_MIN_S), OVERPASS_HEDGE_MAX_S)
+
+
+_overpass_stats = OverpassServerStats(OVERPASS_SERVERS)
+
+
+class OverpassUnavailable(Exception):
+    """Tous les serveurs Overpass ont échoué (ouvre le circuit breaker)"""
+
+
+def _overpass_attempt(server_url: str, query: str, timeout: float) -> dict:
+    """Une requête vers un serveur, mesurée pour le classement"""
+    _overpass_rate_limiter.acquire()
+    start = time.monotonic()
+    try:
+        response = requests.post(server_url, data={'data': query}, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+    except requests.exceptions.HTTPError as e:
+        # Requête invalide (4xx hors 429): le serveur n'est pas en cause
+        if getattr(e.response, 'status_code', None) in OVERPASS_RETRYABLE_STATUS:
+            _overpass_stats.record(server_url, time.monotonic() - start, ok=False)
+        raise
+    except (requests.exceptions.RequestException, ValueError):
+        _overpass_stats.record(server_url, time.monotonic() - start, ok=False)
+        raise
+    # 'remark' = erreur d'exécution côté serveur (résultat partiel)
+    _overpass_stats.record(server_url, time.monotonic() - start, ok='remark' not in data)
+    return data
+
+
+def _overpass_hedged(query: str, timeout: int) -> dict:
+    """
+    Requêtes en course sur les serveurs classés (voir OverpassServerStats)
 
     Raises:
-        requests.exceptions.RequestException: Si tous les serveurs échouent
+        OverpassUnavailable: Aucun serveur n'a répondu dans OVERPASS_TOTAL_TIMEOUT_S
+        requests.exceptions.HTTPError: Erreur HTTP non transitoire (requête invalide)
+    """
+    servers = _overpass_stats.ranked()
+    deadline = time.monotonic() + OVERPASS_TOTAL_TIMEOUT_S
+    executor = ThreadPoolExecutor(max_workers=len(servers), thread_name_prefix='overpass')
+    pending: Dict = {}
+    errors: List[str] = []
+    partial = None
+
+    def launch():
+        server_url = servers[len(errors) + len(pending)]
+        request_timeout = max(1.0, min(timeout, deadline - time.monotonic()))
+        pending[executor.submit(_overpass_attempt, server_url, query, request_timeout)] = server_url
+
+    try:
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Overpass: timeout total de {OVERPASS_TOTAL_TIMEOUT_S}s dépassé")
+                break
+            launched = len(errors) + len(pending)
+            can_hedge = launched < len(servers)
+            last_server = servers[launched - 1]
+            hedge_s = _overpass_stats.hedge_delay(last_server) if can_hedge else remaining
+
+            done, _ = wait(pending, timeout=min(hedge_s, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                if can_hedge:
+                    logger.info(f"⏱️ Overpass: {last_server} sans réponse après {hedge_s:.1f}s, "
+                                f"requête de secours → {servers[launched]}")
+                    launch()
+                continue
+
+            for future in done:
+                server_url = pending.pop(future)
+                try:
+                    data = future.result()
+                except requests.exceptions.HTTPError as e:
+                    status = getattr(e.response, 'status_code', None)
+                    if status not in OVERPASS_RETRYABLE_STATUS:
+                        # Autres erreurs HTTP: ne pas réessayer
+                        raise
+                    errors.append(f"{server_url}: HTTP {status}")
+                    logger.warning(f"Overpass erreur {status} ({server_url})")
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    errors.append(f"{server_url}: {type(e).__name__}")
+                    logger.warning(f"Overpass timeout/connexion ({server_url})")
+                else:
+                    if 'remark' not in data:
+                        if server_url != servers[0]:
+                            logger.info(f"✅ Overpass: réponse de secours via {server_url}")
+                        return data
+                    partial = data
+                    errors.append(f"{server_url}: {data['remark']}")
+                    logger.warning(f"Overpass résultat partiel ({server_url}): {data['remark']}")
+
+            # Échec: le serveur suivant part sans attendre le délai de secours
+            if len(errors) + len(pending) < len(servers):
+                launch()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if partial is not None:
+        return partial
+    raise OverpassUnavailable(
+        f"Tous les {len(servers)} serveurs Overpass ont échoué. "
+        f"Erreurs: {'; '.join(errors) or 'aucune réponse'}"
+    )
+
+
+def _overpass_sequential(query: str, timeout: int) -> dict:
+    """
+    Serveurs essayés l'un après l'autre (classés), avec retries et backoff exponentiel
+
+    Raises:
+        OverpassUnavailable: Tous les serveurs ont échoué
+        requests.exceptions.HTTPError: Erreur HTTP non transitoire (requête invalide)
     """
-    global _overpass_circuit_open, _overpass_last_failure_time
-    
-    # Vérifier le circuit breaker
-    if _overpass_circuit_open:
-        time_since_failure = time.time() - _overpass_last_failure_time
-        if time_since_failure < OVERPASS_CIRCUIT_RESET_S:
-            logger.warning(f"⚡ Circuit breaker actif - Overpass indisponible "
-                          f"(réessai dans {OVERPASS_CIRCUIT_RESET_S - time_since_failure:.0f}s)")
-            raise requests.exceptions.RequestException(
-                "Circuit breaker: Overpass temporairement indisponible"
-            )
-        else:
-            # Réinitialiser le circuit breaker
-            logger.info("🔄 Circuit breaker réinitialisé, tentative Overpass...")
-            _overpass_circuit_open = False
-    
     last_error = None
     start_time = time.time()
     servers_tried = 0
+    servers = _overpass_stats.ranked()
 
-    for server_url in OVERPASS_SERVERS:
+    for server_url in servers:
         servers_tried += 1
         # Vérifier le timeout total
         elapsed = time.time() - start_time
@@ -93,12 +277,9 @@ def _overpass_request(query: str, timeout: int = 15) -> dict:
             try:
                 req_timeout = min(timeout, remaining - 1)
                 logger.debug(f"Overpass requête → {server_url} (essai {attempt}/{OVERPASS_MAX_RETRIES}, timeout={req_timeout:.0f}s)")
-                response = requests.post(server_url, data={'data': query}, timeout=req_timeout)
-                response.raise_for_status()
+                data = _overpass_attempt(server_url, query, req_timeout)
                 logger.debug(f"✅ Overpass succès via {server_url}")
-                # Succès - réinitialiser le circuit breaker si nécessaire
-                _overpass_circuit_open = False
-                return response.json()
+                return data
 
             except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
                 last_error = e
@@ -111,7 +292,7 @@ def _overpass_request(query: str, timeout: int = 15) -> dict:
             except requests.exceptions.HTTPError as e:
                 last_error = e
                 status = getattr(e.response, 'status_code', None)
-                if status in (429, 504, 502, 503):
+                if status in OVERPASS_RETRYABLE_STATUS:
                     logger.warning(f"Overpass erreur {status} ({server_url}, essai {attempt})")
                     if attempt < OVERPASS_MAX_RETRIES:
                         # Pour 504/502/503, attendre plus longtemps (serveur surchargé)
@@ -123,18 +304,84 @@ def _overpass_request(query: str, timeout: int = 15) -> dict:
 
         logger.info(f"Serveur {server_url} épuisé ({OVERPASS_MAX_RETRIES} essais), passage au suivant...")
 
-    # Tous les serveurs ont échoué - activer le circuit breaker
-    _overpass_circuit_open = True
-    _overpass_last_failure_time = time.time()
-    logger.warning(f"⚡ Circuit breaker ACTIVÉ - tous les serveurs Overpass ont échoué")
-    
-    raise requests.exceptions.RequestException(
-        f"Tous les {len(OVERPASS_SERVERS)} serveurs Overpass ont échoué "
+    raise OverpassUnavailable(
+        f"Tous les {len(servers)} serveurs Overpass ont échoué "
         f"(temps écoulé: {time.time() - start_time:.1f}s). "
         f"Dernière erreur: {last_error}"
     )
 
 
+def _store_call(method: str, *args, default=None):
+    """Appel au store Overpass partagé; une panne du store n'empêche pas la requête"""
+    try:
+        return getattr(get_overpass_store(), method)(*args)
+    except Exception as e:
+        logger.warning(f"⚠️ Cache Overpass ({method}) indisponible: {e}")
+        return default
+
+
+def _overpass_request(query: str, timeout: int = 15) -> dict:
+    """
+    Envoie une requête Overpass aux serveurs classés par latence/erreurs récentes:
+    en course (OVERPASS_HEDGED, défaut) ou l'un après l'autre avec retries et
+    backoff exponentiel. Timeout total de 45s pour éviter de bloquer le flux de recherche.
+
+    Réponses en cache partagé (requête normalisée, coordonnées quantifiées, TTL).
+    Circuit breaker partagé entre process: ouvert, échec immédiat; à
+    l'échéance, un seul process sonde Overpass, les autres échouent
+    immédiatement jusqu'à sa réponse.
+
+    Args:
+        query: Requête Overpass QL
+        timeout: Timeout HTTP par requête en secondes
+
+    Returns:
+        dict JSON de la réponse Overpass
+
+    Raises:
+        requests.exceptions.RequestException: Si tous les serveurs échouent
+    """
+    key = cache_key(query)
+    cached = _store_call('get', key)
+    if cached is not None:
+        logger.debug("⚡ Overpass: réponse en cache")
+        return cached
+
+    # Vérifier le circuit breaker
+    open_until = _store_call('breaker_open_until')
+    if open_until is not None:
+        remaining_s = open_until - time.time()
+        if remaining_s > 0:
+            logger.warning(f"⚡ Circuit breaker actif - Overpass indisponible "
+                          f"(réessai dans {remaining_s:.0f}s)")
+            raise requests.exceptions.RequestException(
+                "Circuit breaker: Overpass temporairement indisponible"
+            )
+        if not _store_call('acquire_probe', OVERPASS_TOTAL_TIMEOUT_S, default=True):
+            logger.warning("⚡ Circuit breaker: sonde Overpass en cours dans un autre process")
+            raise requests.exceptions.RequestException(
+                "Circuit breaker: Overpass temporairement indisponible (sonde en cours)"
+            )
+        logger.info("🔄 Circuit breaker semi-ouvert, tentative Overpass...")
+
+    try:
+        data = _overpass_hedged(query, timeout) if OVERPASS_HEDGED else _overpass_sequential(query, timeout)
+    except OverpassUnavailable as e:
+        # Tous les serveurs ont échoué - activer le circuit breaker (pour tous les process)
+        _store_call('open_breaker', time.time() + OVERPASS_CIRCUIT_RESET_S)
+        logger.warning("⚡ Circuit breaker ACTIVÉ - tous les serveurs Overpass ont échoué")
+        raise requests.exceptions.RequestException(str(e))
+
+    # Succès - réinitialiser le circuit breaker si nécessaire
+    if open_until is not None:
+        _store_call('close_breaker')
+        logger.info("✅ Circuit breaker fermé")
+    # 'remark' = erreur d'exécution côté serveur (résultat partiel): pas de cache
+    if 'remark' not in data:
+        _store_call('put', key, data)
+    return data
+
+
 # ============================================================
 # CONSTANTES
 # ============================================================
@@ -426,6 +673,159 @@ def estimate_canopy_from_ndvi(
     return 0.0
 
 
+# ============================================================
+# REQUÊTE OVERPASS COMBINÉE (ESPACES VERTS + ROUTES)
+# ============================================================
+# Une seule requête par adresse: espaces verts et routes dans le plus
+# grand rayon utile, séparés côté client. Les étapes 'parks' et
+# 'traffic' (threads de run_qev_stages) partagent la requête en vol,
+# puis la réponse via le cache Overpass (même requête = même clé).
+
+OVERPASS_PARKS_RADIUS_M = 2000    # Rayon de calculate_distance_to_nearest_park
+ROAD_SEARCH_RADIUS_M = 800        # Rayon maximal de la route la plus proche
+
+# Tracés des routes des dernières réponses, en tableaux NumPy (par clé Overpass)
+ROAD_INDEX_CACHE_SIZE = 64
+
+_neighbourhood_inflight: Dict[str, Future] = {}
+_neighbourhood_lock = threading.Lock()
+_road_indexes: 'OrderedDict[str, RoadGeometryIndex]' = OrderedDict()
+
+
+def build_neighbourhood_query(
+    latitude: float,
+    longitude: float,
+    parks_radius_m: int = OVERPASS_PARKS_RADIUS_M,
+    roads_radius_m: int = ROAD_SEARCH_RADIUS_M
+) -> str:
+    """
+    Requête Overpass QL des espaces verts (centre) et des routes (géométrie
+    complète, types de TRAFFIC_BY_ROAD_TYPE) autour d'un point
+    """
+    parks_around = f"around:{parks_radius_m},{latitude},{longitude}"
+    roads_around = f"around:{roads_radius_m},{latitude},{longitude}"
+    highway_types = '|'.join(sorted(ROAD_HIGHWAY_TYPES))
+    return f"""
+    [out:json][timeout:25];
+    (
+      way["leisure"="park"]({parks_around});
+      way["landuse"="forest"]({parks_around});
+      way["natural"="wood"]({parks_around});
+      way["leisure"="garden"]({parks_around});
+      relation["leisure"="park"]({parks_around});
+      relation["landuse"="forest"]({parks_around});
+    )->.green;
+    way["highway"~"^({highway_types})$"]({roads_around})->.roads;
+    .green out center tags;
+    .roads out tags geom;
+    """
+
+
+def _is_green_space(tags: Dict) -> bool:
+    return (tags.get('leisure') in ('park', 'garden') or tags.get('landuse') == 'forest'
+            or tags.get('natural') == 'wood')
+
+
+def _split_neighbourhood_elements(data: dict, latitude: float, longitude: float) -> Dict[str, List[Dict]]:
+    """Sépare la réponse combinée: espaces verts triés par distance au centre, routes avec leur géométrie"""
+    green_spaces = []
+    roads = []
+    for element in data.get('elements', []):
+        tags = element.get('tags', {})
+        if element.get('type') == 'way' and 'highway' in tags:
+            # Distance au tracé calculée par RoadGeometryIndex
+            roads.append({'osm_id': element.get('id'), 'tags': tags, 'geometry': element.get('geometry') or []})
+            continue
+
+        # Récupérer le centre (pour ways/relations, Overpass retourne 'center')
+        if 'center' in element:
+            el_lat = element['center']['lat']
+            el_lon = element['center']['lon']
+        elif 'lat' in element and 'lon' in element:
+            el_lat = element['lat']
+            el_lon = element['lon']
+        else:
+            continue
+
+        if _is_green_space(tags):
+            green_spaces.append({
+                'name': tags.get('name', tags.get('leisure', tags.get('landuse', 'Espace vert'))),
+                'latitude': el_lat,
+                'longitude': el_lon,
+                # Distance haversine
+                'distance_m': _haversine_distance(latitude, longitude, el_lat, el_lon),
+                'type': tags.get('leisure', tags.get('landuse', tags.get('natural', 'unknown'))),
+                'osm_id': element.get('id')
+            })
+
+    # Trier par distance
+    green_spaces.sort(key=lambda x: x['distance_m'])
+    return {'green_spaces': green_spaces, 'roads': roads}
+
+
+def _query_overpass_neighbourhood(
+    latitude: float,
+    longitude: float,
+    parks_radius_m: int = OVERPASS_PARKS_RADIUS_M,
+    roads_radius_m: int = ROAD_SEARCH_RADIUS_M
+) -> Dict[str, List[Dict]]:
+    """
+    Espaces verts et routes autour d'un point en une requête Overpass
+
+    Un appel concurrent pour la même requête attend la réponse en vol
+    au lieu d'en envoyer une seconde.
+
+    Returns:
+        {'green_spaces': [...] triés par distance, 'roads': RoadGeometryIndex}
+
+    Raises:
+        requests.exceptions.RequestException: Si tous les serveurs échouent
+    """
+    query = build_neighbourhood_query(latitude, longitude, parks_radius_m, roads_radius_m)
+    key = cache_key(query)
+
+    with _neighbourhood_lock:
+        inflight = _neighbourhood_inflight.get(key)
+        owner = inflight is None
+        if owner:
+            inflight = _neighbourhood_inflight[key] = Future()
+
+    if owner:
+        try:
+            data = _overpass_request(query, timeout=30)
+            inflight.set_result(data)
+        except BaseException as e:
+            inflight.set_exception(e)
+            raise
+        finally:
+            with _neighbourhood_lock:
+                _neighbourhood_inflight.pop(key, None)
+    else:
+        logger.debug("Overpass: requête combinée déjà en vol, attente de sa réponse")
+        data = inflight.result()
+
+    neighbourhood = _split_neighbourhood_elements(data, latitude, longitude)
+    # Résultat partiel ('remark'): non mis en cache, comme la réponse
+    if 'remark' in data:
+        neighbourhood['roads'] = RoadGeometryIndex(neighbourhood['roads'])
+    else:
+        neighbourhood['roads'] = _road_geometry_index(key, neighbourhood['roads'])
+    return neighbourhood
+
+
+def _road_geometry_index(key: str, roads: List[Dict]) -> 'RoadGeometryIndex':
+    """Index des tracés d'une réponse, partagé par les adresses qui reçoivent la même réponse"""
+    with _neighbourhood_lock:
+        index = _road_indexes.get(key)
+        if index is None:
+            index = _road_indexes[key] = RoadGeometryIndex(roads)
+            while len(_road_indexes) > ROAD_INDEX_CACHE_SIZE:
+                _road_indexes.popitem(last=False)
+        else:
+            _road_indexes.move_to_end(key)
+    return index
+
+
 # ============================================================
 # DISTANCE ESPACES VERTS (OSM + PostGIS)
 # ============================================================
@@ -433,10 +833,11 @@ def estimate_canopy_from_ndvi(
 def calculate_distance_to_nearest_park(
     latitude: float,
     longitude: float,
-    search_radius_m: int = 2000
+    search_radius_m: int = OVERPASS_PARKS_RADIUS_M,
+    raise_errors: bool = False
 ) -> Tuple[float, Optional[str], Optional[float]]:
     """
-    Calcule la distance au parc/espace vert le plus proche via Overpass API.
+    Calcule la distance au parc/espace vert le plus proche (index OSM local, sinon Overpass).
 
     Sources:
     - OpenStreetMap (tags: leisure=park, landuse=forest, natural=wood, leisure=garden)
@@ -445,11 +846,13 @@ def calculate_distance_to_nearest_park(
         latitude: Latitude du domicile
         longitude: Longitude du domicile
         search_radius_m: Rayon de recherche maximum (m)
+        raise_errors: Propager les erreurs Overpass au lieu de conclure
+                      "aucun parc" (étape 'parks' de qev_service: repli signalé)
 
     Returns:
         (distance_m, park_name, park_area_m2)
     """
-    green_spaces = query_osm_green_spaces(latitude, longitude, search_radius_m)
+    green_spaces = query_osm_green_spaces(latitude, longitude, search_radius_m, raise_errors=raise_errors)
 
     if not green_spaces:
         logger.warning(f"Aucun espace vert trouvé dans un rayon de {search_radius_m}m")
@@ -460,8 +863,8 @@ def calculate_distance_to_nearest_park(
     distance_m = nearest['distance_m']
     park_name = nearest['name']
 
-    # L'aire n'est pas disponible via Overpass center query (nécessiterait geom complet)
-    park_area_m2 = None
+    # L'aire n'est connue que de l'index local (Overpass 'out center' n'a pas la géométrie)
+    park_area_m2 = nearest.get('area_m2')
 
     logger.info(f"Parc le plus proche: {park_name} à {distance_m:.0f}m")
     return (distance_m, park_name, park_area_m2)
@@ -470,72 +873,55 @@ def calculate_distance_to_nearest_park(
 def query_osm_green_spaces(
     latitude: float,
     longitude: float,
-    radius_m: int = 2000
+    radius_m: int = OVERPASS_PARKS_RADIUS_M,
+    raise_errors: bool = False
 ) -> List[Dict]:
     """
     Interroge OpenStreetMap pour trouver les espaces verts à proximité.
 
+    Index OSM local (KNN PostGIS, distance au bord du polygone) si le point
+    est couvert par un extrait importé, sinon Overpass (distance au centre).
+
     Args:
         latitude: Latitude du point
         longitude: Longitude du point
         radius_m: Rayon de recherche
+        raise_errors: Propager les erreurs Overpass (sinon liste vide)
 
     Returns:
         Liste d'espaces verts avec métadonnées
     """
-    overpass_query = f"""
-    [out:json][timeout:25];
-    (
-      way["leisure"="park"](around:{radius_m},{latitude},{longitude});
-      way["landuse"="forest"](around:{radius_m},{latitude},{longitude});
-      way["natural"="wood"](around:{radius_m},{latitude},{longitude});
-      way["leisure"="garden"](around:{radius_m},{latitude},{longitude});
-      relation["leisure"="park"](around:{radius_m},{latitude},{longitude});
-      relation["landuse"="forest"](around:{radius_m},{latitude},{longitude});
-    );
-    out center tags;
-    """
-
-    try:
-        data = _overpass_request(overpass_query, timeout=30)
-
-        green_spaces = []
-        for element in data.get('elements', []):
-            # Récupérer le centre (pour ways/relations, Overpass retourne 'center')
-            if 'center' in element:
-                el_lat = element['center']['lat']
-                el_lon = element['center']['lon']
-            elif 'lat' in element and 'lon' in element:
-                el_lat = element['lat']
-                el_lon = element['lon']
-            else:
-                continue
-
-            tags = element.get('tags', {})
-            name = tags.get('name', tags.get('leisure', tags.get('landuse', 'Espace vert')))
+    green_spaces = osm_local_index.nearest_green_spaces(latitude, longitude, radius_m)
+    if green_spaces is not None:
+        logger.info(f"Index OSM local: {len(green_spaces)} espaces verts dans un rayon de {radius_m}m")
+        return green_spaces
 
-            # Distance haversine
-            dist = _haversine_distance(latitude, longitude, el_lat, el_lon)
+    return _query_overpass_green_spaces(latitude, longitude, radius_m, raise_errors=raise_errors)
 
-            green_spaces.append({
-                'name': name,
-                'latitude': el_lat,
-                'longitude': el_lon,
-                'distance_m': dist,
-                'type': tags.get('leisure', tags.get('landuse', tags.get('natural', 'unknown'))),
-                'osm_id': element.get('id')
-            })
 
-        # Trier par distance
-        green_spaces.sort(key=lambda x: x['distance_m'])
+def _query_overpass_green_spaces(latitude: float, longitude: float, radius_m: int,
+                                 raise_errors: bool = False) -> List[Dict]:
+    """Espaces verts à proximité via la requête Overpass combinée (centre des ways/relations)"""
+    try:
+        # Rayon commun avec l'étape trafic: une seule requête partagée par adresse
+        neighbourhood = _query_overpass_neighbourhood(
+            latitude, longitude, parks_radius_m=max(radius_m, OVERPASS_PARKS_RADIUS_M)
+        )
+        green_spaces = neighbourhood['green_spaces']
+        if radius_m < OVERPASS_PARKS_RADIUS_M:
+            green_spaces = [gs for gs in green_spaces if gs['distance_m'] <= radius_m]
         logger.info(f"Overpass: {len(green_spaces)} espaces verts trouvés dans un rayon de {radius_m}m")
         return green_spaces
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Erreur Overpass API (espaces verts): {e}")
+        if raise_errors:
+            raise
         return []
     except (KeyError, ValueError) as e:
         logger.error(f"Erreur parsing réponse Overpass: {e}")
+        if raise_errors:
+            raise
         return []
 
 
@@ -583,70 +969,202 @@ LANES_MULTIPLIER = {
 }
 
 
+# Routes importées dans l'index local (import_osm_extract.py) et demandées à Overpass
+ROAD_HIGHWAY_TYPES = frozenset(TRAFFIC_BY_ROAD_TYPE)
+
+# Trafic pondéré des routes les plus proches: poids = exp(-distance / décroissance)
+TRAFFIC_NEAREST_ROADS = 5
+TRAFFIC_DISTANCE_DECAY_M = 50.0
+
+EARTH_RADIUS_M = 6371000
+
+
+def _lanes_multiplier(lanes) -> float:
+    """Ajustement du trafic par nombre de voies (tag OSM lanes)"""
+    if lanes:
+        try:
+            lanes_int = int(lanes)
+            return LANES_MULTIPLIER.get(lanes_int, min(lanes_int / 2, 2.5))
+        except (ValueError, TypeError):
+            pass
+    return 1.0
+
+
+class RoadGeometryIndex:
+    """
+    Tracés des routes d'une réponse Overpass ('out geom') en tableaux NumPy
+
+    Construit au premier appel de nearest() puis réutilisé par les adresses
+    qui partagent la réponse (cache Overpass par coordonnées quantifiées).
+    """
+
+    def __init__(self, roads: List[Dict]):
+        self._ways = [road for road in roads if len(road['geometry']) >= 2]
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ways)
+
+    def _build(self) -> tuple:
+        counts = np.fromiter((len(way['geometry']) for way in self._ways), dtype=np.intp, count=len(self._ways))
+        n_points = int(counts.sum())
+        lat = np.fromiter((p['lat'] for way in self._ways for p in way['geometry']), dtype=float, count=n_points)
+        lon = np.fromiter((p['lon'] for way in self._ways for p in way['geometry']), dtype=float, count=n_points)
+
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        # Boîte englobante de chaque way (lon/lat min, max)
+        bounds = (np.minimum.reduceat(lon, starts), np.minimum.reduceat(lat, starts),
+                  np.maximum.reduceat(lon, starts), np.maximum.reduceat(lat, starts))
+        # Segments (i, i+1) d'une même way
+        segments = np.delete(np.arange(n_points - 1), ends[:-1] - 1)
+        segment_ways = np.repeat(np.arange(len(self._ways)), counts - 1)
+        return lat, lon, bounds, segments, segment_ways
+
+    def nearest(self, latitude: float, longitude: float, limit: int = TRAFFIC_NEAREST_ROADS) -> List[Dict]:
+        """
+        Routes les plus proches d'un point (distance au segment le plus proche de chaque way)
+
+        Les boîtes englobantes écartent d'abord les ways qui ne peuvent pas
+        être parmi les plus proches; les segments restants sont traités en
+        une passe NumPy, dans une projection équirectangulaire locale centrée
+        sur le point (erreur négligeable dans ROAD_SEARCH_RADIUS_M).
+
+        Returns:
+            Liste triée par distance (format osm_local_index.nearest_roads)
+        """
+        if not self._ways:
+            return []
+        with self._lock:
+            if self._arrays is None:
+                self._arrays = self._build()
+        lat, lon, (min_lon, min_lat, max_lon, max_lat), segments, segment_ways = self._arrays
+
+        # Mètres, origine au point
+        y_scale = math.radians(1) * EARTH_RADIUS_M
+        x_scale = y_scale * math.cos(math.radians(latitude))
+
+        # Bornes de la distance d'une way: bord de sa boîte (inf.), coin le plus éloigné (sup.)
+        min_x, max_x = (min_lon - longitude) * x_scale, (max_lon - longitude) * x_scale
+        min_y, max_y = (min_lat - latitude) * y_scale, (max_lat - latitude) * y_scale
+        lower = np.hypot(np.maximum(np.maximum(min_x, -max_x), 0.0), np.maximum(np.maximum(min_y, -max_y), 0.0))
+        upper = np.hypot(np.maximum(np.abs(min_x), np.abs(max_x)), np.maximum(np.abs(min_y), np.abs(max_y)))
+        if len(self._ways) > limit:
+            candidates = lower <= np.partition(upper, limit - 1)[limit - 1]
+            keep = candidates[segment_ways]
+            segments, segment_ways = segments[keep], segment_ways[keep]
+
+        ax = (lon[segments] - longitude) * x_scale
+        ay = (lat[segments] - latitude) * y_scale
+        dx = (lon[segments + 1] - longitude) * x_scale - ax
+        dy = (lat[segments + 1] - latitude) * y_scale - ay
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(-(ax * dx + ay * dy) / length2, 0.0, 1.0)
+        t = np.nan_to_num(t)  # Segment de longueur nulle: distance au point a
+        distances = np.hypot(ax + t * dx, ay + t * dy)
+
+        # Distance de chaque way = minimum de ses segments
+        way_distances = np.full(len(self._ways), np.inf)
+        np.minimum.at(way_distances, segment_ways, distances)
+        nearest = np.argsort(way_distances, kind='stable')[:limit]
+
+        return [
+            {
+                'osm_id': self._ways[k]['osm_id'],
+                'distance_m': float(way_distances[k]),
+                'tags': self._ways[k]['tags'],
+            }
+            for k in nearest
+            if np.isfinite(way_distances[k])
+        ]
+
+
+def _traffic_from_roads(roads: List[Dict], source: str) -> Dict:
+    """
+    Trafic estimé depuis les routes les plus proches (triées par distance),
+    pondéré par exp(-distance / TRAFFIC_DISTANCE_DECAY_M)
+    """
+    nearest = roads[:TRAFFIC_NEAREST_ROADS]
+    totals = {'light': 0.0, 'utility': 0.0, 'heavy': 0.0}
+    total_weight = 0.0
+
+    for road in nearest:
+        tags = road['tags']
+        # Récupérer estimation de base
+        base_traffic = TRAFFIC_BY_ROAD_TYPE.get(tags.get('highway'), TRAFFIC_BY_ROAD_TYPE['unclassified'])
+        multiplier = _lanes_multiplier(tags.get('lanes'))
+        weight = math.exp(-road['distance_m'] / TRAFFIC_DISTANCE_DECAY_M)
+        for vehicle in totals:
+            totals[vehicle] += weight * base_traffic[vehicle] * multiplier
+        total_weight += weight
+
+    nearest_tags = nearest[0]['tags']
+    highway_type = nearest_tags.get('highway', 'unclassified')
+    lanes = nearest_tags.get('lanes')
+
+    result = {
+        'light_vehicles': int(totals['light'] / total_weight),
+        'utility_vehicles': int(totals['utility'] / total_weight),
+        'heavy_vehicles': int(totals['heavy'] / total_weight),
+        'source': source,
+        'road_type': highway_type,
+        'lanes': lanes,
+        'multiplier': _lanes_multiplier(lanes),
+        'road_distance_m': round(nearest[0]['distance_m'], 1),
+        'roads_weighted': len(nearest)
+    }
+
+    logger.info(f"Trafic estimé (route {highway_type} à {result['road_distance_m']:.0f}m, "
+                f"{len(nearest)} routes pondérées): "
+                f"{result['light_vehicles']}/{result['utility_vehicles']}/{result['heavy_vehicles']} veh/h")
+    return result
+
+
 def estimate_traffic_from_osm(
     latitude: float,
     longitude: float,
     search_radius_m: int = 100
 ) -> Optional[Dict]:
     """
-    Estime le trafic à partir du type de route OSM le plus proche.
+    Estime le trafic à partir des routes OSM les plus proches (type, voies),
+    pondérées par leur distance.
+
+    Index OSM local (route la plus proche en KNN PostGIS) si le point est
+    couvert par un extrait importé, sinon Overpass (requête combinée avec
+    les espaces verts, routes dans un rayon de 800m).
 
     Args:
         latitude: Latitude du point
         longitude: Longitude du point
-        search_radius_m: Rayon de recherche (m)
+        search_radius_m: Rayon de recherche minimal (m), porté à 800m
 
     Returns:
         Dict avec light_vehicles, utility_vehicles, heavy_vehicles, ou None si erreur
     """
-    overpass_query = f"""
-    [out:json][timeout:25];
-    way["highway"](around:{search_radius_m},{latitude},{longitude});
-    out tags 1;
-    """
+    roads = osm_local_index.nearest_roads(latitude, longitude, ROAD_SEARCH_RADIUS_M)
+    if roads is not None:
+        if not roads:
+            logger.warning(f"Aucune route dans l'index OSM local ({ROAD_SEARCH_RADIUS_M}m)")
+            return None
+        return _traffic_from_roads(roads, source='osm_local')
 
-    try:
-        data = _overpass_request(overpass_query, timeout=30)
+    return _estimate_traffic_from_overpass(latitude, longitude, search_radius_m)
 
-        elements = data.get('elements', [])
-        if not elements:
-            # Élargir la recherche
-            if search_radius_m < 500:
-                return estimate_traffic_from_osm(latitude, longitude, search_radius_m * 2)
+
+def _estimate_traffic_from_overpass(latitude: float, longitude: float, search_radius_m: int) -> Optional[Dict]:
+    """Trafic estimé depuis les routes les plus proches de la requête Overpass combinée (tracé 'out geom')"""
+    try:
+        neighbourhood = _query_overpass_neighbourhood(
+            latitude, longitude, roads_radius_m=max(search_radius_m, ROAD_SEARCH_RADIUS_M)
+        )
+        roads = neighbourhood['roads'].nearest(latitude, longitude)
+        if not roads:
             logger.warning("Aucune route trouvée via Overpass")
             return None
 
-        # Prendre la première route (la plus proche)
-        road = elements[0]
-        tags = road.get('tags', {})
-        highway_type = tags.get('highway', 'unclassified')
-
-        # Récupérer estimation de base
-        base_traffic = TRAFFIC_BY_ROAD_TYPE.get(highway_type, TRAFFIC_BY_ROAD_TYPE['unclassified'])
-
-        # Ajuster par nombre de voies si disponible
-        lanes = tags.get('lanes')
-        multiplier = 1.0
-        if lanes:
-            try:
-                lanes_int = int(lanes)
-                multiplier = LANES_MULTIPLIER.get(lanes_int, min(lanes_int / 2, 2.5))
-            except (ValueError, TypeError):
-                pass
-
-        result = {
-            'light_vehicles': int(base_traffic['light'] * multiplier),
-            'utility_vehicles': int(base_traffic['utility'] * multiplier),
-            'heavy_vehicles': int(base_traffic['heavy'] * multiplier),
-            'source': 'osm_estimation',
-            'road_type': highway_type,
-            'lanes': lanes,
-            'multiplier': multiplier
-        }
-
-        logger.info(f"Trafic estimé (route {highway_type}, {lanes or '?'} voies): "
-                     f"{result['light_vehicles']}/{result['utility_vehicles']}/{result['heavy_vehicles']} veh/h")
-        return result
+        return _traffic_from_roads(roads, source='osm_estimation')
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Erreur Overpass API (trafic): {e}")
@@ -677,6 +1195,35 @@ def calculate_330_rule_metrics(
         yolo_results_dir: Dossier résultats YOLO (optionnel)
         segmentation_results_dir: Dossier résultats segmentation (optionnel)
 
+    Returns:
+        Dict complet avec toutes les métriques
+    """
+    tree_detection = analyze_trees_from_yolo(address, yolo_results_dir)
+    canopy_data = analyze_canopy_from_segmentation(address, segmentation_results_dir)
+    nearest_park = calculate_distance_to_nearest_park(latitude, longitude)
+    return assemble_330_rule_metrics(address, latitude, longitude, tree_detection, canopy_data, nearest_park)
+
+
+def assemble_330_rule_metrics(
+    address: str,
+    latitude: float,
+    longitude: float,
+    tree_detection: Dict[str, int],
+    canopy_data: Dict[str, float],
+    nearest_park: Tuple[float, Optional[str], Optional[float]]
+) -> Dict:
+    """
+    Combine les trois composantes 3-30-300 déjà calculées.
+
+    Permet de lancer YOLO, segmentation et Overpass séparément (voir
+    qev_service.run_qev_stages) puis d'obtenir les mêmes métriques que
+    calculate_330_rule_metrics.
+
+    Args:
+        tree_detection: Résultat de analyze_trees_from_yolo
+        canopy_data: Résultat de analyze_canopy_from_segmentation
+        nearest_park: Résultat de calculate_distance_to_nearest_park
+
     Returns:
         Dict complet avec toutes les métriques
     """
@@ -687,20 +1234,18 @@ def calculate_330_rule_metrics(
     }
 
     # ========== COMPOSANTE 1: VISIBILITÉ (3 arbres) ==========
-    tree_detection = analyze_trees_from_yolo(address, yolo_results_dir)
     metrics['trees_visible_count'] = tree_detection['total_trees']
     metrics['has_minimum_3_trees'] = tree_detection['total_trees'] >= MIN_TREES_VISIBLE
     metrics['visibility_score'] = 1.0 if metrics['has_minimum_3_trees'] else 0.0
 
     # ========== COMPOSANTE 2: CANOPÉE (30%) ==========
-    canopy_data = analyze_canopy_from_segmentation(address, segmentation_results_dir)
     metrics['canopy_coverage_pct'] = canopy_data['canopy_coverage_pct']
     metrics['canopy_area_m2'] = canopy_data['vegetation_area_m2']
     metrics['total_area_analyzed_m2'] = canopy_data['total_area_analyzed_m2']
     metrics['canopy_score'] = min(canopy_data['canopy_coverage_pct'] / TARGET_CANOPY_PCT, 1.0)
 
     # ========== COMPOSANTE 3: ACCESSIBILITÉ (300m) ==========
-    distance_m, park_name, park_area = calculate_distance_to_nearest_park(latitude, longitude)
+    distance_m, park_name, park_area = nearest_park
     metrics['distance_to_nearest_park_m'] = distance_m
     metrics['nearest_park_name'] = park_name
     metrics['nearest_park_area_m2'] = park_area
@@ -749,6 +1294,71 @@ def calculate_green_confidence(metrics: Dict) -> float:
     return confidence
 
 
+# ============================================================
+# EMPREINTE DES ENTRÉES (cache des résultats QeV)
+# ============================================================
+# Overpass n'expose pas de version: sans snapshot local déclaré
+# (OSM_SNAPSHOT_VERSION), la version OSM est une période de
+# OSM_SNAPSHOT_MAX_AGE_DAYS jours, ce qui borne l'âge d'un résultat caché.
+
+OSM_SNAPSHOT_VERSION = os.getenv('OSM_SNAPSHOT_VERSION', '')
+OSM_SNAPSHOT_MAX_AGE_DAYS = int(os.getenv('OSM_SNAPSHOT_MAX_AGE_DAYS', '7'))
+
+
+def osm_snapshot_version() -> str:
+    """Version des données OSM utilisées par le trafic et la distance au parc"""
+    if OSM_SNAPSHOT_VERSION:
+        return OSM_SNAPSHOT_VERSION
+    period = int(time.time() // 86400) // max(1, OSM_SNAPSHOT_MAX_AGE_DAYS)
+    return f"live-{period}"
+
+
+def _normalize_address(address: str) -> str:
+    try:
+        from db_async_wrapper import DatabaseManager
+        return DatabaseManager.sanitize_address(address)
+    except ImportError:
+        normalized = re.sub(r'[^\w\s-]', '', address.lower())
+        return re.sub(r'[\s_-]+', '_', normalized).strip('_')
+
+
+def green_inputs_signature(
+    address: str,
+    yolo_results_dir: Optional[str] = None,
+    segmentation_results_dir: Optional[str] = None
+) -> List[Tuple[str, int, int]]:
+    """
+    Signature des fichiers lus par calculate_330_rule_metrics, sans les lire.
+
+    Les dossiers YOLO sont comptés par image: leur mtime change à chaque
+    ajout/suppression. Les statistics_z*.json sont lus: mtime + taille.
+
+    Returns:
+        Liste triée de (chemin, mtime_ns, taille)
+    """
+    base = Path(__file__).parent / "environment_data"
+    normalized = _normalize_address(address)
+
+    yolo_dirs = ([Path(yolo_results_dir)] if yolo_results_dir is not None
+                 else [base / "yolo_results" / normalized, base / "yolo_results"])
+    seg_dirs = ([Path(segmentation_results_dir)] if segmentation_results_dir is not None
+                else [base / "map_analysis" / normalized, base / "map_analysis"])
+
+    candidates = [d / sub for d in yolo_dirs for sub in ("detection_arbres", "detection_général")]
+    for seg_dir in seg_dirs:
+        if seg_dir.is_dir():
+            candidates.extend(seg_dir.glob("statistics_z*.json"))
+
+    signature = []
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return sorted(signature)
+
+
 # ============================================================
 # EXPORT
 # ============================================================
@@ -758,8 +1368,16 @@ __all__ = [
     'analyze_canopy_from_segmentation',
     'calculate_distance_to_nearest_park',
     'calculate_330_rule_metrics',
+    'assemble_330_rule_metrics',
     'estimate_traffic_from_osm',
     'query_osm_green_spaces',
+    'build_neighbourhood_query',
+    'ROAD_HIGHWAY_TYPES',
+    'osm_snapshot_version',
+    'green_inputs_signature',
+    'RateLimiter',
+    'set_overpass_rate_limit',
+    'OverpassServerStats',
     'MIN_TREES_VISIBLE',
     'TARGET_CANOPY_PCT',
     'MAX_PARK_DISTANCE_M'
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+============================================================
+INDEX OSM LOCAL (PostGIS)
+============================================================
+Parc et route les plus proches d'un point, lus en KNN GIST dans
+les tables chargées par import_osm_extract.py
+(prisma/osm_local_index_migration.sql).
+
+Les fonctions retournent None quand le point n'est couvert par
+aucun extrait importé: l'appelant (green_space_analyzer.py)
+interroge alors Overpass.
+
+Appelées depuis les threads des étapes QeV (run_qev_stages):
+connexions psycopg2 synchrones d'un pool partagé, sans event loop.
+============================================================
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 = index local désactivé (Overpass uniquement)
+OSM_LOCAL_INDEX_ENABLED = os.getenv('OSM_LOCAL_INDEX', '1') != '0'
+OSM_LOCAL_POOL_MAX = int(os.getenv('OSM_LOCAL_POOL_MAX', '8'))
+
+# Après une erreur (base injoignable, tables absentes): Overpass seul pendant ce délai
+OSM_LOCAL_RETRY_S = 60
+
+# Candidats KNN relus puis reclassés en distance géodésique (<-> est en degrés)
+KNN_CANDIDATES = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+# ============================================================
+# CONNEXIONS
+# ============================================================
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from psycopg2.pool import ThreadedConnectionPool
+            from db_utils_postgres import asyncpg_dsn
+
+            # asyncpg_dsn retire les paramètres propres à Prisma: URL libpq valide
+            _pool = ThreadedConnectionPool(1, OSM_LOCAL_POOL_MAX, dsn=asyncpg_dsn())
+            logger.info("✅ Index OSM local: pool psycopg2 connecté")
+        return _pool
+
+
+@contextmanager
+def _cursor():
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        pool.putconn(conn)
+
+
+def _query(sql: str, params: Dict) -> Optional[List[tuple]]:
+    """Exécute une requête de l'index local, None si l'index est indisponible"""
+    global _unavailable_until
+
+    if not OSM_LOCAL_INDEX_ENABLED or time.time() < _unavailable_until:
+        return None
+    try:
+        with _cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+    except Exception as e:
+        _unavailable_until = time.time() + OSM_LOCAL_RETRY_S
+        logger.warning(f"⚠️ Index OSM local indisponible ({e}), Overpass pendant {OSM_LOCAL_RETRY_S}s")
+        return None
+
+
+def close_pool():
+    """Ferme les connexions de l'index local"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# ============================================================
+# REQUÊTES KNN
+# ============================================================
+# La première ligne porte la couverture (covered); les candidats KNN
+# suivent via LEFT JOIN LATERAL, donc une ligne même sans résultat.
+
+_POINT_CTE = '''
+    WITH pt AS (SELECT ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326) AS g),
+    cov AS (
+        SELECT EXISTS (SELECT 1 FROM osm_extracts e, pt WHERE ST_Covers(e.coverage, pt.g)) AS covered
+    )
+'''
+
+NEAREST_GREEN_SPACES_SQL = _POINT_CTE + '''
+    SELECT cov.covered, k.osm_id, k.name, k.green_space_type, k.area,
+           k.lat, k.lon, k.distance_m
+    FROM cov
+    LEFT JOIN LATERAL (
+        SELECT s.osm_id, s.name, s.green_space_type, s.area,
+               ST_Y(ST_PointOnSurface(s.geom)) AS lat, ST_X(ST_PointOnSurface(s.geom)) AS lon,
+               ST_Distance(s.geom::geography, pt.g::geography) AS distance_m
+        FROM green_spaces s, pt
+        WHERE cov.covered AND s.osm_id IS NOT NULL
+        ORDER BY s.geom <-> pt.g
+        LIMIT %(k)s
+    ) k ON TRUE
+'''
+
+NEAREST_ROADS_SQL = _POINT_CTE + '''
+    SELECT cov.covered, k.osm_id, k.highway, k.name, k.lanes, k.maxspeed, k.distance_m
+    FROM cov
+    LEFT JOIN LATERAL (
+        SELECT r.osm_id, r.highway, r.name, r.lanes, r.maxspeed,
+               ST_Distance(r.geom::geography, pt.g::geography) AS distance_m
+        FROM osm_roads r, pt
+        WHERE cov.covered
+        ORDER BY r.geom <-> pt.g
+        LIMIT %(k)s
+    ) k ON TRUE
+'''
+
+
+def nearest_green_spaces(latitude: float, longitude: float, radius_m: float = 2000,
+                         limit: int = KNN_CANDIDATES) -> Optional[List[Dict]]:
+    """
+    Espaces verts les plus proches (distance au bord du polygone, 0 à l'intérieur)
+
+    Returns:
+        Liste triée par distance (format query_osm_green_spaces, + area_m2),
+        vide si aucun dans le rayon; None si le point est hors couverture locale
+    """
+    rows = _query(NEAREST_GREEN_SPACES_SQL, {'lat': latitude, 'lon': longitude, 'k': limit})
+    if not rows or not rows[0][0]:
+        return None
+
+    green_spaces = [
+        {
+            'name': name or green_space_type,
+            'latitude': lat,
+            'longitude': lon,
+            'distance_m': distance_m,
+            'type': green_space_type,
+            'osm_id': osm_id,
+            'area_m2': area,
+        }
+        for _, osm_id, name, green_space_type, area, lat, lon, distance_m in rows
+        if osm_id is not None and distance_m <= radius_m
+    ]
+    green_spaces.sort(key=lambda x: x['distance_m'])
+    return green_spaces
+
+
+def nearest_roads(latitude: float, longitude: float, radius_m: float = 800,
+                  limit: int = KNN_CANDIDATES) -> Optional[List[Dict]]:
+    """
+    Routes (highway=*) les plus proches, avec leurs tags
+
+    Returns:
+        Liste triée par distance ({'osm_id', 'distance_m', 'tags'}), vide si
+        aucune dans le rayon; None si le point est hors couverture locale
+    """
+    rows = _query(NEAREST_ROADS_SQL, {'lat': latitude, 'lon': longitude, 'k': limit})
+    if not rows or not rows[0][0]:
+        return None
+
+    roads = []
+    for _, osm_id, highway, name, lanes, maxspeed, distance_m in rows:
+        if osm_id is None or distance_m > radius_m:
+            continue
+        tags = {'highway': highway, 'name': name, 'lanes': lanes, 'maxspeed': maxspeed}
+        roads.append({
+            'osm_id': osm_id,
+            'distance_m': distance_m,
+            'tags': {key: value for key, value in tags.items() if value is not None},
+        })
+    roads.sort(key=lambda x: x['distance_m'])
+    return roads
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+
+__all__ = [
+    'nearest_green_spaces',
+    'nearest_roads',
+    'close_pool',
+    'OSM_LOCAL_INDEX_ENABLED',
+]
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+============================================================
+CACHE OVERPASS PARTAGÉ + CIRCUIT BREAKER INTER-PROCESS
+============================================================
+Réponses Overpass et état du circuit breaker partagés par tous
+les process (workers Streamlit, batch_qev.py):
+
+- Redis (REDIS_HOST...) si joignable, sinon SQLite sur disque
+  (environment_data/overpass_cache.sqlite), sinon mémoire du process
+- Clé = requête normalisée (espaces) + coordonnées 'around:'
+  quantifiées: les adresses d'un même voisinage partagent la réponse
+  (les distances restent calculées depuis le point exact)
+- TTL (OVERPASS_CACHE_TTL_S) et nombre d'entrées borné
+  (OVERPASS_CACHE_MAX_ENTRIES, éviction des moins récemment lues)
+- Breaker: ouvert par le premier process qui épuise les serveurs;
+  à l'échéance, un seul process sonde Overpass (verrou de sonde),
+  les autres échouent immédiatement jusqu'à sa réponse
+============================================================
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# auto = Redis, sinon disque; redis | disk | memory
+OVERPASS_CACHE_BACKEND = os.getenv('OVERPASS_CACHE_BACKEND', 'auto')
+OVERPASS_CACHE_PATH = os.getenv(
+    'OVERPASS_CACHE_PATH', str(Path(__file__).parent / 'environment_data' / 'overpass_cache.sqlite')
+)
+OVERPASS_CACHE_TTL_S = int(os.getenv('OVERPASS_CACHE_TTL_S', str(7 * 86400)))
+OVERPASS_CACHE_MAX_ENTRIES = int(os.getenv('OVERPASS_CACHE_MAX_ENTRIES', '20000'))
+
+# Pas de quantification des coordonnées des filtres 'around:' (~55m en latitude)
+OVERPASS_CACHE_GRID_DEG = float(os.getenv('OVERPASS_CACHE_GRID_DEG', '0.0005'))
+
+REDIS_KEY_PREFIX = 'overpass:'
+
+_AROUND_RE = re.compile(r'around:(\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)')
+
+
+def _quantize(match: re.Match) -> str:
+    radius, lat, lon = match.group(1), float(match.group(2)), float(match.group(3))
+    grid = OVERPASS_CACHE_GRID_DEG
+    if grid > 0:
+        lat, lon = round(lat / grid) * grid, round(lon / grid) * grid
+    return f"around:{radius},{lat:.6f},{lon:.6f}"
+
+
+def cache_key(query: str) -> str:
+    """Clé de cache d'une requête Overpass (normalisée, coordonnées quantifiées)"""
+    normalized = ' '.join(query.split())
+    normalized = _AROUND_RE.sub(_quantize, normalized)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _encode(data: dict) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+# Interface commune:
+#   get(key) / put(key, data)          réponses Overpass
+#   breaker_open_until()               None si fermé, sinon échéance (epoch)
+#   open_breaker(until) / close_breaker()
+#   acquire_probe(ttl_s)               True pour un seul process à la fois
+
+class MemoryOverpassStore:
+    """Cache et breaker propres au process (repli sans Redis ni disque)"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = OVERPASS_CACHE_MAX_ENTRIES, ttl_s: int = OVERPASS_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._breaker_until: Optional[float] = None
+        self._probe_until = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return _decode(blob)
+
+    def put(self, key: str, data: dict):
+        blob = _encode(data)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_s, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def breaker_open_until(self) -> Optional[float]:
+        return self._breaker_until
+
+    def open_breaker(self, until: float):
+        self._breaker_until = until
+
+    def close_breaker(self):
+        self._breaker_until = None
+
+    def acquire_probe(self, ttl_s: float) -> bool:
+        with self._lock:
+            now = time.time()
+            if now < self._probe_until:
+                return False
+            self._probe_until = now + ttl_s
+            return True
+
+
+class SQLiteOverpassStore:
+    """Cache et breaker dans un fichier SQLite (WAL) partagé par les process de la machine"""
+
+    name = 'disk'
+
+    def __init__(self, path: str = OVERPASS_CACHE_PATH, max_entries: int = OVERPASS_CACHE_MAX_ENTRIES,
+                 ttl_s: int = OVERPASS_CACHE_TTL_S):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._puts = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at);
+            CREATE TABLE IF NOT EXISTS state (
+                name TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            );
+        ''')
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT data FROM responses WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        return _decode(row[0])
+
+    def put(self, key: str, data: dict):
+        blob = _encode(data)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, data, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, blob, now + self.ttl_s, now)
+            )
+            # Éviction amortie: entrées expirées puis moins récemment lues au-delà de la borne
+            self._puts += 1
+            if self._puts % 100 == 1:
+                self.conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+                self.conn.execute('''
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_entries,))
+
+    def breaker_open_until(self) -> Optional[float]:
+        with self._lock:
+            row = self.conn.execute("SELECT until FROM state WHERE name = 'breaker'").fetchone()
+        return row[0] if row else None
+
+    def open_breaker(self, until: float):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO state (name, until) VALUES ('breaker', ?)", (until,))
+
+    def close_breaker(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM state WHERE name IN ('breaker', 'probe')")
+
+    def acquire_probe(self, ttl_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            # Transaction d'écriture: un seul process obtient la sonde
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute("SELECT until FROM state WHERE name = 'probe'").fetchone()
+                acquired = row is None or row[0] <= now
+                if acquired:
+                    self.conn.execute("INSERT OR REPLACE INTO state (name, until) VALUES ('probe', ?)",
+                                      (now + ttl_s,))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return acquired
+
+
+class RedisOverpassStore:
+    """Cache et breaker dans Redis, partagés par toutes les machines"""
+
+    name = 'redis'
+
+    def __init__(self, max_entries: int = OVERPASS_CACHE_MAX_ENTRIES, ttl_s: int = OVERPASS_CACHE_TTL_S):
+        import redis
+
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._puts = 0
+
+        redis_pass = os.getenv('REDIS_PASSWORD')
+        redis_config = {
+            'host': os.getenv('REDIS_HOST', 'localhost'),
+            'port': int(os.getenv('REDIS_PORT', 6379)),
+            'db': int(os.getenv('REDIS_DB', 0)),
+            'socket_connect_timeout': 2,
+            'socket_timeout': 2
+        }
+        if redis_pass and redis_pass.strip():
+            redis_config['password'] = redis_pass
+
+        self.client = redis.Redis(**redis_config)
+        self.client.ping()
+
+    def _key(self, name: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{name}"
+
+    def get(self, key: str) -> Optional[dict]:
+        blob = self.client.get(self._key(f"r:{key}"))
+        if blob is None:
+            return None
+        self.client.zadd(self._key('index'), {key: time.time()})
+        return _decode(blob)
+
+    def put(self, key: str, data: dict):
+        pipe = self.client.pipeline()
+        pipe.setex(self._key(f"r:{key}"), self.ttl_s, _encode(data))
+        pipe.zadd(self._key('index'), {key: time.time()})
+        pipe.execute()
+
+        # Éviction amortie des moins récemment lues au-delà de la borne
+        self._puts += 1
+        if self._puts % 100 == 1:
+            excess = self.client.zcard(self._key('index')) - self.max_entries
+            if excess > 0:
+                evicted = self.client.zrange(self._key('index'), 0, excess - 1)
+                pipe = self.client.pipeline()
+                pipe.delete(*[self._key(f"r:{k.decode()}") for k in evicted])
+                pipe.zrem(self._key('index'), *evicted)
+                pipe.execute()
+
+    def breaker_open_until(self) -> Optional[float]:
+        value = self.client.get(self._key('breaker'))
+        return float(value) if value is not None else None
+
+    def open_breaker(self, until: float):
+        self.client.set(self._key('breaker'), until)
+
+    def close_breaker(self):
+        self.client.delete(self._key('breaker'), self._key('probe'))
+
+    def acquire_probe(self, ttl_s: float) -> bool:
+        return bool(self.client.set(self._key('probe'), 1, nx=True, px=int(ttl_s * 1000)))
+
+
+# ============================================================
+# STORE DU PROCESS
+# ============================================================
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_overpass_store():
+    """Store partagé (créé au premier appel: Redis, disque ou mémoire selon OVERPASS_CACHE_BACKEND)"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            return _store
+
+        backends = {
+            'auto': [RedisOverpassStore, SQLiteOverpassStore],
+            'redis': [RedisOverpassStore],
+            'disk': [SQLiteOverpassStore],
+        }.get(OVERPASS_CACHE_BACKEND, [])
+        for backend in backends:
+            try:
+                _store = backend()
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Cache Overpass {backend.name} indisponible: {e}")
+        if _store is None:
+            _store = MemoryOverpassStore()
+        logger.info(f"✅ Cache Overpass: {_store.name}")
+        return _store
+
+
+def reset_overpass_store(store=None):
+    """Remplace le store du process (None: recréé au prochain appel)"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+
+__all__ = [
+    'cache_key',
+    'get_overpass_store',
+    'reset_overpass_store',
+    'MemoryOverpassStore',
+    'SQLiteOverpassStore',
+    'RedisOverpassStore',
+    'OVERPASS_CACHE_TTL_S',
+    'OVERPASS_CACHE_MAX_ENTRIES',
+]
@@ -14,6 +14,8 @@ from dataclasses import dataclass, asdict
 from datetime import datetime
 import math
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -478,6 +480,351 @@ def calculate_confidence_level(
     return calculate_data_completeness(air_data, traffic_data, green_data)
 
 
+# ============================================================
+# CALCUL VECTORISÉ (LOTS D'ADRESSES / CELLULES DE GRILLE)
+# ============================================================
+# Même arithmétique que le chemin scalaire, opération par opération et
+# dans le même ordre, sur des tableaux float64: les résultats sont
+# identiques au bit près à calculate_qev appelé adresse par adresse.
+#
+# Convention: NaN dans un tableau de polluant ≙ None dans AirQualityData
+# (polluant absent, exclu du maximum et de la complétude).
+
+QEV_CATEGORIES = np.array(["Très mauvais", "Médiocre", "Modéré", "Bon", "Excellent"], dtype=object)
+QEV_CATEGORY_THRESHOLDS = (0.2, 0.4, 0.6, 0.8)
+
+# Polluant (clé sous-indice) → table BelAQI
+BATCH_POLLUTANTS = {'no2': 'NO2', 'pm25': 'PM25', 'pm10': 'PM10', 'o3': 'O3', 'so2': 'SO2'}
+
+
+def _breakpoint_arrays(breakpoints: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(bornes basses, bornes hautes, index) d'une table BelAQI"""
+    lows = np.array([low for low, _, _ in breakpoints], dtype=np.float64)
+    highs = np.array([high for _, high, _ in breakpoints], dtype=np.float64)
+    indices = np.array([index for _, _, index in breakpoints], dtype=np.float64)
+    return lows, highs, indices
+
+
+def interpolate_to_index_batch(concentrations: np.ndarray, breakpoints: list) -> np.ndarray:
+    """
+    Version vectorisée de interpolate_to_index (np.searchsorted).
+
+    Reproduit les cas limites du scalaire: NaN → 1.0, concentration
+    négative ou dans la dernière tranche (borne haute infinie) → 10.0.
+    """
+    lows, highs, indices = _breakpoint_arrays(breakpoints)
+    c = np.asarray(concentrations, dtype=np.float64)
+
+    # Tranche telle que low <= c < high (tranches contiguës triées)
+    slot = np.searchsorted(lows, c, side='right') - 1
+    in_range = (slot >= 0) & ~np.isinf(highs[np.clip(slot, 0, None)])
+    k = np.clip(slot, 0, len(lows) - 1)
+
+    with np.errstate(invalid='ignore'):
+        fraction = (c - lows[k]) / (highs[k] - lows[k])
+        interpolated = (indices[k] - 1) + fraction
+
+    result = np.where(in_range, interpolated, 10.0)
+    return np.where(np.isnan(c), 1.0, result)
+
+
+def normalize_score_batch(values: np.ndarray, min_val: float, max_val: float,
+                          is_negative: bool = False) -> np.ndarray:
+    """Version vectorisée de normalize_score (même clamp, y compris pour NaN)"""
+    values = np.asarray(values, dtype=np.float64)
+    if max_val == min_val:
+        normalized = np.full(values.shape, 0.5)
+    else:
+        normalized = (values - min_val) / (max_val - min_val)
+
+    # max(0.0, min(1.0, x)): NaN → 1.0 comme les builtins Python
+    normalized = np.where(normalized < 1.0, normalized, 1.0)
+    normalized = np.where(normalized > 0.0, normalized, 0.0)
+
+    if is_negative:
+        return 1.0 - normalized
+    return normalized
+
+
+def interpret_qev_score_batch(qev: np.ndarray) -> np.ndarray:
+    """Version vectorisée de interpret_qev_score (NaN → "Très mauvais")"""
+    qev = np.asarray(qev, dtype=np.float64)
+    level = sum((qev >= threshold).astype(np.intp) for threshold in QEV_CATEGORY_THRESHOLDS)
+    return QEV_CATEGORIES[level]
+
+
+@dataclass
+class QeVBatchResult:
+    """Résultats QeV d'un lot (un tableau par champ de QeVResult)"""
+    raw_air_index: np.ndarray
+    raw_air_sub_indices: Dict[str, np.ndarray]   # NaN = polluant absent
+    raw_traffic_nuisance: np.ndarray
+    raw_green_index: np.ndarray
+    normalized_air_score: np.ndarray
+    normalized_traffic_score: np.ndarray
+    normalized_green_score: np.ndarray
+    qev_score: np.ndarray
+    qev_category: np.ndarray
+    weights: Dict[str, float]
+    data_completeness: np.ndarray
+    confidence_level: np.ndarray
+    calculation_timestamp: str
+
+    def __len__(self) -> int:
+        return len(self.qev_score)
+
+    def to_frame(self):
+        """DataFrame une ligne par adresse/cellule"""
+        import pandas as pd
+
+        columns = {
+            'raw_air_index': self.raw_air_index,
+            **{f'sub_index_{name}': values for name, values in self.raw_air_sub_indices.items()},
+            'raw_traffic_nuisance': self.raw_traffic_nuisance,
+            'raw_green_index': self.raw_green_index,
+            'normalized_air_score': self.normalized_air_score,
+            'normalized_traffic_score': self.normalized_traffic_score,
+            'normalized_green_score': self.normalized_green_score,
+            'qev_score': self.qev_score,
+            'qev_category': self.qev_category,
+            'data_completeness': self.data_completeness,
+            'confidence_level': self.confidence_level,
+        }
+        return pd.DataFrame(columns)
+
+
+def calculate_qev_batch(
+    no2=np.nan,
+    pm25=np.nan,
+    pm10=np.nan,
+    o3=np.nan,
+    so2=np.nan,
+    light_vehicles=0,
+    utility_vehicles=0,
+    heavy_vehicles=0,
+    trees_visible=0,
+    canopy_coverage_pct=0.0,
+    distance_to_green_space_m=999.0,
+    custom_weights: Optional[Dict[str, float]] = None,
+    custom_bounds: Optional[Dict[str, Tuple[float, float]]] = None
+) -> QeVBatchResult:
+    """
+    Calcule le score QeV de N adresses (ou cellules) en une passe NumPy.
+
+    Chaque argument est un tableau de longueur N ou un scalaire diffusé;
+    les valeurs par défaut sont celles des dataclasses d'entrée. Un
+    polluant à NaN est traité comme absent (None dans AirQualityData).
+
+    Args:
+        no2, pm25, pm10, o3, so2: Concentrations moyennes (µg/m³)
+        light_vehicles, utility_vehicles, heavy_vehicles: Comptages (véhicules/heure)
+        trees_visible, canopy_coverage_pct, distance_to_green_space_m: Métriques 3-30-300
+        custom_weights: Pondérations personnalisées (optionnel)
+        custom_bounds: Bornes de normalisation personnalisées (optionnel)
+
+    Returns:
+        QeVBatchResult, identique champ par champ à calculate_qev
+    """
+    weights = custom_weights or QEV_WEIGHTS
+    bounds = custom_bounds or NORMALIZATION_BOUNDS
+
+    arrays = np.broadcast_arrays(*(np.atleast_1d(np.asarray(values, dtype=np.float64)) for values in (
+        no2, pm25, pm10, o3, so2,
+        light_vehicles, utility_vehicles, heavy_vehicles,
+        trees_visible, canopy_coverage_pct, distance_to_green_space_m
+    )))
+    pollutants = dict(zip(BATCH_POLLUTANTS, arrays[:5]))
+    light, utility, heavy, trees, canopy, distance = arrays[5:]
+
+    # ========== AIR (BelAQI, facteur limitant) ==========
+    sub_indices = {}
+    global_index = np.full(light.shape, -np.inf)
+    present_count = np.zeros(light.shape, dtype=np.intp)
+    for name, table in BATCH_POLLUTANTS.items():
+        present = ~np.isnan(pollutants[name])
+        sub = np.where(present, interpolate_to_index_batch(pollutants[name], BELAQI_BREAKPOINTS[table]), np.nan)
+        sub_indices[name] = sub
+        global_index = np.where(present, np.maximum(global_index, sub), global_index)
+        present_count += present
+    raw_air_index = np.where(present_count > 0, global_index, 1.0)
+
+    # ========== TRAFIC (EMEP/EEA) ==========
+    raw_traffic = (
+        light * TRAFFIC_WEIGHTS['light'] +
+        utility * TRAFFIC_WEIGHTS['utility'] +
+        heavy * TRAFFIC_WEIGHTS['heavy']
+    )
+
+    # ========== VÉGÉTATION (3-30-300) ==========
+    score_visibility = np.where(trees >= 3, 1.0, 0.0)
+    score_canopy = canopy / 30.0
+    score_canopy = np.where(np.isnan(score_canopy) | (score_canopy <= 1.0), score_canopy, 1.0)
+    score_distance = np.where(distance <= 300, 1.0, 0.0)
+    raw_green = (score_visibility + score_canopy + score_distance) / 3.0
+
+    # ========== NORMALISATION + AGRÉGATION ==========
+    s_air = normalize_score_batch(raw_air_index, bounds['air_index'][0], bounds['air_index'][1], is_negative=True)
+    s_traffic = normalize_score_batch(raw_traffic, bounds['traffic_nuisance'][0], bounds['traffic_nuisance'][1],
+                                      is_negative=True)
+    s_green = raw_green
+
+    qev_score = (
+        weights['air'] * s_air +
+        weights['traffic'] * s_traffic +
+        weights['green'] * s_green
+    )
+
+    # ========== COMPLÉTUDE (5 polluants + 3 trafic + 3 verdure) ==========
+    available = (
+        present_count +
+        (light > 0).astype(np.intp) + (utility > 0) + (heavy > 0) +
+        (trees != 999.0) + (canopy != 999.0) + (distance != 999.0)
+    )
+    completeness = available / 11
+
+    return QeVBatchResult(
+        raw_air_index=raw_air_index,
+        raw_air_sub_indices=sub_indices,
+        raw_traffic_nuisance=raw_traffic,
+        raw_green_index=raw_green,
+        normalized_air_score=s_air,
+        normalized_traffic_score=s_traffic,
+        normalized_green_score=s_green,
+        qev_score=qev_score,
+        qev_category=interpret_qev_score_batch(qev_score),
+        weights=weights,
+        data_completeness=completeness,
+        confidence_level=completeness.copy(),
+        calculation_timestamp=datetime.now().isoformat()
+    )
+
+
+# ============================================================
+# RE-PONDÉRATION (WHAT-IF) DEPUIS LES SOUS-INDICES BRUTS
+# ============================================================
+# Les sous-indices bruts (I_Air et ses composantes, I_Trafic, I_Vert) ne
+# dépendent ni des pondérations ni des bornes: une fois calculés, changer
+# l'une ou l'autre ne touche que la normalisation et la somme pondérée.
+# QeVSubIndices garde ces tableaux en mémoire et rescore() recalcule
+# scores normalisés, QeV et catégorie pour N adresses sans aucune I/O,
+# avec la même arithmétique que calculate_qev / calculate_qev_batch.
+
+@dataclass
+class QeVSubIndices:
+    """Sous-indices bruts de N adresses (entrée de rescore)"""
+    raw_air_index: np.ndarray
+    raw_traffic_nuisance: np.ndarray
+    raw_green_index: np.ndarray
+    raw_air_sub_indices: Dict[str, np.ndarray]   # NaN = polluant absent
+    labels: Optional[np.ndarray] = None          # Adresses (ordre des tableaux)
+
+    def __len__(self) -> int:
+        return len(self.raw_air_index)
+
+    @classmethod
+    def from_results(cls, results: Dict[str, Dict]) -> 'QeVSubIndices':
+        """Depuis des résultats QeVService ({adresse: résultat}, clé 'sub_indices')"""
+        labels = list(results)
+        subs = [results[label]['sub_indices'] for label in labels]
+        column = lambda key: np.array([s.get(key, np.nan) for s in subs], dtype=np.float64).reshape(-1)
+        details = [s.get('I_Air_details') or {} for s in subs]
+        return cls(
+            raw_air_index=column('I_Air'),
+            raw_traffic_nuisance=column('I_Trafic'),
+            raw_green_index=column('I_Vert'),
+            raw_air_sub_indices={
+                name: np.array([d.get(name, np.nan) for d in details], dtype=np.float64).reshape(-1)
+                for name in BATCH_POLLUTANTS
+            },
+            labels=np.array(labels, dtype=object)
+        )
+
+    @classmethod
+    def from_frame(cls, df, label_column: str = 'address') -> 'QeVSubIndices':
+        """Depuis un DataFrame raw_air_index / sub_index_<polluant> / raw_traffic_nuisance / raw_green_index"""
+        column = lambda name: (df[name].to_numpy(dtype=np.float64) if name in df
+                               else np.full(len(df), np.nan))
+        return cls(
+            raw_air_index=column('raw_air_index'),
+            raw_traffic_nuisance=column('raw_traffic_nuisance'),
+            raw_green_index=column('raw_green_index'),
+            raw_air_sub_indices={name: column(f'sub_index_{name}') for name in BATCH_POLLUTANTS},
+            labels=df[label_column].to_numpy(dtype=object) if label_column in df else None
+        )
+
+    @classmethod
+    def from_batch(cls, batch: QeVBatchResult, labels=None) -> 'QeVSubIndices':
+        """Depuis un QeVBatchResult (calculate_qev_batch)"""
+        return cls(
+            raw_air_index=batch.raw_air_index,
+            raw_traffic_nuisance=batch.raw_traffic_nuisance,
+            raw_green_index=batch.raw_green_index,
+            raw_air_sub_indices=dict(batch.raw_air_sub_indices),
+            labels=None if labels is None else np.asarray(labels, dtype=object)
+        )
+
+    def air_index(self, pollutants=None) -> np.ndarray:
+        """
+        Indice air (méthode du maximum), éventuellement restreint à certains polluants
+
+        Args:
+            pollutants: Clés de BATCH_POLLUTANTS à retenir (None = indice stocké)
+        """
+        if pollutants is None:
+            return self.raw_air_index
+        global_index = np.full(self.raw_air_index.shape, -np.inf)
+        present_count = np.zeros(self.raw_air_index.shape, dtype=np.intp)
+        for name in pollutants:
+            sub = self.raw_air_sub_indices.get(name)
+            if sub is None:
+                continue
+            present = ~np.isnan(sub)
+            global_index = np.where(present, np.maximum(global_index, sub), global_index)
+            present_count += present
+        return np.where(present_count > 0, global_index, 1.0)
+
+    def rescore(
+        self,
+        custom_weights: Optional[Dict[str, float]] = None,
+        custom_bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+        pollutants=None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Scores QeV pour d'autres pondérations / bornes (sans I/O)
+
+        Args:
+            custom_weights: Pondérations air/traffic/green (défaut: QEV_WEIGHTS)
+            custom_bounds: Bornes air_index/traffic_nuisance (défaut: NORMALIZATION_BOUNDS)
+            pollutants: Polluants retenus dans l'indice air (None = tous)
+
+        Returns:
+            dict de tableaux: normalized_air_score, normalized_traffic_score,
+            normalized_green_score, qev_score, qev_category
+        """
+        weights = custom_weights or QEV_WEIGHTS
+        bounds = custom_bounds or NORMALIZATION_BOUNDS
+
+        s_air = normalize_score_batch(self.air_index(pollutants), bounds['air_index'][0], bounds['air_index'][1],
+                                      is_negative=True)
+        s_traffic = normalize_score_batch(self.raw_traffic_nuisance, bounds['traffic_nuisance'][0],
+                                          bounds['traffic_nuisance'][1], is_negative=True)
+        # Végétation: déjà dans [0, 1], non renormalisée (comme calculate_qev)
+        s_green = self.raw_green_index
+
+        qev_score = (
+            weights['air'] * s_air +
+            weights['traffic'] * s_traffic +
+            weights['green'] * s_green
+        )
+        return {
+            'normalized_air_score': s_air,
+            'normalized_traffic_score': s_traffic,
+            'normalized_green_score': s_green,
+            'qev_score': qev_score,
+            'qev_category': interpret_qev_score_batch(qev_score),
+        }
+
+
 # ============================================================
 # EXPORT
 # ============================================================
@@ -488,6 +835,9 @@ __all__ = [
     'GreenSpaceData',
     'QeVResult',
     'calculate_qev',
+    'calculate_qev_batch',
+    'QeVBatchResult',
+    'QeVSubIndices',
     'calculate_air_index',
     'calculate_traffic_index',
     'calculate_green_index',
@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+============================================================
+RASTER QeV PRÉCALCULÉ (ÉCHELLE DE LA VILLE)
+============================================================
+Score QeV sur une grille régulière couvrant une bounding box
+(Bruxelles par défaut), indépendamment des adresses saisies:
+
+1. Entrées locales par adresse connue (rollups air, traffic_records,
+   green_space_metrics, qev_result_cache): aucun appel Overpass
+2. Interpolation IDW vers les centres de cellule + calculate_qev_batch,
+   par bandes de lignes réparties sur un ProcessPoolExecutor
+3. Raster float32 (couches × lignes × colonnes) en memmap .npy,
+   checkpoint après chaque bande (reprise possible)
+4. Tuiles XYZ PNG pré-rendues sous static/qev_tiles, servies telles
+   quelles par Streamlit (server.enableStaticServing): aucune
+   computation par requête
+
+Usage: voir precompute_qev_raster.py
+============================================================
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from qev_calculator import calculate_qev_batch
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+# Région de Bruxelles-Capitale (sud, ouest, nord, est)
+BRUSSELS_BBOX = (50.763, 4.244, 50.914, 4.482)
+DEFAULT_RASTER = 'brussels'
+DEFAULT_CELL_SIZE_M = 100.0
+
+RASTER_DIR = Path(__file__).parent / "environment_data" / "qev_raster"
+TILES_DIR = Path(__file__).parent / "static" / "qev_tiles"
+# URL servie par Streamlit pour app/static (surcharge: CDN, nginx...)
+QEV_TILE_URL_TEMPLATE = os.getenv('QEV_TILE_URL_TEMPLATE', '/app/static/qev_tiles/{name}/{layer}/{z}/{x}/{y}.png')
+
+# Interpolation IDW: rayon d'influence d'une adresse et puissance
+IDW_RADIUS_M = 3000.0
+IDW_POWER = 2.0
+# Cellules × adresses par bande (borne la mémoire des matrices de distances)
+BAND_MAX_PAIRS = 4_000_000
+
+M_PER_DEG_LAT = 111_320.0
+
+# Entrées de calculate_qev_batch interpolées par cellule
+AIR_INPUTS = ('no2', 'pm25', 'pm10', 'o3', 'so2')
+RASTER_INPUTS = AIR_INPUTS + (
+    'light_vehicles', 'utility_vehicles', 'heavy_vehicles',
+    'trees_visible', 'canopy_coverage_pct', 'distance_to_green_space_m',
+)
+# Hors air: valeur des dataclasses d'entrée si aucune adresse dans le rayon
+RASTER_DEFAULTS = {
+    'light_vehicles': 0.0,
+    'utility_vehicles': 0.0,
+    'heavy_vehicles': 0.0,
+    'trees_visible': 0.0,
+    'canopy_coverage_pct': 0.0,
+    'distance_to_green_space_m': 999.0,
+}
+
+# Couche du raster → champ de QeVBatchResult
+RASTER_LAYERS = {
+    'qev': 'qev_score',
+    'air': 'normalized_air_score',
+    'traffic': 'normalized_traffic_score',
+    'green': 'normalized_green_score',
+}
+
+TILE_SIZE = 256
+TILE_OPACITY = 0.6
+TILE_COLORMAP = 'RdYlGn'
+
+
+# ============================================================
+# GRILLE
+# ============================================================
+
+@dataclass(frozen=True)
+class RasterGrid:
+    """Grille régulière en degrés, cellules d'environ cell_size_m de côté"""
+    south: float
+    west: float
+    north: float
+    east: float
+    cell_size_m: float = DEFAULT_CELL_SIZE_M
+
+    @property
+    def lat_step(self) -> float:
+        return self.cell_size_m / M_PER_DEG_LAT
+
+    @property
+    def lon_step(self) -> float:
+        return self.cell_size_m / (M_PER_DEG_LAT * math.cos(math.radians((self.south + self.north) / 2)))
+
+    @property
+    def rows(self) -> int:
+        return max(1, math.ceil((self.north - self.south) / self.lat_step))
+
+    @property
+    def cols(self) -> int:
+        return max(1, math.ceil((self.east - self.west) / self.lon_step))
+
+    def cell_centers(self, row0: int, row1: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(lat, lon) des centres des lignes [row0, row1), aplatis ligne par ligne"""
+        lat = self.north - (np.arange(row0, row1) + 0.5) * self.lat_step
+        lon = self.west + (np.arange(self.cols) + 0.5) * self.lon_step
+        lat_grid, lon_grid = np.meshgrid(lat, lon, indexing='ij')
+        return lat_grid.ravel(), lon_grid.ravel()
+
+
+def idw_weights(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    points_lat: np.ndarray,
+    points_lon: np.ndarray,
+    radius_m: float = IDW_RADIUS_M,
+    power: float = IDW_POWER
+) -> np.ndarray:
+    """
+    Poids IDW (cellules × points), 0 au-delà du rayon
+
+    Ne dépend que des positions: calculés une fois par bande et partagés
+    par toutes les couches (idw_apply).
+    """
+    cos_lat = math.cos(math.radians(float(np.mean(points_lat)))) if len(points_lat) else 1.0
+    dy = (lat[:, None] - points_lat[None, :]) * M_PER_DEG_LAT
+    dx = (lon[:, None] - points_lon[None, :]) * M_PER_DEG_LAT * cos_lat
+    distance = np.hypot(dx, dy)
+
+    # Distance plancher 1 m: une cellule sur une adresse prend sa valeur
+    return np.where(distance <= radius_m, np.maximum(distance, 1.0) ** -power, 0.0)
+
+
+def idw_apply(weights: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Interpolation d'une couche avec des poids idw_weights (points non-NaN seulement)
+
+    Returns:
+        Valeur par cellule, NaN si aucun point connu dans le rayon
+    """
+    known = np.isfinite(values)
+    if not known.any():
+        return np.full(weights.shape[0], np.nan)
+
+    total = weights @ known.astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, weights @ np.where(known, values, 0.0) / total, np.nan)
+
+
+def idw_interpolate(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    points_lat: np.ndarray,
+    points_lon: np.ndarray,
+    values: np.ndarray,
+    radius_m: float = IDW_RADIUS_M,
+    power: float = IDW_POWER
+) -> np.ndarray:
+    """
+    Interpolation par inverse de la distance (points non-NaN seulement).
+
+    Returns:
+        Valeur par cellule, NaN si aucun point dans le rayon
+    """
+    known = np.isfinite(values)
+    if not known.any():
+        return np.full(lat.shape, np.nan)
+    weights = idw_weights(lat, lon, points_lat[known], points_lon[known], radius_m, power)
+    return idw_apply(weights, values[known])
+
+
+# ============================================================
+# ENTRÉES (DONNÉES LOCALES)
+# ============================================================
+
+async def load_raster_inputs(grid: RasterGrid, days: int = 30,
+                             radius_m: float = IDW_RADIUS_M) -> Dict[str, np.ndarray]:
+    """
+    Entrées QeV des adresses connues autour de la grille (une requête asyncpg)
+
+    Air: moyennes des rollups journaliers sur `days` jours. Trafic et
+    verdure: traffic_records / green_space_metrics, à défaut le dernier
+    résultat QeV caché de l'adresse (qev_result_cache).
+
+    Returns:
+        {'lat', 'lon', *RASTER_INPUTS}: tableaux float64 alignés (NaN = inconnu)
+    """
+    from db_utils_postgres import AsyncpgClient
+
+    margin_lat = radius_m / M_PER_DEG_LAT
+    margin_lon = margin_lat / math.cos(math.radians((grid.south + grid.north) / 2))
+
+    pool = await AsyncpgClient.get_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            WITH air AS (
+                SELECT address_id,
+                       SUM(nitrogen_dioxide_sum) / NULLIF(SUM(nitrogen_dioxide_count), 0) AS no2,
+                       SUM(pm2_5_sum) / NULLIF(SUM(pm2_5_count), 0) AS pm25,
+                       SUM(pm10_sum) / NULLIF(SUM(pm10_count), 0) AS pm10,
+                       SUM(ozone_sum) / NULLIF(SUM(ozone_count), 0) AS o3,
+                       SUM(sulfur_dioxide_sum) / NULLIF(SUM(sulfur_dioxide_count), 0) AS so2
+                FROM air_quality_daily_rollups
+                WHERE day >= CURRENT_DATE - $1::integer
+                GROUP BY address_id
+            ),
+            traffic AS (
+                SELECT address_id,
+                       AVG(light_vehicles) AS light_vehicles,
+                       AVG(utility_vehicles) AS utility_vehicles,
+                       AVG(heavy_vehicles) AS heavy_vehicles
+                FROM traffic_records
+                WHERE "timestamp" >= NOW() - make_interval(days => $1::integer)
+                GROUP BY address_id
+            ),
+            green AS (
+                SELECT DISTINCT ON (address_id)
+                       address_id, trees_visible_count, canopy_coverage_pct, distance_to_nearest_park_m
+                FROM green_space_metrics
+                ORDER BY address_id, updated_at DESC
+            )
+            SELECT a.latitude AS lat, a.longitude AS lon,
+                   air.no2, air.pm25, air.pm10, air.o3, air.so2,
+                   COALESCE(t.light_vehicles, (c.result #>> '{raw_indicators,traffic,light_vehicles}')::float) AS light_vehicles,
+                   COALESCE(t.utility_vehicles, (c.result #>> '{raw_indicators,traffic,utility_vehicles}')::float) AS utility_vehicles,
+                   COALESCE(t.heavy_vehicles, (c.result #>> '{raw_indicators,traffic,heavy_vehicles}')::float) AS heavy_vehicles,
+                   COALESCE(g.trees_visible_count, (c.result #>> '{raw_indicators,green,trees_visible_count}')::float) AS trees_visible,
+                   COALESCE(g.canopy_coverage_pct, (c.result #>> '{raw_indicators,green,canopy_coverage_pct}')::float) AS canopy_coverage_pct,
+                   COALESCE(g.distance_to_nearest_park_m, (c.result #>> '{raw_indicators,green,distance_to_nearest_park_m}')::float) AS distance_to_green_space_m
+            FROM addresses a
+            LEFT JOIN air ON air.address_id = a.id
+            LEFT JOIN traffic t ON t.address_id = a.id
+            LEFT JOIN green g ON g.address_id = a.id
+            LEFT JOIN qev_result_cache c ON c.address_id = a.id
+            WHERE a.latitude BETWEEN $2 AND $3 AND a.longitude BETWEEN $4 AND $5
+        ''', days, grid.south - margin_lat, grid.north + margin_lat,
+            grid.west - margin_lon, grid.east + margin_lon)
+
+    points = {
+        name: np.array([np.nan if row[name] is None else float(row[name]) for row in rows], dtype=np.float64)
+        for name in ('lat', 'lon') + RASTER_INPUTS
+    }
+    logger.info(f"📍 {len(rows)} adresse(s) en entrée du raster QeV "
+                f"({int(np.isfinite(points['no2']).sum())} avec NO2)")
+    return points
+
+
+# ============================================================
+# CALCUL PAR BANDES (PROCESSUS)
+# ============================================================
+
+def _score_band(task: Tuple) -> Tuple[int, np.ndarray]:
+    """Worker: interpole et score les lignes [row0, row1) → (row0, couches)"""
+    row0, row1, grid_fields, points, radius_m, power, weights, bounds = task
+    grid = RasterGrid(**grid_fields)
+    lat, lon = grid.cell_centers(row0, row1)
+
+    # Une matrice de poids pour toutes les couches (seules les valeurs changent)
+    idw = idw_weights(lat, lon, points['lat'], points['lon'], radius_m, power)
+    inputs = {}
+    for name in RASTER_INPUTS:
+        values = idw_apply(idw, points[name])
+        if name in RASTER_DEFAULTS:
+            values = np.where(np.isnan(values), RASTER_DEFAULTS[name], values)
+        inputs[name] = values
+
+    result = calculate_qev_batch(**inputs, custom_weights=weights, custom_bounds=bounds)
+
+    # Sans aucun polluant dans le rayon, calculate_qev_batch suppose un air
+    # parfait (indice 1): la cellule est laissée vide
+    no_air = np.logical_and.reduce([np.isnan(inputs[name]) for name in AIR_INPUTS])
+    layers = np.stack([getattr(result, field) for field in RASTER_LAYERS.values()]).astype(np.float32)
+    layers[:, no_air] = np.nan
+    return row0, layers.reshape(len(RASTER_LAYERS), row1 - row0, grid.cols)
+
+
+def _inputs_fingerprint(grid: RasterGrid, points: Dict[str, np.ndarray], band_rows: int,
+                        radius_m: float, power: float, weights, bounds) -> str:
+    digest = hashlib.sha256(json.dumps({
+        'grid': asdict(grid), 'band_rows': band_rows, 'radius_m': radius_m, 'power': power,
+        'weights': weights, 'bounds': bounds,
+    }, sort_keys=True, default=str).encode('utf-8'))
+    for name in ('lat', 'lon') + RASTER_INPUTS:
+        digest.update(np.ascontiguousarray(points[name]).tobytes())
+    return digest.hexdigest()
+
+
+def _raster_paths(name: str) -> Tuple[Path, Path]:
+    directory = RASTER_DIR / name
+    return directory / "qev_raster.npy", directory / "manifest.json"
+
+
+def _write_manifest(path: Path, manifest: Dict) -> None:
+    # Écriture atomique: un arrêt brutal ne laisse jamais un manifest tronqué
+    tmp = path.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, default=str), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def read_manifest(name: str = DEFAULT_RASTER) -> Optional[Dict]:
+    """Manifest du raster (grille, bandes terminées, tuiles) ou None"""
+    _, manifest_path = _raster_paths(name)
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text(encoding='utf-8'))
+
+
+def build_raster(
+    points: Dict[str, np.ndarray],
+    grid: RasterGrid,
+    name: str = DEFAULT_RASTER,
+    workers: Optional[int] = None,
+    radius_m: float = IDW_RADIUS_M,
+    power: float = IDW_POWER,
+    custom_weights: Optional[Dict[str, float]] = None,
+    custom_bounds: Optional[Dict[str, Tuple[float, float]]] = None,
+    resume: bool = True
+) -> Dict:
+    """
+    Calcule le raster QeV sur un pool de processus.
+
+    Chaque bande terminée est écrite dans le memmap, flushée, puis
+    enregistrée dans le manifest: relancé avec les mêmes entrées, le
+    calcul reprend aux bandes manquantes.
+
+    Args:
+        points: Entrées par adresse (load_raster_inputs)
+        grid: Grille à couvrir
+        name: Nom du raster (dossier sous environment_data/qev_raster)
+        workers: Nombre de processus (défaut: nombre de CPU)
+        resume: False pour recalculer depuis zéro
+
+    Returns:
+        Manifest final
+    """
+    raster_path, manifest_path = _raster_paths(name)
+    raster_path.parent.mkdir(parents=True, exist_ok=True)
+
+    n_points = max(1, len(points['lat']))
+    band_rows = max(1, min(grid.rows, BAND_MAX_PAIRS // (grid.cols * n_points)))
+    fingerprint = _inputs_fingerprint(grid, points, band_rows, radius_m, power, custom_weights, custom_bounds)
+    shape = (len(RASTER_LAYERS), grid.rows, grid.cols)
+
+    manifest = read_manifest(name) if resume else None
+    if manifest and manifest.get('fingerprint') == fingerprint and raster_path.exists():
+        raster = np.load(raster_path, mmap_mode='r+')
+        done = set(manifest['done'])
+        logger.info(f"♻️ Reprise du raster '{name}': {len(done)} bande(s) déjà calculée(s)")
+    else:
+        raster = np.lib.format.open_memmap(raster_path, mode='w+', dtype=np.float32, shape=shape)
+        raster[:] = np.nan
+        raster.flush()
+        done = set()
+        manifest = {
+            'name': name,
+            'fingerprint': fingerprint,
+            'grid': asdict(grid),
+            'rows': grid.rows,
+            'cols': grid.cols,
+            'layers': list(RASTER_LAYERS),
+            'band_rows': band_rows,
+            'points': len(points['lat']),
+            'radius_m': radius_m,
+            'started_at': datetime.now().isoformat(),
+            'completed_at': None,
+            'done': [],
+        }
+        _write_manifest(manifest_path, manifest)
+
+    pending = [(row0, min(row0 + band_rows, grid.rows))
+               for row0 in range(0, grid.rows, band_rows) if row0 not in done]
+    logger.info(f"🧮 Raster '{name}': {grid.rows}×{grid.cols} cellules de {grid.cell_size_m:.0f} m, "
+                f"{len(pending)} bande(s) de {band_rows} ligne(s) à calculer")
+
+    grid_fields = asdict(grid)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_score_band, (row0, row1, grid_fields, points, radius_m, power,
+                                          custom_weights, custom_bounds))
+            for row0, row1 in pending
+        ]
+        for future in as_completed(futures):
+            row0, layers = future.result()
+            raster[:, row0:row0 + layers.shape[1], :] = layers
+            raster.flush()
+            done.add(row0)
+            manifest['done'] = sorted(done)
+            _write_manifest(manifest_path, manifest)
+            logger.info(f"   ✅ Bande {len(done)}/{math.ceil(grid.rows / band_rows)} (lignes {row0}+)")
+
+    manifest['completed_at'] = datetime.now().isoformat()
+    _write_manifest(manifest_path, manifest)
+    del raster
+    return manifest
+
+
+def load_raster(name: str = DEFAULT_RASTER) -> Tuple[np.ndarray, Dict]:
+    """Raster en lecture seule (memmap) et son manifest"""
+    raster_path, _ = _raster_paths(name)
+    manifest = read_manifest(name)
+    if manifest is None or not raster_path.exists():
+        raise FileNotFoundError(f"Raster QeV '{name}' absent: lancer precompute_qev_raster.py build")
+    return np.load(raster_path, mmap_mode='r'), manifest
+
+
+# ============================================================
+# TUILES XYZ (PNG PRÉ-RENDUES)
+# ============================================================
+
+def _tile_range(grid: RasterGrid, zoom: int) -> Tuple[range, range]:
+    """Tuiles Web Mercator (x, y) couvrant la grille à ce zoom"""
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(n - 1, int((lon + 180.0) / 360.0 * n))
+
+    def tile_y(lat):
+        lat_rad = math.radians(lat)
+        return min(n - 1, int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n))
+
+    return range(tile_x(grid.west), tile_x(grid.east) + 1), range(tile_y(grid.north), tile_y(grid.south) + 1)
+
+
+def _render_tile_column(task: Tuple) -> int:
+    """Worker: rend les tuiles d'une colonne x pour une couche → nombre de tuiles écrites"""
+    from matplotlib import colormaps
+    from matplotlib.image import imsave
+
+    raster_path, layer_index, grid_fields, zoom, x, ys, out_dir = task
+    grid = RasterGrid(**grid_fields)
+    layer = np.load(raster_path, mmap_mode='r')[layer_index]
+    cmap = colormaps[TILE_COLORMAP]
+    n = 2 ** zoom
+
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lon = (x + offsets) / n * 360.0 - 180.0
+    cols = np.floor((lon - grid.west) / grid.lon_step).astype(np.int64)[None, :]
+
+    written = 0
+    for y in ys:
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (y + offsets) / n))))
+        rows = np.floor((grid.north - lat) / grid.lat_step).astype(np.int64)[:, None]
+        inside = (rows >= 0) & (rows < grid.rows) & (cols >= 0) & (cols < grid.cols)
+        if not inside.any():
+            continue
+
+        values = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+        row_idx, col_idx = np.broadcast_arrays(rows, cols)
+        values[inside] = layer[row_idx[inside], col_idx[inside]]
+        empty = np.isnan(values)
+        if empty.all():
+            continue
+
+        rgba = cmap(np.clip(np.nan_to_num(values), 0.0, 1.0))
+        rgba[..., 3] = np.where(empty, 0.0, TILE_OPACITY)
+        tile_path = Path(out_dir) / str(zoom) / str(x) / f"{y}.png"
+        tile_path.parent.mkdir(parents=True, exist_ok=True)
+        imsave(tile_path, rgba)
+        written += 1
+    return written
+
+
+def render_tiles(
+    name: str = DEFAULT_RASTER,
+    layers: Sequence[str] = ('qev',),
+    zooms: Sequence[int] = range(11, 16),
+    workers: Optional[int] = None
+) -> int:
+    """
+    Pré-rend les tuiles XYZ des couches demandées sous static/qev_tiles/<name>/<couche>.
+
+    Returns:
+        Nombre de tuiles écrites
+    """
+    raster_path, manifest_path = _raster_paths(name)
+    _, manifest = load_raster(name)
+    grid = RasterGrid(**manifest['grid'])
+
+    tasks = []
+    for layer in layers:
+        layer_index = manifest['layers'].index(layer)
+        out_dir = TILES_DIR / name / layer
+        for zoom in zooms:
+            xs, ys = _tile_range(grid, zoom)
+            tasks.extend((str(raster_path), layer_index, manifest['grid'], zoom, x, list(ys), str(out_dir))
+                         for x in xs)
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for count in executor.map(_render_tile_column, tasks):
+            written += count
+
+    manifest['tiles'] = {
+        'layers': list(layers),
+        'min_zoom': min(zooms),
+        'max_zoom': max(zooms),
+        'count': written,
+        'rendered_at': datetime.now().isoformat(),
+    }
+    _write_manifest(manifest_path, manifest)
+    logger.info(f"🗺️ {written} tuile(s) QeV écrite(s) sous {TILES_DIR / name}")
+    return written
+
+
+# ============================================================
+# COUCHE FOLIUM
+# ============================================================
+
+def qev_tile_url(layer: str = 'qev', name: str = DEFAULT_RASTER, local: bool = False) -> Optional[str]:
+    """
+    Gabarit d'URL {z}/{x}/{y} des tuiles pré-rendues, None si absentes
+
+    Args:
+        local: URL file:// (cartes HTML ouvertes hors de Streamlit)
+    """
+    tiles_dir = TILES_DIR / name / layer
+    if not tiles_dir.is_dir():
+        return None
+    if local:
+        return tiles_dir.resolve().as_uri() + '/{z}/{x}/{y}.png'
+    return QEV_TILE_URL_TEMPLATE.replace('{name}', name).replace('{layer}', layer)
+
+
+def add_qev_heatmap_layer(m, layer: str = 'qev', name: str = DEFAULT_RASTER,
+                          local: bool = False, show: bool = False) -> bool:
+    """
+    Ajoute la couche de tuiles QeV à une carte Folium (désactivée par défaut)
+
+    Returns:
+        True si la couche a été ajoutée (tuiles disponibles)
+    """
+    import folium
+
+    url = qev_tile_url(layer, name, local=local)
+    manifest = read_manifest(name) if url else None
+    if not manifest or 'tiles' not in manifest:
+        return False
+
+    folium.TileLayer(
+        tiles=url,
+        attr='QeV précalculé',
+        name=f"🌿 Carte QeV ({layer})",
+        overlay=True,
+        control=True,
+        show=show,
+        min_zoom=manifest['tiles']['min_zoom'],
+        max_native_zoom=manifest['tiles']['max_zoom'],
+    ).add_to(m)
+    return True
+
+
+# ============================================================
+# EXPORT
+# ============================================================
+
+__all__ = [
+    'RasterGrid',
+    'BRUSSELS_BBOX',
+    'RASTER_LAYERS',
+    'idw_weights',
+    'idw_apply',
+    'idw_interpolate',
+    'load_raster_inputs',
+    'build_raster',
+    'load_raster',
+    'read_manifest',
+    'render_tiles',
+    'qev_tile_url',
+    'add_qev_heatmap_layer',
+]
@@ -7,8 +7,14 @@ Couche d'intégration entre calculateur QeV et base de données
 ============================================================
 """
 
+import hashlib
+import json
 import logging
-from typing import Dict, Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
 from datetime import datetime
 import pandas as pd
 
@@ -17,13 +23,174 @@ from qev_calculator import (
     TrafficData,
     GreenSpaceData,
     QeVResult,
-    calculate_qev
+    calculate_qev,
+    calculate_qev_batch,
+    QeVSubIndices,
+    QEV_WEIGHTS,
+    NORMALIZATION_BOUNDS
+)
+from green_space_analyzer import (
+    analyze_trees_from_yolo,
+    analyze_canopy_from_segmentation,
+    calculate_distance_to_nearest_park,
+    assemble_330_rule_metrics,
+    estimate_traffic_from_osm,
+    green_inputs_signature,
+    osm_snapshot_version
 )
-from green_space_analyzer import calculate_330_rule_metrics, estimate_traffic_from_osm
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================
+# SÉRIES TEMPORELLES
+# ============================================================
+
+# Granularité → (fréquence pandas, fenêtre des percentiles glissants)
+SERIES_GRANULARITIES = {
+    'hour': ('h', '24h'),
+    'day': ('D', '7D'),
+}
+
+# Colonnes polluants du DataFrame air quality → argument de calculate_qev_batch
+SERIES_POLLUTANTS = {
+    'nitrogen_dioxide': 'no2',
+    'pm2_5': 'pm25',
+    'pm10': 'pm10',
+    'ozone': 'o3',
+    'sulphur_dioxide': 'so2',
+}
+
+
+# ============================================================
+# EMPREINTE DES ENTRÉES
+# ============================================================
+
+# À incrémenter quand la formule change: invalide tous les résultats cachés
+QEV_FINGERPRINT_VERSION = 1
+
+
+def qev_input_fingerprint(
+    address: str,
+    latitude: float,
+    longitude: float,
+    air_version: Tuple,
+    weights: Optional[Dict[str, float]] = None,
+    bounds: Optional[Dict[str, tuple]] = None
+) -> str:
+    """
+    Empreinte (sha256) de tout ce dont dépend calculate_qev_for_address.
+
+    Calculée sans appel Overpass ni lecture d'image: version de la série
+    air, version OSM, mtimes des résultats YOLO/segmentation, pondérations
+    et bornes.
+
+    Args:
+        air_version: Version de la série air, ex. (last_ts, records, updated_at)
+                     des agrégats courants ou (max(timestamp), nombre de lignes)
+    """
+    payload = {
+        'version': QEV_FINGERPRINT_VERSION,
+        'address': address,
+        'coordinates': [round(latitude, 6), round(longitude, 6)],
+        'air': [part.isoformat() if isinstance(part, datetime) else part for part in air_version],
+        'osm': osm_snapshot_version(),
+        'green': green_inputs_signature(address),
+        'weights': weights or QEV_WEIGHTS,
+        'bounds': bounds or NORMALIZATION_BOUNDS,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# ============================================================
+# ORCHESTRATION DES ÉTAPES
+# ============================================================
+# Trafic Overpass, parcs Overpass, scan YOLO et scan segmentation sont
+# indépendants: ils tournent en parallèle (threads, I/O réseau et disque)
+# sous une échéance globale. Une étape en échec ou hors délai prend sa
+# valeur de repli et le calcul continue: la latence est celle de l'étape
+# la plus lente, bornée par QEV_STAGE_DEADLINE_S.
+
+QEV_STAGE_DEADLINE_S = float(os.getenv('QEV_STAGE_DEADLINE_S', '50'))
+
+# Valeurs de repli par étape (mêmes valeurs que les échecs des analyseurs)
+STAGE_FALLBACKS = {
+    'traffic': None,
+    'parks': (999.0, None, None),
+    'trees': {'total_trees': 0, 'detection_arbres': 0, 'detection_general': 0, 'images_analyzed': 0},
+    'canopy': {'canopy_coverage_pct': 0.0, 'vegetation_area_m2': 0.0, 'total_area_analyzed_m2': 0.0,
+               'method': 'unavailable'},
+}
+
+
+@dataclass
+class StageOutcome:
+    """Résultat d'une étape du pipeline QeV"""
+    name: str
+    value: Any
+    status: str                 # 'ok', 'error', 'timeout', 'skipped'
+    elapsed_s: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('ok', 'skipped')
+
+
+def run_qev_stages(
+    stages: Dict[str, Callable[[], Any]],
+    fallbacks: Dict[str, Any],
+    deadline_s: float = QEV_STAGE_DEADLINE_S
+) -> Dict[str, StageOutcome]:
+    """
+    Exécute des étapes indépendantes en parallèle sous une échéance commune.
+
+    Args:
+        stages: Nom → callable sans argument
+        fallbacks: Nom → valeur utilisée si l'étape échoue ou dépasse l'échéance
+        deadline_s: Échéance globale (secondes) pour l'ensemble des étapes
+
+    Returns:
+        Nom → StageOutcome (valeur, statut, durée)
+    """
+    started = time.monotonic()
+    timings: Dict[str, float] = {}
+
+    def _timed(name: str, func: Callable[[], Any]):
+        t0 = time.monotonic()
+        try:
+            return func()
+        finally:
+            timings[name] = time.monotonic() - t0
+
+    # Pas de 'with': l'échéance ne doit pas attendre les étapes en retard,
+    # elles se terminent en arrière-plan et leur résultat est ignoré
+    executor = ThreadPoolExecutor(max_workers=max(1, len(stages)), thread_name_prefix='qev-stage')
+    futures = {executor.submit(_timed, name, func): name for name, func in stages.items()}
+    done, _ = wait(futures, timeout=deadline_s)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    outcomes = {}
+    for future, name in futures.items():
+        if future not in done:
+            outcomes[name] = StageOutcome(name, fallbacks.get(name), 'timeout', time.monotonic() - started,
+                                          f"échéance de {deadline_s:.1f}s dépassée")
+            logger.warning(f"⏱️ Étape QeV '{name}' hors délai ({deadline_s:.1f}s), valeur de repli")
+            continue
+        try:
+            outcomes[name] = StageOutcome(name, future.result(), 'ok', timings.get(name, 0.0))
+        except Exception as e:
+            outcomes[name] = StageOutcome(name, fallbacks.get(name), 'error', timings.get(name, 0.0), str(e))
+            logger.warning(f"⚠️ Étape QeV '{name}' en échec: {e}")
+
+    logger.info("⏱️ Étapes QeV: " + ", ".join(
+        f"{name}={outcome.elapsed_s:.2f}s" + ('' if outcome.status == 'ok' else f" ({outcome.status})")
+        for name, outcome in outcomes.items()
+    ) + f" | total {time.monotonic() - started:.2f}s")
+    return outcomes
+
+
 # ============================================================
 # SERVICE PRINCIPAL
 # ============================================================
@@ -41,7 +208,9 @@ class QeVService:
         latitude: float,
         longitude: float,
         air_quality_df: Optional[pd.DataFrame] = None,
-        traffic_data: Optional[Dict] = None
+        traffic_data: Optional[Dict] = None,
+        air_aggregates: Optional[Dict] = None,
+        deadline_s: float = QEV_STAGE_DEADLINE_S
     ) -> Dict:
         """
         Calcule le score QeV complet pour une adresse.
@@ -52,6 +221,9 @@ class QeVService:
             longitude: Longitude
             air_quality_df: DataFrame avec données air quality (optionnel)
             traffic_data: Dict avec données trafic (optionnel)
+            air_aggregates: Agrégats courants (read_air_aggregates), prioritaires
+                            sur air_quality_df: aucune relecture de l'historique
+            deadline_s: Échéance globale des étapes trafic/parcs/YOLO/segmentation
 
         Returns:
             Dict avec tous les résultats QeV
@@ -65,21 +237,40 @@ class QeVService:
 
         # 1. Données qualité de l'air
         logger.info("── [1/4] Qualité de l'air ──")
-        air_data = self._prepare_air_quality_data(air_quality_df)
+        if air_aggregates is not None:
+            air_data = self._air_data_from_aggregates(air_aggregates)
+        else:
+            air_data = self._prepare_air_quality_data(air_quality_df)
         logger.info(f"   NO2={air_data.no2}, PM2.5={air_data.pm25}, PM10={air_data.pm10}, "
                      f"O3={air_data.o3}, SO2={air_data.so2}")
 
-        # 2. Données trafic - estimer via OSM si non fournies
-        logger.info("── [2/4] Estimation trafic (Overpass OSM) ──")
+        # 2-3. Trafic et parcs (une requête Overpass partagée), YOLO et segmentation en parallèle.
+        # Overpass indisponible: l'étape 'parks' échoue (repli + degraded_stages) au lieu
+        # de conclure "aucun parc à 2 km"
+        stages = {
+            'traffic': lambda: self._estimate_traffic_from_osm(latitude, longitude),
+            'parks': lambda: calculate_distance_to_nearest_park(latitude, longitude, raise_errors=True),
+            'trees': lambda: analyze_trees_from_yolo(address),
+            'canopy': lambda: analyze_canopy_from_segmentation(address),
+        }
+        if traffic_data is not None:
+            del stages['traffic']
+        outcomes = run_qev_stages(stages, fallbacks=STAGE_FALLBACKS, deadline_s=deadline_s)
         if traffic_data is None:
-            traffic_data = self._estimate_traffic_from_osm(latitude, longitude)
+            traffic_data = outcomes['traffic'].value
+
+        logger.info("── [2/4] Estimation trafic (Overpass OSM) ──")
+        osm_traffic_available = traffic_data is not None
         traffic = self._prepare_traffic_data(traffic_data)
         logger.info(f"   Légers={traffic.light_vehicles}/h, Utilitaires={traffic.utility_vehicles}/h, "
                      f"Lourds={traffic.heavy_vehicles}/h")
 
         # 3. Données espaces verts (règle 3-30-300)
         logger.info("── [3/4] Espaces verts (règle 3-30-300) ──")
-        green_metrics = calculate_330_rule_metrics(address, latitude, longitude)
+        green_metrics = assemble_330_rule_metrics(
+            address, latitude, longitude,
+            outcomes['trees'].value, outcomes['canopy'].value, outcomes['parks'].value
+        )
         logger.info(f"   🌳 Arbres visibles: {green_metrics.get('trees_visible_count', 0)} "
                      f"(min requis: 3)")
         logger.info(f"   🌿 Canopée: {green_metrics.get('canopy_coverage_pct', 0):.1f}% "
@@ -133,6 +324,11 @@ class QeVService:
             'weights': qev_result.weights,
             'data_completeness': qev_result.data_completeness,
             'confidence_level': qev_result.confidence_level,
+            # False: Overpass indisponible, trafic par défaut (résultat à ne pas cacher)
+            'osm_traffic_available': osm_traffic_available,
+            # Étapes en échec/hors délai (valeurs de repli: résultat à ne pas cacher)
+            'degraded_stages': [name for name, outcome in outcomes.items() if not outcome.ok],
+            'stage_timings': {name: round(outcome.elapsed_s, 3) for name, outcome in outcomes.items()},
 
             # Interprétation
             'interpretation': self._get_interpretation(qev_result.qev_score)
@@ -147,6 +343,110 @@ class QeVService:
 
         return result
 
+    def calculate_qev_series(
+        self,
+        air_quality_df: pd.DataFrame,
+        traffic_data: Optional[Dict],
+        green_metrics: Dict,
+        granularity: str = 'day'
+    ) -> pd.DataFrame:
+        """
+        Calcule le QeV par heure ou par jour sur la série air quality stockée.
+
+        Les moyennes de polluants sont calculées par période (resample) puis
+        toutes les périodes sont scorées en une passe (calculate_qev_batch).
+        Trafic et verdure sont des relevés ponctuels (estimation OSM, règle
+        3-30-300): ils restent constants sur toute la série.
+
+        Args:
+            air_quality_df: DataFrame 'date' + polluants (get_location_data)
+            traffic_data: Dict light/utility/heavy_vehicles (None = estimation par défaut)
+            green_metrics: Métriques 3-30-300 (calculate_330_rule_metrics)
+            granularity: 'hour' ou 'day'
+
+        Returns:
+            DataFrame indexé par début de période: sous-indices, scores normalisés,
+            qev_score, qev_category, complétude et percentiles glissants
+            qev_p10/qev_p50/qev_p90 (24h en horaire, 7 jours en journalier)
+        """
+        if granularity not in SERIES_GRANULARITIES:
+            raise ValueError(f"Granularité inconnue: {granularity} (attendu: {list(SERIES_GRANULARITIES)})")
+        if air_quality_df is None or air_quality_df.empty:
+            return pd.DataFrame()
+
+        freq, window = SERIES_GRANULARITIES[granularity]
+        columns = [col for col in SERIES_POLLUTANTS if col in air_quality_df]
+        means = (
+            air_quality_df.set_index(pd.to_datetime(air_quality_df['date']))[columns]
+            .astype('float64')
+            .sort_index()
+            .resample(freq)
+            .mean()
+            .dropna(how='all')
+        )
+        if means.empty:
+            return pd.DataFrame()
+
+        traffic = self._prepare_traffic_data(traffic_data)
+        batch = calculate_qev_batch(
+            **{SERIES_POLLUTANTS[col]: means[col].to_numpy() for col in columns},
+            light_vehicles=traffic.light_vehicles,
+            utility_vehicles=traffic.utility_vehicles,
+            heavy_vehicles=traffic.heavy_vehicles,
+            trees_visible=green_metrics.get('trees_visible_count', 0),
+            canopy_coverage_pct=green_metrics.get('canopy_coverage_pct', 0.0),
+            distance_to_green_space_m=green_metrics.get('distance_to_nearest_park_m', 999.0)
+        )
+
+        series = batch.to_frame()
+        series.index = means.index.rename('period_start')
+
+        rolling = series['qev_score'].rolling(window, min_periods=1)
+        series['qev_p10'] = rolling.quantile(0.10)
+        series['qev_p50'] = rolling.quantile(0.50)
+        series['qev_p90'] = rolling.quantile(0.90)
+
+        logger.info(f"📈 Série QeV ({granularity}): {len(series)} périodes "
+                    f"[{series.index.min()} → {series.index.max()}]")
+        return series
+
+    def reweight_qev_result(
+        self,
+        qev_result: Dict,
+        custom_weights: Optional[Dict[str, float]] = None,
+        custom_bounds: Optional[Dict[str, tuple]] = None
+    ) -> Dict:
+        """
+        Rejoue un résultat QeV avec d'autres pondérations / bornes.
+
+        Seuls les scores normalisés, le QeV, la catégorie et l'interprétation
+        changent: les sous-indices bruts du résultat sont réutilisés (aucun
+        appel Overpass, aucune lecture air quality ni image).
+
+        Args:
+            qev_result: Résultat de calculate_qev_for_address (ou du cache)
+            custom_weights: Pondérations air/traffic/green
+            custom_bounds: Bornes air_index/traffic_nuisance
+
+        Returns:
+            Copie du résultat avec les scores recalculés
+        """
+        table = QeVSubIndices.from_results({qev_result['address']: qev_result})
+        scores = table.rescore(custom_weights, custom_bounds)
+        qev_score = float(scores['qev_score'][0])
+
+        result = dict(qev_result)
+        result['normalized_scores'] = {
+            'S_Air': float(scores['normalized_air_score'][0]),
+            'S_Trafic': float(scores['normalized_traffic_score'][0]),
+            'S_Vert': float(scores['normalized_green_score'][0])
+        }
+        result['QeV'] = qev_score
+        result['QeV_category'] = str(scores['qev_category'][0])
+        result['weights'] = custom_weights or QEV_WEIGHTS
+        result['interpretation'] = self._get_interpretation(qev_score)
+        return result
+
     # ========== MÉTHODES PRIVÉES ==========
 
     def _prepare_air_quality_data(
@@ -175,6 +475,23 @@ class QeVService:
             so2=air_quality_df['sulphur_dioxide'].mean() if 'sulphur_dioxide' in air_quality_df else None
         )
 
+    def _air_data_from_aggregates(self, air_aggregates: Dict) -> AirQualityData:
+        """
+        Prépare les données air quality à partir des agrégats courants.
+
+        Moyennes sum/count par polluant: identiques à _prepare_air_quality_data
+        sur l'historique complet, en O(1).
+        """
+        pollutants = air_aggregates.get('pollutants', {})
+        mean = lambda col: pollutants.get(col, {}).get('mean')
+        return AirQualityData(
+            no2=mean('nitrogen_dioxide'),
+            pm25=mean('pm2_5'),
+            pm10=mean('pm10'),
+            o3=mean('ozone'),
+            so2=mean('sulphur_dioxide')
+        )
+
     def _estimate_traffic_from_osm(self, latitude: float, longitude: float) -> Optional[Dict]:
         """
         Estime le trafic via l'API Overpass (type de route OSM).
@@ -280,4 +597,12 @@ class QeVService:
 # EXPORT
 # ============================================================
 
-__all__ = ['QeVService']
+__all__ = [
+    'QeVService',
+    'SERIES_GRANULARITIES',
+    'qev_input_fingerprint',
+    'QEV_FINGERPRINT_VERSION',
+    'run_qev_stages',
+    'StageOutcome',
+    'QEV_STAGE_DEADLINE_S',
+]
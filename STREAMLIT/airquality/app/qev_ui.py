@@ -13,13 +13,16 @@ import plotly.express as px
 import pandas as pd
 from typing import Dict, Optional
 
+from qev_calculator import QeVSubIndices, QEV_WEIGHTS, NORMALIZATION_BOUNDS, BATCH_POLLUTANTS
 
-def display_qev_section(qev_result: Dict):
+
+def display_qev_section(qev_result: Dict, qev_series: Optional[Dict[str, pd.DataFrame]] = None):
     """
     Affiche la section QeV complète avec visualisations.
 
     Args:
         qev_result: Résultat du calcul QeV depuis qev_service
+        qev_series: Séries QeV précalculées par granularité ('day', 'hour'), optionnel
     """
     if not qev_result:
         st.warning("⚠️ Impossible de calculer le score QeV pour cette adresse")
@@ -139,7 +142,7 @@ def display_qev_section(qev_result: Dict):
     # ========== SECTION 3: GRAPHIQUES DÉTAILLÉS ==========
     st.subheader("📈 Analyse Détaillée")
 
-    tab1, tab2, tab3 = st.tabs(["Contributions", "Évolution simulée", "Comparaison"])
+    tab1, tab2, tab3 = st.tabs(["Contributions", "Évolution simulée", "Comparaison & pondérations"])
 
     with tab1:
         # Graphique en barres des contributions
@@ -154,18 +157,33 @@ def display_qev_section(qev_result: Dict):
         """)
 
     with tab2:
-        st.info("📊 Fonctionnalité à venir: Évolution temporelle du QeV si données historiques disponibles")
+        available = {g: df for g, df in (qev_series or {}).items() if df is not None and not df.empty}
+        if not available:
+            st.info("📊 Pas encore de série QeV pour cette adresse (calculée avec le score)")
+        else:
+            labels = {'day': "Journalier", 'hour': "Horaire"}
+            granularity = st.radio(
+                "Granularité",
+                list(available),
+                format_func=lambda g: labels.get(g, g),
+                horizontal=True,
+                key="qev_series_granularity"
+            )
+            fig_evolution = create_evolution_chart(available[granularity], granularity)
+            st.plotly_chart(fig_evolution, width="stretch")
 
-        # Placeholder pour évolution future
-        # fig_evolution = create_evolution_chart(qev_history)
-        # st.plotly_chart(fig_evolution, width="stretch")
+            st.markdown("""
+            **Lecture du graphique:**
+            - Score QeV recalculé par période à partir des concentrations mesurées
+            - Trafic et espaces verts sont constants (relevés ponctuels)
+            - La bande grise couvre les percentiles glissants P10-P90 (24h en horaire, 7 jours en journalier)
+            """)
 
     with tab3:
-        st.info("📊 Fonctionnalité à venir: Comparaison avec d'autres quartiers de Bruxelles")
-
-        # Placeholder pour benchmark
-        # fig_benchmark = create_benchmark_chart(qev_result, brussels_avg)
-        # st.plotly_chart(fig_benchmark, width="stretch")
+        try:
+            display_qev_what_if(qev_result, load_qev_sub_indices_table())
+        except Exception as e:
+            st.warning(f"⚠️ Simulation indisponible: {e}")
 
     st.divider()
 
@@ -255,6 +273,109 @@ def display_qev_section(qev_result: Dict):
         """)
 
 
+# ============================================================
+# SIMULATION DES PONDÉRATIONS (WHAT-IF)
+# ============================================================
+
+@st.cache_data(ttl=300)  # Cache 5 minutes
+def load_qev_sub_indices_table() -> pd.DataFrame:
+    """Sous-indices bruts de toutes les adresses scorées (une requête, puis cache)"""
+    from db_async_wrapper import AirQualityDB
+    return AirQualityDB().get_qev_sub_indices()
+
+
+def display_qev_what_if(qev_result: Dict, sub_indices: pd.DataFrame):
+    """
+    Curseurs de pondération et de bornes appliqués en direct à l'adresse
+    courante et à toutes les adresses scorées.
+
+    Les sous-indices bruts sont chargés une fois (load_qev_sub_indices_table):
+    déplacer un curseur ne fait que re-normaliser et re-pondérer en mémoire.
+
+    Args:
+        qev_result: Résultat QeV de l'adresse courante
+        sub_indices: Sous-indices bruts des adresses scorées (get_qev_sub_indices)
+    """
+    st.markdown("**Simulation:** ajustez les pondérations et bornes, les scores sont recalculés instantanément.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        w_air = st.slider("Poids Air", 0.0, 1.0, QEV_WEIGHTS['air'], 0.05, key="qev_whatif_air")
+    with col2:
+        w_traffic = st.slider("Poids Trafic", 0.0, 1.0, QEV_WEIGHTS['traffic'], 0.05, key="qev_whatif_traffic")
+    with col3:
+        w_green = st.slider("Poids Vert", 0.0, 1.0, QEV_WEIGHTS['green'], 0.05, key="qev_whatif_green")
+
+    total = w_air + w_traffic + w_green
+    if total <= 0:
+        st.warning("⚠️ Au moins une pondération doit être non nulle")
+        return
+    # Pondérations ramenées à une somme de 1 (score toujours dans [0, 1])
+    weights = {'air': w_air / total, 'traffic': w_traffic / total, 'green': w_green / total}
+
+    col1, col2 = st.columns(2)
+    with col1:
+        traffic_max = st.number_input(
+            "Nuisance trafic maximale (borne de normalisation)",
+            min_value=100.0, max_value=50000.0, step=500.0,
+            value=float(NORMALIZATION_BOUNDS['traffic_nuisance'][1]),
+            key="qev_whatif_traffic_max"
+        )
+    with col2:
+        pollutants = st.multiselect(
+            "Polluants retenus dans l'indice air",
+            list(BATCH_POLLUTANTS),
+            default=list(BATCH_POLLUTANTS),
+            format_func=str.upper,
+            key="qev_whatif_pollutants"
+        )
+    bounds = dict(NORMALIZATION_BOUNDS, traffic_nuisance=(NORMALIZATION_BOUNDS['traffic_nuisance'][0], traffic_max))
+
+    # Adresse courante
+    current = QeVSubIndices.from_results({qev_result['address']: qev_result}).rescore(weights, bounds, pollutants)
+    simulated = float(current['qev_score'][0])
+    st.metric(
+        "Score QeV simulé",
+        f"{simulated:.3f} ({current['qev_category'][0]})",
+        delta=f"{simulated - qev_result['QeV']:+.3f}",
+        help=f"Score calculé: {qev_result['QeV']:.3f}"
+    )
+
+    if sub_indices is None or sub_indices.empty:
+        st.info("📊 Aucune autre adresse scorée pour la comparaison")
+        return
+
+    # Toutes les adresses scorées
+    table = QeVSubIndices.from_frame(sub_indices)
+    baseline = table.rescore()
+    scores = table.rescore(weights, bounds, pollutants)
+
+    comparison = pd.DataFrame({
+        'Adresse': table.labels,
+        'QeV': baseline['qev_score'],
+        'QeV simulé': scores['qev_score'],
+        'Catégorie simulée': scores['qev_category'],
+    })
+    comparison['Rang'] = comparison['QeV'].rank(ascending=False, method='min').astype(int)
+    comparison['Rang simulé'] = comparison['QeV simulé'].rank(ascending=False, method='min').astype(int)
+    comparison = comparison.sort_values('QeV simulé', ascending=False).reset_index(drop=True)
+
+    rank = int((scores['qev_score'] > simulated).sum()) + 1
+    st.write(f"**Classement simulé**: {rank}/{len(comparison)} adresses scorées")
+
+    fig = px.histogram(comparison, x='QeV simulé', nbins=20, range_x=[0, 1],
+                       title="Distribution des scores simulés")
+    fig.add_vline(x=simulated, line_dash="dash", line_color="red", annotation_text="Adresse courante")
+    fig.update_layout(height=300, showlegend=False)
+    st.plotly_chart(fig, width="stretch")
+
+    st.dataframe(
+        comparison.style.format({'QeV': '{:.3f}', 'QeV simulé': '{:.3f}'}),
+        width="stretch",
+        hide_index=True
+    )
+
+
 # ============================================================
 # FONCTIONS DE VISUALISATION
 # ============================================================
@@ -411,8 +532,61 @@ def create_contributions_chart(qev_result: Dict) -> go.Figure:
     return fig
 
 
+def create_evolution_chart(series: pd.DataFrame, granularity: str = 'day') -> go.Figure:
+    """
+    Crée le graphique d'évolution temporelle du QeV.
+
+    Args:
+        series: Série QeV précalculée ('date', qev_score, qev_p10/p50/p90)
+        granularity: 'day' ou 'hour'
+
+    Returns:
+        Figure Plotly
+    """
+    fig = go.Figure()
+
+    # Bande P10-P90 (percentiles glissants)
+    fig.add_trace(go.Scatter(
+        x=series['date'], y=series['qev_p90'],
+        mode='lines', line=dict(width=0),
+        showlegend=False, hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=series['date'], y=series['qev_p10'],
+        mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(128, 128, 128, 0.2)',
+        name='P10-P90 glissants'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=series['date'], y=series['qev_p50'],
+        mode='lines', line=dict(color='gray', dash='dot'),
+        name='Médiane glissante'
+    ))
+    fig.add_trace(go.Scatter(
+        x=series['date'], y=series['qev_score'],
+        mode='lines' if granularity == 'hour' else 'lines+markers',
+        line=dict(color='rgba(0, 123, 255, 0.9)'),
+        name='Score QeV',
+        customdata=series['qev_category'],
+        hovertemplate='%{x}<br>QeV %{y:.3f} (%{customdata})<extra></extra>'
+    ))
+
+    fig.add_hline(y=0.6, line_dash="dash", line_color="green", annotation_text='Seuil "Bon" (0.6)')
+
+    fig.update_layout(
+        title="Évolution du score QeV " + ("horaire" if granularity == 'hour' else "journalier"),
+        yaxis=dict(title="Score QeV", range=[0, 1]),
+        xaxis_title="Date",
+        height=400,
+        hovermode='x unified'
+    )
+
+    return fig
+
+
 # ============================================================
 # EXPORT
 # ============================================================
 
-__all__ = ['display_qev_section']
+__all__ = ['display_qev_section', 'display_qev_what_if', 'load_qev_sub_indices_table']
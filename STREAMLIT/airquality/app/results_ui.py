@@ -278,7 +278,11 @@ def display_results(address):
             # Afficher le score QeV
             try:
                 from qev_ui import display_qev_section
-                display_qev_section(qev_result)
+                qev_series = {
+                    granularity: db.get_qev_series(address, granularity)
+                    for granularity in ('day', 'hour')
+                }
+                display_qev_section(qev_result, qev_series=qev_series)
             except Exception as e:
                 logger.error(f"Erreur affichage QeV: {e}")
                 st.error(f"⚠️ Erreur lors de l'affichage du score QeV: {e}")
@@ -16,6 +16,7 @@ import logging
 from datetime import datetime
 
 from db_async_wrapper import StationManager
+from qev_raster import add_qev_heatmap_layer
 
 logger = logging.getLogger(__name__)
 
@@ -214,6 +215,9 @@ def create_stations_map(
     air_quality_group.add_to(m)
     weather_group.add_to(m)
 
+    # Carte QeV précalculée (tuiles statiques, voir precompute_qev_raster.py)
+    add_qev_heatmap_layer(m)
+
     # Ajouter le contrôle des couches
     folium.LayerControl().add_to(m)
 
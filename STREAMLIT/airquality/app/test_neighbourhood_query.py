@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests de la requête Overpass combinée (green_space_analyzer.py):
+build_neighbourhood_query (rayons parcs 2000 m / routes 800 m),
+séparation de la réponse en espaces verts et routes, requête partagée
+entre les étapes 'parks' et 'traffic'
+Overpass simulé (_overpass_request remplacé)
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import green_space_analyzer as gsa
+from green_space_analyzer import (
+    OVERPASS_PARKS_RADIUS_M,
+    ROAD_HIGHWAY_TYPES,
+    ROAD_SEARCH_RADIUS_M,
+    RoadGeometryIndex,
+    _split_neighbourhood_elements,
+    build_neighbourhood_query,
+)
+
+LAT, LON = 50.8466, 4.3528
+
+ELEMENTS = [
+    {'type': 'way', 'id': 1, 'tags': {'leisure': 'park', 'name': 'Parc lointain'},
+     'center': {'lat': LAT + 0.010, 'lon': LON}},
+    {'type': 'node', 'id': 2, 'tags': {'leisure': 'garden'}, 'lat': LAT + 0.001, 'lon': LON},
+    {'type': 'relation', 'id': 3, 'tags': {'landuse': 'forest'}, 'center': {'lat': LAT, 'lon': LON + 0.005}},
+    {'type': 'way', 'id': 4, 'tags': {'natural': 'wood'}, 'center': {'lat': LAT - 0.003, 'lon': LON}},
+    {'type': 'way', 'id': 5, 'tags': {'highway': 'primary', 'lanes': '2'},
+     'geometry': [{'lat': LAT, 'lon': LON - 0.001}, {'lat': LAT, 'lon': LON + 0.001}]},
+    {'type': 'way', 'id': 6, 'tags': {'highway': 'residential'}},
+    # Ni espace vert ni route, ou sans position: ignorés
+    {'type': 'way', 'id': 7, 'tags': {'building': 'yes'}, 'center': {'lat': LAT, 'lon': LON}},
+    {'type': 'way', 'id': 8, 'tags': {'leisure': 'park'}},
+]
+
+
+def _around(query: str) -> dict:
+    """Rayon 'around' de chaque ligne de filtre, par sélecteur"""
+    return {selector.strip(): int(radius) for selector, radius
+            in re.findall(r'^(.*)\(around:(\d+),', query, flags=re.MULTILINE)}
+
+
+# ============================================================
+# REQUÊTE
+# ============================================================
+
+def test_query_default_radii():
+    around = _around(build_neighbourhood_query(LAT, LON))
+    roads = [selector for selector in around if '"highway"' in selector]
+    green = [selector for selector in around if selector not in roads]
+    assert len(roads) == 1 and len(green) == 6
+    assert {around[selector] for selector in green} == {OVERPASS_PARKS_RADIUS_M} == {2000}
+    assert around[roads[0]] == ROAD_SEARCH_RADIUS_M == 800
+
+
+def test_query_roads_filter_and_outputs():
+    query = build_neighbourhood_query(LAT, LON, parks_radius_m=1500, roads_radius_m=300)
+    assert f"around:1500,{LAT},{LON}" in query
+    assert f"around:300,{LAT},{LON}" in query
+    # Types de routes connus de TRAFFIC_BY_ROAD_TYPE uniquement, en regex ancrée
+    highway_types = re.search(r'"highway"~"\^\(([^)]*)\)\$"', query).group(1).split('|')
+    assert highway_types == sorted(ROAD_HIGHWAY_TYPES)
+    # Centre des espaces verts, tracé complet des routes
+    assert '.green out center tags;' in query
+    assert '.roads out tags geom;' in query
+
+
+def test_query_is_deterministic():
+    assert build_neighbourhood_query(LAT, LON) == build_neighbourhood_query(LAT, LON)
+    assert build_neighbourhood_query(LAT, LON) != build_neighbourhood_query(LAT, LON + 0.01)
+
+
+# ============================================================
+# SÉPARATION DE LA RÉPONSE
+# ============================================================
+
+def test_split_roads_and_green_spaces():
+    split = _split_neighbourhood_elements({'elements': ELEMENTS}, LAT, LON)
+    assert [road['osm_id'] for road in split['roads']] == [5, 6]
+    assert split['roads'][0]['geometry'] == ELEMENTS[4]['geometry']
+    assert split['roads'][1]['geometry'] == []
+
+    # Triés par distance au centre (node: ses propres coordonnées)
+    green = split['green_spaces']
+    assert [gs['osm_id'] for gs in green] == [2, 4, 3, 1]
+    assert [gs['type'] for gs in green] == ['garden', 'wood', 'forest', 'park']
+    assert green[0]['distance_m'] == pytest.approx(111.2, abs=0.5)
+    assert green[-1]['name'] == 'Parc lointain'
+    assert green[0]['name'] == 'garden'
+
+
+def test_split_empty_response():
+    assert _split_neighbourhood_elements({}, LAT, LON) == {'green_spaces': [], 'roads': []}
+
+
+# ============================================================
+# REQUÊTE PARTAGÉE ENTRE ÉTAPES
+# ============================================================
+
+@pytest.fixture
+def overpass(monkeypatch):
+    """Overpass simulé: requêtes reçues, réponse modifiable"""
+    state = {'queries': [], 'data': {'elements': ELEMENTS}, 'delay': None}
+
+    def request(query, timeout=15):
+        state['queries'].append(query)
+        if state['delay'] is not None:
+            state['delay'].wait(5)
+        return state['data']
+
+    monkeypatch.setattr(gsa, '_overpass_request', request)
+    monkeypatch.setattr(gsa, '_road_indexes', OrderedDict())
+    monkeypatch.setattr(gsa, '_neighbourhood_inflight', {})
+    return state
+
+
+def test_parks_and_traffic_share_one_query(overpass):
+    green_spaces = gsa._query_overpass_green_spaces(LAT, LON, 2000)
+    traffic = gsa._estimate_traffic_from_overpass(LAT, LON, search_radius_m=100)
+
+    # Rayon trafic porté à 800 m: même requête que l'étape parcs
+    assert len(overpass['queries']) == 2
+    assert overpass['queries'][0] == overpass['queries'][1] == build_neighbourhood_query(LAT, LON)
+    assert [gs['osm_id'] for gs in green_spaces] == [2, 4, 3, 1]
+    assert traffic['road_type'] == 'primary'
+    assert traffic['road_distance_m'] == pytest.approx(0.0, abs=0.5)
+
+
+def test_radii_beyond_defaults_widen_query(overpass):
+    gsa._query_overpass_green_spaces(LAT, LON, 3000)
+    gsa._estimate_traffic_from_overpass(LAT, LON, search_radius_m=1200)
+    assert overpass['queries'] == [
+        build_neighbourhood_query(LAT, LON, parks_radius_m=3000),
+        build_neighbourhood_query(LAT, LON, roads_radius_m=1200),
+    ]
+
+
+def test_smaller_parks_radius_filters_response(overpass):
+    green_spaces = gsa._query_overpass_green_spaces(LAT, LON, 500)
+    # Requête à 2000 m (partagée), espaces verts au-delà de 500 m écartés
+    assert overpass['queries'] == [build_neighbourhood_query(LAT, LON)]
+    assert [gs['osm_id'] for gs in green_spaces] == [2, 4, 3]
+
+
+def test_concurrent_stages_wait_for_inflight_query(overpass):
+    overpass['delay'] = threading.Event()
+    results = {}
+
+    def run(name):
+        results[name] = gsa._query_overpass_neighbourhood(LAT, LON)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ('parks', 'traffic')]
+    for thread in threads:
+        thread.start()
+    # Le second appel arrive pendant la requête en vol du premier
+    time.sleep(0.2)
+    overpass['delay'].set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(overpass['queries']) == 1
+    assert results['parks']['green_spaces'] == results['traffic']['green_spaces']
+    # Index des tracés construit une fois et partagé
+    assert results['parks']['roads'] is results['traffic']['roads']
+    assert isinstance(results['parks']['roads'], RoadGeometryIndex)
+    assert gsa._neighbourhood_inflight == {}
+
+
+def test_partial_response_road_index_not_cached(overpass):
+    overpass['data'] = {'elements': ELEMENTS, 'remark': 'runtime error: timeout'}
+    first = gsa._query_overpass_neighbourhood(LAT, LON)
+    second = gsa._query_overpass_neighbourhood(LAT, LON)
+    assert first['roads'] is not second['roads']
+    assert len(gsa._road_indexes) == 0
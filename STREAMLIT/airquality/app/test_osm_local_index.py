@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Tests de l'index OSM local (osm_local_index.py): couverture, rayon et tri
+des résultats KNN, indisponibilité; et repli sur Overpass dans
+green_space_analyzer.py quand le point n'est pas couvert
+Base et Overpass simulés (_query / _cursor et _overpass_request remplacés)
+"""
+
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import green_space_analyzer as gsa
+import osm_local_index
+
+LAT, LON = 50.8466, 4.3528
+
+# (covered, osm_id, name, green_space_type, area, lat, lon, distance_m)
+GREEN_ROWS = [
+    (True, 11, 'Parc de Bruxelles', 'park', 130000.0, 50.8450, 4.3640, 650.0),
+    (True, 12, None, 'garden', 800.0, 50.8470, 4.3530, 40.0),
+    (True, 13, 'Forêt de Soignes', 'forest', 4.4e7, 50.7800, 4.4200, 7500.0),
+]
+# (covered, osm_id, highway, name, lanes, maxspeed, distance_m)
+ROAD_ROWS = [
+    (True, 21, 'primary', 'Boulevard Anspach', '2', None, 120.0),
+    (True, 22, 'residential', None, None, '30', 15.0),
+    (True, 23, 'motorway', 'Ring', '3', '120', 2500.0),
+]
+NOT_COVERED = [(False, None, None, None, None, None, None, None)]
+
+# Réponse Overpass combinée: un parc, une route
+OVERPASS_DATA = {'elements': [
+    {'type': 'way', 'id': 31, 'tags': {'leisure': 'park', 'name': 'Parc Overpass'},
+     'center': {'lat': LAT + 0.002, 'lon': LON}},
+    {'type': 'way', 'id': 32, 'tags': {'highway': 'secondary', 'lanes': '2'},
+     'geometry': [{'lat': LAT + 0.0005, 'lon': LON - 0.001}, {'lat': LAT + 0.0005, 'lon': LON + 0.001}]},
+]}
+
+
+@pytest.fixture
+def local_rows(monkeypatch):
+    """Lignes retournées par l'index local, par requête (absente = index indisponible)"""
+    rows = {}
+
+    def query(sql, params):
+        assert params == {'lat': LAT, 'lon': LON, 'k': osm_local_index.KNN_CANDIDATES}
+        return rows.get(sql)
+
+    monkeypatch.setattr(osm_local_index, '_query', query)
+    return rows
+
+
+@pytest.fixture
+def overpass(monkeypatch):
+    """Overpass simulé: requêtes reçues, réponse OVERPASS_DATA"""
+    queries = []
+
+    def request(query, timeout=15):
+        queries.append(query)
+        return OVERPASS_DATA
+
+    monkeypatch.setattr(gsa, '_overpass_request', request)
+    monkeypatch.setattr(gsa, '_road_indexes', OrderedDict())
+    return queries
+
+
+# ============================================================
+# RÉSULTATS DE L'INDEX LOCAL
+# ============================================================
+
+def test_nearest_green_spaces_sorted_within_radius(local_rows):
+    local_rows[osm_local_index.NEAREST_GREEN_SPACES_SQL] = GREEN_ROWS
+    green_spaces = osm_local_index.nearest_green_spaces(LAT, LON, radius_m=2000)
+    assert [gs['osm_id'] for gs in green_spaces] == [12, 11]
+    # Sans nom: type de l'espace vert; aire du polygone conservée
+    assert green_spaces[0]['name'] == 'garden'
+    assert green_spaces[1]['area_m2'] == 130000.0
+
+
+def test_nearest_roads_sorted_within_radius_with_tags(local_rows):
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = ROAD_ROWS
+    roads = osm_local_index.nearest_roads(LAT, LON, radius_m=800)
+    assert [road['osm_id'] for road in roads] == [22, 21]
+    # Tags absents (NULL) omis, comme dans une réponse Overpass
+    assert roads[0]['tags'] == {'highway': 'residential', 'maxspeed': '30'}
+    assert roads[1]['tags'] == {'highway': 'primary', 'name': 'Boulevard Anspach', 'lanes': '2'}
+
+
+def test_covered_without_results_is_empty_not_none(local_rows):
+    local_rows[osm_local_index.NEAREST_GREEN_SPACES_SQL] = [(True, None, None, None, None, None, None, None)]
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = [(True, 23, 'motorway', 'Ring', '3', '120', 2500.0)]
+    assert osm_local_index.nearest_green_spaces(LAT, LON) == []
+    assert osm_local_index.nearest_roads(LAT, LON, radius_m=800) == []
+
+
+@pytest.mark.parametrize('rows', [NOT_COVERED, [], None])
+def test_not_covered_or_unavailable_is_none(local_rows, rows):
+    local_rows[osm_local_index.NEAREST_GREEN_SPACES_SQL] = rows
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = None if rows is None else [row[:7] for row in rows]
+    assert osm_local_index.nearest_green_spaces(LAT, LON) is None
+    assert osm_local_index.nearest_roads(LAT, LON) is None
+
+
+def test_query_error_disables_index_for_retry_delay(monkeypatch):
+    monkeypatch.setattr(osm_local_index, 'OSM_LOCAL_INDEX_ENABLED', True)
+    monkeypatch.setattr(osm_local_index, '_unavailable_until', 0.0)
+    calls = []
+
+    @contextmanager
+    def unreachable():
+        calls.append(1)
+        raise OSError('connection refused')
+        yield
+
+    monkeypatch.setattr(osm_local_index, '_cursor', unreachable)
+    assert osm_local_index.nearest_roads(LAT, LON) is None
+    # Pendant OSM_LOCAL_RETRY_S: plus aucune tentative de connexion
+    assert osm_local_index.nearest_green_spaces(LAT, LON) is None
+    assert len(calls) == 1
+    assert osm_local_index._unavailable_until > 0.0
+
+
+def test_disabled_index_never_connects(monkeypatch):
+    monkeypatch.setattr(osm_local_index, 'OSM_LOCAL_INDEX_ENABLED', False)
+
+    def fail():
+        raise AssertionError('connexion ouverte')
+
+    monkeypatch.setattr(osm_local_index, '_cursor', fail)
+    assert osm_local_index.nearest_green_spaces(LAT, LON) is None
+
+
+# ============================================================
+# REPLI SUR OVERPASS (green_space_analyzer)
+# ============================================================
+
+def test_covered_point_does_not_query_overpass(local_rows, overpass):
+    local_rows[osm_local_index.NEAREST_GREEN_SPACES_SQL] = GREEN_ROWS
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = ROAD_ROWS
+
+    assert gsa.calculate_distance_to_nearest_park(LAT, LON) == (40.0, 'garden', 800.0)
+    traffic = gsa.estimate_traffic_from_osm(LAT, LON)
+    assert traffic['source'] == 'osm_local'
+    assert traffic['road_type'] == 'residential'
+    assert traffic['road_distance_m'] == 15.0
+    assert overpass == []
+
+
+def test_covered_point_without_road_is_not_sent_to_overpass(local_rows, overpass):
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = [(True, None, None, None, None, None, None)]
+    assert gsa.estimate_traffic_from_osm(LAT, LON) is None
+    assert overpass == []
+
+
+@pytest.mark.parametrize('rows', [NOT_COVERED, None])
+def test_uncovered_point_falls_back_to_overpass(local_rows, overpass, rows):
+    local_rows[osm_local_index.NEAREST_GREEN_SPACES_SQL] = rows
+    local_rows[osm_local_index.NEAREST_ROADS_SQL] = None if rows is None else [row[:7] for row in rows]
+
+    distance_m, name, area_m2 = gsa.calculate_distance_to_nearest_park(LAT, LON)
+    assert name == 'Parc Overpass'
+    assert distance_m == pytest.approx(222.4, abs=1.0)
+    # Overpass 'out center': pas de géométrie, donc pas d'aire
+    assert area_m2 is None
+
+    traffic = gsa.estimate_traffic_from_osm(LAT, LON)
+    assert traffic['source'] == 'osm_estimation'
+    assert traffic['road_type'] == 'secondary'
+    assert traffic['road_distance_m'] == pytest.approx(55.6, abs=1.0)
+
+    # Même requête combinée pour les deux étapes
+    assert len(overpass) == 2
+    assert overpass[0] == overpass[1]
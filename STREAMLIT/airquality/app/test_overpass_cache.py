@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Tests du cache Overpass partagé (overpass_cache.py):
+clés normalisées/quantifiées, TTL, éviction LRU, verrou de sonde du breaker
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import overpass_cache
+from overpass_cache import MemoryOverpassStore, SQLiteOverpassStore, cache_key
+
+QUERY = '''
+[out:json][timeout:25];
+(
+  way["leisure"="park"](around:2000,{lat},{lon});
+);
+out center;
+'''
+
+
+class FakeClock:
+    """Horloge contrôlée (time.time du module overpass_cache)"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(overpass_cache.time, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def make_store(request, tmp_path):
+    """Fabrique de stores (mêmes tests pour la mémoire et SQLite)"""
+    def make(max_entries: int = 100, ttl_s: int = 60):
+        if request.param == 'memory':
+            return MemoryOverpassStore(max_entries=max_entries, ttl_s=ttl_s)
+        return SQLiteOverpassStore(path=str(tmp_path / 'overpass.sqlite'), max_entries=max_entries, ttl_s=ttl_s)
+    return make
+
+
+# ============================================================
+# CLÉS
+# ============================================================
+
+def test_key_ignores_whitespace():
+    compact = ' '.join(QUERY.format(lat=50.8466, lon=4.3528).split())
+    assert cache_key(QUERY.format(lat=50.8466, lon=4.3528)) == cache_key(compact)
+
+
+def test_key_quantizes_around_coordinates(monkeypatch):
+    monkeypatch.setattr(overpass_cache, 'OVERPASS_CACHE_GRID_DEG', 0.0005)
+    # Même cellule de 0.0005° → même clé
+    assert cache_key(QUERY.format(lat=50.84661, lon=4.35281)) == cache_key(QUERY.format(lat=50.84669, lon=4.35289))
+    # Cellule voisine → clé différente
+    assert cache_key(QUERY.format(lat=50.8466, lon=4.3528)) != cache_key(QUERY.format(lat=50.8476, lon=4.3528))
+
+
+def test_key_keeps_radius_and_query_body(monkeypatch):
+    monkeypatch.setattr(overpass_cache, 'OVERPASS_CACHE_GRID_DEG', 0.0005)
+    base = QUERY.format(lat=50.8466, lon=4.3528)
+    assert cache_key(base) != cache_key(base.replace('around:2000', 'around:100'))
+    assert cache_key(base) != cache_key(base.replace('park', 'garden'))
+
+
+def test_key_without_quantization(monkeypatch):
+    monkeypatch.setattr(overpass_cache, 'OVERPASS_CACHE_GRID_DEG', 0.0)
+    assert cache_key(QUERY.format(lat=50.84661, lon=4.3528)) != cache_key(QUERY.format(lat=50.84669, lon=4.3528))
+
+
+# ============================================================
+# TTL ET ÉVICTION
+# ============================================================
+
+def test_roundtrip(make_store, clock):
+    store = make_store()
+    data = {'elements': [{'type': 'way', 'id': 1, 'tags': {'name': 'Parc de Bruxelles'}}]}
+    store.put('k', data)
+    assert store.get('k') == data
+    assert store.get('missing') is None
+
+
+def test_entries_expire_after_ttl(make_store, clock):
+    store = make_store(ttl_s=60)
+    store.put('k', {'elements': []})
+    clock.advance(59)
+    assert store.get('k') == {'elements': []}
+    clock.advance(2)
+    assert store.get('k') is None
+
+
+def test_memory_store_evicts_least_recently_read(clock):
+    store = MemoryOverpassStore(max_entries=2, ttl_s=60)
+    store.put('a', {'v': 'a'})
+    store.put('b', {'v': 'b'})
+    assert store.get('a') == {'v': 'a'}  # 'b' devient la moins récemment lue
+    store.put('c', {'v': 'c'})
+    assert store.get('b') is None
+    assert store.get('a') == {'v': 'a'}
+    assert store.get('c') == {'v': 'c'}
+
+
+def test_sqlite_store_evicts_least_recently_read(tmp_path, clock):
+    store = SQLiteOverpassStore(path=str(tmp_path / 'overpass.sqlite'), max_entries=3, ttl_s=3600)
+    for i in range(100):
+        store.put(f'k{i}', {'v': i})
+        clock.advance(1)
+    # Relue: plus récente que les dernières écritures
+    assert store.get('k0') == {'v': 0}
+    clock.advance(1)
+
+    # Éviction amortie: au 101e put
+    store.put('k100', {'v': 100})
+    remaining = {row[0] for row in store.conn.execute('SELECT key FROM responses')}
+    assert remaining == {'k0', 'k99', 'k100'}
+
+
+def test_sqlite_store_purges_expired_entries(tmp_path, clock):
+    store = SQLiteOverpassStore(path=str(tmp_path / 'overpass.sqlite'), max_entries=1000, ttl_s=10)
+    for i in range(100):
+        store.put(f'k{i}', {'v': i})
+    clock.advance(11)
+    store.put('fresh', {'v': 'fresh'})
+    remaining = {row[0] for row in store.conn.execute('SELECT key FROM responses')}
+    assert remaining == {'fresh'}
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'overpass.sqlite')
+    SQLiteOverpassStore(path=path).put('k', {'v': 1})
+    assert SQLiteOverpassStore(path=path).get('k') == {'v': 1}
+
+
+# ============================================================
+# BREAKER ET VERROU DE SONDE
+# ============================================================
+
+def test_breaker_open_and_close(make_store, clock):
+    store = make_store()
+    assert store.breaker_open_until() is None
+    store.open_breaker(clock.now + 30)
+    assert store.breaker_open_until() == clock.now + 30
+    store.close_breaker()
+    assert store.breaker_open_until() is None
+
+
+def test_single_probe_until_ttl(make_store, clock):
+    store = make_store()
+    assert store.acquire_probe(ttl_s=5) is True
+    assert store.acquire_probe(ttl_s=5) is False
+    clock.advance(4.9)
+    assert store.acquire_probe(ttl_s=5) is False
+    clock.advance(0.2)
+    assert store.acquire_probe(ttl_s=5) is True
+
+
+def test_sqlite_single_probe_across_processes(tmp_path, clock):
+    """Deux stores sur le même fichier (deux process): une seule sonde"""
+    path = str(tmp_path / 'overpass.sqlite')
+    first, second = SQLiteOverpassStore(path=path), SQLiteOverpassStore(path=path)
+    first.open_breaker(clock.now + 30)
+
+    assert first.acquire_probe(ttl_s=5) is True
+    assert second.acquire_probe(ttl_s=5) is False
+    assert second.breaker_open_until() == clock.now + 30
+
+    # Sonde réussie: breaker fermé et verrou libéré pour tous
+    first.close_breaker()
+    assert second.breaker_open_until() is None
+    assert second.acquire_probe(ttl_s=5) is True
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Tests de _overpass_hedged (green_space_analyzer.py): délai de secours,
+ordre de bascule entre serveurs classés, résultats partiels ('remark')
+Les requêtes sont simulées (_overpass_attempt remplacé)
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import green_space_analyzer as gsa
+from green_space_analyzer import OverpassServerStats, OverpassUnavailable, _overpass_hedged
+
+SERVERS = ['https://a.test/api', 'https://b.test/api', 'https://c.test/api']
+HEDGE_S = 0.2
+
+
+def _http_error(status: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"HTTP {status}", response=response)
+
+
+class FakeServers:
+    """
+    Remplace _overpass_attempt: comportement par serveur
+    (délai, puis réponse ou exception), appels horodatés
+    """
+
+    def __init__(self, behaviours: dict):
+        self.behaviours = behaviours
+        self.calls = []
+        self.started = time.monotonic()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, server_url: str, query: str, timeout: float) -> dict:
+        with self._lock:
+            self.calls.append((server_url, time.monotonic() - self.started))
+        delay, outcome = self.behaviours[server_url]
+        if delay:
+            self.release.wait(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    @property
+    def order(self):
+        return [server for server, _ in self.calls]
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """Installe des serveurs simulés (classement initial = ordre de SERVERS)"""
+    monkeypatch.setattr(gsa, '_overpass_stats', OverpassServerStats(SERVERS))
+    monkeypatch.setattr(gsa, 'OVERPASS_HEDGE_DEFAULT_S', HEDGE_S)
+    monkeypatch.setattr(gsa, 'OVERPASS_HEDGE_MIN_S', 0.0)
+    installed = []
+
+    def install(behaviours: dict) -> FakeServers:
+        fake = FakeServers(behaviours)
+        monkeypatch.setattr(gsa, '_overpass_attempt', fake)
+        installed.append(fake)
+        return fake
+
+    yield install
+    for fake in installed:
+        fake.release.set()
+
+
+def test_fast_primary_no_hedge(servers):
+    fake = servers({
+        SERVERS[0]: (0, {'elements': ['a']}),
+        SERVERS[1]: (0, {'elements': ['b']}),
+        SERVERS[2]: (0, {'elements': ['c']}),
+    })
+    assert _overpass_hedged('q', timeout=5) == {'elements': ['a']}
+    assert fake.order == [SERVERS[0]]
+
+
+def test_slow_primary_hedges_after_delay(servers):
+    fake = servers({
+        SERVERS[0]: (5, {'elements': ['a']}),
+        SERVERS[1]: (0, {'elements': ['b']}),
+        SERVERS[2]: (0, {'elements': ['c']}),
+    })
+    started = time.monotonic()
+    assert _overpass_hedged('q', timeout=5) == {'elements': ['b']}
+    assert fake.order == [SERVERS[0], SERVERS[1]]
+    # Secours lancé après le délai de secours, pas avant
+    assert fake.calls[1][1] >= HEDGE_S * 0.9
+    assert time.monotonic() - started < HEDGE_S + 1.0
+
+
+def test_hedge_delay_follows_server_latency_percentile(servers, monkeypatch):
+    stats = OverpassServerStats(SERVERS)
+    for latency in [0.1] * 9 + [0.4]:
+        stats.record(SERVERS[0], latency, ok=True)
+    monkeypatch.setattr(gsa, '_overpass_stats', stats)
+    monkeypatch.setattr(gsa, 'OVERPASS_HEDGE_PERCENTILE', 0.9)
+    assert stats.hedge_delay(SERVERS[0]) == pytest.approx(0.1)
+    monkeypatch.setattr(gsa, 'OVERPASS_HEDGE_PERCENTILE', 1.0)
+    assert stats.hedge_delay(SERVERS[0]) == pytest.approx(0.4)
+
+
+def test_failure_launches_next_server_without_waiting(servers, monkeypatch):
+    monkeypatch.setattr(gsa, 'OVERPASS_HEDGE_DEFAULT_S', 10.0)
+    fake = servers({
+        SERVERS[0]: (0, requests.exceptions.ConnectionError('down')),
+        SERVERS[1]: (0, _http_error(503)),
+        SERVERS[2]: (0, {'elements': ['c']}),
+    })
+    started = time.monotonic()
+    assert _overpass_hedged('q', timeout=5) == {'elements': ['c']}
+    assert fake.order == SERVERS
+    assert time.monotonic() - started < 1.0
+
+
+def test_failover_follows_ranking(servers, monkeypatch):
+    stats = OverpassServerStats(SERVERS)
+    for _ in range(5):
+        stats.record(SERVERS[0], 3.0, ok=True)
+        stats.record(SERVERS[1], 0.5, ok=False)
+        stats.record(SERVERS[2], 0.5, ok=True)
+    monkeypatch.setattr(gsa, '_overpass_stats', stats)
+    assert stats.ranked() == [SERVERS[2], SERVERS[0], SERVERS[1]]
+
+    fake = servers({
+        SERVERS[0]: (0, requests.exceptions.Timeout('slow')),
+        SERVERS[1]: (0, {'elements': ['b']}),
+        SERVERS[2]: (0, requests.exceptions.ConnectionError('down')),
+    })
+    assert _overpass_hedged('q', timeout=5) == {'elements': ['b']}
+    assert fake.order == [SERVERS[2], SERVERS[0], SERVERS[1]]
+
+
+def test_partial_result_is_superseded_by_complete_one(servers):
+    fake = servers({
+        SERVERS[0]: (0, {'elements': ['a'], 'remark': 'runtime error: out of memory'}),
+        SERVERS[1]: (0, {'elements': ['b']}),
+        SERVERS[2]: (0, {'elements': ['c']}),
+    })
+    assert _overpass_hedged('q', timeout=5) == {'elements': ['b']}
+    assert fake.order == [SERVERS[0], SERVERS[1]]
+
+
+def test_partial_result_returned_when_nothing_better(servers):
+    partial = {'elements': ['a'], 'remark': 'runtime error: timeout'}
+    servers({
+        SERVERS[0]: (0, partial),
+        SERVERS[1]: (0, _http_error(429)),
+        SERVERS[2]: (0, requests.exceptions.ConnectionError('down')),
+    })
+    assert _overpass_hedged('q', timeout=5) == partial
+
+
+def test_all_servers_failing_raises_unavailable(servers):
+    fake = servers({server: (0, requests.exceptions.ConnectionError('down')) for server in SERVERS})
+    with pytest.raises(OverpassUnavailable):
+        _overpass_hedged('q', timeout=5)
+    assert fake.order == SERVERS
+
+
+def test_non_retryable_http_error_is_raised(servers):
+    fake = servers({
+        SERVERS[0]: (0, _http_error(400)),
+        SERVERS[1]: (0, {'elements': ['b']}),
+        SERVERS[2]: (0, {'elements': ['c']}),
+    })
+    with pytest.raises(requests.exceptions.HTTPError):
+        _overpass_hedged('q', timeout=5)
+    assert fake.order == [SERVERS[0]]
+
+
+def test_total_timeout(servers, monkeypatch):
+    monkeypatch.setattr(gsa, 'OVERPASS_TOTAL_TIMEOUT_S', 0.5)
+    fake = servers({server: (5, {'elements': []}) for server in SERVERS})
+    started = time.monotonic()
+    with pytest.raises(OverpassUnavailable):
+        _overpass_hedged('q', timeout=5)
+    assert time.monotonic() - started < 1.5
+    # Tous les serveurs ont été tentés en secours avant l'échéance
+    assert fake.order == SERVERS
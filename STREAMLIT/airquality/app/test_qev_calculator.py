@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests de qev_calculator: chemin vectorisé (calculate_qev_batch) comparé
+au calcul scalaire (calculate_qev) ligne par ligne, et QeVSubIndices.rescore
+"""
+
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from qev_calculator import (
+    BATCH_POLLUTANTS,
+    BELAQI_BREAKPOINTS,
+    AirQualityData,
+    GreenSpaceData,
+    QeVSubIndices,
+    TrafficData,
+    calculate_qev,
+    calculate_qev_batch,
+)
+
+N_ROWS = 5000
+
+
+def _random_inputs(seed: int, n: int = N_ROWS) -> dict:
+    """Entrées aléatoires avec bornes BelAQI exactes, NaN, zéros et sentinelles 999"""
+    rng = np.random.default_rng(seed)
+    inputs = {}
+    for name, table in BATCH_POLLUTANTS.items():
+        edges = np.array(sorted({bound for low, high, _ in BELAQI_BREAKPOINTS[table]
+                                 for bound in (low, high) if math.isfinite(bound)}))
+        values = rng.uniform(0, edges[-1] * 1.5, n)
+        on_edge = rng.random(n) < 0.2
+        values[on_edge] = rng.choice(edges, on_edge.sum())
+        values[rng.random(n) < 0.15] = np.nan
+        inputs[name] = values
+
+    for name in ('light_vehicles', 'utility_vehicles', 'heavy_vehicles'):
+        values = rng.integers(0, 3000, n).astype(float)
+        values[rng.random(n) < 0.2] = 0.0
+        inputs[name] = values
+
+    inputs['trees_visible'] = rng.integers(0, 8, n).astype(float)
+    canopy = rng.uniform(0, 60, n)
+    canopy[rng.random(n) < 0.1] = 30.0
+    inputs['canopy_coverage_pct'] = canopy
+    distance = rng.uniform(0, 2000, n)
+    distance[rng.random(n) < 0.1] = 300.0
+    distance[rng.random(n) < 0.1] = 999.0
+    inputs['distance_to_green_space_m'] = distance
+    return inputs
+
+
+def _scalar(inputs: dict, i: int, **kwargs):
+    """calculate_qev sur la ligne i (NaN ≙ polluant absent)"""
+    pollutant = lambda name: None if np.isnan(inputs[name][i]) else float(inputs[name][i])
+    return calculate_qev(
+        AirQualityData(**{name: pollutant(name) for name in BATCH_POLLUTANTS}),
+        TrafficData(
+            light_vehicles=inputs['light_vehicles'][i],
+            utility_vehicles=inputs['utility_vehicles'][i],
+            heavy_vehicles=inputs['heavy_vehicles'][i],
+        ),
+        GreenSpaceData(
+            trees_visible=inputs['trees_visible'][i],
+            canopy_coverage_pct=inputs['canopy_coverage_pct'][i],
+            distance_to_green_space_m=inputs['distance_to_green_space_m'][i],
+        ),
+        **kwargs
+    )
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'custom_weights': {'air': 0.6, 'traffic': 0.1, 'green': 0.3}},
+    {'custom_bounds': {'air_index': (1, 8), 'traffic_nuisance': (100, 3000), 'green_index': (0, 1)}},
+])
+def test_batch_matches_scalar(kwargs):
+    inputs = _random_inputs(seed=len(kwargs) + 11)
+    batch = calculate_qev_batch(**inputs, **kwargs)
+    assert len(batch) == N_ROWS
+
+    for i in range(N_ROWS):
+        expected = _scalar(inputs, i, **kwargs)
+        assert batch.raw_air_index[i] == expected.raw_air_index
+        assert batch.raw_traffic_nuisance[i] == expected.raw_traffic_nuisance
+        assert batch.raw_green_index[i] == expected.raw_green_index
+        assert batch.normalized_air_score[i] == expected.normalized_air_score
+        assert batch.normalized_traffic_score[i] == expected.normalized_traffic_score
+        assert batch.normalized_green_score[i] == expected.normalized_green_score
+        assert batch.qev_score[i] == expected.qev_score
+        assert batch.qev_category[i] == expected.qev_category
+        assert batch.data_completeness[i] == expected.data_completeness
+        assert batch.confidence_level[i] == expected.confidence_level
+        for name, values in batch.raw_air_sub_indices.items():
+            if name in expected.raw_air_sub_indices:
+                assert values[i] == expected.raw_air_sub_indices[name]
+            else:
+                assert np.isnan(values[i])
+
+
+def test_batch_broadcasts_scalars():
+    batch = calculate_qev_batch(no2=[10.0, 55.0, np.nan], light_vehicles=120, distance_to_green_space_m=250.0)
+    assert len(batch) == 3
+    for i, no2 in enumerate([10.0, 55.0, None]):
+        expected = calculate_qev(AirQualityData(no2=no2), TrafficData(light_vehicles=120),
+                                 GreenSpaceData(distance_to_green_space_m=250.0))
+        assert batch.qev_score[i] == expected.qev_score
+        assert batch.qev_category[i] == expected.qev_category
+
+
+def test_batch_without_pollutants_defaults_to_best_air_index():
+    batch = calculate_qev_batch(light_vehicles=[0.0, 500.0])
+    assert batch.raw_air_index.tolist() == [1.0, 1.0]
+    assert np.isnan(batch.raw_air_sub_indices['no2']).all()
+
+
+# ============================================================
+# RESCORE (QeVSubIndices)
+# ============================================================
+
+SCORE_FIELDS = ('normalized_air_score', 'normalized_traffic_score', 'normalized_green_score', 'qev_score')
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'custom_weights': {'air': 0.6, 'traffic': 0.1, 'green': 0.3}},
+    {'custom_bounds': {'air_index': (1, 8), 'traffic_nuisance': (100, 3000), 'green_index': (0, 1)}},
+    {'custom_weights': {'air': 0.2, 'traffic': 0.2, 'green': 0.6},
+     'custom_bounds': {'air_index': (2, 6), 'traffic_nuisance': (0, 1500), 'green_index': (0, 1)}},
+])
+def test_rescore_matches_scalar(kwargs):
+    """Sous-indices calculés une fois (pondérations par défaut), rescorés ensuite"""
+    inputs = _random_inputs(seed=len(kwargs) + 23, n=1000)
+    rescored = QeVSubIndices.from_batch(calculate_qev_batch(**inputs)).rescore(**kwargs)
+
+    for i in range(1000):
+        expected = _scalar(inputs, i, **kwargs)
+        for field in SCORE_FIELDS:
+            assert rescored[field][i] == getattr(expected, field)
+        assert rescored['qev_category'][i] == expected.qev_category
+
+
+@pytest.mark.parametrize('pollutants', [('no2',), ('pm25', 'pm10'), ('o3', 'so2', 'no2')])
+def test_rescore_pollutant_subset(pollutants):
+    """Indice air restreint = calcul avec les seuls polluants retenus"""
+    inputs = _random_inputs(seed=31, n=1000)
+    rescored = QeVSubIndices.from_batch(calculate_qev_batch(**inputs)).rescore(pollutants=pollutants)
+
+    subset = {name: values for name, values in inputs.items() if name not in BATCH_POLLUTANTS or name in pollutants}
+    expected = calculate_qev_batch(**subset)
+    for field in SCORE_FIELDS:
+        np.testing.assert_array_equal(rescored[field], getattr(expected, field))
+    np.testing.assert_array_equal(rescored['qev_category'], expected.qev_category)
+
+
+def test_rescore_from_frame_roundtrip():
+    inputs = _random_inputs(seed=37, n=200)
+    batch = calculate_qev_batch(**inputs)
+    frame = {
+        'raw_air_index': batch.raw_air_index,
+        'raw_traffic_nuisance': batch.raw_traffic_nuisance,
+        'raw_green_index': batch.raw_green_index,
+        **{f'sub_index_{name}': values for name, values in batch.raw_air_sub_indices.items()},
+    }
+    sub_indices = QeVSubIndices.from_frame(pd.DataFrame(frame))
+    assert len(sub_indices) == 200
+    assert sub_indices.labels is None
+
+    weights = {'air': 0.5, 'traffic': 0.25, 'green': 0.25}
+    rescored = sub_indices.rescore(custom_weights=weights, pollutants=('no2', 'pm25'))
+    expected = QeVSubIndices.from_batch(batch).rescore(custom_weights=weights, pollutants=('no2', 'pm25'))
+    for field in SCORE_FIELDS:
+        np.testing.assert_array_equal(rescored[field], expected[field])
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests de qev_raster: interpolation IDW, calcul d'une bande (_score_band)
+et construction/reprise d'un petit raster (build_raster)
+"""
+
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import qev_raster
+from qev_calculator import AirQualityData, GreenSpaceData, TrafficData, calculate_qev
+from qev_raster import (
+    RASTER_INPUTS,
+    RASTER_LAYERS,
+    RasterGrid,
+    _score_band,
+    build_raster,
+    idw_apply,
+    idw_interpolate,
+    idw_weights,
+    load_raster,
+)
+
+# ~1 km × 1 km autour de la Grand-Place, cellules de 100 m
+GRID = RasterGrid(south=50.842, west=4.346, north=50.851, east=4.360, cell_size_m=100.0)
+RADIUS_M = 400.0
+WEIGHTS = {'air': 0.6, 'traffic': 0.1, 'green': 0.3}
+
+
+def _points() -> dict:
+    """Trois adresses; la troisième sans mesure de NO2"""
+    points = {name: np.full(3, np.nan) for name in RASTER_INPUTS}
+    points['lat'] = np.array([50.8435, 50.8466, 50.8495])
+    points['lon'] = np.array([4.3490, 4.3528, 4.3570])
+    points['no2'] = np.array([20.0, 45.0, np.nan])
+    points['pm25'] = np.array([8.0, 15.0, 30.0])
+    points['light_vehicles'] = np.array([200.0, 1500.0, 50.0])
+    points['canopy_coverage_pct'] = np.array([40.0, 5.0, 20.0])
+    points['distance_to_green_space_m'] = np.array([100.0, 600.0, 250.0])
+    return points
+
+
+def _cell_of(grid: RasterGrid, lat: float, lon: float):
+    return int((grid.north - lat) // grid.lat_step), int((lon - grid.west) // grid.lon_step)
+
+
+# ============================================================
+# IDW
+# ============================================================
+
+def test_idw_apply_matches_interpolate_per_layer():
+    points = _points()
+    lat, lon = GRID.cell_centers(0, GRID.rows)
+    idw = idw_weights(lat, lon, points['lat'], points['lon'], RADIUS_M)
+    for name in ('no2', 'pm25', 'light_vehicles'):
+        expected = idw_interpolate(lat, lon, points['lat'], points['lon'], points[name], RADIUS_M)
+        np.testing.assert_allclose(idw_apply(idw, points[name]), expected, rtol=1e-4)
+
+
+def test_idw_apply_without_known_values():
+    lat, lon = GRID.cell_centers(0, 2)
+    idw = idw_weights(lat, lon, np.array([50.8466]), np.array([4.3528]), RADIUS_M)
+    assert np.isnan(idw_apply(idw, np.array([np.nan]))).all()
+
+
+# ============================================================
+# BANDES
+# ============================================================
+
+def _task(row0: int, row1: int, weights=None, bounds=None) -> tuple:
+    return (row0, row1, asdict(GRID), _points(), RADIUS_M, qev_raster.IDW_POWER, weights, bounds)
+
+
+def test_score_band_shape_and_custom_weights():
+    row0, layers = _score_band(_task(0, GRID.rows, weights=WEIGHTS))
+    assert row0 == 0
+    assert layers.shape == (len(RASTER_LAYERS), GRID.rows, GRID.cols)
+    assert layers.dtype == np.float32
+
+    # Pondérations QeV transmises (et non la matrice IDW)
+    _, default_layers = _score_band(_task(0, GRID.rows))
+    qev = list(RASTER_LAYERS).index('qev')
+    known = ~np.isnan(layers[qev])
+    assert known.any()
+    assert not np.allclose(layers[qev][known], default_layers[qev][known])
+
+
+def test_score_band_cell_on_address_matches_scalar():
+    points = _points()
+    row, col = _cell_of(GRID, points['lat'][1], points['lon'][1])
+    _, layers = _score_band(_task(0, GRID.rows, weights=WEIGHTS))
+
+    # Au centre de la cellule, l'adresse domine sans égaler exactement sa valeur
+    lat, lon = GRID.cell_centers(row, row + 1)
+    idw = idw_weights(lat[col:col + 1], lon[col:col + 1], points['lat'], points['lon'], RADIUS_M)
+    cell = {name: float(idw_apply(idw, points[name])[0]) for name in RASTER_INPUTS}
+    nan_to_none = lambda value: None if np.isnan(value) else value
+    expected = calculate_qev(
+        AirQualityData(no2=nan_to_none(cell['no2']), pm25=nan_to_none(cell['pm25'])),
+        TrafficData(light_vehicles=cell['light_vehicles']),
+        GreenSpaceData(canopy_coverage_pct=cell['canopy_coverage_pct'],
+                       distance_to_green_space_m=cell['distance_to_green_space_m']),
+        custom_weights=WEIGHTS
+    )
+    assert layers[list(RASTER_LAYERS).index('qev'), row, col] == pytest.approx(expected.qev_score, abs=1e-5)
+
+
+def test_score_band_leaves_cells_without_air_empty():
+    far = dict(_points(), lat=np.array([50.90, 50.90, 50.90]), lon=np.array([4.40, 4.40, 4.40]))
+    task = (0, 2, asdict(GRID), far, RADIUS_M, qev_raster.IDW_POWER, None, None)
+    _, layers = _score_band(task)
+    assert np.isnan(layers).all()
+
+
+# ============================================================
+# CONSTRUCTION ET REPRISE
+# ============================================================
+
+@pytest.fixture
+def raster_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(qev_raster, 'RASTER_DIR', tmp_path)
+    return tmp_path
+
+
+def test_build_raster_matches_bands_and_resumes(raster_dir, monkeypatch):
+    # Bandes de 2 lignes: plusieurs tâches pour le pool
+    monkeypatch.setattr(qev_raster, 'BAND_MAX_PAIRS', GRID.cols * 3 * 2)
+    manifest = build_raster(_points(), GRID, name='test', workers=1, radius_m=RADIUS_M,
+                            custom_weights=WEIGHTS)
+    assert manifest['band_rows'] == 2
+    assert manifest['completed_at'] is not None
+    assert manifest['done'] == list(range(0, GRID.rows, 2))
+
+    raster, loaded = load_raster('test')
+    assert loaded['fingerprint'] == manifest['fingerprint']
+    _, expected = _score_band(_task(0, GRID.rows, weights=WEIGHTS))
+    np.testing.assert_array_equal(np.asarray(raster), expected)
+
+    # Mêmes entrées: aucune bande recalculée
+    def fail(task):
+        raise AssertionError('bande recalculée')
+    monkeypatch.setattr(qev_raster, '_score_band', fail)
+    assert build_raster(_points(), GRID, name='test', workers=1, radius_m=RADIUS_M,
+                        custom_weights=WEIGHTS)['done'] == manifest['done']
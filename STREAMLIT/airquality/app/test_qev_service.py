@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Tests de qev_service: orchestration des étapes (run_qev_stages, échéance,
+étape en échec), repli par étape dans calculate_qev_for_address et séries
+QeV (calculate_qev_series) comparées au calcul scalaire par période
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import qev_service
+from qev_calculator import AirQualityData, GreenSpaceData, TrafficData, calculate_qev
+from qev_service import SERIES_GRANULARITIES, STAGE_FALLBACKS, QeVService, run_qev_stages
+
+PARKS = (120.0, 'Parc de Bruxelles', 1.5)
+TREES = {'total_trees': 4, 'detection_arbres': 4, 'detection_general': 0, 'images_analyzed': 2}
+CANOPY = {'canopy_coverage_pct': 35.0, 'vegetation_area_m2': 350.0, 'total_area_analyzed_m2': 1000.0,
+          'method': 'segmentation'}
+TRAFFIC = {'light_vehicles': 300, 'utility_vehicles': 40, 'heavy_vehicles': 10, 'road_type': 'secondary'}
+
+
+@pytest.fixture
+def release():
+    """Débloque les étapes lentes en fin de test (threads non attendus par run_qev_stages)"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+# ============================================================
+# RUN_QEV_STAGES
+# ============================================================
+
+def test_all_stages_ok():
+    outcomes = run_qev_stages({'a': lambda: 1, 'b': lambda: 'deux'}, fallbacks={'a': 0, 'b': ''})
+    assert {name: outcome.value for name, outcome in outcomes.items()} == {'a': 1, 'b': 'deux'}
+    assert all(outcome.status == 'ok' and outcome.ok for outcome in outcomes.values())
+
+
+def test_failing_stage_uses_fallback_others_unaffected():
+    def boom():
+        raise RuntimeError('Overpass 504')
+
+    outcomes = run_qev_stages({'traffic': boom, 'trees': lambda: TREES}, fallbacks=STAGE_FALLBACKS)
+    assert outcomes['traffic'].status == 'error'
+    assert not outcomes['traffic'].ok
+    assert outcomes['traffic'].value is STAGE_FALLBACKS['traffic']
+    assert 'Overpass 504' in outcomes['traffic'].error
+    assert outcomes['trees'].status == 'ok'
+    assert outcomes['trees'].value == TREES
+
+
+def test_stages_run_concurrently():
+    def slow(value):
+        def run():
+            time.sleep(0.3)
+            return value
+        return run
+
+    started = time.monotonic()
+    outcomes = run_qev_stages({name: slow(name) for name in 'abcd'}, fallbacks={})
+    assert time.monotonic() - started < 0.9
+    assert [outcome.value for outcome in outcomes.values()] == list('abcd')
+    assert all(outcome.elapsed_s >= 0.29 for outcome in outcomes.values())
+
+
+def test_deadline_returns_fallback_without_waiting(release):
+    def stuck():
+        release.wait(10)
+        return 'trop tard'
+
+    started = time.monotonic()
+    outcomes = run_qev_stages({'parks': stuck, 'canopy': lambda: CANOPY},
+                              fallbacks=STAGE_FALLBACKS, deadline_s=0.3)
+    assert time.monotonic() - started < 1.0
+    assert outcomes['parks'].status == 'timeout'
+    assert outcomes['parks'].value == STAGE_FALLBACKS['parks']
+    assert outcomes['parks'].elapsed_s >= 0.3
+    assert outcomes['canopy'].status == 'ok'
+
+
+# ============================================================
+# CALCULATE_QEV_FOR_ADDRESS
+# ============================================================
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Étapes du service remplacées (aucun appel Overpass ni lecture d'image)"""
+    behaviours = {
+        'traffic': lambda lat, lon: TRAFFIC,
+        'parks': lambda lat, lon, raise_errors=False: PARKS,
+        'trees': lambda address: TREES,
+        'canopy': lambda address: CANOPY,
+    }
+    monkeypatch.setattr(qev_service, 'estimate_traffic_from_osm', lambda lat, lon: behaviours['traffic'](lat, lon))
+    monkeypatch.setattr(qev_service, 'calculate_distance_to_nearest_park',
+                        lambda lat, lon, raise_errors=False: behaviours['parks'](lat, lon, raise_errors))
+    monkeypatch.setattr(qev_service, 'analyze_trees_from_yolo', lambda address: behaviours['trees'](address))
+    monkeypatch.setattr(qev_service, 'analyze_canopy_from_segmentation',
+                        lambda address: behaviours['canopy'](address))
+    return behaviours
+
+
+def _calculate(**kwargs):
+    return QeVService().calculate_qev_for_address('Grand-Place 1, 1000 Bruxelles', 50.8466, 4.3528, **kwargs)
+
+
+def test_service_all_stages_ok(stages):
+    result = _calculate()
+    assert result['degraded_stages'] == []
+    assert result['osm_traffic_available'] is True
+    assert set(result['stage_timings']) == {'traffic', 'parks', 'trees', 'canopy'}
+    assert result['raw_indicators']['traffic']['light_vehicles'] == TRAFFIC['light_vehicles']
+    assert result['raw_indicators']['green']['distance_to_nearest_park_m'] == PARKS[0]
+
+
+def test_service_failing_parks_stage_is_degraded(stages):
+    seen = {}
+
+    def unavailable(lat, lon, raise_errors):
+        seen['raise_errors'] = raise_errors
+        raise RuntimeError('Overpass indisponible')
+
+    stages['parks'] = unavailable
+    result = _calculate()
+    # Overpass en panne: repli "pas de parc" signalé, jamais confondu avec un vrai résultat
+    assert seen['raise_errors'] is True
+    assert result['degraded_stages'] == ['parks']
+    assert result['raw_indicators']['green']['distance_to_nearest_park_m'] == STAGE_FALLBACKS['parks'][0]
+    assert result['raw_indicators']['green']['trees_visible_count'] == TREES['total_trees']
+
+
+def test_service_deadline_degrades_slow_stage(stages, release):
+    stages['canopy'] = lambda address: release.wait(10) or CANOPY
+
+    started = time.monotonic()
+    result = _calculate(deadline_s=0.3)
+    assert time.monotonic() - started < 1.5
+    assert result['degraded_stages'] == ['canopy']
+    assert result['raw_indicators']['green']['canopy_coverage_pct'] == 0.0
+
+
+def test_service_manual_traffic_skips_traffic_stage(stages):
+    def fail(lat, lon):
+        raise AssertionError('étape trafic lancée')
+
+    stages['traffic'] = fail
+    result = _calculate(traffic_data={'light_vehicles': 50, 'utility_vehicles': 5, 'heavy_vehicles': 1})
+    assert 'traffic' not in result['stage_timings']
+    assert result['raw_indicators']['traffic']['light_vehicles'] == 50
+
+
+# ============================================================
+# CALCULATE_QEV_SERIES
+# ============================================================
+
+GREEN = {'trees_visible_count': 2, 'canopy_coverage_pct': 18.0, 'distance_to_nearest_park_m': 420.0}
+
+
+def _air_series(seed: int = 7, days: int = 10) -> pd.DataFrame:
+    """Mesures horaires irrégulières: doublons, trous d'une journée, NaN"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2026-03-01', periods=days * 24, freq='h')
+    dates = dates[(dates < '2026-03-04') | (dates >= '2026-03-05')]   # 4 mars absent
+    dates = dates.append(dates[rng.choice(len(dates), min(40, len(dates)), replace=False)] + pd.Timedelta(minutes=20))
+    n = len(dates)
+    df = pd.DataFrame({
+        'date': dates,
+        'nitrogen_dioxide': rng.uniform(5, 90, n),
+        'pm2_5': rng.uniform(1, 40, n),
+        'pm10': rng.uniform(5, 70, n),
+        'ozone': rng.uniform(10, 180, n),
+        'sulphur_dioxide': rng.uniform(0, 15, n),
+    })
+    for col in ('nitrogen_dioxide', 'ozone', 'sulphur_dioxide'):
+        df.loc[rng.random(n) < 0.2, col] = np.nan
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def _scalar_period(means: pd.Series):
+    value = lambda col: None if pd.isna(means.get(col)) else float(means[col])
+    return calculate_qev(
+        AirQualityData(no2=value('nitrogen_dioxide'), pm25=value('pm2_5'), pm10=value('pm10'),
+                       o3=value('ozone'), so2=value('sulphur_dioxide')),
+        TrafficData(**{key: TRAFFIC[key] for key in ('light_vehicles', 'utility_vehicles', 'heavy_vehicles')}),
+        GreenSpaceData(trees_visible=GREEN['trees_visible_count'],
+                       canopy_coverage_pct=GREEN['canopy_coverage_pct'],
+                       distance_to_green_space_m=GREEN['distance_to_nearest_park_m'])
+    )
+
+
+@pytest.mark.parametrize('granularity', list(SERIES_GRANULARITIES))
+def test_series_matches_scalar_per_period(granularity):
+    df = _air_series()
+    series = QeVService().calculate_qev_series(df, TRAFFIC, GREEN, granularity=granularity)
+
+    freq = SERIES_GRANULARITIES[granularity][0]
+    grouped = df.assign(period=pd.to_datetime(df['date']).dt.floor(freq)).groupby('period')
+    means = grouped[['nitrogen_dioxide', 'pm2_5', 'pm10', 'ozone', 'sulphur_dioxide']].mean()
+    # Périodes sans mesure (4 mars) absentes, pas de ligne vide
+    assert list(series.index) == list(means.index)
+    assert series.index.name == 'period_start'
+    assert pd.Timestamp('2026-03-04') not in series.index
+
+    for period, row in means.iterrows():
+        expected = _scalar_period(row)
+        actual = series.loc[period]
+        assert actual['raw_air_index'] == expected.raw_air_index
+        assert actual['qev_score'] == pytest.approx(expected.qev_score, abs=1e-12)
+        assert actual['qev_category'] == expected.qev_category
+        assert actual['normalized_green_score'] == pytest.approx(expected.normalized_green_score, abs=1e-12)
+
+
+@pytest.mark.parametrize('granularity', list(SERIES_GRANULARITIES))
+def test_series_rolling_quantiles(granularity):
+    series = QeVService().calculate_qev_series(_air_series(seed=3), TRAFFIC, GREEN, granularity=granularity)
+    window = pd.Timedelta(SERIES_GRANULARITIES[granularity][1])
+
+    for period in series.index:
+        # Fenêtre temporelle (period - window, period]: les trous ne l'élargissent pas
+        values = series['qev_score'][(series.index > period - window) & (series.index <= period)].to_numpy()
+        for column, q in (('qev_p10', 0.10), ('qev_p50', 0.50), ('qev_p90', 0.90)):
+            assert series.loc[period, column] == pytest.approx(np.quantile(values, q), abs=1e-12)
+    assert (series['qev_p10'] <= series['qev_p50']).all()
+    assert (series['qev_p50'] <= series['qev_p90']).all()
+
+
+def test_series_default_traffic_and_empty_inputs():
+    service = QeVService()
+    series = service.calculate_qev_series(_air_series(days=2), None, GREEN, granularity='day')
+    default = service._prepare_traffic_data(None)
+    assert len(series) == 2
+    assert series['raw_traffic_nuisance'].nunique() == 1
+    assert series['raw_traffic_nuisance'].iloc[0] == calculate_qev(
+        AirQualityData(), default, GreenSpaceData()).raw_traffic_nuisance
+
+    assert service.calculate_qev_series(pd.DataFrame(), TRAFFIC, GREEN).empty
+    all_nan = _air_series(days=1).assign(nitrogen_dioxide=np.nan, pm2_5=np.nan, pm10=np.nan,
+                                         ozone=np.nan, sulphur_dioxide=np.nan)
+    assert service.calculate_qev_series(all_nan, TRAFFIC, GREEN).empty
+    with pytest.raises(ValueError):
+        service.calculate_qev_series(_air_series(days=1), TRAFFIC, GREEN, granularity='week')
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests du cache de lecture (db_utils_postgres.py): ReadCache (éviction LRU
+au budget mémoire, copies), cached_read (clé versionnée) et
+invalidate_read_cache
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Client Prisma généré requis (prisma generate)
+pytest.importorskip('prisma.models')
+
+import db_utils_postgres
+from db_utils_postgres import ReadCache, cached_read, invalidate_read_cache
+
+
+def _frame(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({'no2': [float(i) for i in range(rows)], 'pm25': [1.0] * rows})
+
+
+# ============================================================
+# READCACHE
+# ============================================================
+
+def test_get_returns_copy():
+    cache = ReadCache(max_bytes=1024 * 1024)
+    cache.put(('t', 1), _frame())
+    first = cache.get(('t', 1))
+    first.loc[0, 'no2'] = -1.0
+    assert cache.get(('t', 1)).loc[0, 'no2'] == 0.0
+    assert cache.get(('t', 2)) is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_evicts_least_recently_used_over_budget():
+    size = ReadCache._sizeof(_frame())
+    cache = ReadCache(max_bytes=size * 2)
+    cache.put(('t', 1), _frame())
+    cache.put(('t', 2), _frame())
+    assert cache.get(('t', 1)) is not None  # ('t', 2) devient la moins récemment utilisée
+    cache.put(('t', 3), _frame())
+
+    assert cache.get(('t', 2)) is None
+    assert cache.get(('t', 1)) is not None
+    assert cache.get(('t', 3)) is not None
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = ReadCache(max_bytes=ReadCache._sizeof(_frame(10)))
+    cache.put(('t', 1), _frame(10))
+    cache.put(('t', 2), _frame(1000))
+    assert cache.get(('t', 2)) is None
+    assert cache.get(('t', 1)) is not None
+
+
+def test_put_replaces_entry_without_leaking_bytes():
+    cache = ReadCache(max_bytes=1024 * 1024)
+    cache.put(('t', 1), _frame(100))
+    cache.put(('t', 1), _frame(10))
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == ReadCache._sizeof(_frame(10))
+
+
+def test_invalidate_by_table_and_address():
+    cache = ReadCache(max_bytes=1024 * 1024)
+    for table in ('air_quality_records', 'weather_records'):
+        for address_id in (1, 2):
+            cache.put((table, address_id, None, 0, ()), {'v': address_id})
+
+    assert cache.invalidate('air_quality_records', [1]) == 1
+    assert cache.get(('air_quality_records', 1, None, 0, ())) is None
+    assert cache.get(('air_quality_records', 2, None, 0, ())) == {'v': 2}
+    assert cache.get(('weather_records', 1, None, 0, ())) == {'v': 1}
+
+    assert cache.invalidate('weather_records') == 2
+    assert cache.invalidate() == 1
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+# ============================================================
+# CACHED_READ / INVALIDATE_READ_CACHE
+# ============================================================
+
+@pytest.fixture
+def versions(monkeypatch):
+    """Versions de séries contrôlées (pas de base): {(table, address_id): (last_ts, rows)}"""
+    table = {}
+
+    async def series_version(name, address_id):
+        return table.get((name, address_id), (None, 0))
+
+    monkeypatch.setattr(db_utils_postgres, 'READ_CACHE', ReadCache(max_bytes=1024 * 1024))
+    monkeypatch.setattr(db_utils_postgres, 'series_version', series_version)
+    return table
+
+
+def _loader(calls: list, value):
+    async def load():
+        calls.append(1)
+        return value
+    return load
+
+
+def test_cached_read_hits_until_version_changes(versions):
+    calls = []
+    versions[('air_quality_records', 1)] = ('2026-01-01T00:00', 24)
+    read = lambda: asyncio.run(cached_read('air_quality_records', 1, ('24h',), _loader(calls, _frame())))
+
+    pd.testing.assert_frame_equal(read(), _frame())
+    pd.testing.assert_frame_equal(read(), _frame())
+    assert len(calls) == 1
+
+    # Nouvel insert: nouvelle version, nouvelle lecture
+    versions[('air_quality_records', 1)] = ('2026-01-01T01:00', 25)
+    read()
+    assert len(calls) == 2
+
+
+def test_cached_read_keys_on_params(versions):
+    calls = []
+    asyncio.run(cached_read('air_quality_records', 1, ('24h',), _loader(calls, _frame())))
+    asyncio.run(cached_read('air_quality_records', 1, ('7d',), _loader(calls, _frame())))
+    assert len(calls) == 2
+
+
+def test_cached_read_does_not_cache_none(versions):
+    calls = []
+    assert asyncio.run(cached_read('weather_records', 1, (), _loader(calls, None))) is None
+    assert asyncio.run(cached_read('weather_records', 1, (), _loader(calls, None))) is None
+    assert len(calls) == 2
+
+
+def test_invalidate_read_cache_forces_reload(versions):
+    calls = []
+    read = lambda address_id: asyncio.run(
+        cached_read('air_quality_records', address_id, (), _loader(calls, {'id': address_id}))
+    )
+    read(1)
+    read(2)
+    assert len(calls) == 2
+
+    # force_update: valeurs modifiées à version identique
+    invalidate_read_cache('air_quality_records', [1])
+    assert read(1) == {'id': 1}
+    assert read(2) == {'id': 2}
+    assert len(calls) == 3
+
+
+def test_load_qev_result_returns_deep_copy(monkeypatch):
+    cache = ReadCache(max_bytes=1024 * 1024)
+    monkeypatch.setattr(db_utils_postgres, 'QEV_RESULT_CACHE', cache)
+    cache.put(('qev_result', 1, 'abc'), {'qev_score': 0.6, 'normalized_scores': {'air': 0.5}})
+
+    # Modification par l'appelant (repondération): le cache reste intact
+    result = asyncio.run(db_utils_postgres.load_qev_result(1, 'abc'))
+    result['qev_score'] = 0.0
+    result['normalized_scores']['air'] = 0.0
+    assert asyncio.run(db_utils_postgres.load_qev_result(1, 'abc')) == {
+        'qev_score': 0.6, 'normalized_scores': {'air': 0.5}
+    }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests de RoadGeometryIndex.nearest et _traffic_from_roads
+Comparaison avec un calcul de référence segment par segment (force brute)
+"""
+
+import math
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from green_space_analyzer import (
+    EARTH_RADIUS_M,
+    TRAFFIC_BY_ROAD_TYPE,
+    TRAFFIC_DISTANCE_DECAY_M,
+    TRAFFIC_NEAREST_ROADS,
+    RoadGeometryIndex,
+    _traffic_from_roads,
+)
+
+CENTER = (50.8466, 4.3528)  # Grand-Place
+
+
+def _brute_force(roads, latitude, longitude, limit):
+    """Distance de chaque way = minimum sur ses segments, même projection locale"""
+    y_scale = math.radians(1) * EARTH_RADIUS_M
+    x_scale = y_scale * math.cos(math.radians(latitude))
+    results = []
+    for road in roads:
+        points = [((p['lon'] - longitude) * x_scale, (p['lat'] - latitude) * y_scale) for p in road['geometry']]
+        if len(points) < 2:
+            continue
+        best = math.inf
+        for (ax, ay), (bx, by) in zip(points, points[1:]):
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            t = 0.0 if length2 == 0 else min(max(-(ax * dx + ay * dy) / length2, 0.0), 1.0)
+            best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+        results.append((best, road['osm_id']))
+    results.sort(key=lambda item: item[0])
+    return results[:limit]
+
+
+def _random_roads(rng, count, spread_deg=0.01):
+    highways = list(TRAFFIC_BY_ROAD_TYPE)
+    roads = []
+    for osm_id in range(count):
+        n_points = rng.choice([1, 2, 2, 3, 5, 8])
+        lat = CENTER[0] + rng.uniform(-spread_deg, spread_deg)
+        lon = CENTER[1] + rng.uniform(-spread_deg, spread_deg)
+        geometry = []
+        for _ in range(n_points):
+            geometry.append({'lat': lat, 'lon': lon})
+            # Points répétés: segments de longueur nulle
+            if rng.random() > 0.2:
+                lat += rng.uniform(-0.002, 0.002)
+                lon += rng.uniform(-0.002, 0.002)
+        roads.append({'osm_id': osm_id, 'geometry': geometry, 'tags': {'highway': rng.choice(highways)}})
+    return roads
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_nearest_matches_brute_force(seed):
+    rng = random.Random(seed)
+    roads = _random_roads(rng, rng.randint(1, 40))
+    index = RoadGeometryIndex(roads)
+
+    for _ in range(5):
+        latitude = CENTER[0] + rng.uniform(-0.015, 0.015)
+        longitude = CENTER[1] + rng.uniform(-0.015, 0.015)
+        limit = rng.randint(1, 8)
+
+        expected = _brute_force(roads, latitude, longitude, limit)
+        actual = index.nearest(latitude, longitude, limit=limit)
+
+        assert [road['osm_id'] for road in actual] == [osm_id for _, osm_id in expected]
+        for road, (distance, _) in zip(actual, expected):
+            assert road['distance_m'] == pytest.approx(distance, rel=1e-9, abs=1e-6)
+
+
+def test_pruning_keeps_far_long_way():
+    """Une way longue dont la boîte est loin mais un segment proche n'est pas écartée"""
+    roads = [
+        # Longue way passant à ~10 m du point, extrémités à ~5 km
+        {'osm_id': 'long', 'tags': {'highway': 'primary'},
+         'geometry': [{'lat': CENTER[0] + 0.0001, 'lon': CENTER[1] - 0.07},
+                      {'lat': CENTER[0] + 0.0001, 'lon': CENTER[1] + 0.07}]},
+    ] + [
+        {'osm_id': f'short{i}', 'tags': {'highway': 'residential'},
+         'geometry': [{'lat': CENTER[0] + 0.001 * (i + 1), 'lon': CENTER[1]},
+                      {'lat': CENTER[0] + 0.001 * (i + 1), 'lon': CENTER[1] + 0.0005}]}
+        for i in range(10)
+    ]
+    nearest = RoadGeometryIndex(roads).nearest(*CENTER, limit=1)
+    assert nearest[0]['osm_id'] == 'long'
+    assert nearest[0]['distance_m'] == pytest.approx(11.1, abs=0.1)
+
+
+def test_empty_and_degenerate_ways():
+    assert RoadGeometryIndex([]).nearest(*CENTER) == []
+
+    single_points = [{'osm_id': i, 'tags': {}, 'geometry': [{'lat': CENTER[0], 'lon': CENTER[1]}]}
+                     for i in range(3)]
+    index = RoadGeometryIndex(single_points)
+    assert len(index) == 0
+    assert index.nearest(*CENTER) == []
+
+
+def test_single_way():
+    road = {'osm_id': 7, 'tags': {'highway': 'tertiary'},
+            'geometry': [{'lat': CENTER[0], 'lon': CENTER[1] + 0.001},
+                         {'lat': CENTER[0], 'lon': CENTER[1] + 0.001}]}
+    nearest = RoadGeometryIndex([road]).nearest(*CENTER, limit=TRAFFIC_NEAREST_ROADS)
+    assert [r['osm_id'] for r in nearest] == [7]
+    assert nearest[0]['distance_m'] == pytest.approx(_brute_force([road], *CENTER, 1)[0][0])
+
+
+def test_traffic_single_road_is_base_estimate():
+    roads = [{'osm_id': 1, 'distance_m': 30.0, 'tags': {'highway': 'primary', 'lanes': '2'}}]
+    traffic = _traffic_from_roads(roads, source='test')
+    assert traffic['light_vehicles'] == TRAFFIC_BY_ROAD_TYPE['primary']['light']
+    assert traffic['heavy_vehicles'] == TRAFFIC_BY_ROAD_TYPE['primary']['heavy']
+    assert traffic['road_type'] == 'primary'
+    assert traffic['road_distance_m'] == 30.0
+    assert traffic['roads_weighted'] == 1
+
+
+def test_traffic_distance_decay_weighting():
+    roads = [
+        {'osm_id': 1, 'distance_m': 0.0, 'tags': {'highway': 'motorway'}},
+        {'osm_id': 2, 'distance_m': TRAFFIC_DISTANCE_DECAY_M, 'tags': {'highway': 'residential'}},
+    ]
+    weights = [1.0, math.exp(-1.0)]
+    expected = (weights[0] * TRAFFIC_BY_ROAD_TYPE['motorway']['light']
+                + weights[1] * TRAFFIC_BY_ROAD_TYPE['residential']['light']) / sum(weights)
+
+    traffic = _traffic_from_roads(roads, source='test')
+    assert traffic['light_vehicles'] == int(expected)
+    assert traffic['road_type'] == 'motorway'
+
+
+def test_traffic_uses_only_nearest_roads():
+    near = [{'osm_id': i, 'distance_m': 10.0, 'tags': {'highway': 'residential'}}
+            for i in range(TRAFFIC_NEAREST_ROADS)]
+    far = [{'osm_id': 'far', 'distance_m': 11.0, 'tags': {'highway': 'motorway'}}]
+    traffic = _traffic_from_roads(near + far, source='test')
+    assert traffic['roads_weighted'] == TRAFFIC_NEAREST_ROADS
+    assert traffic['light_vehicles'] == TRAFFIC_BY_ROAD_TYPE['residential']['light']
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+============================================================
+SCORING QeV PAR LOT (LISTE D'ADRESSES)
+============================================================
+Calcule le score QeV d'une liste d'adresses (CSV ou Parquet):
+
+1. Un point à scorer par couple distinct (adresse saisie, coordonnées):
+   coordonnées de l'entrée, sinon géocodage Nominatim de l'adresse
+   saisie (cache JSON persistant, débit limité)
+2. Agrégats air lus sur l'adresse de la base (AddressManager.sanitize_address
+   la réduit à code postal + commune: plusieurs points peuvent la partager),
+   résolue en une requête par lot ou créée au premier point
+3. Scoring QeVService au point sur un pool borné de workers (trafic et
+   verdure aux coordonnées du point, aucun téléchargement air); les
+   résultats déjà calculés pour la même empreinte sont relus du cache
+4. Écriture par lot dans qev_scores (store_qev_results) des seuls points
+   situés aux coordonnées de leur adresse de la base, et de tous les
+   points dans un fichier Parquet de checkpoint par lot
+
+Relancer la même commande après une interruption reprend là où elle
+s'était arrêtée (les points scorés ou en cache sont ignorés).
+
+Usage:
+    python batch_qev.py run addresses.csv results.parquet [--workers 4] [--overpass-rps 1]
+    python batch_qev.py status results.parquet
+============================================================
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple
+import logging
+
+import pandas as pd
+
+# Ajouter le dossier app au path
+app_path = Path(__file__).parent / 'app'
+sys.path.insert(0, str(app_path))
+
+from db_utils_postgres import (
+    AddressManager,
+    AsyncpgClient,
+    DatabaseClient,
+    read_air_aggregates,
+    load_qev_result,
+    store_qev_results,
+)
+from green_space_analyzer import RateLimiter, set_overpass_rate_limit
+from qev_service import QeVService, qev_input_fingerprint, QEV_STAGE_DEADLINE_S
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 50            # Adresses par checkpoint (un INSERT et un fichier Parquet)
+DEFAULT_GEOCODE_RPS = 1.0          # Politique d'usage de Nominatim: 1 requête/s
+DEFAULT_GEOCODE_CACHE = app_path / 'environment_data' / 'geocode_cache.json'
+
+# Statuts définitifs: ignorés à la reprise (les autres sont retentés)
+DONE_STATUSES = ('ok', 'cached')
+
+# Tolérance (degrés) pour qu'un point soit considéré à l'emplacement de son adresse de la base
+SAME_POINT_TOLERANCE_DEG = 1e-6
+
+RESULT_COLUMNS = [
+    'point_key', 'normalized_address', 'address_id', 'points_in_address',
+    'qev_latitude', 'qev_longitude', 'status',
+    'qev_score', 'qev_category', 's_air', 's_traffic', 's_green',
+    'i_air', 'i_traffic', 'i_green', 'confidence_level',
+    'fingerprint', 'persisted', 'error', 'processed_at',
+]
+
+
+# ============================================================
+# LECTURE / ÉCRITURE DES TABLES
+# ============================================================
+
+def _is_parquet(path: Path) -> bool:
+    return path.suffix.lower() in ('.parquet', '.pq')
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    """Lit un fichier CSV ou Parquet (selon l'extension)"""
+    return pd.read_parquet(path) if _is_parquet(path) else pd.read_csv(path)
+
+
+def write_table(df: pd.DataFrame, path: Path):
+    """Écrit un fichier CSV ou Parquet de façon atomique (fichier temporaire + rename)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    if _is_parquet(path):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# GÉOCODAGE (CACHE PERSISTANT)
+# ============================================================
+
+class GeocodeCache:
+    """
+    Cache JSON adresse saisie → (lat, lon, adresse complète)
+
+    Les adresses introuvables sont mémorisées (None) pour ne pas
+    réinterroger Nominatim à chaque relance.
+    """
+
+    def __init__(self, path: Path = DEFAULT_GEOCODE_CACHE):
+        self.path = Path(path)
+        self.entries: Dict[str, Optional[list]] = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Cache de géocodage illisible ({e}), ignoré")
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return ' '.join(address.lower().split())
+
+    def __contains__(self, address: str) -> bool:
+        return self._key(address) in self.entries
+
+    def get(self, address: str) -> Optional[list]:
+        return self.entries.get(self._key(address))
+
+    def put(self, address: str, value: Optional[Tuple[float, float, str]]):
+        self.entries[self._key(address)] = list(value) if value is not None else None
+        self.dirty = True
+
+    def save(self):
+        """Écriture atomique (appelée à chaque checkpoint)"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.entries, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class Geocoder:
+    """Géocodage Nominatim avec cache et débit limité (partagé entre workers)"""
+
+    def __init__(self, cache: GeocodeCache, rate_per_s: float = DEFAULT_GEOCODE_RPS):
+        from geopy.geocoders import Nominatim
+
+        self.cache = cache
+        self.limiter = RateLimiter(rate_per_s)
+        self.geolocator = Nominatim(user_agent="air_quality_batch_v1.0", timeout=15)
+
+    def _geocode(self, address: str) -> Optional[Tuple[float, float, str]]:
+        self.limiter.acquire()
+        location = self.geolocator.geocode(address, exactly_one=True)
+        if location is None:
+            return None
+        return location.latitude, location.longitude, location.address
+
+    async def geocode(self, address: str) -> Optional[Tuple[float, float, str]]:
+        """(lat, lon, adresse complète) ou None si introuvable"""
+        if address in self.cache:
+            cached = self.cache.get(address)
+            return tuple(cached) if cached is not None else None
+
+        # Une erreur réseau / service remonte sans être mémorisée: retentée à la prochaine relance
+        value = await asyncio.to_thread(self._geocode, address)
+        self.cache.put(address, value)
+        return value
+
+
+# ============================================================
+# SCORING PAR LOT
+# ============================================================
+
+class BatchQeVRunner:
+    """Scoring QeV d'une liste d'adresses, checkpointé par lot"""
+
+    def __init__(
+        self,
+        output_path: Path,
+        workers: int = DEFAULT_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        geocode_rps: float = DEFAULT_GEOCODE_RPS,
+        geocode_cache: Path = DEFAULT_GEOCODE_CACHE,
+        deadline_s: float = QEV_STAGE_DEADLINE_S
+    ):
+        self.output_path = Path(output_path)
+        self.parts_dir = self.output_path.with_name(self.output_path.name + '.parts')
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.deadline_s = deadline_s
+        self.geocode_cache = GeocodeCache(geocode_cache)
+        self.geocode_rps = geocode_rps
+        self.geocoder: Optional[Geocoder] = None
+        self.address_manager = AddressManager()
+        self.qev_service = QeVService()
+        self.stats: Dict[str, int] = {}
+        self._address_locks: Dict[str, asyncio.Lock] = {}
+        self._created: Dict[str, object] = {}
+
+    # ---------- Checkpoints ----------
+
+    def _part_files(self) -> List[Path]:
+        return sorted(self.parts_dir.glob('part-*.parquet')) if self.parts_dir.exists() else []
+
+    def load_checkpoint(self) -> pd.DataFrame:
+        """Dernier résultat connu de chaque point (vide si aucun checkpoint)"""
+        parts = [pd.read_parquet(path) for path in self._part_files()]
+        # Checkpoints antérieurs au scoring par point: ignorés (points recalculés)
+        parts = [part for part in parts if 'point_key' in part.columns]
+        if not parts:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        results = pd.concat(parts, ignore_index=True)
+        return results.drop_duplicates('point_key', keep='last').reset_index(drop=True)
+
+    def _write_part(self, rows: List[Dict]):
+        existing = self._part_files()
+        index = int(existing[-1].stem.split('-')[1]) + 1 if existing else 0
+        frame = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        write_table(frame, self.parts_dir / f'part-{index:05d}.parquet')
+
+    async def _flush(self, rows: List[Dict], items: List[Tuple[int, str, Dict]]):
+        """Persiste un lot: qev_scores d'abord, puis le checkpoint Parquet"""
+        if items:
+            submitted = {(address_id, fingerprint) for address_id, fingerprint, _ in items}
+            try:
+                written = set(await store_qev_results(items))
+            except Exception as e:
+                logger.error(f"❌ Écriture qev_scores impossible: {e}")
+                for row in rows:
+                    if (row['address_id'], row['fingerprint']) in submitted:
+                        row.update(status='error', error=f"store: {e}")
+                written = set()
+            for row in rows:
+                if row['status'] == 'ok':
+                    row['persisted'] = (row['address_id'], row['fingerprint']) in submitted \
+                        and row['address_id'] in written
+
+        self._write_part(rows)
+        self.geocode_cache.save()
+        for row in rows:
+            self.stats[row['status']] = self.stats.get(row['status'], 0) + 1
+
+    # ---------- Résolution des points et des adresses ----------
+
+    @staticmethod
+    def point_key(address: str, latitude, longitude) -> str:
+        """Clé d'un point à scorer: adresse saisie (casse/espaces ignorés) + coordonnées d'entrée"""
+        coordinates = '' if pd.isna(latitude) or pd.isna(longitude) else f"{float(latitude):.6f},{float(longitude):.6f}"
+        return f"{GeocodeCache._key(address)}|{coordinates}"
+
+    async def _locate(self, address: str, latitude, longitude) -> Optional[Tuple[float, float]]:
+        """Coordonnées du point: celles de l'entrée, sinon géocodage de l'adresse saisie"""
+        if not (pd.isna(latitude) or pd.isna(longitude)):
+            return float(latitude), float(longitude)
+
+        if self.geocoder is None:
+            self.geocoder = Geocoder(self.geocode_cache, self.geocode_rps)
+        location = await self.geocoder.geocode(address)
+        return None if location is None else (location[0], location[1])
+
+    async def _resolve(self, address: str, normalized: str, latitude: float, longitude: float, found: Dict):
+        """
+        Address de la base portant les données air du point
+
+        Connue: jamais modifiée (ses coordonnées restent celles de son premier
+        géocodage). Inconnue: créée une seule fois, au premier point de la commune.
+        """
+        if address in found:
+            return found[address]
+
+        lock = self._address_locks.setdefault(normalized, asyncio.Lock())
+        async with lock:
+            if normalized not in self._created:
+                self._created[normalized] = await self.address_manager.get_or_create_address(
+                    address, latitude, longitude
+                )
+            return self._created[normalized]
+
+    # ---------- Scoring d'un point ----------
+
+    async def _score(self, key: str, normalized: str, points_in_address: int, address: str,
+                     latitude, longitude, found: Dict,
+                     semaphore: asyncio.Semaphore) -> Tuple[Dict, Optional[Tuple[int, str, Dict]]]:
+        row = {column: None for column in RESULT_COLUMNS}
+        row.update(point_key=key, normalized_address=normalized, points_in_address=points_in_address,
+                   persisted=False)
+
+        async with semaphore:
+            try:
+                point = await self._locate(address, latitude, longitude)
+                if point is None:
+                    row['status'] = 'not_found'
+                    return row, None
+                latitude, longitude = point
+                row.update(qev_latitude=latitude, qev_longitude=longitude)
+
+                record = await self._resolve(address, normalized, latitude, longitude, found)
+                row['address_id'] = record.id
+
+                aggregates = await read_air_aggregates(record.id)
+                if aggregates is None:
+                    row['status'] = 'no_air_data'
+                    return row, None
+
+                # Le score n'est rattaché à l'adresse de la base (cache, qev_scores)
+                # que s'il est calculé à ses coordonnées
+                at_record = (
+                    record.latitude is not None and record.longitude is not None
+                    and math.isclose(record.latitude, latitude, abs_tol=SAME_POINT_TOLERANCE_DEG)
+                    and math.isclose(record.longitude, longitude, abs_tol=SAME_POINT_TOLERANCE_DEG)
+                )
+                label = record.fullAddress if at_record else address
+
+                air_version = (aggregates['last_ts'], aggregates['records'], aggregates['updated_at'])
+                fingerprint = qev_input_fingerprint(label, latitude, longitude, air_version)
+                row['fingerprint'] = fingerprint
+
+                result = await load_qev_result(record.id, fingerprint) if at_record else None
+                if result is not None:
+                    row['status'] = 'cached'
+                else:
+                    result = await asyncio.to_thread(
+                        self.qev_service.calculate_qev_for_address,
+                        address=label,
+                        latitude=latitude,
+                        longitude=longitude,
+                        air_aggregates=aggregates,
+                        deadline_s=self.deadline_s
+                    )
+                    # Trafic par défaut ou étape en repli: ni cache ni historique (comme get_qev_score)
+                    incomplete = not result.get('osm_traffic_available', True) or result.get('degraded_stages')
+                    row['status'] = 'degraded' if incomplete else 'ok'
+
+                scores = result.get('normalized_scores', {})
+                sub_indices = result.get('sub_indices', {})
+                row.update(
+                    qev_score=result.get('QeV'),
+                    qev_category=result.get('QeV_category'),
+                    s_air=scores.get('S_Air'),
+                    s_traffic=scores.get('S_Trafic'),
+                    s_green=scores.get('S_Vert'),
+                    i_air=sub_indices.get('I_Air'),
+                    i_traffic=sub_indices.get('I_Trafic'),
+                    i_green=sub_indices.get('I_Vert'),
+                    confidence_level=result.get('confidence_level'),
+                )
+                if row['status'] == 'ok' and at_record:
+                    return row, (record.id, fingerprint, result)
+                return row, None
+
+            except Exception as e:
+                logger.error(f"❌ QeV impossible pour '{address}': {e}")
+                row.update(status='error', error=str(e)[:500])
+                return row, None
+
+            finally:
+                row['processed_at'] = datetime.now().isoformat(timespec='seconds')
+
+    # ---------- Exécution ----------
+
+    async def run(self, input_df: pd.DataFrame, address_column: str = 'address', resume: bool = True):
+        """
+        Score les adresses de input_df puis écrit le fichier de sortie
+
+        Args:
+            input_df: Table d'entrée (colonnes latitude/longitude optionnelles: pas de géocodage)
+            address_column: Colonne des adresses
+            resume: Reprendre depuis les checkpoints existants
+        """
+        if address_column not in input_df.columns:
+            raise ValueError(f"Colonne '{address_column}' absente du fichier d'entrée")
+
+        if not resume and self.parts_dir.exists():
+            for path in self._part_files():
+                path.unlink()
+
+        df = input_df[input_df[address_column].notna()].copy()
+        df[address_column] = df[address_column].astype(str).str.strip()
+        has_coordinates = {'latitude', 'longitude'} <= set(df.columns)
+        df['point_key'] = [
+            self.point_key(address, lat, lon)
+            for address, lat, lon in zip(
+                df[address_column],
+                df['latitude'] if has_coordinates else [None] * len(df),
+                df['longitude'] if has_coordinates else [None] * len(df)
+            )
+        ]
+
+        # Un score par point distinct; les données air viennent de l'adresse normalisée
+        firsts = df.drop_duplicates('point_key').copy()
+        firsts['normalized_address'] = firsts[address_column].map(AddressManager.sanitize_address)
+        firsts['points_in_address'] = firsts.groupby('normalized_address')['point_key'].transform('size')
+
+        shared = firsts.loc[firsts['points_in_address'] > 1, 'normalized_address'].nunique()
+        if shared:
+            logger.warning(f"⚠️ {shared} adresse(s) de la base partagée(s) par plusieurs points "
+                           f"(normalisation code postal + commune): données air communes, "
+                           f"trafic et verdure calculés par point, seul le point situé à "
+                           f"l'adresse de la base est écrit dans qev_scores")
+
+        checkpoint = self.load_checkpoint()
+        done = set(checkpoint.loc[checkpoint['status'].isin(DONE_STATUSES), 'point_key'])
+        pending = firsts[~firsts['point_key'].isin(done)]
+
+        logger.info(f"📋 {len(df)} lignes, {len(firsts)} points distincts "
+                    f"({firsts['normalized_address'].nunique()} adresses de la base), "
+                    f"{len(firsts) - len(pending)} déjà traités, {len(pending)} à scorer")
+
+        semaphore = asyncio.Semaphore(self.workers)
+        start = time.monotonic()
+        for offset in range(0, len(pending), self.chunk_size):
+            chunk = pending.iloc[offset:offset + self.chunk_size]
+            addresses = chunk[address_column].tolist()
+            found = await self.address_manager.find_addresses(addresses)
+
+            outcomes = await asyncio.gather(*(
+                self._score(
+                    row['point_key'], row['normalized_address'], row['points_in_address'], row[address_column],
+                    row['latitude'] if has_coordinates else None,
+                    row['longitude'] if has_coordinates else None,
+                    found, semaphore
+                )
+                for _, row in chunk.iterrows()
+            ))
+            await self._flush([row for row, _ in outcomes], [item for _, item in outcomes if item is not None])
+
+            processed = offset + len(chunk)
+            logger.info(f"💾 Checkpoint {processed}/{len(pending)} points "
+                        f"({time.monotonic() - start:.0f}s)")
+
+        # Fichier de sortie: une ligne par ligne d'entrée, coordonnées d'entrée conservées
+        output = df.merge(self.load_checkpoint(), on='point_key', how='left')
+        write_table(output, self.output_path)
+        logger.info(f"✅ Résultats écrits: {self.output_path} ({len(output)} lignes)")
+        return output
+
+    def print_summary(self):
+        """Affiche le résumé de l'exécution"""
+        print_status(self.output_path, self.stats)
+
+
+def print_status(output_path: Path, run_stats: Optional[Dict[str, int]] = None):
+    """Affiche l'avancement d'un scoring par lot"""
+    runner_parts = Path(output_path).with_name(Path(output_path).name + '.parts')
+    parts = sorted(runner_parts.glob('part-*.parquet')) if runner_parts.exists() else []
+
+    print("\n" + "="*60)
+    print("RÉSUMÉ DU SCORING QeV PAR LOT")
+    print("="*60)
+    if run_stats:
+        print("🧮 Cette exécution: " + ', '.join(f"{status}={count}" for status, count in sorted(run_stats.items())))
+    if not parts:
+        print(f"❌ Aucun checkpoint pour '{output_path}'")
+    else:
+        results = pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+        key = 'point_key' if 'point_key' in results.columns else 'normalized_address'
+        results = results.drop_duplicates(key, keep='last')
+        counts = results['status'].value_counts()
+        print(f"📦 {len(parts)} checkpoints, {len(results)} points distincts")
+        for status, count in counts.items():
+            print(f"   {status:12s}: {count}")
+        scored = results[results['status'].isin(DONE_STATUSES)]
+        if not scored.empty:
+            print(f"📊 QeV moyen: {scored['qev_score'].mean():.3f} "
+                  f"(min {scored['qev_score'].min():.3f}, max {scored['qev_score'].max():.3f})")
+    print("="*60)
+
+
+async def _run(args) -> None:
+    if args.overpass_rps is not None:
+        set_overpass_rate_limit(args.overpass_rps)
+
+    runner = BatchQeVRunner(
+        Path(args.output),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        geocode_rps=args.geocode_rps,
+        geocode_cache=Path(args.geocode_cache),
+        deadline_s=args.deadline
+    )
+    try:
+        await runner.run(read_table(Path(args.input)), address_column=args.address_column,
+                         resume=not args.restart)
+    finally:
+        runner.geocode_cache.save()
+        runner.print_summary()
+        await AsyncpgClient.close()
+        await DatabaseClient.disconnect()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Scoring QeV par lot d'une liste d'adresses")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Score les adresses (reprend après interruption)")
+    run_parser.add_argument('input', help="Fichier d'adresses (.csv ou .parquet)")
+    run_parser.add_argument('output', help="Fichier de résultats (.parquet ou .csv)")
+    run_parser.add_argument('--address-column', default='address')
+    run_parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Adresses scorées en parallèle")
+    run_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Adresses par checkpoint")
+    run_parser.add_argument('--geocode-rps', type=float, default=DEFAULT_GEOCODE_RPS,
+                            help="Débit maximal vers Nominatim (requêtes/s)")
+    run_parser.add_argument('--overpass-rps', type=float, default=None,
+                            help="Débit maximal vers Overpass (requêtes/s, défaut: OVERPASS_MAX_RPS)")
+    run_parser.add_argument('--geocode-cache', default=str(DEFAULT_GEOCODE_CACHE))
+    run_parser.add_argument('--deadline', type=float, default=QEV_STAGE_DEADLINE_S,
+                            help="Échéance des étapes QeV par adresse (s)")
+    run_parser.add_argument('--restart', action='store_true', help="Ignore les checkpoints existants")
+
+    status_parser = subparsers.add_parser('status', help="Avancement d'un scoring")
+    status_parser.add_argument('output')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'run':
+            asyncio.run(_run(args))
+        else:
+            print_status(Path(args.output))
+
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR FATALE: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
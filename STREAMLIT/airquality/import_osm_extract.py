@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+============================================================
+IMPORT D'UN EXTRAIT OSM RÉGIONAL → INDEX POSTGIS LOCAL
+============================================================
+Charge les espaces verts (leisure=park/garden, landuse=forest,
+natural=wood) et les routes (highway=*) d'un extrait OSM local
+(.osm.pbf Geofabrik, .osm, .osm.bz2) dans green_spaces et
+osm_roads. Le parc et la route les plus proches sont ensuite lus
+en KNN GIST (app/osm_local_index.py); Overpass n'est interrogé
+que hors de l'emprise des extraits importés.
+
+Réimporter un extrait du même nom remplace ses données en une
+transaction (les lectures voient l'ancienne version jusqu'au commit).
+
+L'emprise de l'extrait décide quelles adresses quittent Overpass: donner
+le contour publié avec l'extrait (--poly belgium.poly chez Geofabrik).
+À défaut, elle est formée des cellules de la grille (~1 km) où commencent
+des routes importées; une enveloppe (convexe ou rectangle de l'en-tête)
+couvrirait les pays voisins, où l'index n'a ni parc ni route.
+
+Prérequis: prisma/osm_local_index_migration.sql appliqué,
+pyosmium (pip install osmium).
+
+Usage:
+    python import_osm_extract.py import belgium-latest.osm.pbf [--name belgium] [--poly belgium.poly | --bbox S W N E]
+    python import_osm_extract.py status
+    python import_osm_extract.py drop --name belgium
+============================================================
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple
+import logging
+
+# Ajouter le dossier app au path
+app_path = Path(__file__).parent / 'app'
+sys.path.insert(0, str(app_path))
+
+from db_utils_postgres import asyncpg_dsn
+from green_space_analyzer import ROAD_HIGHWAY_TYPES
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# Tags des espaces verts (mêmes filtres que la requête Overpass de query_osm_green_spaces)
+GREEN_SPACE_TAGS: List[Tuple[str, str]] = [
+    ('leisure', 'park'),
+    ('landuse', 'forest'),
+    ('natural', 'wood'),
+    ('leisure', 'garden'),
+]
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Emprise par défaut: cellules de la grille (degrés) contenant le début d'au moins une route
+COVERAGE_CELL_DEG = 0.01
+
+COVERAGE_FROM_ROADS_SQL = '''
+    SELECT ST_Multi(ST_Union(ST_MakeEnvelope(c.x * %(cell)s, c.y * %(cell)s,
+                                             (c.x + 1) * %(cell)s, (c.y + 1) * %(cell)s, 4326)))
+    FROM (
+        SELECT DISTINCT floor(ST_X(ST_StartPoint(geom)) / %(cell)s) AS x,
+                        floor(ST_Y(ST_StartPoint(geom)) / %(cell)s) AS y
+        FROM osm_roads WHERE osm_extract = %(name)s
+    ) c
+'''
+
+GREEN_SPACES_INSERT_SQL = '''
+    INSERT INTO green_spaces (osm_id, name, green_space_type, geom, area,
+                              data_source, osm_extract, created_at, updated_at)
+    SELECT t.osm_id, t.name, t.green_space_type, g.geom, ST_Area(g.geom::geography),
+           'osm', t.osm_extract, NOW(), NOW()
+    FROM (VALUES %s) AS t(osm_id, name, green_space_type, osm_extract, wkb)
+    CROSS JOIN LATERAL (
+        SELECT ST_Multi(ST_CollectionExtract(ST_MakeValid(
+                   ST_SetSRID(ST_GeomFromWKB(decode(t.wkb, 'hex')), 4326)), 3)) AS geom
+    ) g
+    WHERE NOT ST_IsEmpty(g.geom)
+    ON CONFLICT (osm_id) DO UPDATE
+    SET name = EXCLUDED.name, green_space_type = EXCLUDED.green_space_type,
+        geom = EXCLUDED.geom, area = EXCLUDED.area,
+        osm_extract = EXCLUDED.osm_extract, updated_at = NOW()
+'''
+
+ROADS_INSERT_SQL = '''
+    INSERT INTO osm_roads (osm_id, highway, name, lanes, maxspeed, osm_extract, geom)
+    VALUES %s
+    ON CONFLICT (osm_id) DO UPDATE
+    SET highway = EXCLUDED.highway, name = EXCLUDED.name, lanes = EXCLUDED.lanes,
+        maxspeed = EXCLUDED.maxspeed, osm_extract = EXCLUDED.osm_extract, geom = EXCLUDED.geom
+'''
+ROADS_INSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, ST_SetSRID(ST_GeomFromWKB(decode(%s, 'hex')), 4326))"
+
+
+def _green_space_type(tags) -> Optional[str]:
+    for key, value in GREEN_SPACE_TAGS:
+        if tags.get(key) == value:
+            return value
+    return None
+
+
+def read_poly_file(path: Path) -> str:
+    """
+    Contour d'un fichier .poly (format Osmosis, publié par Geofabrik) en WKT MULTIPOLYGON
+
+    Chaque anneau est une liste "lon lat" terminée par END; un anneau dont
+    le nom commence par '!' est un trou du polygone qui le précède.
+    """
+    lines = [line.strip() for line in Path(path).read_text(encoding='utf-8').splitlines()]
+    polygons: List[List[List[Tuple[float, float]]]] = []
+    ring: Optional[List[Tuple[float, float]]] = None
+    hole = False
+
+    for line in lines[1:]:  # 1re ligne: nom du contour
+        if not line:
+            continue
+        if ring is None:
+            if line == 'END':
+                break
+            ring, hole = [], line.startswith('!')
+        elif line == 'END':
+            if len(ring) < 3:
+                raise ValueError(f"{path}: anneau de moins de 3 points")
+            if ring[0] != ring[-1]:
+                ring.append(ring[0])
+            if hole:
+                if not polygons:
+                    raise ValueError(f"{path}: trou avant tout polygone")
+                polygons[-1].append(ring)
+            else:
+                polygons.append([ring])
+            ring = None
+        else:
+            lon, lat = line.split()[:2]
+            ring.append((float(lon), float(lat)))
+
+    if not polygons:
+        raise ValueError(f"{path}: aucun polygone")
+    return 'MULTIPOLYGON(' + ', '.join(
+        '(' + ', '.join('(' + ', '.join(f"{lon} {lat}" for lon, lat in r) + ')' for r in polygon) + ')'
+        for polygon in polygons
+    ) + ')'
+
+
+def _read_osm_timestamp(path: Path) -> Optional[datetime]:
+    """Date des données déclarée dans l'en-tête du fichier (UTC naïf)"""
+    import osmium
+
+    reader = osmium.io.Reader(str(path), osmium.osm.osm_entity_bits.NOTHING)
+    try:
+        header = reader.header()
+        stamp = header.get('osmosis_replication_timestamp') or header.get('timestamp')
+    finally:
+        reader.close()
+    if not stamp:
+        return None
+    try:
+        return datetime.fromisoformat(stamp.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+class OSMExtractImporter:
+    """Import d'un extrait OSM dans les tables de l'index local"""
+
+    def __init__(self, name: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.name = name
+        self.batch_size = batch_size
+        self.conn = None
+        self.stats: Dict[str, int] = {'green_spaces': 0, 'roads': 0, 'skipped': 0}
+
+    def connect(self):
+        import psycopg2
+
+        self.conn = psycopg2.connect(asyncpg_dsn())
+        logger.info("✅ Connexion PostgreSQL établie")
+
+    def disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    # ---------- Écriture par lots ----------
+
+    def _flush_green_spaces(self, cursor, rows: List[tuple]):
+        from psycopg2.extras import execute_values
+
+        if rows:
+            execute_values(cursor, GREEN_SPACES_INSERT_SQL, rows, page_size=len(rows))
+            self.stats['green_spaces'] += len(rows)
+            rows.clear()
+
+    def _flush_roads(self, cursor, rows: List[tuple]):
+        from psycopg2.extras import execute_values
+
+        if rows:
+            execute_values(cursor, ROADS_INSERT_SQL, rows, template=ROADS_INSERT_TEMPLATE, page_size=len(rows))
+            self.stats['roads'] += len(rows)
+            rows.clear()
+
+    # ---------- Import ----------
+
+    def import_file(self, path: Path, bbox: Optional[Tuple[float, float, float, float]] = None,
+                    poly: Optional[Path] = None):
+        """
+        Importe l'extrait (remplace les données d'un extrait du même nom)
+
+        Args:
+            path: Fichier OSM (.osm.pbf, .osm, .osm.bz2)
+            bbox: Emprise rectangulaire (S, W, N, E)
+            poly: Contour .poly de l'extrait (prioritaire sur bbox)
+                  Sans l'un ni l'autre: cellules de COVERAGE_CELL_DEG où commencent des routes
+        """
+        import osmium
+
+        importer = self
+        osm_timestamp = _read_osm_timestamp(path)
+        green_rows: List[tuple] = []
+        road_rows: List[tuple] = []
+        start = time.monotonic()
+
+        class Handler(osmium.SimpleHandler):
+            def __init__(self, cursor):
+                super().__init__()
+                self.cursor = cursor
+                self.wkb = osmium.geom.WKBFactory()
+
+            def way(self, w):
+                highway = w.tags.get('highway')
+                if highway not in ROAD_HIGHWAY_TYPES:
+                    return
+                try:
+                    wkb = self.wkb.create_linestring(w)
+                except Exception:
+                    importer.stats['skipped'] += 1
+                    return
+                road_rows.append((w.id, highway, w.tags.get('name'), w.tags.get('lanes'),
+                                  w.tags.get('maxspeed'), importer.name, wkb))
+                if len(road_rows) >= importer.batch_size:
+                    importer._flush_roads(self.cursor, road_rows)
+                    logger.info(f"   🛣️ {importer.stats['roads']} routes...")
+
+            def area(self, a):
+                green_space_type = _green_space_type(a.tags)
+                if green_space_type is None:
+                    return
+                try:
+                    wkb = self.wkb.create_multipolygon(a)
+                except Exception:
+                    importer.stats['skipped'] += 1
+                    return
+                osm_id = f"{'way' if a.from_way() else 'relation'}/{a.orig_id()}"
+                green_rows.append((osm_id, a.tags.get('name'), green_space_type, importer.name, wkb))
+                if len(green_rows) >= importer.batch_size:
+                    importer._flush_green_spaces(self.cursor, green_rows)
+
+        logger.info(f"📦 Import de {path} (extrait '{self.name}')...")
+        with self.conn:
+            with self.conn.cursor() as cursor:
+                cursor.execute('DELETE FROM green_spaces WHERE osm_extract = %s', (self.name,))
+                cursor.execute('DELETE FROM osm_roads WHERE osm_extract = %s', (self.name,))
+
+                Handler(cursor).apply_file(str(path), locations=True)
+                self._flush_roads(cursor, road_rows)
+                self._flush_green_spaces(cursor, green_rows)
+
+                if poly is not None:
+                    cursor.execute('SELECT ST_Multi(ST_CollectionExtract(ST_MakeValid(ST_GeomFromText(%s, 4326)), 3))',
+                                   (read_poly_file(poly),))
+                elif bbox is not None:
+                    south, west, north, east = bbox
+                    cursor.execute('SELECT ST_Multi(ST_MakeEnvelope(%s, %s, %s, %s, 4326))', (west, south, east, north))
+                else:
+                    logger.warning("⚠️ Ni --poly ni --bbox: emprise déduite des routes importées "
+                                   f"(cellules de {COVERAGE_CELL_DEG}°), à remplacer par le contour .poly de l'extrait")
+                    cursor.execute(COVERAGE_FROM_ROADS_SQL, {'cell': COVERAGE_CELL_DEG, 'name': self.name})
+                coverage = cursor.fetchone()[0]
+                if coverage is None:
+                    raise ValueError("Emprise de l'extrait inconnue (aucune route importée): utilisez --poly ou --bbox")
+
+                cursor.execute('''
+                    INSERT INTO osm_extracts (name, coverage, source_file, osm_timestamp,
+                                              green_spaces, roads, imported_at)
+                    VALUES (%s, ST_Multi(ST_SetSRID(%s::geometry, 4326)), %s, %s, %s, %s, NOW())
+                    ON CONFLICT (name) DO UPDATE
+                    SET coverage = EXCLUDED.coverage, source_file = EXCLUDED.source_file,
+                        osm_timestamp = EXCLUDED.osm_timestamp, green_spaces = EXCLUDED.green_spaces,
+                        roads = EXCLUDED.roads, imported_at = NOW()
+                ''', (self.name, coverage, str(path), osm_timestamp,
+                      self.stats['green_spaces'], self.stats['roads']))
+
+        # Statistiques du planificateur pour les requêtes KNN
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            cursor.execute('ANALYZE green_spaces')
+            cursor.execute('ANALYZE osm_roads')
+
+        self.stats['elapsed_s'] = round(time.monotonic() - start)
+        self.stats['osm_timestamp'] = osm_timestamp
+        logger.info(f"✅ Extrait '{self.name}' importé: {self.stats['green_spaces']} espaces verts, "
+                    f"{self.stats['roads']} routes ({self.stats['elapsed_s']}s)")
+
+    def drop(self):
+        """Supprime un extrait et ses données (retour à Overpass sur son emprise)"""
+        with self.conn:
+            with self.conn.cursor() as cursor:
+                cursor.execute('DELETE FROM green_spaces WHERE osm_extract = %s', (self.name,))
+                cursor.execute('DELETE FROM osm_roads WHERE osm_extract = %s', (self.name,))
+                cursor.execute('DELETE FROM osm_extracts WHERE name = %s', (self.name,))
+        logger.info(f"🗑️ Extrait '{self.name}' supprimé")
+
+    def print_status(self):
+        """Affiche les extraits importés"""
+        with self.conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT name, ST_YMin(coverage), ST_XMin(coverage), ST_YMax(coverage), ST_XMax(coverage),
+                       osm_timestamp, green_spaces, roads, imported_at
+                FROM osm_extracts ORDER BY name
+            ''')
+            rows = cursor.fetchall()
+
+        print("\n" + "="*60)
+        print("INDEX OSM LOCAL")
+        print("="*60)
+        if not rows:
+            print("❌ Aucun extrait importé (Overpass pour toutes les adresses)")
+        for name, south, west, north, east, osm_timestamp, green_spaces, roads, imported_at in rows:
+            print(f"🗺️ {name}: [{south:.3f}, {west:.3f}, {north:.3f}, {east:.3f}]")
+            print(f"   {green_spaces} espaces verts, {roads} routes, données OSM du "
+                  f"{osm_timestamp or '?'} (importé le {imported_at:%Y-%m-%d %H:%M})")
+        print("="*60)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Import d'un extrait OSM dans l'index PostGIS local")
+    parser.add_argument('command', choices=['import', 'status', 'drop'])
+    parser.add_argument('path', nargs='?', help="Fichier OSM (.osm.pbf, .osm, .osm.bz2)")
+    parser.add_argument('--name', default=None, help="Nom de l'extrait (défaut: nom du fichier)")
+    coverage = parser.add_mutually_exclusive_group()
+    coverage.add_argument('--poly', default=None, help="Contour .poly de l'extrait (emprise exacte)")
+    coverage.add_argument('--bbox', nargs=4, type=float, default=None,
+                          metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'import' and not args.path:
+        parser.error("import: fichier OSM requis")
+    if args.command == 'drop' and not args.name:
+        parser.error("drop: --name requis")
+
+    name = args.name or (Path(args.path).name.split('.')[0] if args.path else '')
+    importer = OSMExtractImporter(name, batch_size=args.batch_size)
+
+    try:
+        importer.connect()
+        if args.command == 'import':
+            importer.import_file(Path(args.path), bbox=tuple(args.bbox) if args.bbox else None,
+                                 poly=Path(args.poly) if args.poly else None)
+            stamp = importer.stats['osm_timestamp']
+            print(f"\n💡 Fixez OSM_SNAPSHOT_VERSION={name}-{stamp:%Y%m%d}" if stamp else
+                  f"\n💡 Fixez OSM_SNAPSHOT_VERSION={name}-<date de l'extrait>", end='')
+            print(" pour que les résultats QeV cachés suivent les imports")
+        elif args.command == 'drop':
+            importer.drop()
+        importer.print_status()
+
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR FATALE: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    finally:
+        importer.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+============================================================
+MIGRATION EN LIGNE → TABLES PARTITIONNÉES PAR MOIS
+============================================================
+Convertit air_quality_records, weather_records et pollen_records
+(tables heap uniques) en tables partitionnées par mois sur "timestamp",
+sans interrompre l'ingestion:
+
+1. Création de <table>_part (même colonnes, PARTITION BY RANGE)
+   + partitions mensuelles couvrant l'historique + partition par défaut
+2. Trigger miroir sur l'ancienne table (INSERT/UPDATE/DELETE → <table>_part)
+3. Copie par lots d'id (INSERT ... ON CONFLICT DO NOTHING)
+4. Bascule atomique (LOCK, RENAME), ancienne table conservée en <table>_legacy
+
+Prérequis: prisma/partitioning_migration.sql appliqué.
+
+Usage:
+    python migrate_to_partitioned.py migrate [--tables ...] [--batch-size N] [--drop-legacy]
+    python migrate_to_partitioned.py ensure --months-ahead 3
+    python migrate_to_partitioned.py prune --keep-months 24
+============================================================
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from datetime import date
+from typing import Optional, List, Dict
+import logging
+
+# Ajouter le dossier app au path
+app_path = Path(__file__).parent / 'app'
+sys.path.insert(0, str(app_path))
+
+from db_utils_postgres import asyncpg_dsn
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# Tables de séries temporelles → clé unique (doit contenir "timestamp")
+PARTITIONED_TABLES: Dict[str, str] = {
+    'air_quality_records': 'UNIQUE (address_id, "timestamp", station_id)',
+    'weather_records': 'UNIQUE (address_id, "timestamp", station_id)',
+    'pollen_records': 'UNIQUE (address_id, "timestamp")',
+}
+
+# Index créés sur la table partitionnée (propagés à chaque partition)
+PARTITION_INDEXES: Dict[str, List[str]] = {
+    'air_quality_records': [
+        '(address_id, "timestamp" DESC)',
+        '(station_id, "timestamp" DESC)',
+        '("timestamp" DESC)',
+        '(aqi_category)',
+        '(data_source)',
+    ],
+    'weather_records': [
+        '(address_id, "timestamp" DESC)',
+        '(station_id, "timestamp" DESC)',
+        '("timestamp" DESC)',
+    ],
+    'pollen_records': [
+        '(address_id, "timestamp" DESC)',
+        '("timestamp" DESC)',
+    ],
+}
+
+DEFAULT_BATCH_SIZE = 100_000
+
+
+class PartitionMigrator:
+    """Migrateur en ligne heap → partitionnement mensuel (asyncpg)"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, months_ahead: int = 3):
+        self.conn = None
+        self.batch_size = batch_size
+        self.months_ahead = months_ahead
+        self.stats: Dict[str, Dict] = {}
+
+    async def connect(self):
+        """Connexion à PostgreSQL"""
+        import asyncpg
+        self.conn = await asyncpg.connect(dsn=asyncpg_dsn())
+        logger.info("✅ Connecté à PostgreSQL")
+
+    async def disconnect(self):
+        """Déconnexion de PostgreSQL"""
+        if self.conn:
+            await self.conn.close()
+            logger.info("🔌 Déconnecté de PostgreSQL")
+
+    async def is_partitioned(self, table: str) -> bool:
+        """True si la table est déjà partitionnée"""
+        return await self.conn.fetchval('''
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = $1 AND c.relnamespace = 'public'::regnamespace
+            )
+        ''', table)
+
+    async def _columns(self, table: str) -> List[str]:
+        """Colonnes de la table dans l'ordre physique"""
+        rows = await self.conn.fetch('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = $1
+            ORDER BY ordinal_position
+        ''', table)
+        return [row['column_name'] for row in rows]
+
+    async def create_partitioned_copy(self, table: str) -> str:
+        """Étape 1: table partitionnée vide + partitions couvrant l'historique"""
+        target = f'{table}_part'
+        await self.conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {target} (
+                LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CHECK,
+                PRIMARY KEY (id, "timestamp"),
+                {PARTITIONED_TABLES[table]}
+            ) PARTITION BY RANGE ("timestamp")
+        ''')
+        await self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {target}_default PARTITION OF {target} DEFAULT'
+        )
+
+        # Clés étrangères (supportées sur tables partitionnées, PG ≥ 12)
+        fks = await self.conn.fetch('''
+            SELECT conname, pg_get_constraintdef(oid) AS definition
+            FROM pg_constraint
+            WHERE conrelid = $1::regclass AND contype = 'f'
+        ''', table)
+        for fk in fks:
+            exists = await self.conn.fetchval(
+                'SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = $1::regclass AND conname = $2)',
+                target, fk['conname']
+            )
+            if not exists:
+                await self.conn.execute(
+                    f'ALTER TABLE {target} ADD CONSTRAINT {fk["conname"]} {fk["definition"]}'
+                )
+
+        for i, index_def in enumerate(PARTITION_INDEXES[table]):
+            await self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_{target}_{i} ON {target} {index_def}'
+            )
+
+        bounds = await self.conn.fetchrow(f'SELECT MIN("timestamp") AS lo, MAX("timestamp") AS hi FROM {table}')
+        lo = bounds['lo'].date() if bounds['lo'] else date.today()
+        hi = max(bounds['hi'].date() if bounds['hi'] else date.today(), date.today())
+        hi = date(hi.year + (hi.month - 1 + self.months_ahead) // 12,
+                  (hi.month - 1 + self.months_ahead) % 12 + 1, 1)
+        months = await self.conn.fetchval('SELECT ensure_monthly_partitions($1, $2, $3)', target, lo, hi)
+        logger.info(f"📅 {target}: {months} partitions mensuelles ({lo} → {hi})")
+        return target
+
+    async def install_mirror_trigger(self, table: str, target: str):
+        """Étape 2: toute écriture sur l'ancienne table est répliquée pendant la copie"""
+        columns = await self._columns(table)
+        quoted = ', '.join(f'"{col}"' for col in columns)
+        new_values = ', '.join(f'NEW."{col}"' for col in columns)
+        set_parts = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in columns if col not in ('id', 'timestamp'))
+
+        await self.conn.execute(f'''
+            CREATE OR REPLACE FUNCTION {table}_mirror_to_part() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {target} WHERE id = OLD.id AND "timestamp" = OLD."timestamp"
+                      AND (TG_OP = 'DELETE' OR OLD."timestamp" <> NEW."timestamp");
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {target} ({quoted}) VALUES ({new_values})
+                    ON CONFLICT (id, "timestamp") DO UPDATE SET {set_parts};
+                    RETURN NEW;
+                END IF;
+                RETURN OLD;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        await self.conn.execute(f'DROP TRIGGER IF EXISTS {table}_mirror ON {table}')
+        await self.conn.execute(f'''
+            CREATE TRIGGER {table}_mirror
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_mirror_to_part()
+        ''')
+        logger.info(f"🪞 Trigger miroir installé sur {table}")
+
+    async def backfill(self, table: str, target: str) -> int:
+        """Étape 3: copie par plages d'id, chaque lot dans sa propre transaction"""
+        columns = ', '.join(f'"{col}"' for col in await self._columns(table))
+        max_id = await self.conn.fetchval(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+        copied = 0
+        started = time.perf_counter()
+
+        for lo in range(0, max_id, self.batch_size):
+            status = await self.conn.execute(f'''
+                INSERT INTO {target} ({columns})
+                SELECT {columns} FROM {table}
+                WHERE id > $1 AND id <= $2
+                ON CONFLICT DO NOTHING
+            ''', lo, lo + self.batch_size)
+            copied += int(status.split()[-1])
+            elapsed = time.perf_counter() - started
+            logger.info(f"📦 {table}: id ≤ {min(lo + self.batch_size, max_id)}/{max_id} "
+                        f"({copied} lignes, {copied / max(elapsed, 1e-9):.0f} lignes/s)")
+
+        return copied
+
+    async def swap(self, table: str, target: str, drop_legacy: bool = False):
+        """Étape 4: bascule atomique des noms (verrou bref)"""
+        legacy = f'{table}_legacy'
+        async with self.conn.transaction():
+            await self.conn.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+
+            # Vérification sous verrou: plus aucune écriture concurrente possible
+            source_count = await self.conn.fetchval(f'SELECT COUNT(*) FROM {table}')
+            target_count = await self.conn.fetchval(f'SELECT COUNT(*) FROM {target}')
+            if source_count != target_count:
+                raise RuntimeError(f"{table}: {source_count} lignes source ≠ {target_count} copiées, bascule annulée")
+
+            # Triggers applicatifs (ex: update_updated_at) à recréer sur la nouvelle table
+            triggers = await self.conn.fetch('''
+                SELECT tgname, pg_get_triggerdef(oid) AS definition
+                FROM pg_trigger
+                WHERE tgrelid = $1::regclass AND NOT tgisinternal AND tgname <> $2
+            ''', table, f'{table}_mirror')
+            await self.conn.execute(f'DROP TRIGGER {table}_mirror ON {table}')
+            await self.conn.execute(f'DROP FUNCTION {table}_mirror_to_part()')
+
+            # Les FK entrantes (ex: data_anomalies.record_id) ne peuvent pas cibler
+            # id seul sur une table partitionnée: elles sont supprimées
+            incoming = await self.conn.fetch('''
+                SELECT conrelid::regclass::text AS source, conname
+                FROM pg_constraint
+                WHERE confrelid = $1::regclass AND contype = 'f'
+            ''', table)
+            for fk in incoming:
+                await self.conn.execute(f'ALTER TABLE {fk["source"]} DROP CONSTRAINT {fk["conname"]}')
+                logger.warning(f"⚠️ FK {fk['source']}.{fk['conname']} supprimée (cible partitionnée)")
+
+            await self.conn.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+            await self.conn.execute(f'ALTER TABLE {target} RENAME TO {table}')
+            await self.conn.execute(f'ALTER TABLE {target}_default RENAME TO {table}_default')
+            for part in await self.conn.fetch('''
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = $1::regclass
+            ''', table):
+                if part['relname'].startswith(f'{target}_p'):
+                    suffix = part['relname'][len(target):]
+                    await self.conn.execute(f'ALTER TABLE {part["relname"]} RENAME TO {table}{suffix}')
+
+            # La séquence id suit la nouvelle table
+            sequence = await self.conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", legacy)
+            if sequence:
+                await self.conn.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+
+            # Définitions lues avant renommage: "ON <table>" désigne désormais la table partitionnée
+            for trigger in triggers:
+                await self.conn.execute(trigger['definition'])
+
+            if drop_legacy:
+                await self.conn.execute(f'DROP TABLE {legacy}')
+
+        logger.info(f"🔁 {table} basculée sur la table partitionnée"
+                    f"{'' if drop_legacy else f' (ancienne: {legacy})'}")
+
+    async def migrate_table(self, table: str, drop_legacy: bool = False):
+        """Migre une table complète"""
+        logger.info(f"\n{'='*60}")
+        logger.info(f"PARTITIONNEMENT: {table}")
+        logger.info(f"{'='*60}")
+
+        if await self.is_partitioned(table):
+            logger.info(f"✅ {table} déjà partitionnée, rien à faire")
+            self.stats[table] = {'rows': 0, 'status': 'déjà partitionnée'}
+            return
+
+        started = time.perf_counter()
+        target = await self.create_partitioned_copy(table)
+        await self.install_mirror_trigger(table, target)
+        copied = await self.backfill(table, target)
+        await self.swap(table, target, drop_legacy=drop_legacy)
+        self.stats[table] = {
+            'rows': copied,
+            'status': 'migrée',
+            'elapsed_s': round(time.perf_counter() - started, 1)
+        }
+
+    async def ensure_future(self, months_ahead: int):
+        """Pré-crée les partitions des prochains mois"""
+        await self.conn.execute('SELECT create_future_partitions($1)', months_ahead)
+        logger.info(f"📅 Partitions créées jusqu'à +{months_ahead} mois")
+
+    async def prune(self, tables: List[str], keep_months: int) -> List[str]:
+        """Rétention: supprime les partitions entières plus anciennes que keep_months"""
+        today = date.today()
+        months = today.year * 12 + today.month - 1 - keep_months
+        cutoff = date(months // 12, months % 12 + 1, 1)
+
+        dropped = []
+        for table in tables:
+            rows = await self.conn.fetch('SELECT drop_partitions_before($1, $2) AS name', table, cutoff)
+            dropped.extend(row['name'] for row in rows)
+        logger.info(f"🗑️ {len(dropped)} partitions supprimées (avant {cutoff})")
+        return dropped
+
+    def print_summary(self):
+        """Affiche le résumé de la migration"""
+        print("\n" + "="*60)
+        print("RÉSUMÉ DU PARTITIONNEMENT")
+        print("="*60)
+        for table, stats in self.stats.items():
+            elapsed = f" en {stats['elapsed_s']}s" if 'elapsed_s' in stats else ''
+            print(f"📊 {table:22s}: {stats['status']} ({stats['rows']} lignes{elapsed})")
+        print("="*60)
+
+
+async def main(argv: Optional[List[str]] = None):
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Partitionnement mensuel des séries temporelles")
+    parser.add_argument('command', choices=['migrate', 'ensure', 'prune'])
+    parser.add_argument('--tables', nargs='+', default=list(PARTITIONED_TABLES), choices=list(PARTITIONED_TABLES))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--months-ahead', type=int, default=3)
+    parser.add_argument('--keep-months', type=int, default=24)
+    parser.add_argument('--drop-legacy', action='store_true', help="Supprime <table>_legacy après bascule")
+    args = parser.parse_args(argv)
+
+    migrator = PartitionMigrator(batch_size=args.batch_size, months_ahead=args.months_ahead)
+
+    try:
+        await migrator.connect()
+
+        if args.command == 'migrate':
+            for table in args.tables:
+                await migrator.migrate_table(table, drop_legacy=args.drop_legacy)
+            migrator.print_summary()
+        elif args.command == 'ensure':
+            await migrator.ensure_future(args.months_ahead)
+        else:
+            await migrator.prune(args.tables, args.keep_months)
+
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR FATALE: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    finally:
+        await migrator.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
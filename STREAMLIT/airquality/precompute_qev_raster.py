@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+============================================================
+PRÉCALCUL DU RASTER QeV (ÉCHELLE DE LA VILLE)
+============================================================
+Calcule le score QeV sur une grille couvrant une bounding box
+(Bruxelles par défaut) à partir des données locales, puis
+pré-rend les tuiles XYZ affichées par stations_map_ui.py et
+air_quality_map.py (voir app/qev_raster.py).
+
+Le calcul est checkpointé par bande: relancer la commande
+après une interruption reprend là où elle s'était arrêtée.
+
+Les tuiles sont écrites dans app/static/qev_tiles, servies par Streamlit
+(--server.enableStaticServing). docker-compose.yml monte STREAMLIT/airquality
+en lecture seule: lancer ce script sur l'hôte, depuis le dépôt (DATABASE_URL
+pointant sur le port PostgreSQL exposé); le conteneur voit les tuiles via le
+montage sans redémarrage.
+
+Usage:
+    python precompute_qev_raster.py build [--bbox S W N E] [--cell-size 100] [--workers N]
+    python precompute_qev_raster.py tiles [--layers qev air] [--zooms 11 15]
+    python precompute_qev_raster.py status
+============================================================
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import Optional, List
+import logging
+
+# Ajouter le dossier app au path
+app_path = Path(__file__).parent / 'app'
+sys.path.insert(0, str(app_path))
+
+from qev_raster import (
+    RasterGrid,
+    BRUSSELS_BBOX,
+    DEFAULT_RASTER,
+    DEFAULT_CELL_SIZE_M,
+    IDW_RADIUS_M,
+    RASTER_LAYERS,
+    load_raster_inputs,
+    build_raster,
+    read_manifest,
+    render_tiles,
+)
+
+# Configuration logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def _load_inputs(grid: RasterGrid, days: int, radius_m: float):
+    from db_utils_postgres import AsyncpgClient
+
+    try:
+        return await load_raster_inputs(grid, days=days, radius_m=radius_m)
+    finally:
+        await AsyncpgClient.close()
+
+
+def print_status(name: str):
+    """Affiche l'avancement du raster"""
+    manifest = read_manifest(name)
+    print("\n" + "="*60)
+    if manifest is None:
+        print(f"❌ Aucun raster '{name}'")
+    else:
+        bands = -(-manifest['rows'] // manifest['band_rows'])
+        state = 'terminé' if manifest['completed_at'] else 'en cours'
+        print(f"🧮 Raster '{name}': {manifest['rows']}×{manifest['cols']} cellules, "
+              f"{len(manifest['done'])}/{bands} bandes ({state})")
+        print(f"📍 Adresses en entrée: {manifest['points']}")
+        tiles = manifest.get('tiles')
+        if tiles:
+            print(f"🗺️ Tuiles: {tiles['count']} ({', '.join(tiles['layers'])}, "
+                  f"zoom {tiles['min_zoom']}-{tiles['max_zoom']})")
+    print("="*60)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Précalcul du raster QeV et de ses tuiles")
+    parser.add_argument('command', choices=['build', 'tiles', 'status'])
+    parser.add_argument('--name', default=DEFAULT_RASTER)
+    parser.add_argument('--bbox', nargs=4, type=float, default=list(BRUSSELS_BBOX),
+                        metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE_M, help="Côté des cellules (m)")
+    parser.add_argument('--days', type=int, default=30, help="Fenêtre des moyennes air quality (jours)")
+    parser.add_argument('--radius', type=float, default=IDW_RADIUS_M, help="Rayon d'interpolation IDW (m)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--restart', action='store_true', help="Ignore le checkpoint existant")
+    parser.add_argument('--no-tiles', action='store_true', help="build sans rendu des tuiles")
+    parser.add_argument('--layers', nargs='+', default=['qev'], choices=list(RASTER_LAYERS))
+    parser.add_argument('--zooms', nargs=2, type=int, default=[11, 15], metavar=('MIN', 'MAX'))
+    args = parser.parse_args(argv)
+
+    zooms = range(args.zooms[0], args.zooms[1] + 1)
+
+    try:
+        if args.command == 'build':
+            grid = RasterGrid(*args.bbox, cell_size_m=args.cell_size)
+            points = asyncio.run(_load_inputs(grid, args.days, args.radius))
+            build_raster(points, grid, name=args.name, workers=args.workers,
+                         radius_m=args.radius, resume=not args.restart)
+            if not args.no_tiles:
+                render_tiles(args.name, layers=args.layers, zooms=zooms, workers=args.workers)
+        elif args.command == 'tiles':
+            render_tiles(args.name, layers=args.layers, zooms=zooms, workers=args.workers)
+
+        print_status(args.name)
+
+    except Exception as e:
+        logger.error(f"\n❌ ERREUR FATALE: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
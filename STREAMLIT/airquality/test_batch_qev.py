@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tests du scoring par lot (batch_qev.py): statut et colonnes d'un point
+(_score), rattachement à l'adresse de la base, cache, repli, et
+exécution complète avec reprise (run)
+Base, Overpass et géocodage simulés
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+app_path = Path(__file__).parent / 'app'
+sys.path.insert(0, str(app_path))
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Client Prisma généré requis (prisma generate)
+pytest.importorskip('prisma.models')
+
+import batch_qev
+from batch_qev import RESULT_COLUMNS, BatchQeVRunner
+
+ADDRESS = 'Rue Haute 10, 1000 Bruxelles'
+NORMALIZED = '1000_bruxelles'
+LAT, LON = 50.8380, 4.3480
+RECORD = SimpleNamespace(id=7, latitude=LAT, longitude=LON, fullAddress='Rue Haute 10, 1000 Bruxelles, Belgique')
+AGGREGATES = {'last_ts': '2026-10-01T12:00:00', 'records': 240, 'updated_at': '2026-10-01T12:05:00'}
+
+
+def _result(**overrides) -> dict:
+    result = {
+        'QeV': 0.62,
+        'QeV_category': 'Bon',
+        'normalized_scores': {'S_Air': 0.55, 'S_Trafic': 0.70, 'S_Vert': 0.65},
+        'sub_indices': {'I_Air': 0.45, 'I_Trafic': 0.30, 'I_Vert': 0.35},
+        'confidence_level': 'high',
+        'osm_traffic_available': True,
+        'degraded_stages': [],
+    }
+    result.update(overrides)
+    return result
+
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    """Runner sans base: agrégats air, cache QeV, qev_scores et service simulés"""
+    runner = BatchQeVRunner(tmp_path / 'results.parquet', workers=2, chunk_size=2,
+                            geocode_cache=tmp_path / 'geocode.json')
+    runner.calls = {'service': [], 'cache': [], 'store': []}
+    runner.results = {}
+    runner.cached = {}
+    runner.aggregates = {RECORD.id: AGGREGATES}
+
+    async def read_air_aggregates(address_id):
+        return runner.aggregates.get(address_id)
+
+    async def load_qev_result(address_id, fingerprint):
+        runner.calls['cache'].append((address_id, fingerprint))
+        return runner.cached.get(address_id)
+
+    async def store_qev_results(items):
+        runner.calls['store'].append(list(items))
+        return [address_id for address_id, _, _ in items]
+
+    def calculate_qev_for_address(address, latitude, longitude, air_aggregates, deadline_s):
+        runner.calls['service'].append((address, latitude, longitude))
+        return runner.results.get((latitude, longitude), _result())
+
+    async def get_or_create_address(address, latitude, longitude):
+        return RECORD
+
+    async def find_addresses(addresses):
+        return {}
+
+    monkeypatch.setattr(batch_qev, 'read_air_aggregates', read_air_aggregates)
+    monkeypatch.setattr(batch_qev, 'load_qev_result', load_qev_result)
+    monkeypatch.setattr(batch_qev, 'store_qev_results', store_qev_results)
+    monkeypatch.setattr(runner.qev_service, 'calculate_qev_for_address', calculate_qev_for_address)
+    monkeypatch.setattr(runner.address_manager, 'get_or_create_address', get_or_create_address)
+    monkeypatch.setattr(runner.address_manager, 'find_addresses', find_addresses)
+    return runner
+
+
+def _score(runner, latitude=LAT, longitude=LON, address=ADDRESS, found=None):
+    key = BatchQeVRunner.point_key(address, latitude, longitude)
+    return asyncio.run(runner._score(key, NORMALIZED, 1, address, latitude, longitude,
+                                     {} if found is None else found, asyncio.Semaphore(1)))
+
+
+# ============================================================
+# SCORE D'UN POINT
+# ============================================================
+
+def test_point_key_ignores_case_and_spaces():
+    assert BatchQeVRunner.point_key('  Rue HAUTE 10,  1000 Bruxelles', LAT, LON) == \
+        BatchQeVRunner.point_key(ADDRESS.lower(), LAT, LON)
+    assert BatchQeVRunner.point_key(ADDRESS, None, None).endswith('|')
+    assert BatchQeVRunner.point_key(ADDRESS, LAT, LON) != BatchQeVRunner.point_key(ADDRESS, LAT, 4.3481)
+
+
+def test_score_at_record_is_persisted(runner):
+    row, item = _score(runner, found={ADDRESS: RECORD})
+    assert set(row) == set(RESULT_COLUMNS)
+    assert row['status'] == 'ok'
+    # Adresse normalisée conservée, scores lus de normalized_scores
+    assert row['normalized_address'] == NORMALIZED
+    assert (row['s_air'], row['s_traffic'], row['s_green']) == (0.55, 0.70, 0.65)
+    assert (row['i_air'], row['i_traffic'], row['i_green']) == (0.45, 0.30, 0.35)
+    assert (row['qev_score'], row['qev_category'], row['confidence_level']) == (0.62, 'Bon', 'high')
+    assert row['address_id'] == RECORD.id
+    assert row['processed_at'] is not None
+
+    # Calcul sous le libellé de la base, rattaché à son empreinte
+    assert runner.calls['service'] == [(RECORD.fullAddress, LAT, LON)]
+    assert item == (RECORD.id, row['fingerprint'], _result())
+
+
+def test_score_off_record_is_not_persisted(runner):
+    row, item = _score(runner, latitude=LAT + 0.002)
+    assert row['status'] == 'ok'
+    assert row['qev_latitude'] == LAT + 0.002
+    assert item is None
+    # Ni cache ni libellé de la base pour un autre point de la commune
+    assert runner.calls['cache'] == []
+    assert runner.calls['service'] == [(ADDRESS, LAT + 0.002, LON)]
+
+
+def test_score_reads_cached_result(runner):
+    runner.cached[RECORD.id] = _result(QeV=0.48, QeV_category='Moyen')
+    row, item = _score(runner)
+    assert row['status'] == 'cached'
+    assert (row['qev_score'], row['qev_category']) == (0.48, 'Moyen')
+    assert runner.calls['service'] == []
+    assert runner.calls['cache'] == [(RECORD.id, row['fingerprint'])]
+    assert item is None
+
+
+@pytest.mark.parametrize('overrides', [{'degraded_stages': ['parks']}, {'osm_traffic_available': False}])
+def test_score_degraded_is_not_persisted(runner, overrides):
+    runner.results[(LAT, LON)] = _result(**overrides)
+    row, item = _score(runner)
+    assert row['status'] == 'degraded'
+    assert row['qev_score'] == 0.62
+    assert item is None
+
+
+def test_score_without_air_data(runner):
+    runner.aggregates.clear()
+    row, item = _score(runner)
+    assert row['status'] == 'no_air_data'
+    assert row['address_id'] == RECORD.id
+    assert runner.calls['service'] == []
+    assert item is None
+
+
+def test_score_geocodes_missing_coordinates(runner):
+    async def geocode(address):
+        return None if address == 'Nulle part' else (LAT, LON, RECORD.fullAddress)
+
+    runner.geocoder = SimpleNamespace(geocode=geocode)
+    row, _ = _score(runner, latitude=None, longitude=None)
+    assert row['status'] == 'ok'
+    assert (row['qev_latitude'], row['qev_longitude']) == (LAT, LON)
+
+    row, item = _score(runner, latitude=None, longitude=None, address='Nulle part')
+    assert row['status'] == 'not_found'
+    assert item is None
+
+
+def test_score_error_is_reported(runner):
+    def fail(**kwargs):
+        raise RuntimeError('Overpass indisponible')
+
+    runner.qev_service.calculate_qev_for_address = fail
+    row, item = _score(runner)
+    assert row['status'] == 'error'
+    assert 'Overpass indisponible' in row['error']
+    assert row['processed_at'] is not None
+    assert item is None
+
+
+# ============================================================
+# EXÉCUTION ET REPRISE
+# ============================================================
+
+def test_run_scores_points_and_resumes(runner, tmp_path):
+    pytest.importorskip('pyarrow')
+    input_df = pd.DataFrame({
+        'address': [ADDRESS, 'Rue Blaes 5, 1000 Bruxelles', ADDRESS, None],
+        'latitude': [LAT, LAT + 0.001, LAT, LAT],
+        'longitude': [LON, LON + 0.001, LON, LON],
+    })
+    output = asyncio.run(runner.run(input_df))
+
+    # Une ligne par ligne d'entrée adressée, un score par point distinct
+    assert len(output) == 3
+    assert output['status'].tolist() == ['ok', 'ok', 'ok']
+    assert output['points_in_address'].tolist() == [2, 2, 2]
+    assert len(runner.calls['service']) == 2
+    # Seul le point situé à l'adresse de la base est écrit dans qev_scores
+    assert [[item[0] for item in items] for items in runner.calls['store']] == [[RECORD.id]]
+    assert output.loc[0, 'persisted'] and not output.loc[1, 'persisted']
+    assert pd.read_parquet(tmp_path / 'results.parquet')['point_key'].tolist() == output['point_key'].tolist()
+
+    # Relance: tous les points sont déjà traités
+    asyncio.run(runner.run(input_df))
+    assert len(runner.calls['service']) == 2
+    assert runner.stats == {'ok': 2}
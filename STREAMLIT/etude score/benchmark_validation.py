@@ -12,6 +12,10 @@ Méthodes de validation:
 4. Validation croisée avec indices existants
 5. Tests de robustesse aux valeurs extrêmes
 
+L'analyse de sensibilité Monte Carlo échantillonne des milliers de
+vecteurs de poids sur le simplexe et score toute la matrice de
+scénarios en une contraction NumPy (le QeV est linéaire en ses poids).
+
 Références:
 - Saisana & Tarantola (2002): State-of-the-art report on composite indicators
 - Saltelli et al. (2008): Global Sensitivity Analysis
@@ -22,8 +26,10 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Optional
 import logging
 from scipy.stats import pearsonr, spearmanr
 from sklearn.preprocessing import StandardScaler
@@ -31,7 +37,7 @@ from sklearn.metrics import mean_absolute_error, r2_score
 
 # Import du calculateur principal
 from metascore_calculator import (
-    QeVCalculator, QeVConfig, QeVSimulator,
+    QeVCalculator, QeVSimulator,
     TrafficData, GreenSpaceData, AirQualityData, QeVScore
 )
 
@@ -42,6 +48,86 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# ============================================================
+# MOTEUR DE SENSIBILITÉ VECTORISÉ
+# ============================================================
+
+# Ordre des composantes dans les matrices (poids et sous-scores)
+WEIGHT_COMPONENTS = ('air', 'traffic', 'green')
+
+# Paires de scénarios × échantillons traitées par bloc (borne mémoire)
+MAX_PAIRS_PER_CHUNK = 2_000_000
+
+
+def sample_simplex_weights(
+    n_samples: int,
+    baseline: Optional[Dict[str, float]] = None,
+    concentration: Optional[float] = None,
+    seed: int = 42
+) -> np.ndarray:
+    """
+    Échantillonne des vecteurs de poids (air, trafic, vert) sur le simplexe
+
+    Args:
+        n_samples: Nombre de vecteurs
+        baseline: Poids de référence (requis si concentration est donnée)
+        concentration: None = uniforme sur le simplexe (Dirichlet(1, 1, 1)),
+                       sinon Dirichlet(concentration × baseline), centré sur
+                       la référence (plus la concentration est grande, plus
+                       les poids restent proches)
+        seed: Graine du générateur
+
+    Returns:
+        Matrice (n_samples, 3), chaque ligne positive de somme 1
+    """
+    rng = np.random.default_rng(seed)
+    if concentration is None:
+        alpha = np.ones(len(WEIGHT_COMPONENTS))
+    else:
+        alpha = concentration * np.array([baseline[c] for c in WEIGHT_COMPONENTS])
+    return rng.dirichlet(alpha, size=n_samples)
+
+
+def kendall_tau_batch(scores: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """
+    Tau-b de Kendall entre chaque ligne de scores et la référence
+
+    Args:
+        scores: Matrice (m, n) de scores
+        reference: Vecteur (n,) de scores de référence
+
+    Returns:
+        Vecteur (m,) de tau-b (NaN si une ligne est constante)
+    """
+    i, j = np.triu_indices(scores.shape[1], k=1)
+    ref_sign = np.sign(reference[i] - reference[j])
+    sample_sign = np.sign(scores[:, i] - scores[:, j])
+    concordance = sample_sign @ ref_sign
+    denominator = np.sqrt(np.count_nonzero(sample_sign, axis=1) * np.count_nonzero(ref_sign))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return concordance / denominator
+
+
+def top_k_overlap_batch(scores: np.ndarray, reference: np.ndarray, k: int) -> np.ndarray:
+    """Part des k meilleurs scénarios de la référence restés dans le top-k de chaque ligne"""
+    k = min(k, scores.shape[1])
+    in_reference_top = np.zeros(scores.shape[1], dtype=bool)
+    in_reference_top[np.argsort(-reference, kind='stable')[:k]] = True
+    sample_top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return in_reference_top[sample_top].sum(axis=1) / k
+
+
+def _rank_stability_chunk(scores: np.ndarray, reference: np.ndarray, k: int) -> Dict[str, np.ndarray]:
+    """Statistiques de rang d'un bloc d'échantillons (exécuté en parallèle)"""
+    ranks = np.argsort(np.argsort(-scores, axis=1, kind='stable'), axis=1)
+    return {
+        'kendall_tau': kendall_tau_batch(scores, reference),
+        'top_k_overlap': top_k_overlap_batch(scores, reference, k),
+        'top1_unchanged': np.argmax(scores, axis=1) == np.argmax(reference),
+        'ranks': ranks.astype(np.int32),
+    }
+
+
 # ============================================================
 # CLASSE DE VALIDATION
 # ============================================================
@@ -86,13 +172,13 @@ class QeVValidator:
             weight_variations = [-0.2, -0.15, -0.1, -0.05, 0, 0.05, 0.1, 0.15, 0.2]
         
         baseline_weights = self.baseline_config.GLOBAL_WEIGHTS.copy()
-        baseline_scores = []
         
-        # Calculer scores de référence
+        # Calculer scores de référence (sous-scores une seule fois: le QeV
+        # est linéaire en ses poids, chaque variation est un produit matriciel)
         logger.info("📊 Calcul des scores de référence...")
-        for traffic, green, air in scenarios:
-            score = self.calculator.calculate_qev_score(traffic, green, air)
-            baseline_scores.append(score.qev_score)
+        components = self._component_matrix(scenarios)
+        baseline_vector = np.array([baseline_weights[c] for c in WEIGHT_COMPONENTS])
+        baseline_scores = list(components @ baseline_vector)
         
         baseline_ranking = np.argsort(baseline_scores)[::-1]  # Tri décroissant
         
@@ -127,16 +213,8 @@ class QeVValidator:
                 'green': baseline_weights['green'] * ratio
             }
             
-            # Créer une nouvelle config avec ces poids
-            test_config = QeVConfig()
-            test_config.GLOBAL_WEIGHTS = new_weights
-            test_calculator = QeVCalculator(test_config)
-            
             # Recalculer tous les scores
-            varied_scores = []
-            for traffic, green, air in scenarios:
-                score = test_calculator.calculate_qev_score(traffic, green, air)
-                varied_scores.append(score.qev_score)
+            varied_scores = list(components @ np.array([new_weights[c] for c in WEIGHT_COMPONENTS]))
             
             varied_ranking = np.argsort(varied_scores)[::-1]
             
@@ -187,6 +265,131 @@ class QeVValidator:
         self.validation_results['sensitivity'] = results
         return results
     
+    def _component_matrix(
+        self,
+        scenarios: List[Tuple[TrafficData, GreenSpaceData, AirQualityData]]
+    ) -> np.ndarray:
+        """
+        Sous-scores (air, trafic, vert) de chaque scénario, calculés une fois
+        
+        Returns:
+            Matrice (n_scenarios, 3) dans l'ordre de WEIGHT_COMPONENTS
+        """
+        rows = []
+        for traffic, green, air in scenarios:
+            score = self.calculator.calculate_qev_score(traffic, green, air)
+            rows.append((score.air_score, score.traffic_score, score.green_score))
+        return np.array(rows, dtype=np.float64)
+    
+    def monte_carlo_sensitivity(
+        self,
+        scenarios: List[Tuple[TrafficData, GreenSpaceData, AirQualityData]],
+        n_samples: int = 5000,
+        concentration: Optional[float] = None,
+        top_k: int = 5,
+        workers: Optional[int] = None,
+        seed: int = 42
+    ) -> Dict:
+        """
+        Analyse de sensibilité Monte Carlo sur les trois poids à la fois
+        
+        Les poids sont échantillonnés sur le simplexe, la matrice
+        (échantillons × scénarios) est obtenue en une contraction NumPy,
+        puis la stabilité du classement (tau de Kendall, recouvrement du
+        top-k, intervalles de rang) est calculée par blocs en parallèle.
+        
+        Args:
+            scenarios: Liste de tuples (traffic, green, air)
+            n_samples: Nombre de vecteurs de poids
+            concentration: None = simplexe uniforme, sinon Dirichlet centré
+                           sur les poids de référence (voir sample_simplex_weights)
+            top_k: Taille du top pour le recouvrement
+            workers: Nombre de threads (NumPy libère le GIL)
+            seed: Graine du générateur
+            
+        Returns:
+            Dictionnaire avec statistiques de stabilité
+        """
+        logger.info("\n" + "="*60)
+        logger.info("🎲 ANALYSE DE SENSIBILITÉ MONTE CARLO")
+        logger.info("="*60 + "\n")
+        
+        start = time.perf_counter()
+        baseline_weights = self.baseline_config.GLOBAL_WEIGHTS
+        components = self._component_matrix(scenarios)
+        reference = components @ np.array([baseline_weights[c] for c in WEIGHT_COMPONENTS])
+        
+        weights = sample_simplex_weights(n_samples, baseline_weights, concentration, seed)
+        scores = weights @ components.T  # (n_samples, n_scenarios)
+        
+        n_scenarios = components.shape[0]
+        n_pairs = max(1, n_scenarios * (n_scenarios - 1) // 2)
+        chunk_size = max(1, MAX_PAIRS_PER_CHUNK // n_pairs)
+        chunks = [scores[i:i + chunk_size] for i in range(0, n_samples, chunk_size)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(lambda chunk: _rank_stability_chunk(chunk, reference, top_k), chunks))
+        stats = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+        
+        tau = stats['kendall_tau']
+        overlap = stats['top_k_overlap']
+        ranks = stats['ranks']
+        reference_ranks = np.argsort(np.argsort(-reference, kind='stable'), kind='stable')
+        rank_shift = np.abs(ranks - reference_ranks[None, :])
+        
+        # Influence de chaque poids sur la stabilité (corrélation de Spearman)
+        influence = {}
+        for index, component in enumerate(WEIGHT_COMPONENTS):
+            rho, _ = spearmanr(weights[:, index], tau, nan_policy='omit')
+            influence[component] = float(rho)
+        
+        tau_p5 = float(np.nanpercentile(tau, 5))
+        results = {
+            'n_samples': n_samples,
+            'n_scenarios': n_scenarios,
+            'concentration': concentration,
+            'top_k': min(top_k, n_scenarios),
+            'kendall_tau': {
+                'mean': float(np.nanmean(tau)),
+                'median': float(np.nanmedian(tau)),
+                'p5': tau_p5,
+                'min': float(np.nanmin(tau)),
+            },
+            'top_k_overlap': {
+                'mean': float(overlap.mean()),
+                'p5': float(np.percentile(overlap, 5)),
+            },
+            'top1_unchanged_rate': float(stats['top1_unchanged'].mean()),
+            'mean_rank_shift': float(rank_shift.mean()),
+            'rank_intervals': pd.DataFrame({
+                'reference_rank': reference_ranks + 1,
+                'rank_p5': np.percentile(ranks, 5, axis=0) + 1,
+                'rank_p95': np.percentile(ranks, 95, axis=0) + 1,
+                'mean_shift': rank_shift.mean(axis=0),
+            }),
+            'weight_influence': influence,
+            'score_std': float(scores.std(axis=0).mean()),
+            'elapsed_s': time.perf_counter() - start,
+            # Classement robuste si 95% des tirages gardent un tau ≥ 0.7
+            'is_robust': tau_p5 >= 0.7,
+        }
+        
+        logger.info(f"📈 {n_samples} vecteurs de poids × {n_scenarios} scénarios "
+                    f"en {results['elapsed_s']:.2f}s")
+        logger.info(f"   Tau de Kendall: moyen={results['kendall_tau']['mean']:.3f}, "
+                    f"P5={tau_p5:.3f}, min={results['kendall_tau']['min']:.3f}")
+        logger.info(f"   Recouvrement top-{results['top_k']}: moyen={results['top_k_overlap']['mean']:.2%}, "
+                    f"P5={results['top_k_overlap']['p5']:.2%}")
+        logger.info(f"   Premier inchangé: {results['top1_unchanged_rate']:.1%} des tirages")
+        
+        if results['is_robust']:
+            logger.info("   ✅ Classement STABLE sur l'ensemble du simplexe des poids")
+        else:
+            logger.info("   ⚠️  Classement SENSIBLE au choix des poids")
+        
+        self.validation_results['monte_carlo'] = results
+        return results
+    
     def internal_consistency_test(self, scores: List[QeVScore]) -> Dict:
         """
         Test de cohérence interne: vérifie les corrélations entre composantes
@@ -561,6 +764,28 @@ class QeVValidator:
                         f.write("de justifier les pondérations choisies par la littérature ou par un\n")
                         f.write("consensus d'experts (méthode Delphi).\n\n")
             
+            # 1b. Sensibilité Monte Carlo
+            if 'monte_carlo' in self.validation_results:
+                mc = self.validation_results['monte_carlo']
+                f.write("-" * 80 + "\n")
+                f.write("1b. SENSIBILITÉ MONTE CARLO (SIMPLEXE DES POIDS)\n")
+                f.write("-" * 80 + "\n\n")
+                
+                f.write(f"Tirages: {mc['n_samples']} vecteurs de poids × {mc['n_scenarios']} scénarios "
+                        f"({mc['elapsed_s']:.2f}s)\n")
+                f.write(f"  • Tau de Kendall: moyen {mc['kendall_tau']['mean']:.3f}, "
+                        f"P5 {mc['kendall_tau']['p5']:.3f}, min {mc['kendall_tau']['min']:.3f}\n")
+                f.write(f"  • Recouvrement top-{mc['top_k']}: moyen {mc['top_k_overlap']['mean']:.1%}, "
+                        f"P5 {mc['top_k_overlap']['p5']:.1%}\n")
+                f.write(f"  • Premier du classement inchangé: {mc['top1_unchanged_rate']:.1%} des tirages\n")
+                f.write(f"  • Déplacement moyen de rang: {mc['mean_rank_shift']:.2f}\n")
+                influence = ', '.join(f"{name}={rho:+.2f}" for name, rho in mc['weight_influence'].items())
+                f.write(f"  • Influence des poids sur le tau (Spearman): {influence}\n")
+                f.write(f"  • Classement robuste: {'✅ OUI' if mc['is_robust'] else '⚠️ NON'}\n\n")
+                
+                f.write("Intervalles de rang (P5-P95) par scénario:\n")
+                f.write(mc['rank_intervals'].to_string() + "\n\n")
+            
             # 2. Cohérence interne
             if 'consistency' in self.validation_results:
                 f.write("-" * 80 + "\n")
@@ -649,6 +874,11 @@ class QeVValidator:
                     all_valid = False
                     issues.append("Sensibilité aux poids de pondération")
             
+            if 'monte_carlo' in self.validation_results:
+                if not self.validation_results['monte_carlo']['is_robust']:
+                    all_valid = False
+                    issues.append("Instabilité du classement sur le simplexe des poids (Monte Carlo)")
+            
             if all_valid:
                 f.write("✅ Le méta-score QeV passe TOUS les tests de validation.\n\n")
                 f.write("Le modèle est:\n")
@@ -734,6 +964,9 @@ def main():
     # 1. Analyse de sensibilité
     validator.sensitivity_analysis(test_scenarios)
     
+    # 1b. Sensibilité Monte Carlo (tous les poids à la fois)
+    validator.monte_carlo_sensitivity(test_scenarios, n_samples=10000)
+    
     # 2. Cohérence interne
     validator.internal_consistency_test(test_scores)
     
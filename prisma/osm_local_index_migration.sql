@@ -0,0 +1,73 @@
+-- Migration: Local OSM spatial index
+-- Created: 2026-10-16
+-- Description: Green spaces and roads of a regional OSM extract, loaded by
+--              STREAMLIT/airquality/import_osm_extract.py. The nearest park
+--              and nearest road lookups (app/osm_local_index.py) are GIST
+--              KNN queries on these tables; Overpass is only queried for
+--              points outside every imported extract (osm_extracts.coverage).
+
+-- ============================================================
+-- Green spaces (parks, gardens, forests, woods)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS green_spaces (
+    id SERIAL PRIMARY KEY,
+    green_space_type VARCHAR(100),
+    geom geometry(Polygon, 4326),
+    area FLOAT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+ALTER TABLE green_spaces ADD COLUMN IF NOT EXISTS osm_id TEXT;
+ALTER TABLE green_spaces ADD COLUMN IF NOT EXISTS name TEXT;
+ALTER TABLE green_spaces ADD COLUMN IF NOT EXISTS data_source TEXT NOT NULL DEFAULT 'osm';
+ALTER TABLE green_spaces ADD COLUMN IF NOT EXISTS osm_extract VARCHAR(100);
+ALTER TABLE green_spaces ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP(3) DEFAULT NOW();
+
+-- OSM multipolygon relations (large parks, forests) are not single polygons
+ALTER TABLE green_spaces
+    ALTER COLUMN geom TYPE geometry(MultiPolygon, 4326) USING ST_Multi(geom);
+
+CREATE UNIQUE INDEX IF NOT EXISTS green_spaces_osm_id_key ON green_spaces(osm_id);
+CREATE INDEX IF NOT EXISTS idx_green_spaces_geom ON green_spaces USING GIST(geom);
+CREATE INDEX IF NOT EXISTS green_spaces_osm_extract ON green_spaces(osm_extract);
+
+-- ============================================================
+-- Roads (highway=* ways used by the traffic estimation)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS osm_roads (
+    osm_id BIGINT PRIMARY KEY,
+    highway VARCHAR(50) NOT NULL,
+    name TEXT,
+    lanes VARCHAR(20),
+    maxspeed VARCHAR(20),
+    osm_extract VARCHAR(100),
+    geom geometry(LineString, 4326) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS osm_roads_geom ON osm_roads USING GIST(geom);
+CREATE INDEX IF NOT EXISTS osm_roads_osm_extract ON osm_roads(osm_extract);
+
+-- ============================================================
+-- Imported extracts (coverage of the local data)
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS osm_extracts (
+    name VARCHAR(100) PRIMARY KEY,
+    coverage geometry(MultiPolygon, 4326) NOT NULL,
+    source_file TEXT,
+    osm_timestamp TIMESTAMP(3),
+    green_spaces INTEGER NOT NULL DEFAULT 0,
+    roads INTEGER NOT NULL DEFAULT 0,
+    imported_at TIMESTAMP(3) NOT NULL DEFAULT NOW()
+);
+
+-- Installations antérieures: emprise Polygon (enveloppe convexe) → MultiPolygon
+-- (contour .poly ou cellules couvertes par les routes importées)
+ALTER TABLE osm_extracts ALTER COLUMN coverage TYPE geometry(MultiPolygon, 4326) USING ST_Multi(coverage);
+
+CREATE INDEX IF NOT EXISTS osm_extracts_coverage ON osm_extracts USING GIST(coverage);
+
+COMMENT ON TABLE osm_roads IS 'OSM highway ways of the imported extracts (nearest road lookups)';
+COMMENT ON TABLE osm_extracts IS 'Imported OSM extracts; points outside every coverage fall back to Overpass';
@@ -0,0 +1,161 @@
+-- Migration: Monthly range partitioning of time series tables
+-- Created: 2026-10-16
+-- Description: Helper functions for air_quality_records, weather_records and
+--              pollen_records partitioned by month on "timestamp".
+--              The online conversion of existing heap tables is done by
+--              STREAMLIT/airquality/migrate_to_partitioned.py (batched copy +
+--              mirror trigger + swap); this file only holds the SQL helpers,
+--              it is safe to re-run.
+
+-- ============================================================
+-- create_monthly_partition(parent, month)
+-- ============================================================
+-- Creates <parent>_pYYYYMM for the month containing month_start.
+-- Rows that already landed in <parent>_default for that month are moved
+-- into the new partition (otherwise PostgreSQL refuses the new bounds):
+-- the default partition is detached, the month created, its rows moved,
+-- then the default re-attached. The parent stays ACCESS EXCLUSIVE locked
+-- until the caller's transaction ends, so no concurrent insert can land
+-- in the default partition in between. Called by the ingest path inside
+-- the batch transaction. Returns the partition name, NULL if parent is
+-- not partitioned.
+
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent_table TEXT, month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+    lower_bound DATE := date_trunc('month', month_start)::DATE;
+    upper_bound DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := format('%s_p%s', parent_table, to_char(month_start, 'YYYYMM'));
+    default_name TEXT := parent_table || '_default';
+    has_default BOOLEAN;
+    moved_rows BIGINT := 0;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = parent_table AND c.relnamespace = 'public'::regnamespace
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Sérialise les créations concurrentes, puis revérifie sous le verrou
+    EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', parent_table);
+    IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    has_default := to_regclass('public.' || default_name) IS NOT NULL;
+    IF has_default THEN
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent_table, default_name);
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent_table, lower_bound, upper_bound
+    );
+
+    IF has_default THEN
+        -- Lignes du mois tombées dans la partition par défaut
+        EXECUTE format(
+            'WITH d AS (DELETE FROM %I WHERE "timestamp" >= %L AND "timestamp" < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM d',
+            default_name, lower_bound, upper_bound, partition_name
+        );
+        GET DIAGNOSTICS moved_rows = ROW_COUNT;
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent_table, default_name);
+    END IF;
+
+    IF moved_rows > 0 THEN
+        RAISE NOTICE '% lignes déplacées de % vers %', moved_rows, default_name, partition_name;
+    END IF;
+
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- ensure_monthly_partitions(parent, from, to)
+-- ============================================================
+-- Creates every missing monthly partition between two dates (inclusive).
+-- Returns the number of months checked.
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent_table TEXT, from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month_cursor DATE := date_trunc('month', from_date)::DATE;
+    months INTEGER := 0;
+BEGIN
+    WHILE month_cursor <= to_date LOOP
+        PERFORM create_monthly_partition(parent_table, month_cursor);
+        month_cursor := (month_cursor + INTERVAL '1 month')::DATE;
+        months := months + 1;
+    END LOOP;
+    RETURN months;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- create_future_partitions(months_ahead)
+-- ============================================================
+-- Pre-creates the next months for all time series tables (to schedule).
+
+CREATE OR REPLACE FUNCTION create_future_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS void AS $$
+DECLARE
+    parent TEXT;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['air_quality_records', 'weather_records', 'pollen_records'] LOOP
+        PERFORM ensure_monthly_partitions(
+            parent,
+            CURRENT_DATE,
+            (CURRENT_DATE + make_interval(months => months_ahead))::DATE
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- drop_partitions_before(parent, cutoff)
+-- ============================================================
+-- Retention: detaches and drops whole monthly partitions strictly older
+-- than cutoff (no row-by-row DELETE, no bloat). Returns dropped names.
+
+CREATE OR REPLACE FUNCTION drop_partitions_before(parent_table TEXT, cutoff DATE)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = parent_table
+          AND c.relname ~ ('^' || parent_table || '_p[0-9]{6}$')
+          AND (to_date(right(c.relname, 6), 'YYYYMM') + INTERVAL '1 month') <= cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent_table, part.relname);
+        -- DROP ne déclenche pas les triggers DELETE: compteurs par station
+        -- (station_stats_migration.sql) décrémentés depuis la partition détachée
+        IF to_regclass('public.station_running_stats') IS NOT NULL THEN
+            EXECUTE format(
+                'UPDATE station_running_stats t SET records = GREATEST(t.records - d.records, 0), updated_at = NOW()
+                 FROM (SELECT station_id, COUNT(*) AS records FROM %I
+                       WHERE station_id IS NOT NULL GROUP BY station_id) d
+                 WHERE t.station_id = d.station_id AND t.source_table = %L',
+                part.relname, parent_table
+            );
+        END IF;
+        EXECUTE format('DROP TABLE %I', part.relname);
+        RETURN NEXT part.relname;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Schedule (if pg_cron extension available)
+-- SELECT cron.schedule('future-partitions', '0 3 1 * *', 'SELECT create_future_partitions(3)');
@@ -0,0 +1,123 @@
+-- Migration: Latest QeV score per address
+-- Created: 2026-10-16
+-- Description: qev_scores is append-only. qev_latest_scores keeps one row per
+--              address with its most recent on-demand score (granularity IS
+--              NULL), maintained by an AFTER INSERT trigger on qev_scores.
+--              Coordinates are copied from addresses so that rankings and
+--              map overlays (db_utils_postgres.top_k_qev_scores) are served
+--              from covering indexes without touching the history.
+
+-- ============================================================
+-- Projection table
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS qev_latest_scores (
+    address_id INTEGER PRIMARY KEY REFERENCES addresses(id) ON DELETE CASCADE,
+    score_id INTEGER NOT NULL,
+    qev_score DOUBLE PRECISION NOT NULL,
+    qev_category VARCHAR(50) NOT NULL,
+    normalized_air_score DOUBLE PRECISION,
+    normalized_traffic_score DOUBLE PRECISION,
+    normalized_green_score DOUBLE PRECISION,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    calculated_at TIMESTAMP(3) NOT NULL
+);
+
+-- Rankings (global / per category), covering the map payload
+CREATE INDEX IF NOT EXISTS qev_latest_scores_rank
+    ON qev_latest_scores(qev_score DESC)
+    INCLUDE (qev_category, latitude, longitude);
+
+CREATE INDEX IF NOT EXISTS qev_latest_scores_category_rank
+    ON qev_latest_scores(qev_category, qev_score DESC)
+    INCLUDE (latitude, longitude);
+
+-- Small bounding boxes (zoomed-in maps)
+CREATE INDEX IF NOT EXISTS qev_latest_scores_coordinates
+    ON qev_latest_scores(latitude, longitude)
+    INCLUDE (qev_score, qev_category);
+
+-- Latest on-demand score of one address in the history (backfill, audits)
+CREATE INDEX IF NOT EXISTS qev_scores_spot_latest
+    ON qev_scores(address_id, calculated_at DESC, id DESC)
+    WHERE granularity IS NULL;
+
+-- ============================================================
+-- Maintenance trigger
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION update_qev_latest_score()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO qev_latest_scores (
+        address_id, score_id, qev_score, qev_category,
+        normalized_air_score, normalized_traffic_score, normalized_green_score,
+        latitude, longitude, calculated_at
+    )
+    SELECT NEW.address_id, NEW.id, NEW.qev_score, NEW.qev_category,
+           NEW.normalized_air_score, NEW.normalized_traffic_score, NEW.normalized_green_score,
+           a.latitude, a.longitude, COALESCE(NEW.calculated_at, NOW())
+    FROM addresses a
+    WHERE a.id = NEW.address_id
+    ON CONFLICT (address_id) DO UPDATE SET
+        score_id = EXCLUDED.score_id,
+        qev_score = EXCLUDED.qev_score,
+        qev_category = EXCLUDED.qev_category,
+        normalized_air_score = EXCLUDED.normalized_air_score,
+        normalized_traffic_score = EXCLUDED.normalized_traffic_score,
+        normalized_green_score = EXCLUDED.normalized_green_score,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude,
+        calculated_at = EXCLUDED.calculated_at
+    -- Out-of-order inserts (backfills) never replace a more recent score
+    WHERE qev_latest_scores.calculated_at <= EXCLUDED.calculated_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_qev_latest_score ON qev_scores;
+CREATE TRIGGER trigger_update_qev_latest_score
+    AFTER INSERT ON qev_scores
+    FOR EACH ROW
+    WHEN (NEW.granularity IS NULL)
+    EXECUTE FUNCTION update_qev_latest_score();
+
+-- Coordinates follow address updates (geocoding fixes)
+CREATE OR REPLACE FUNCTION update_qev_latest_coordinates()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE qev_latest_scores
+    SET latitude = NEW.latitude, longitude = NEW.longitude
+    WHERE address_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_qev_latest_coordinates ON addresses;
+CREATE TRIGGER trigger_update_qev_latest_coordinates
+    AFTER UPDATE OF latitude, longitude ON addresses
+    FOR EACH ROW
+    WHEN (OLD.latitude IS DISTINCT FROM NEW.latitude OR OLD.longitude IS DISTINCT FROM NEW.longitude)
+    EXECUTE FUNCTION update_qev_latest_coordinates();
+
+-- ============================================================
+-- Backfill from the history
+-- ============================================================
+
+INSERT INTO qev_latest_scores (
+    address_id, score_id, qev_score, qev_category,
+    normalized_air_score, normalized_traffic_score, normalized_green_score,
+    latitude, longitude, calculated_at
+)
+SELECT DISTINCT ON (s.address_id)
+       s.address_id, s.id, s.qev_score, s.qev_category,
+       s.normalized_air_score, s.normalized_traffic_score, s.normalized_green_score,
+       a.latitude, a.longitude, COALESCE(s.calculated_at, s.created_at, NOW())
+FROM qev_scores s
+JOIN addresses a ON a.id = s.address_id
+WHERE s.granularity IS NULL
+ORDER BY s.address_id, s.calculated_at DESC NULLS LAST, s.id DESC
+ON CONFLICT (address_id) DO NOTHING;
+
+COMMENT ON TABLE qev_latest_scores IS 'Latest on-demand QeV score per address (maintained by trigger on qev_scores)';
@@ -0,0 +1,18 @@
+-- Migration: QeV result cache
+-- Created: 2026-10-16
+-- Description: Latest full QeV result per address, keyed by the fingerprint
+--              of its inputs (air series version, OSM snapshot version,
+--              YOLO/segmentation stats mtimes, weights and bounds).
+--              Read/written by db_utils_postgres.load_qev_result and
+--              store_qev_result; a new qev_scores row is only written when
+--              the fingerprint changes.
+
+CREATE TABLE IF NOT EXISTS qev_result_cache (
+    address_id INTEGER PRIMARY KEY REFERENCES addresses(id) ON DELETE CASCADE,
+    fingerprint CHAR(64) NOT NULL,
+    result JSONB NOT NULL,
+    computed_at TIMESTAMP(3) NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE qev_result_cache IS 'Latest QeV result per address (history stays in qev_scores)';
+COMMENT ON COLUMN qev_result_cache.fingerprint IS 'sha256 of the QeV inputs (qev_service.qev_input_fingerprint)';
@@ -0,0 +1,28 @@
+-- Migration: Time-resolved QeV series
+-- Created: 2026-10-16
+-- Description: Hourly and daily QeV scores stored in qev_scores next to the
+--              on-demand scores. Series rows carry granularity ('hour'/'day')
+--              and period_start; on-demand scores keep granularity NULL.
+--              Written in bulk by db_utils_postgres.upsert_qev_series.
+
+ALTER TABLE qev_scores
+    ADD COLUMN IF NOT EXISTS raw_air_index_no2 FLOAT,
+    ADD COLUMN IF NOT EXISTS raw_air_index_pm25 FLOAT,
+    ADD COLUMN IF NOT EXISTS raw_air_index_pm10 FLOAT,
+    ADD COLUMN IF NOT EXISTS raw_air_index_o3 FLOAT,
+    ADD COLUMN IF NOT EXISTS raw_air_index_so2 FLOAT,
+    ADD COLUMN IF NOT EXISTS data_completeness FLOAT,
+    ADD COLUMN IF NOT EXISTS confidence_level FLOAT,
+    ADD COLUMN IF NOT EXISTS granularity VARCHAR(10),
+    ADD COLUMN IF NOT EXISTS period_start TIMESTAMP(3),
+    ADD COLUMN IF NOT EXISTS qev_p10 FLOAT,
+    ADD COLUMN IF NOT EXISTS qev_p50 FLOAT,
+    ADD COLUMN IF NOT EXISTS qev_p90 FLOAT;
+
+-- One row per address x granularity x period (ON CONFLICT target)
+CREATE UNIQUE INDEX IF NOT EXISTS qev_scores_series_key
+    ON qev_scores(address_id, granularity, period_start)
+    WHERE granularity IS NOT NULL;
+
+COMMENT ON COLUMN qev_scores.granularity IS 'NULL = on-demand score, hour/day = time-resolved series';
+COMMENT ON COLUMN qev_scores.qev_p50 IS 'Rolling median of qev_score (24h window for hour, 7 days for day)';
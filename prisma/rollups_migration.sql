@@ -0,0 +1,117 @@
+-- Migration: Daily rollups for air quality and weather
+-- Created: 2026-10-16
+-- Description: Per address x day (UTC) aggregates kept up to date by the
+--              ingest path (db_utils_postgres.refresh_daily_rollups).
+--              Summaries, date ranges and address listings read these
+--              tables instead of scanning raw records.
+--              Thresholds (µg/m³) must match ROLLUP_COLUMNS in db_utils_postgres.py:
+--              pm10 50, pm2_5 20, nitrogen_dioxide 200, ozone 120,
+--              sulfur_dioxide 350, carbon_monoxide 10000.
+
+-- Table 1: Air quality daily rollups
+CREATE TABLE IF NOT EXISTS air_quality_daily_rollups (
+    address_id INTEGER NOT NULL REFERENCES addresses(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    records INTEGER NOT NULL DEFAULT 0,
+    first_ts TIMESTAMP(3),
+    last_ts TIMESTAMP(3),
+
+    pm10_count INTEGER NOT NULL DEFAULT 0,
+    pm10_sum DOUBLE PRECISION,
+    pm10_min DOUBLE PRECISION,
+    pm10_max DOUBLE PRECISION,
+    pm10_exceed INTEGER NOT NULL DEFAULT 0,
+
+    pm2_5_count INTEGER NOT NULL DEFAULT 0,
+    pm2_5_sum DOUBLE PRECISION,
+    pm2_5_min DOUBLE PRECISION,
+    pm2_5_max DOUBLE PRECISION,
+    pm2_5_exceed INTEGER NOT NULL DEFAULT 0,
+
+    nitrogen_dioxide_count INTEGER NOT NULL DEFAULT 0,
+    nitrogen_dioxide_sum DOUBLE PRECISION,
+    nitrogen_dioxide_min DOUBLE PRECISION,
+    nitrogen_dioxide_max DOUBLE PRECISION,
+    nitrogen_dioxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    ozone_count INTEGER NOT NULL DEFAULT 0,
+    ozone_sum DOUBLE PRECISION,
+    ozone_min DOUBLE PRECISION,
+    ozone_max DOUBLE PRECISION,
+    ozone_exceed INTEGER NOT NULL DEFAULT 0,
+
+    sulfur_dioxide_count INTEGER NOT NULL DEFAULT 0,
+    sulfur_dioxide_sum DOUBLE PRECISION,
+    sulfur_dioxide_min DOUBLE PRECISION,
+    sulfur_dioxide_max DOUBLE PRECISION,
+    sulfur_dioxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    carbon_monoxide_count INTEGER NOT NULL DEFAULT 0,
+    carbon_monoxide_sum DOUBLE PRECISION,
+    carbon_monoxide_min DOUBLE PRECISION,
+    carbon_monoxide_max DOUBLE PRECISION,
+    carbon_monoxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (address_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS air_quality_daily_rollups_day_idx ON air_quality_daily_rollups(day);
+
+-- Table 2: Weather daily rollups
+CREATE TABLE IF NOT EXISTS weather_daily_rollups (
+    address_id INTEGER NOT NULL REFERENCES addresses(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    records INTEGER NOT NULL DEFAULT 0,
+    first_ts TIMESTAMP(3),
+    last_ts TIMESTAMP(3),
+
+    temperature_count INTEGER NOT NULL DEFAULT 0,
+    temperature_sum DOUBLE PRECISION,
+    temperature_min DOUBLE PRECISION,
+    temperature_max DOUBLE PRECISION,
+
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (address_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS weather_daily_rollups_day_idx ON weather_daily_rollups(day);
+
+-- Initial backfill from existing raw records (idempotent)
+INSERT INTO air_quality_daily_rollups (
+    address_id, day, records, first_ts, last_ts,
+    pm10_count, pm10_sum, pm10_min, pm10_max, pm10_exceed,
+    pm2_5_count, pm2_5_sum, pm2_5_min, pm2_5_max, pm2_5_exceed,
+    nitrogen_dioxide_count, nitrogen_dioxide_sum, nitrogen_dioxide_min, nitrogen_dioxide_max, nitrogen_dioxide_exceed,
+    ozone_count, ozone_sum, ozone_min, ozone_max, ozone_exceed,
+    sulfur_dioxide_count, sulfur_dioxide_sum, sulfur_dioxide_min, sulfur_dioxide_max, sulfur_dioxide_exceed,
+    carbon_monoxide_count, carbon_monoxide_sum, carbon_monoxide_min, carbon_monoxide_max, carbon_monoxide_exceed,
+    updated_at
+)
+SELECT
+    address_id, "timestamp"::date, COUNT(*), MIN("timestamp"), MAX("timestamp"),
+    COUNT(pm10), SUM(pm10), MIN(pm10), MAX(pm10), COUNT(*) FILTER (WHERE pm10 > 50),
+    COUNT(pm2_5), SUM(pm2_5), MIN(pm2_5), MAX(pm2_5), COUNT(*) FILTER (WHERE pm2_5 > 20),
+    COUNT(nitrogen_dioxide), SUM(nitrogen_dioxide), MIN(nitrogen_dioxide), MAX(nitrogen_dioxide), COUNT(*) FILTER (WHERE nitrogen_dioxide > 200),
+    COUNT(ozone), SUM(ozone), MIN(ozone), MAX(ozone), COUNT(*) FILTER (WHERE ozone > 120),
+    COUNT(sulfur_dioxide), SUM(sulfur_dioxide), MIN(sulfur_dioxide), MAX(sulfur_dioxide), COUNT(*) FILTER (WHERE sulfur_dioxide > 350),
+    COUNT(carbon_monoxide), SUM(carbon_monoxide), MIN(carbon_monoxide), MAX(carbon_monoxide), COUNT(*) FILTER (WHERE carbon_monoxide > 10000),
+    NOW()
+FROM air_quality_records
+GROUP BY address_id, "timestamp"::date
+ON CONFLICT (address_id, day) DO NOTHING;
+
+INSERT INTO weather_daily_rollups (
+    address_id, day, records, first_ts, last_ts,
+    temperature_count, temperature_sum, temperature_min, temperature_max,
+    updated_at
+)
+SELECT
+    address_id, "timestamp"::date, COUNT(*), MIN("timestamp"), MAX("timestamp"),
+    COUNT(temperature), SUM(temperature), MIN(temperature), MAX(temperature),
+    NOW()
+FROM weather_records
+GROUP BY address_id, "timestamp"::date
+ON CONFLICT (address_id, day) DO NOTHING;
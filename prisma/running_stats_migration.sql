@@ -0,0 +1,131 @@
+-- Migration: Running aggregates for air quality
+-- Created: 2026-10-16
+-- Description: Sum of squares in the daily rollups (variance per day / window)
+--              and one row of running totals per address
+--              (air_quality_running_stats: count, sum, sum of squares, min, max,
+--              exceedances per pollutant). Both are refreshed by
+--              db_utils_postgres.refresh_daily_rollups in the ingest transaction;
+--              get_location_summary and the QeV air inputs read one row.
+
+-- ============================================================
+-- Sum of squares in the daily rollups
+-- ============================================================
+
+ALTER TABLE air_quality_daily_rollups
+    ADD COLUMN IF NOT EXISTS pm10_sumsq DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS pm2_5_sumsq DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS nitrogen_dioxide_sumsq DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS ozone_sumsq DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS sulfur_dioxide_sumsq DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS carbon_monoxide_sumsq DOUBLE PRECISION;
+
+ALTER TABLE weather_daily_rollups
+    ADD COLUMN IF NOT EXISTS temperature_sumsq DOUBLE PRECISION;
+
+-- Backfill (days written before this migration)
+UPDATE air_quality_daily_rollups r SET
+    pm10_sumsq = s.pm10_sumsq,
+    pm2_5_sumsq = s.pm2_5_sumsq,
+    nitrogen_dioxide_sumsq = s.nitrogen_dioxide_sumsq,
+    ozone_sumsq = s.ozone_sumsq,
+    sulfur_dioxide_sumsq = s.sulfur_dioxide_sumsq,
+    carbon_monoxide_sumsq = s.carbon_monoxide_sumsq
+FROM (
+    SELECT address_id, "timestamp"::date AS day,
+           SUM(pm10 * pm10) AS pm10_sumsq,
+           SUM(pm2_5 * pm2_5) AS pm2_5_sumsq,
+           SUM(nitrogen_dioxide * nitrogen_dioxide) AS nitrogen_dioxide_sumsq,
+           SUM(ozone * ozone) AS ozone_sumsq,
+           SUM(sulfur_dioxide * sulfur_dioxide) AS sulfur_dioxide_sumsq,
+           SUM(carbon_monoxide * carbon_monoxide) AS carbon_monoxide_sumsq
+    FROM air_quality_records
+    GROUP BY address_id, "timestamp"::date
+) s
+WHERE r.address_id = s.address_id AND r.day = s.day;
+
+UPDATE weather_daily_rollups r SET temperature_sumsq = s.temperature_sumsq
+FROM (
+    SELECT address_id, "timestamp"::date AS day, SUM(temperature * temperature) AS temperature_sumsq
+    FROM weather_records
+    GROUP BY address_id, "timestamp"::date
+) s
+WHERE r.address_id = s.address_id AND r.day = s.day;
+
+-- ============================================================
+-- Running totals per address
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS air_quality_running_stats (
+    address_id INTEGER PRIMARY KEY REFERENCES addresses(id) ON DELETE CASCADE,
+    records INTEGER NOT NULL DEFAULT 0,
+    first_ts TIMESTAMP(3),
+    last_ts TIMESTAMP(3),
+
+    pm10_count INTEGER NOT NULL DEFAULT 0,
+    pm10_sum DOUBLE PRECISION,
+    pm10_sumsq DOUBLE PRECISION,
+    pm10_min DOUBLE PRECISION,
+    pm10_max DOUBLE PRECISION,
+    pm10_exceed INTEGER NOT NULL DEFAULT 0,
+
+    pm2_5_count INTEGER NOT NULL DEFAULT 0,
+    pm2_5_sum DOUBLE PRECISION,
+    pm2_5_sumsq DOUBLE PRECISION,
+    pm2_5_min DOUBLE PRECISION,
+    pm2_5_max DOUBLE PRECISION,
+    pm2_5_exceed INTEGER NOT NULL DEFAULT 0,
+
+    nitrogen_dioxide_count INTEGER NOT NULL DEFAULT 0,
+    nitrogen_dioxide_sum DOUBLE PRECISION,
+    nitrogen_dioxide_sumsq DOUBLE PRECISION,
+    nitrogen_dioxide_min DOUBLE PRECISION,
+    nitrogen_dioxide_max DOUBLE PRECISION,
+    nitrogen_dioxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    ozone_count INTEGER NOT NULL DEFAULT 0,
+    ozone_sum DOUBLE PRECISION,
+    ozone_sumsq DOUBLE PRECISION,
+    ozone_min DOUBLE PRECISION,
+    ozone_max DOUBLE PRECISION,
+    ozone_exceed INTEGER NOT NULL DEFAULT 0,
+
+    sulfur_dioxide_count INTEGER NOT NULL DEFAULT 0,
+    sulfur_dioxide_sum DOUBLE PRECISION,
+    sulfur_dioxide_sumsq DOUBLE PRECISION,
+    sulfur_dioxide_min DOUBLE PRECISION,
+    sulfur_dioxide_max DOUBLE PRECISION,
+    sulfur_dioxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    carbon_monoxide_count INTEGER NOT NULL DEFAULT 0,
+    carbon_monoxide_sum DOUBLE PRECISION,
+    carbon_monoxide_sumsq DOUBLE PRECISION,
+    carbon_monoxide_min DOUBLE PRECISION,
+    carbon_monoxide_max DOUBLE PRECISION,
+    carbon_monoxide_exceed INTEGER NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT NOW()
+);
+
+-- Initial backfill from the daily rollups
+INSERT INTO air_quality_running_stats (
+    address_id, records, first_ts, last_ts,
+    pm10_count, pm10_sum, pm10_sumsq, pm10_min, pm10_max, pm10_exceed,
+    pm2_5_count, pm2_5_sum, pm2_5_sumsq, pm2_5_min, pm2_5_max, pm2_5_exceed,
+    nitrogen_dioxide_count, nitrogen_dioxide_sum, nitrogen_dioxide_sumsq, nitrogen_dioxide_min, nitrogen_dioxide_max, nitrogen_dioxide_exceed,
+    ozone_count, ozone_sum, ozone_sumsq, ozone_min, ozone_max, ozone_exceed,
+    sulfur_dioxide_count, sulfur_dioxide_sum, sulfur_dioxide_sumsq, sulfur_dioxide_min, sulfur_dioxide_max, sulfur_dioxide_exceed,
+    carbon_monoxide_count, carbon_monoxide_sum, carbon_monoxide_sumsq, carbon_monoxide_min, carbon_monoxide_max, carbon_monoxide_exceed,
+    updated_at
+)
+SELECT
+    address_id, SUM(records), MIN(first_ts), MAX(last_ts),
+    SUM(pm10_count), SUM(pm10_sum), SUM(pm10_sumsq), MIN(pm10_min), MAX(pm10_max), SUM(pm10_exceed),
+    SUM(pm2_5_count), SUM(pm2_5_sum), SUM(pm2_5_sumsq), MIN(pm2_5_min), MAX(pm2_5_max), SUM(pm2_5_exceed),
+    SUM(nitrogen_dioxide_count), SUM(nitrogen_dioxide_sum), SUM(nitrogen_dioxide_sumsq), MIN(nitrogen_dioxide_min), MAX(nitrogen_dioxide_max), SUM(nitrogen_dioxide_exceed),
+    SUM(ozone_count), SUM(ozone_sum), SUM(ozone_sumsq), MIN(ozone_min), MAX(ozone_max), SUM(ozone_exceed),
+    SUM(sulfur_dioxide_count), SUM(sulfur_dioxide_sum), SUM(sulfur_dioxide_sumsq), MIN(sulfur_dioxide_min), MAX(sulfur_dioxide_max), SUM(sulfur_dioxide_exceed),
+    SUM(carbon_monoxide_count), SUM(carbon_monoxide_sum), SUM(carbon_monoxide_sumsq), MIN(carbon_monoxide_min), MAX(carbon_monoxide_max), SUM(carbon_monoxide_exceed),
+    NOW()
+FROM air_quality_daily_rollups
+GROUP BY address_id
+ON CONFLICT (address_id) DO NOTHING;
@@ -0,0 +1,102 @@
+-- Migration: Per-station running stats
+-- Created: 2026-10-16
+-- Description: One row per station x source table (record count, last
+--              measurement) read by StationManager (STATION_STATS_QUERY in
+--              db_utils_postgres.py) instead of counting raw records.
+--              Station rows are written by several paths (Prisma, imports),
+--              so the counters are kept up to date by statement-level
+--              triggers with transition tables: one aggregate per statement,
+--              not per row. Run after migrate_to_partitioned.py (triggers are
+--              attached to the current tables).
+
+CREATE TABLE IF NOT EXISTS station_running_stats (
+    station_id INTEGER NOT NULL REFERENCES stations(id) ON DELETE CASCADE,
+    source_table TEXT NOT NULL,
+    records BIGINT NOT NULL DEFAULT 0,
+    last_ts TIMESTAMP(3),
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (station_id, source_table)
+);
+
+-- ============================================================
+-- Triggers (TG_ARGV[0] = source table, stable across renames)
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION station_stats_after_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO station_running_stats AS t (station_id, source_table, records, last_ts, updated_at)
+    SELECT station_id, TG_ARGV[0], COUNT(*), MAX("timestamp"), NOW()
+    FROM new_rows
+    WHERE station_id IS NOT NULL
+    GROUP BY station_id
+    ON CONFLICT (station_id, source_table) DO UPDATE SET
+        records = t.records + EXCLUDED.records,
+        last_ts = GREATEST(t.last_ts, EXCLUDED.last_ts),
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- last_ts reste une borne haute après suppression (pas de rescan)
+CREATE OR REPLACE FUNCTION station_stats_after_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE station_running_stats t SET
+        records = GREATEST(t.records - d.records, 0),
+        updated_at = NOW()
+    FROM (
+        SELECT station_id, COUNT(*) AS records
+        FROM old_rows
+        WHERE station_id IS NOT NULL
+        GROUP BY station_id
+    ) d
+    WHERE t.station_id = d.station_id AND t.source_table = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS air_quality_station_stats_insert ON air_quality_records;
+CREATE TRIGGER air_quality_station_stats_insert
+    AFTER INSERT ON air_quality_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION station_stats_after_insert('air_quality_records');
+
+DROP TRIGGER IF EXISTS air_quality_station_stats_delete ON air_quality_records;
+CREATE TRIGGER air_quality_station_stats_delete
+    AFTER DELETE ON air_quality_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION station_stats_after_delete('air_quality_records');
+
+DROP TRIGGER IF EXISTS weather_station_stats_insert ON weather_records;
+CREATE TRIGGER weather_station_stats_insert
+    AFTER INSERT ON weather_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION station_stats_after_insert('weather_records');
+
+DROP TRIGGER IF EXISTS weather_station_stats_delete ON weather_records;
+CREATE TRIGGER weather_station_stats_delete
+    AFTER DELETE ON weather_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION station_stats_after_delete('weather_records');
+
+-- ============================================================
+-- Initial backfill (recomputed from raw records, idempotent)
+-- ============================================================
+
+INSERT INTO station_running_stats (station_id, source_table, records, last_ts, updated_at)
+SELECT station_id, 'air_quality_records', COUNT(*), MAX("timestamp"), NOW()
+FROM air_quality_records
+WHERE station_id IS NOT NULL
+GROUP BY station_id
+ON CONFLICT (station_id, source_table) DO UPDATE SET
+    records = EXCLUDED.records, last_ts = EXCLUDED.last_ts, updated_at = NOW();
+
+INSERT INTO station_running_stats (station_id, source_table, records, last_ts, updated_at)
+SELECT station_id, 'weather_records', COUNT(*), MAX("timestamp"), NOW()
+FROM weather_records
+WHERE station_id IS NOT NULL
+GROUP BY station_id
+ON CONFLICT (station_id, source_table) DO UPDATE SET
+    records = EXCLUDED.records, last_ts = EXCLUDED.last_ts, updated_at = NOW();
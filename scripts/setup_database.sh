@@ -155,6 +155,57 @@ EOSQL
 
 echo "✅ Triggers finaux configurés"
 
+# ============================================================
+# 8b. Partitionnement mensuel des séries temporelles
+# ============================================================
+echo ""
+echo "📅 Partitionnement mensuel (air_quality, weather, pollen)..."
+
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/partitioning_migration.sql
+# Les anciennes tables sont conservées (<table>_legacy) sauf DROP_LEGACY_TABLES=1
+if [ "${DROP_LEGACY_TABLES:-0}" = "1" ]; then
+    python3 STREAMLIT/airquality/migrate_to_partitioned.py migrate --drop-legacy
+else
+    python3 STREAMLIT/airquality/migrate_to_partitioned.py migrate
+fi
+
+echo "✅ Tables partitionnées par mois"
+
+# Rollups journaliers (résumés, listes d'adresses)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/rollups_migration.sql
+
+echo "✅ Rollups journaliers créés"
+
+# Agrégats courants par adresse (résumés et QeV en une ligne)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/running_stats_migration.sql
+
+echo "✅ Agrégats courants créés"
+
+# Compteurs par station (carte des stations sans comptage des mesures)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/station_stats_migration.sql
+
+echo "✅ Compteurs par station créés"
+
+# Séries QeV horaires/journalières dans qev_scores
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/qev_series_migration.sql
+
+echo "✅ Séries QeV activées"
+
+# Cache des résultats QeV (empreinte des entrées)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/qev_result_cache_migration.sql
+
+echo "✅ Cache des résultats QeV créé"
+
+# Dernier score QeV par adresse (classements, cartes)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/qev_latest_migration.sql
+
+echo "✅ Projection des derniers scores QeV créée"
+
+# Index OSM local (parcs et routes, import: STREAMLIT/airquality/import_osm_extract.py)
+docker-compose exec -T postgres psql -U airquality_user -d airquality_db < prisma/osm_local_index_migration.sql
+
+echo "✅ Index OSM local créé"
+
 # ============================================================
 # 9. Démarrer PgAdmin (optionnel)
 # ============================================================